@@ -21,16 +21,22 @@
 #include "gt_input_map_parser.h"
 #include "gt_input_map_utils.h"
 #include "gt_input_sam_parser.h"
+#include "gt_input_bam_parser.h"
+#include "gt_input_gtb_parser.h"
 #include "gt_input_fasta_parser.h"
 #include "gt_input_generic_parser.h"
+#include "gt_paired_input_file.h"
+#include "gt_prefetch_input_file.h"
 
 // Output handlers
 #include "gt_output_buffer.h"
 #include "gt_buffered_output_file.h"
-// Output printers (MAP,SAM,BAM,...)
+// Output printers (MAP,SAM,BAM,GTB,...)
 #include "gt_output_fasta.h"
 #include "gt_output_map.h"
 #include "gt_output_sam.h"
+#include "gt_output_bam.h"
+#include "gt_output_gtb.h"
 #include "gt_output_generic_printer.h"
 
 // GEM-Tools basic data structures: Template/Alignment/Maps/...
@@ -52,6 +58,8 @@
 
 // Utilities
 #include "gt_json.h"
+#include "gt_bgzf.h"
+#include "gt_template_index.h"
 
 // GEM Idx Loader
 #include "gt_gemIdx_loader.h"
@@ -120,6 +128,9 @@ extern char* gt_gtfcount_groups[];
 extern gt_option gt_region_options[];
 extern char* gt_region_groups[];
 
+extern gt_option gt_bgzip_options[];
+extern char* gt_bgzip_groups[];
+
 GT_INLINE uint64_t gt_options_get_num_options(const gt_option* const options);
 GT_INLINE struct option* gt_options_adaptor_getopt(const gt_option* const options);
 GT_INLINE gt_string* gt_options_adaptor_getopt_short(const gt_option* const options);
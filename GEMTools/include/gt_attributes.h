@@ -87,6 +87,12 @@ typedef struct {
   bool contains_qualities;
 } gt_map_file_format;
 
+// GTB-format (binary templates) File Attribute
+typedef struct {
+  uint8_t version;
+  bool contains_qualities;
+} gt_gtb_file_format;
+
 // FASTQ/FASTA/MULTIFASTA File Attribute
 typedef enum { F_FASTA, F_FASTQ, F_MULTI_FASTA } gt_file_fasta_format;
 typedef struct {
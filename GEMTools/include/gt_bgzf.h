@@ -0,0 +1,145 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt_bgzf.h
+ * DATE: 18/10/2026
+ * DESCRIPTION: BGZF (blocked gzip) reader and writer with parallel block (de)compression.
+ *   A BGZF file is a series of gzip members of at most 64KB of uncompressed
+ *   data each, where the size of every member is stored in the 'BC' extra
+ *   field of its header. Members can therefore be located without
+ *   decompression and inflated independently.
+ */
+
+#ifndef GT_BGZF_H_
+#define GT_BGZF_H_
+
+#include "gt_essentials.h"
+
+#ifdef HAVE_ZLIB
+#include <zlib.h>
+#endif
+
+// BGZF constants
+#define GT_BGZF_HEADER_SIZE 18
+#define GT_BGZF_MAX_BLOCK_SIZE (1<<16)
+#define GT_BGZF_BATCH_BLOCKS 1024 /* Max blocks inflated together (64MB) */
+#define GT_BGZF_DEFAULT_THREADS 4
+#define GT_BGZF_BLOCK_SIZE 0xff00 /* Uncompressed bytes per written block */
+#define GT_BGZF_WRITE_BATCH_BLOCKS 256 /* Blocks compressed together (16MB) */
+
+/*
+ * Virtual offsets address a byte in a BGZF file by the file offset
+ * of its block and the offset inside the uncompressed block
+ */
+#define GT_BGZF_VIRTUAL_OFFSET(block_address,block_offset) (((uint64_t)(block_address)<<16)|((uint64_t)(block_offset)&0xffff))
+#define GT_BGZF_BLOCK_ADDRESS(virtual_offset) ((uint64_t)(virtual_offset)>>16)
+#define GT_BGZF_BLOCK_OFFSET(virtual_offset) ((uint64_t)(virtual_offset)&0xffff)
+
+/*
+ * Checkers
+ */
+#define GT_BGZF_READER_CHECK(bgzf_reader) \
+  GT_NULL_CHECK(bgzf_reader); \
+  GT_NULL_CHECK(bgzf_reader->file)
+#define GT_BGZF_WRITER_CHECK(bgzf_writer) \
+  GT_NULL_CHECK(bgzf_writer); \
+  GT_NULL_CHECK(bgzf_writer->file)
+
+typedef struct {
+  uint8_t* data;       // Compressed data (deflate stream)
+  uint64_t data_size;  // Compressed size
+  uint32_t crc;        // CRC32 of the uncompressed data
+  uint32_t size;       // Uncompressed size
+  uint64_t offset;     // Offset of the uncompressed data in the output buffer
+  uint64_t address;    // File offset of the block (reader)
+  bool error;          // The block could not be inflated (reader)
+} gt_bgzf_block;
+
+typedef struct {
+  FILE* file;
+  char* file_name;
+  uint64_t num_threads;
+  bool eof;
+  bool eof_marker;     // The last block read is empty (i.e. the BGZF EOF marker)
+  bool truncated;      // The file ends without the EOF marker
+  /* Position */
+  uint64_t address;    // File offset of the next block
+  uint64_t end;        // Virtual offset the content ends at (UINT64_MAX if none)
+  /* Current batch */
+  uint8_t* compressed_buffer;
+  gt_bgzf_block* blocks;
+  uint64_t num_blocks;
+  uint8_t* output;
+  bool error;          // A block could not be read/inflated (reported by the next read)
+  /* Content read ahead from the file (i.e. for format detection of streams) */
+  uint8_t* pending;
+  uint64_t pending_size;
+  uint64_t pending_pos;
+} gt_bgzf_reader;
+
+typedef struct {
+  FILE* file;
+  uint64_t num_threads;
+  int level;
+  /* Current batch */
+  uint8_t* buffer;            // Uncompressed data of the batch
+  uint64_t buffer_size;
+  uint8_t* compressed_buffer; // One GT_BGZF_MAX_BLOCK_SIZE slot per block
+  uint64_t* compressed_sizes;
+  uint64_t block_address;     // File offset of the first block of the batch
+  bool error;
+  /* Index */
+  gt_vector* marks;           // Pending marks (uint64_t offsets in the batch)
+  gt_vector* index;           // Virtual offsets of the marks (uint64_t)
+} gt_bgzf_writer;
+
+/*
+ * Format detection
+ */
+GT_INLINE bool gt_bgzf_is_bgzf(const uint8_t* const header,const uint64_t length);
+
+/*
+ * Reader
+ */
+gt_bgzf_reader* gt_bgzf_reader_new(FILE* const file,char* const file_name,const uint64_t num_threads);
+void gt_bgzf_reader_delete(gt_bgzf_reader* const bgzf_reader);
+GT_INLINE void gt_bgzf_reader_set_threads(gt_bgzf_reader* const bgzf_reader,const uint64_t num_threads);
+/* Compressed content already consumed from the file that is read before the file */
+void gt_bgzf_reader_unread(gt_bgzf_reader* const bgzf_reader,const uint8_t* const data,const uint64_t length);
+/*
+ * Fills the buffer with the content of complete blocks.
+ * The buffer has to hold at least GT_BGZF_MAX_BLOCK_SIZE bytes.
+ * Returns the number of bytes read, 0 at EOF and -1 on error.
+ * The content of the blocks before a bad block is returned, the error by the next read
+ */
+int64_t gt_bgzf_reader_read(gt_bgzf_reader* const bgzf_reader,uint8_t* const buffer,const uint64_t buffer_size);
+/*
+ * Random access (files only)
+ *   Seeks to the block at the given file offset. The end is a virtual offset,
+ *   the content of the blocks read after it is discarded.
+ */
+bool gt_bgzf_reader_seek(gt_bgzf_reader* const bgzf_reader,const uint64_t block_address);
+GT_INLINE void gt_bgzf_reader_set_end(gt_bgzf_reader* const bgzf_reader,const uint64_t virtual_offset);
+/*
+ * Translation between virtual offsets and positions of the buffer filled by
+ * the last read. Virtual offsets outside of the last batch have no position
+ */
+GT_INLINE uint64_t gt_bgzf_reader_get_virtual_offset(gt_bgzf_reader* const bgzf_reader,const uint64_t buffer_pos);
+GT_INLINE bool gt_bgzf_reader_get_buffer_pos(
+    gt_bgzf_reader* const bgzf_reader,const uint64_t virtual_offset,uint64_t* const buffer_pos);
+
+/*
+ * Writer
+ *   Marks record the virtual offset of the current position, i.e. the
+ *   start of a template. They are resolved when their block is written.
+ */
+gt_bgzf_writer* gt_bgzf_writer_new(FILE* const file,const uint64_t num_threads,const int level);
+void gt_bgzf_writer_delete(gt_bgzf_writer* const bgzf_writer);
+GT_INLINE void gt_bgzf_writer_set_threads(gt_bgzf_writer* const bgzf_writer,const uint64_t num_threads);
+bool gt_bgzf_writer_write(gt_bgzf_writer* const bgzf_writer,const uint8_t* data,uint64_t length);
+GT_INLINE void gt_bgzf_writer_mark(gt_bgzf_writer* const bgzf_writer);
+bool gt_bgzf_writer_flush(gt_bgzf_writer* const bgzf_writer);
+/* Flushes the remaining data and writes the EOF marker block */
+bool gt_bgzf_writer_close(gt_bgzf_writer* const bgzf_writer);
+GT_INLINE gt_vector* gt_bgzf_writer_get_index(gt_bgzf_writer* const bgzf_writer);
+
+#endif /* GT_BGZF_H_ */
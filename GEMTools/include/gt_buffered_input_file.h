@@ -52,6 +52,8 @@ GT_INLINE gt_status gt_buffered_input_file_get_block(
     gt_buffered_input_file* const buffered_input_file,const uint64_t num_lines);
 GT_INLINE gt_status gt_buffered_input_file_add_lines_to_block(
     gt_buffered_input_file* const buffered_input_file,const uint64_t num_lines);
+/* Clears the block buffer, i.e. before reading lines into it */
+GT_INLINE void gt_buffered_input_file_clear_block(gt_buffered_input_file* const buffered_input_file);
 
 /*
  * Block Synchronization with Output
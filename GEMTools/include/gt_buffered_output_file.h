@@ -60,5 +60,6 @@ GT_INLINE void gt_buffered_output_file_safety_dump(gt_buffered_output_file* cons
  */
 GT_INLINE gt_status gt_vbofprintf(gt_buffered_output_file* const buffered_output_file,const char *template,va_list v_args);
 GT_INLINE gt_status gt_bofprintf(gt_buffered_output_file* const buffered_output_file,const char *template,...);
+GT_INLINE gt_status gt_bofwrite(gt_buffered_output_file* const buffered_output_file,const void* const data,const uint64_t length);
 
 #endif /* GT_BUFFERED_OUTPUT_FILE_H_ */
@@ -283,6 +283,7 @@ gt_status gt_tprintf(const char* format,...);
 #define GT_ERROR_SYS_MMAP_FILE "Could not map file '%s' to memory"
 #define GT_ERROR_SYS_UNMAP "Could not unmap memory"
 #define GT_ERROR_SYS_THREAD "Could not create thread"
+#define GT_ERROR_SYS_THREAD_JOIN "Could not join thread"
 #define GT_ERROR_SYS_PIPE "Could not create pipe"
 #define GT_ERROR_SYS_MUTEX "Mutex call error"
 #define GT_ERROR_SYS_MUTEX_INIT "Mutex initialization error"
@@ -310,6 +311,8 @@ gt_status gt_tprintf(const char* format,...);
 #define GT_ERROR_FILE_BZIP2_OPEN "Could not open BZIPPED file '%s'"
 #define GT_ERROR_FILE_BZIP2_NO_BZLIB "Could not open BZIPPED file '%s': no bzlib support compiled in"
 #define GT_ERROR_FILE_FDOPEN "Could not fdopen file descriptor"
+#define GT_ERROR_FILE_BGZF_BLOCK "Invalid BGZF block in file '%s'"
+#define GT_ERROR_FILE_BGZF_INFLATE "Could not inflate BGZF block of file '%s'"
 
 // Output errors
 #define GT_ERROR_FPRINTF "Printing output. 'fprintf' call failed"
@@ -318,6 +321,7 @@ gt_status gt_tprintf(const char* format,...);
 #define GT_ERROR_BPRINTF "Printing output. Buffer print formated 'gt_bprintf' call failed"
 #define GT_ERROR_OFPRINTF "Printing output. Output File print formated 'gt_ofprintf' call failed"
 #define GT_ERROR_BOFPRINTF "Printing output. Buffered Output file print formated 'gt_bofprintf' call failed"
+#define GT_ERROR_FWRITE "Printing output. 'fwrite' call failed"
 
 #define GT_ERROR_PRINT_FORMAT "Incorrect print format. Expected format character"
 
@@ -412,6 +416,36 @@ gt_status gt_tprintf(const char* format,...);
 #define GT_ERROR_PARSE_SAM_WRONG_NUM_XA "Parsing SAM error(%s:%"PRIu64":%"PRIu64"). Wrong number of eXtra mAps (as to pair them)"
 #define GT_ERROR_PARSE_SAM_UNSOLVED_PENDING_MAPS "Parsing SAM error(%s:%"PRIu64":%"PRIu64"). Failed to pair maps"
 
+/*
+ * Parsing BAM File format errors
+ */
+// IBP (Input BAM Parser). General
+#define GT_ERROR_PARSE_BAM "Parsing BAM error(%s:%"PRIu64")"
+#define GT_ERROR_PARSE_BAM_BAD_FILE_FORMAT "Parsing BAM error(%s:%"PRIu64"). Not a BAM file"
+#define GT_ERROR_PARSE_BAM_TRUNCATED_RECORD "Parsing BAM error(%s:%"PRIu64"). Truncated record"
+#define GT_ERROR_PARSE_BAM_BAD_REFERENCE "Parsing BAM error(%s:%"PRIu64"). Reference ID not declared in the header"
+#define GT_ERROR_PARSE_BAM_BAD_CIGAR "Parsing BAM error(%s:%"PRIu64"). Invalid CIGAR operation"
+#define GT_ERROR_PARSE_BAM_UNSOLVED_PENDING_MAPS "Parsing BAM error(%s:%"PRIu64"). Failed to pair maps"
+
+/*
+ * Parsing GTB (binary templates) File format errors
+ */
+// IGTB (Input GTB Parser). General
+#define GT_ERROR_PARSE_GTB "Parsing GTB error(%s:%"PRIu64")"
+#define GT_ERROR_PARSE_GTB_BAD_FILE_FORMAT "Parsing GTB error(%s:%"PRIu64"). Not a GTB file"
+#define GT_ERROR_PARSE_GTB_BAD_VERSION "Parsing GTB error(%s). Version %"PRIu64" not supported (version %"PRIu64" expected)"
+#define GT_ERROR_PARSE_GTB_TRUNCATED_RECORD "Parsing GTB error(%s:%"PRIu64"). Truncated record"
+#define GT_ERROR_PARSE_GTB_BAD_SEQ_NAME "Parsing GTB error(%s:%"PRIu64"). Sequence name index out of range"
+#define GT_ERROR_PARSE_GTB_BAD_OPERATION "Parsing GTB error(%s:%"PRIu64"). Invalid mismatch/junction operation"
+#define GT_ERROR_PARSE_GTB_BAD_NUMBER_OF_BLOCKS "Parsing GTB error(%s:%"PRIu64"). Wrong number of blocks"
+#define GT_ERROR_PARSE_GTB_UNPAIRED "Parsing GTB error(%s:%"PRIu64"). Single-end records of the same template not found"
+
+/*
+ * Paired input files
+ */
+#define GT_ERROR_PAIRED_INPUT_UNSYNCH_FILES "Paired input (%s,%s). Files contain a different number of reads"
+#define GT_ERROR_PAIRED_INPUT_ID_MISMATCH "Paired input (%s,%s). Read ids differ ('%s' vs '%s')"
+
 /*
  * Output File
  */
@@ -420,6 +454,13 @@ gt_status gt_tprintf(const char* format,...);
 #define GT_ERROR_BUFFER_SAFETY_DUMP "Output buffer. Could not perform safety dump"
 
 #define GT_ERROR_OUTPUT_SAM_NO_PRIMARY_ALG "Output SAM. No primary alignment specified"
+#define GT_ERROR_OUTPUT_BAM "Output BAM. Encoding SAM record failed (line %"PRIu64")"
+#define GT_ERROR_OUTPUT_BAM_BAD_RECORD "Output BAM. Malformed SAM record (line %"PRIu64")"
+#define GT_ERROR_OUTPUT_BAM_BAD_REFERENCE "Output BAM. Reference not declared by the @SQ header lines (line %"PRIu64")"
+#define GT_ERROR_OUTPUT_BAM_BAD_CIGAR "Output BAM. Invalid CIGAR (line %"PRIu64")"
+#define GT_ERROR_OUTPUT_BAM_BAD_OPTIONAL_FIELD "Output BAM. Invalid optional field (line %"PRIu64")"
+#define GT_ERROR_OUTPUT_BAM_WRITE "Output BAM. Error writing the BGZF blocks (line %"PRIu64")"
+#define GT_ERROR_OUTPUT_GTB_MMAP_NOT_FOUND "Output GTB. Paired map not present in the maps of its end (template '%s')"
 
 /*
  * Map Alignment
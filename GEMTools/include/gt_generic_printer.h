@@ -51,6 +51,7 @@ GT_INLINE void gt_generic_new_buffered_output_file_printer(gt_generic_printer* c
 
 GT_INLINE gt_status gt_vgprintf(gt_generic_printer* const generic_printer,const char *template,va_list v_args);
 GT_INLINE gt_status gt_gprintf(gt_generic_printer* const generic_printer,const char *template,...);
+GT_INLINE gt_status gt_gwrite(gt_generic_printer* const generic_printer,const void* const data,const uint64_t length);
 
 /*
  * Automatic bindings generator
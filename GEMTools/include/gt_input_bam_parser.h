@@ -0,0 +1,70 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt_input_bam_parser.h
+ * DATE: 18/10/2026
+ * DESCRIPTION: Input parser for BAM format. BAM records are decoded
+ *   straight into templates/alignments (no SAM text stage)
+ */
+
+#ifndef GT_INPUT_BAM_PARSER_H_
+#define GT_INPUT_BAM_PARSER_H_
+
+#include "gt_commons.h"
+#include "gt_dna_string.h"
+#include "gt_alignment_utils.h"
+#include "gt_template_utils.h"
+
+#include "gt_input_file.h"
+#include "gt_buffered_input_file.h"
+#include "gt_input_parser.h"
+#include "gt_input_sam_parser.h"
+
+#include "gt_sam_attributes.h"
+
+// Codes gt_status
+#define GT_IBP_OK   GT_STATUS_OK
+#define GT_IBP_FAIL GT_STATUS_FAIL
+#define GT_IBP_EOF  0
+
+/*
+ * Parsing error/state codes
+ */
+#define GT_IBP_PE_WRONG_FILE_FORMAT 10
+#define GT_IBP_PE_TRUNCATED_RECORD 11
+#define GT_IBP_PE_BAD_REFERENCE 12
+#define GT_IBP_PE_BAD_CIGAR 13
+#define GT_IBP_PE_UNSOLVED_PENDING_MAPS 32
+
+/*
+ * BAM file format constants
+ */
+#define GT_BAM_MAGIC "BAM\1"
+#define GT_BAM_MAGIC_LENGTH 4
+#define GT_BAM_RECORD_CORE_SIZE 32 /* Fixed fields of a record (without block_size) */
+#define GT_BAM_CIGAR_OPERATIONS "MIDNSHP=X"
+#define GT_BAM_SEQ_CODES "=ACMGRSVTWYHKDBN"
+#define GT_BAM_NO_QUALITY 0xff
+
+/*
+ * BAM File basics
+ */
+GT_INLINE bool gt_input_file_test_bam(
+    gt_input_file* const input_file,gt_bam_headers** const bam_headers,const bool show_errors);
+GT_INLINE void gt_input_bam_parser_prompt_error(
+    gt_buffered_input_file* const buffered_bam_input,uint64_t record_num,const gt_status error_code);
+
+/*
+ * High Level Parsers
+ */
+GT_INLINE gt_status gt_input_bam_parser_get_template(
+    gt_buffered_input_file* const buffered_bam_input,gt_template* const template);
+GT_INLINE gt_status gt_input_bam_parser_get_alignment(
+    gt_buffered_input_file* const buffered_bam_input,gt_alignment* const alignment);
+
+/*
+ * Synch read of blocks
+ */
+GT_INLINE gt_status gt_input_bam_parser_synch_blocks_a(
+    pthread_mutex_t* const input_mutex,gt_buffered_input_file** const buffered_input,const uint64_t num_inputs);
+
+#endif /* GT_INPUT_BAM_PARSER_H_ */
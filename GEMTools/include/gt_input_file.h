@@ -12,6 +12,8 @@
 #include "gt_essentials.h"
 #include "gt_attributes.h"
 #include "gt_sam_attributes.h"
+#include "gt_bgzf.h"
+#include "gt_template_index.h"
 
 #ifdef HAVE_ZLIB
 #include <zlib.h>
@@ -36,15 +38,17 @@
 /*
  * GT Input file
  */
-typedef enum { FASTA, MAP, SAM, FILE_FORMAT_UNKNOWN } gt_file_format;
-typedef enum { STREAM, REGULAR_FILE, MAPPED_FILE, GZIPPED_FILE, BZIPPED_FILE } gt_file_type;
+typedef enum { FASTA, MAP, SAM, BAM, GTB, FILE_FORMAT_UNKNOWN } gt_file_format;
+typedef enum { STREAM, REGULAR_FILE, MAPPED_FILE, GZIPPED_FILE, BZIPPED_FILE, BGZIPPED_FILE } gt_file_type;
 typedef struct {
   /* Input file */
   char* file_name;
   gt_file_type file_type;
   FILE* file;
   int fildes;
+  gt_bgzf_reader* bgzf_reader;
   bool eof;
+  bool error;          // The (compressed) input is corrupt or truncated. Reading stops as at EOF
   uint64_t file_size;
   /* File format */
   gt_file_format file_format;
@@ -52,6 +56,8 @@ typedef struct {
     gt_map_file_format map_type;
     gt_fasta_file_format fasta_type;
     gt_sam_headers sam_headers;
+    gt_bam_headers* bam_headers;
+    gt_gtb_file_format gtb_type;
   };
   pthread_mutex_t input_mutex;
   /* Auxiliary Buffer (for synch purposes) */
@@ -61,6 +67,7 @@ typedef struct {
   uint64_t buffer_pos;
   uint64_t global_pos;
   uint64_t processed_lines;
+  uint64_t content_end; // Offset the content ends at (UINT64_MAX if none)
   /* ID generator */
   uint64_t processed_id;
 } gt_input_file;
@@ -71,10 +78,35 @@ typedef struct {
 gt_input_file* gt_input_stream_open(FILE* stream);
 gt_input_file* gt_input_file_open(char* const file_name,const bool mmap_file);
 gt_status gt_input_file_close(gt_input_file* const input_file);
+/* Number of threads used to decompress BGZF files */
+void gt_input_file_set_threads(gt_input_file* const input_file,const uint64_t num_threads);
 
 /* Format detection */
 gt_file_format gt_input_file_detect_file_format(gt_input_file* const input_file);
 
+/*
+ * Random access (uncompressed and BGZF files)
+ *   Offsets of BGZF files are virtual offsets (see gt_bgzf.h). The end limits
+ *   the content read from the file, i.e. to read a partition of the templates
+ */
+GT_INLINE bool gt_input_file_is_seekable(gt_input_file* const input_file);
+GT_INLINE bool gt_input_file_seek(gt_input_file* const input_file,const uint64_t offset);
+GT_INLINE uint64_t gt_input_file_tell(gt_input_file* const input_file);
+GT_INLINE void gt_input_file_set_end(gt_input_file* const input_file,const uint64_t offset);
+
+/*
+ * Template index
+ *   Records the offset of every interval-th template of the input file, where
+ *   templates span template_lines lines (i.e. 1 for MAP). Seeking restricts the
+ *   input file to the templates [begin,end) and returns false if the input file
+ *   cannot be positioned with the index
+ */
+gt_template_index* gt_input_file_index_templates(
+    gt_input_file* const input_file,const uint64_t interval,const uint64_t template_lines);
+bool gt_input_file_seek_templates(
+    gt_input_file* const input_file,gt_template_index* const template_index,
+    const uint64_t template_lines,const uint64_t begin,const uint64_t end);
+
 /*
  * Accessors (Mutex,ID,...) functions
  */
@@ -88,6 +120,14 @@ GT_INLINE uint64_t gt_input_file_next_id(gt_input_file* const input_file);
 GT_INLINE size_t gt_input_file_dump_to_buffer(gt_input_file* const input_file,gt_vector* const buffer_dst);
 GT_INLINE size_t gt_input_file_fill_buffer(gt_input_file* const input_file);
 GT_INLINE size_t gt_input_file_next_line(gt_input_file* const input_file,gt_vector* const buffer_dst);
+/* Skips lines without copying them. Returns the number of lines skipped */
+GT_INLINE uint64_t gt_input_file_skip_lines(gt_input_file* const input_file,const uint64_t num_lines);
+/*
+ * Makes at least num_bytes of content available at the buffer position (i.e. a complete
+ * binary record). Returns false if the file ends before. The content between
+ * buffer_begin and buffer_pos has to be dumped before.
+ */
+GT_INLINE bool gt_input_file_reserve(gt_input_file* const input_file,const uint64_t num_bytes);
 
 GT_INLINE size_t gt_input_file_next_record(
     gt_input_file* const input_file,gt_vector* const buffer_dst,gt_string* const first_field,
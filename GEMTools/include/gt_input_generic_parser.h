@@ -20,6 +20,8 @@
 #include "gt_input_fasta_parser.h"
 #include "gt_input_map_parser.h"
 #include "gt_input_sam_parser.h"
+#include "gt_input_bam_parser.h"
+#include "gt_input_gtb_parser.h"
 
 #define GT_IGP_FAIL -1
 #define GT_IGP_EOF 0
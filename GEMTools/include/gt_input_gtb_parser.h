@@ -0,0 +1,93 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt_input_gtb_parser.h
+ * DATE: 18/10/2026
+ * DESCRIPTION: Input parser for GTB format (binary templates). GTB records are
+ *   decoded straight into templates/alignments (no text tokenizing)
+ */
+
+#ifndef GT_INPUT_GTB_PARSER_H_
+#define GT_INPUT_GTB_PARSER_H_
+
+#include "gt_commons.h"
+#include "gt_template_utils.h"
+
+#include "gt_input_file.h"
+#include "gt_buffered_input_file.h"
+#include "gt_input_parser.h"
+
+// Codes gt_status
+#define GT_IGTB_OK   GT_STATUS_OK
+#define GT_IGTB_FAIL GT_STATUS_FAIL
+#define GT_IGTB_EOF  0
+
+/*
+ * Parsing error/state codes
+ */
+#define GT_IGTB_PE_WRONG_FILE_FORMAT 10
+#define GT_IGTB_PE_TRUNCATED_RECORD 11
+#define GT_IGTB_PE_BAD_SEQ_NAME 12
+#define GT_IGTB_PE_BAD_OPERATION 13
+#define GT_IGTB_PE_BAD_NUMBER_OF_BLOCKS 14
+#define GT_IGTB_PE_UNPAIRED 15
+
+/*
+ * GTB file format
+ *   Header := 'G' 'T' 'B' version(uint8)
+ *   Record := record_size tag(MAP tag text) TAB num_blocks
+ *             {read qualities}[num_blocks] [template_counters] {counters}[num_blocks]
+ *             seq_names {maps}[num_blocks] [mmaps]
+ *   Read := length<<1|packed (packed ? num_exceptions {position_delta base(uint8)}[num_exceptions] bases(2b)
+ *                                     : bases(uint8)[length])
+ *   Counters := num_counters {counter}[num_counters] (mcs+1)<<1|not_unique
+ *   All integers are unsigned LEB128 varints unless stated otherwise. Counters
+ *   and scores that can be undefined (UINT64_MAX) are stored as value+1. Maps
+ *   refer to the sequence names of the record by index. The template fields
+ *   (counters and mmaps) are only present if num_blocks>1. Reads made of
+ *   ACGT (but a few other bases, the exceptions) are packed into 2 bits per base
+ */
+#define GT_GTB_MAGIC "GTB"
+#define GT_GTB_MAGIC_LENGTH 3
+#define GT_GTB_HEADER_LENGTH (GT_GTB_MAGIC_LENGTH+1)
+#define GT_GTB_VERSION 2
+#define GT_GTB_MAX_RECORD_SIZE_LENGTH 5 /* varint of a uint32 */
+/* Packed reads. A=0 C=1 G=2 T=3, four bases per byte (first base in the low bits) */
+#define GT_GTB_READ_PACKED 1
+#define GT_GTB_PACKED_LENGTH(length) (((length)+3)/4)
+#define GT_GTB_BASES "ACGT"
+/* Map block flags. strand(2b) junction(3b) */
+#define GT_GTB_FLAG_STRAND_MASK 0x03
+#define GT_GTB_FLAG_JUNCTION_SHIFT 2
+#define GT_GTB_FLAG_JUNCTION_MASK 0x07
+#define GT_GTB_FLAG_BITS 5
+/* Mismatch type (2b) */
+#define GT_GTB_MISMS_TYPE_BITS 2
+#define GT_GTB_MISMS_TYPE_MASK 0x03
+/* Zigzag encoding of signed values */
+#define gt_gtb_zigzag_encode(value) ((((uint64_t)(value))<<1) ^ (uint64_t)((int64_t)(value)>>63))
+#define gt_gtb_zigzag_decode(value) ((int64_t)((value)>>1) ^ -(int64_t)((value)&1))
+
+/*
+ * GTB File basics
+ */
+GT_INLINE bool gt_input_file_test_gtb(
+    gt_input_file* const input_file,gt_gtb_file_format* const gtb_file_format,const bool show_errors);
+GT_INLINE void gt_input_gtb_parser_prompt_error(
+    gt_buffered_input_file* const buffered_gtb_input,uint64_t record_num,const gt_status error_code);
+
+/*
+ * High Level Parsers
+ *   If force_read_paired, consecutive single-end records of the same template are joined
+ */
+GT_INLINE gt_status gt_input_gtb_parser_get_template(
+    gt_buffered_input_file* const buffered_gtb_input,gt_template* const template,const bool force_read_paired);
+GT_INLINE gt_status gt_input_gtb_parser_get_alignment(
+    gt_buffered_input_file* const buffered_gtb_input,gt_alignment* const alignment);
+
+/*
+ * Synch read of blocks
+ */
+GT_INLINE gt_status gt_input_gtb_parser_synch_blocks_a(
+    pthread_mutex_t* const input_mutex,gt_buffered_input_file** const buffered_input,const uint64_t num_inputs);
+
+#endif /* GT_INPUT_GTB_PARSER_H_ */
@@ -60,6 +60,33 @@ GT_INLINE void gt_input_sam_parser_attributes_delete(gt_sam_parser_attributes* c
 GT_INLINE void gt_input_sam_parser_attributes_reset_defaults(gt_sam_parser_attributes* const attributes);
 GT_INLINE void gt_input_sam_parser_attributes_set_soap_compilant(gt_sam_parser_attributes* const attributes);
 
+/*
+ * Pair-pending maps (maps whose mate has not been parsed yet).
+ *   Shared with the BAM parser
+ */
+typedef struct {
+  // Current map info
+  gt_string map_seq_name;
+  uint64_t map_position;
+  uint64_t end_position; // 0/1
+  // Next map info
+  gt_string next_seq_name;
+  uint64_t next_position;
+  // Map location and span info
+  uint64_t map_displacement; // In alignment's map vector
+  uint64_t num_maps; // Maps in the vector coupled to the first one
+} gt_sam_pending_end;
+
+#define GT_SAM_INIT_PENDING { .map_seq_name.allocated=0, .next_seq_name.allocated=0 }
+
+GT_INLINE void gt_isp_solve_pending_maps(
+    gt_vector* pending_v,gt_sam_pending_end* pending,gt_template* const template);
+GT_INLINE gt_status gt_isp_solve_remaining_maps(gt_vector* const pending_v,gt_template* const template);
+/* Attached maps of the XA field (chr17,-34553512,125M,0;...) */
+GT_INLINE gt_status gt_isp_parse_sam_xa_maps(
+    char** const text_line,gt_alignment* const alignment,
+    gt_vector* const maps_vector,gt_sam_pending_end* const pending);
+
 /*
  * SAM File basics
  */
@@ -0,0 +1,81 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt_output_bam.h
+ * DATE: 18/10/2026
+ * DESCRIPTION: BAM writer. SAM records are encoded into binary BAM records
+ *   and compressed as BGZF blocks (no samtools stage)
+ */
+
+#ifndef GT_OUTPUT_BAM_H_
+#define GT_OUTPUT_BAM_H_
+
+#include "gt_essentials.h"
+#include "gt_shash.h"
+#include "gt_bgzf.h"
+#include "gt_sam_attributes.h"
+#include "gt_input_bam_parser.h"
+
+// Codes gt_status
+#define GT_OBW_OK GT_STATUS_OK
+#define GT_OBW_FAIL GT_STATUS_FAIL
+
+/*
+ * Error Codes
+ */
+#define GT_OBW_PE_BAD_RECORD 10
+#define GT_OBW_PE_BAD_REFERENCE 11
+#define GT_OBW_PE_BAD_CIGAR 12
+#define GT_OBW_PE_BAD_OPTIONAL_FIELD 13
+#define GT_OBW_PE_WRITE 14
+
+/*
+ * Checkers
+ */
+#define GT_BAM_WRITER_CHECK(bam_writer) \
+  GT_NULL_CHECK(bam_writer); \
+  GT_BGZF_WRITER_CHECK(bam_writer->bgzf_writer)
+
+typedef struct {
+  gt_bgzf_writer* bgzf_writer;
+  /* Header */
+  gt_bam_headers* bam_headers;
+  gt_shash* reference_ids;   // Reference name -> refID (uint64_t)
+  bool header_written;
+  /* Filter */
+  uint8_t min_mapq;          // Records with a lower MAPQ are skipped
+  /* Record buffer */
+  gt_vector* record;         // (uint8_t)
+} gt_bam_writer;
+
+/*
+ * Setup
+ */
+gt_bam_writer* gt_bam_writer_new(FILE* const file,const uint64_t num_threads,const int level);
+void gt_bam_writer_delete(gt_bam_writer* const bam_writer);
+GT_INLINE void gt_bam_writer_set_min_mapq(gt_bam_writer* const bam_writer,const uint8_t min_mapq);
+
+/*
+ * Header
+ *   Header lines have to be added before the first record. @SQ lines
+ *   declare the references (SN/LN) in the order of their refIDs.
+ *   Returns 0 or the error code (GT_OBW_PE_*)
+ */
+gt_status gt_bam_writer_add_header_line(gt_bam_writer* const bam_writer,const char* const line,const uint64_t length);
+
+/*
+ * Records
+ *   Encodes a SAM record (no EOL) into a BAM record.
+ *   Returns 0 or the error code (GT_OBW_PE_*)
+ */
+gt_status gt_bam_writer_write_sam_record(gt_bam_writer* const bam_writer,const char* const line,const uint64_t length);
+/* Encodes all the SAM lines (header and records) of the stream */
+gt_status gt_bam_writer_write_sam_stream(gt_bam_writer* const bam_writer,FILE* const sam_stream);
+/* Writes the header if no record was written, flushes and writes the EOF block */
+bool gt_bam_writer_close(gt_bam_writer* const bam_writer);
+
+/*
+ * BAM binning scheme (UCSC bins over [begin,end) 0-based)
+ */
+GT_INLINE uint16_t gt_bam_reg2bin(const int64_t begin,int64_t end);
+
+#endif /* GT_OUTPUT_BAM_H_ */
@@ -70,4 +70,9 @@ GT_INLINE gt_status gt_vbprintf_(
 GT_INLINE gt_status gt_bprintf_(
     gt_output_buffer* const output_buffer,const uint64_t expected_mem_usage,const char *template,...);
 
+/*
+ * Buffer raw writer (binary content, no formating)
+ */
+GT_INLINE gt_status gt_bwrite(gt_output_buffer* const output_buffer,const void* const data,const uint64_t length);
+
 #endif /* GT_OUTPUT_BUFFER_H_ */
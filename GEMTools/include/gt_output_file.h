@@ -11,12 +11,13 @@
 
 #include "gt_essentials.h"
 #include "gt_output_buffer.h"
+#include "gt_template_index.h"
 
 #define GT_MAX_OUTPUT_BUFFERS 25
 #define GT_OUTPUT_COMPRESS_BUFFER_SIZE 16384
 
 typedef enum { SORTED_FILE, UNSORTED_FILE } gt_output_file_type;
-typedef enum { NONE, GZIP, BZIP2 } gt_output_file_compression;
+typedef enum { NONE, GZIP, BZIP2, BGZF } gt_output_file_compression;
 
 typedef struct {
   /* Output file */
@@ -37,6 +38,13 @@ typedef struct {
   /* Block ID (for synchronization purposes) */
   uint32_t mayor_block_id;
   uint32_t minor_block_id;
+  /* Template index (offsets of the lines written) */
+  gt_template_index* template_index;
+  char* template_index_file_name;
+  uint64_t template_lines;
+  uint64_t bytes_written;
+  uint64_t lines_written;
+  bool line_open;
   /* Mutexes */
   pthread_cond_t  out_buffer_cond;
   pthread_cond_t  out_write_cond;
@@ -69,12 +77,26 @@ gt_output_file* gt_output_file_new_compress(char* const file_name,const gt_outpu
 #define gt_output_file_new(file_name,output_file_type) gt_output_file_new_compress(file_name,output_file_type,NONE)
 #define gt_output_stream_new(file_name,output_file_type) gt_output_stream_new_compress(file_name,output_file_type,NONE)
 gt_status gt_output_file_close(gt_output_file* const output_file);
+/*
+ * Records the offset of every interval-th template written (templates span
+ * template_lines lines). The index is written to the given file on close.
+ * Only uncompressed and BGZF outputs can be indexed, the index of BGZF
+ * outputs records virtual offsets
+ */
+bool gt_output_file_set_template_index(
+    gt_output_file* const output_file,char* const index_file_name,
+    const uint64_t interval,const uint64_t template_lines);
+/*
+ * Threads compressing the blocks of BGZF outputs
+ */
+void gt_output_file_set_threads(gt_output_file* const output_file,const uint64_t num_threads);
 
 /*
  * Output File Printers
  */
 GT_INLINE gt_status gt_vofprintf(gt_output_file* const output_file,const char *template,va_list v_args);
 GT_INLINE gt_status gt_ofprintf(gt_output_file* const output_file,const char *template,...);
+GT_INLINE gt_status gt_ofwrite(gt_output_file* const output_file,const void* const data,const uint64_t length);
 
 /*
  * Internal Buffers Accessors
@@ -19,6 +19,7 @@
 #include "gt_output_fasta.h"
 #include "gt_output_map.h"
 #include "gt_output_sam.h"
+#include "gt_output_gtb.h"
 
 
 /*
@@ -0,0 +1,40 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt_output_gtb.h
+ * DATE: 18/10/2026
+ * DESCRIPTION: GTB writer (binary templates). Templates are encoded as length-prefixed
+ *   records (see gt_input_gtb_parser.h) meant for intermediate files between stages
+ */
+
+#ifndef GT_OUTPUT_GTB_H_
+#define GT_OUTPUT_GTB_H_
+
+#include "gt_essentials.h"
+#include "gt_template.h"
+
+#include "gt_generic_printer.h"
+#include "gt_buffered_output_file.h"
+#include "gt_output_map.h"
+#include "gt_input_gtb_parser.h"
+
+/*
+ * Error/state codes (GTB Output Error)
+ */
+#define GT_OGTB_MMAP_NOT_FOUND 10
+
+/*
+ * Header (has to be printed once at the beginning of the file)
+ */
+GT_INLINE gt_status gt_output_gtb_gprint_header(gt_generic_printer* const gprinter);
+GT_INLINE gt_status gt_output_gtb_fprint_header(FILE* file);
+GT_INLINE gt_status gt_output_gtb_ofprint_header(gt_output_file* const output_file);
+
+/*
+ * Records
+ *   The tag is encoded using the output_map_attributes (casava/extra), the
+ *   scores are dropped unless print_scores is set
+ */
+GT_GENERIC_PRINTER_PROTOTYPE(gt_output_gtb,print_template,gt_template* const template,gt_output_map_attributes* const output_map_attributes);
+GT_GENERIC_PRINTER_PROTOTYPE(gt_output_gtb,print_alignment,gt_alignment* const alignment,gt_output_map_attributes* const output_map_attributes);
+
+#endif /* GT_OUTPUT_GTB_H_ */
@@ -0,0 +1,110 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt_paired_input_file.h
+ * DATE: 18/10/2026
+ * DESCRIPTION: Paired input of two mate files (end/1 and end/2). Each mate file
+ *   is read (and decompressed) by its own reader thread into a bounded ring of
+ *   blocks. The merger hands out matching blocks of both rings to the parsing
+ *   threads, which check that the read ids of both ends agree.
+ */
+
+#ifndef GT_PAIRED_INPUT_FILE_H_
+#define GT_PAIRED_INPUT_FILE_H_
+
+#include "gt_essentials.h"
+#include "gt_template.h"
+#include "gt_input_file.h"
+#include "gt_buffered_input_file.h"
+#include "gt_input_generic_parser.h"
+
+// Codes gt_status
+#define GT_PIF_OK   GT_STATUS_OK
+#define GT_PIF_FAIL GT_STATUS_FAIL
+#define GT_PIF_EOF  0
+
+/*
+ * Error codes
+ */
+#define GT_PIF_PE_UNSYNCH_FILES 10
+#define GT_PIF_PE_ID_MISMATCH 11
+
+#define GT_PIF_DEFAULT_NUM_BLOCKS 4
+#define GT_PIF_NUM_LINES (4/*4_lines_per_record*/*GT_NUM_LINES_10K)
+
+/*
+ * Checkers
+ */
+#define GT_PAIRED_INPUT_FILE_CHECK(paired_input_file) \
+  GT_NULL_CHECK(paired_input_file); \
+  GT_NULL_CHECK(paired_input_file->mates)
+
+typedef struct {
+  gt_vector* block_buffer; /* (char) */
+  uint64_t lines_in_buffer;
+  uint64_t first_line_num;
+} gt_paired_input_block;
+
+typedef struct {
+  /* Mate input file */
+  gt_input_file* input_file;
+  pthread_t reader_thread;
+  /* Ring of blocks read ahead */
+  gt_paired_input_block* blocks;
+  uint64_t blocks_begin; // Next block to merge
+  uint64_t blocks_used;  // Blocks read and not merged yet
+  bool eof;
+} gt_paired_input_mate;
+
+typedef struct {
+  /* Mates (end/1, end/2) */
+  gt_paired_input_mate* mates;
+  uint64_t num_blocks;
+  uint64_t num_lines;
+  /* Synchronization */
+  pthread_mutex_t ring_mutex;
+  pthread_cond_t block_read_cond;
+  pthread_cond_t block_free_cond;
+  bool closed;
+  /* ID generator */
+  uint64_t processed_id;
+} gt_paired_input_file;
+
+/*
+ * Setup
+ *   The reader threads start right away. If num_blocks is zero,
+ *   GT_PIF_DEFAULT_NUM_BLOCKS blocks are read ahead for each mate.
+ */
+gt_paired_input_file* gt_paired_input_file_new(
+    gt_input_file* const end1_input_file,gt_input_file* const end2_input_file,const uint64_t num_blocks);
+/* Stops the readers. Blocked mergers return GT_PIF_EOF */
+void gt_paired_input_file_abort(gt_paired_input_file* const paired_input_file);
+/* Stops and joins the readers (the mate input files are not closed) */
+void gt_paired_input_file_close(gt_paired_input_file* const paired_input_file);
+
+/*
+ * Merger
+ *   Hands out the next pair of matching blocks. Returns GT_PIF_OK, GT_PIF_EOF
+ *   or GT_PIF_PE_UNSYNCH_FILES if one of the mates ends before the other
+ */
+GT_INLINE gt_status gt_paired_input_file_get_blocks(
+    gt_paired_input_file* const paired_input_file,
+    gt_buffered_input_file* const buffered_end1,gt_buffered_input_file* const buffered_end2);
+/* Reloads both buffered inputs (and dumps the attached output) if end/1 is exhausted */
+GT_INLINE gt_status gt_paired_input_file_synch_blocks(
+    gt_paired_input_file* const paired_input_file,
+    gt_buffered_input_file* const buffered_end1,gt_buffered_input_file* const buffered_end2);
+
+/*
+ * Parsers
+ *   Parses one template of each end and checks that both read ids agree.
+ *   Returns GT_PIF_OK or the error code (GT_PIF_PE_* or the parser error)
+ */
+GT_INLINE gt_status gt_paired_input_file_get_templates(
+    gt_buffered_input_file* const buffered_end1,gt_buffered_input_file* const buffered_end2,
+    gt_template* const end1_template,gt_template* const end2_template,
+    gt_generic_parser_attributes* const attributes);
+GT_INLINE void gt_paired_input_file_prompt_error(
+    gt_buffered_input_file* const buffered_end1,gt_buffered_input_file* const buffered_end2,
+    gt_template* const end1_template,gt_template* const end2_template,const gt_status error_code);
+
+#endif /* GT_PAIRED_INPUT_FILE_H_ */
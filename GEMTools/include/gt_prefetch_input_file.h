@@ -0,0 +1,81 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt_prefetch_input_file.h
+ * DATE: 18/10/2026
+ * DESCRIPTION: Prefetching input. A reader thread reads and parses the input file
+ *   into a bounded ring of template blocks while the consumer takes the templates
+ *   of the blocks that are already parsed.
+ */
+
+#ifndef GT_PREFETCH_INPUT_FILE_H_
+#define GT_PREFETCH_INPUT_FILE_H_
+
+#include "gt_essentials.h"
+#include "gt_template.h"
+#include "gt_input_file.h"
+#include "gt_buffered_input_file.h"
+#include "gt_input_generic_parser.h"
+
+// Codes gt_status
+#define GT_PRF_OK   GT_STATUS_OK
+#define GT_PRF_FAIL GT_STATUS_FAIL
+#define GT_PRF_EOF  0
+
+#define GT_PRF_DEFAULT_NUM_BLOCKS 4
+#define GT_PRF_DEFAULT_BLOCK_SIZE 1024
+
+/*
+ * Checkers
+ */
+#define GT_PREFETCH_INPUT_FILE_CHECK(prefetch_input_file) \
+  GT_NULL_CHECK(prefetch_input_file); \
+  GT_NULL_CHECK(prefetch_input_file->blocks)
+
+typedef struct {
+  gt_template** templates;
+  uint64_t num_templates; // Templates parsed into the block
+  gt_status status;       // Status of the parser after the last template
+} gt_prefetch_input_block;
+
+typedef struct {
+  /* Input */
+  gt_input_file* input_file;
+  gt_generic_parser_attributes* parser_attributes;
+  pthread_t reader_thread;
+  /* Ring of blocks parsed ahead */
+  gt_prefetch_input_block* blocks;
+  uint64_t num_blocks;
+  uint64_t block_size;
+  uint64_t blocks_begin; // Next block of the consumer
+  uint64_t blocks_used;  // Blocks parsed and not released by the consumer
+  /* Consumer */
+  gt_prefetch_input_block* current_block; // Block taken by the consumer (owned until released)
+  uint64_t next_template;
+  /* Synchronization */
+  pthread_mutex_t ring_mutex;
+  pthread_cond_t block_read_cond;
+  pthread_cond_t block_free_cond;
+  bool closed;
+} gt_prefetch_input_file;
+
+/*
+ * Setup
+ *   The reader thread starts right away and is the only one reading the
+ *   input file until the prefetch input is closed. If num_blocks/block_size
+ *   are zero, the defaults are used
+ */
+gt_prefetch_input_file* gt_prefetch_input_file_new(
+    gt_input_file* const input_file,const uint64_t num_blocks,const uint64_t block_size,const bool paired_read);
+/* Stops and joins the reader (the input file is not closed) */
+void gt_prefetch_input_file_close(gt_prefetch_input_file* const prefetch_input_file);
+
+/*
+ * Consumer
+ *   Swaps the next parsed template with *template (the old template is
+ *   recycled by the reader). Returns GT_PRF_OK, GT_PRF_EOF or the parser
+ *   error code (the error is reported by the parser)
+ */
+GT_INLINE gt_status gt_prefetch_input_file_get_template(
+    gt_prefetch_input_file* const prefetch_input_file,gt_template** const template);
+
+#endif /* GT_PREFETCH_INPUT_FILE_H_ */
@@ -20,6 +20,10 @@
 /*
  * Checkers
  */
+#define GT_BAM_HEADERS_CHECK(bam_headers) \
+  GT_NULL_CHECK(bam_headers); \
+  GT_STRING_CHECK(bam_headers->text); \
+  GT_VECTOR_CHECK(bam_headers->reference_names)
 #define GT_SAM_HEADERS_CHECK(sam_headers) \
   GT_STRING_CHECK(sam_headers->header); \
   GT_VECTOR_CHECK(sam_headers->read_group); \
@@ -63,6 +67,22 @@ GT_INLINE void gt_sam_header_set_header_record(gt_sam_headers* const sam_headers
 GT_INLINE void gt_sam_header_add_read_group_record(gt_sam_headers* const sam_headers,gt_string* const read_group_record);
 GT_INLINE void gt_sam_header_add_program_record(gt_sam_headers* const sam_headers,gt_string* const program_record);
 GT_INLINE void gt_sam_header_add_comment(gt_sam_headers* const sam_headers,gt_string* const comment);
+/*
+ * BAM File specifics (SAM header text & reference dictionary)
+ */
+typedef struct {
+  gt_string* text;              // SAM header text
+  gt_vector* reference_names;   // Reference names indexed by refID (gt_string*)
+  gt_vector* reference_lengths; // Reference lengths indexed by refID (uint64_t)
+} gt_bam_headers;
+
+GT_INLINE gt_bam_headers* gt_bam_header_new(void);
+GT_INLINE void gt_bam_header_clear(gt_bam_headers* const bam_headers);
+GT_INLINE void gt_bam_header_delete(gt_bam_headers* const bam_headers);
+GT_INLINE void gt_bam_header_add_reference(
+    gt_bam_headers* const bam_headers,const char* const name,const uint64_t name_length,const uint64_t length);
+GT_INLINE uint64_t gt_bam_header_get_num_references(gt_bam_headers* const bam_headers);
+GT_INLINE gt_string* gt_bam_header_get_reference_name(gt_bam_headers* const bam_headers,const uint64_t reference_id);
 /*
  * SAM Optional Fields
  *   - SAM Attributes(optional fields) are just a vector of @gt_sam_attribute
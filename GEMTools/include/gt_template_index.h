@@ -0,0 +1,58 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt_template_index.h
+ * DATE: 18/10/2026
+ * DESCRIPTION: Sidecar index with the offset of every K-th template of a file.
+ *   For BGZF compressed files the offsets are BGZF virtual offsets.
+ *
+ *   File layout (little endian)
+ *     char[4]  magic "GTIX"
+ *     uint32_t version
+ *     uint32_t flags
+ *     uint64_t interval (templates between two offsets)
+ *     uint64_t num_templates
+ *     uint64_t num_offsets
+ *     uint64_t data_size  (size of the indexed file)
+ *     uint64_t data_mtime (modification time of the indexed file, seconds)
+ *     uint64_t data_mtime_nsec (nanoseconds of the modification time)
+ *     uint64_t data_inode (inode of the indexed file)
+ *     uint64_t offsets[num_offsets]
+ */
+
+#ifndef GT_TEMPLATE_INDEX_H_
+#define GT_TEMPLATE_INDEX_H_
+
+#include "gt_essentials.h"
+
+#define GT_TEMPLATE_INDEX_MAGIC "GTIX"
+#define GT_TEMPLATE_INDEX_VERSION 2
+#define GT_TEMPLATE_INDEX_DEFAULT_INTERVAL 4096
+// Flags
+#define GT_TEMPLATE_INDEX_VIRTUAL_OFFSETS 1
+
+typedef struct {
+  uint32_t flags;
+  uint64_t interval;
+  uint64_t num_templates;
+  uint64_t data_size;
+  uint64_t data_mtime;
+  uint64_t data_mtime_nsec;
+  uint64_t data_inode;
+  gt_vector* offsets; // uint64_t
+} gt_template_index;
+
+gt_template_index* gt_template_index_new(const uint64_t interval,const uint32_t flags);
+void gt_template_index_delete(gt_template_index* const template_index);
+gt_template_index* gt_template_index_read(char* const file_name);
+bool gt_template_index_write(gt_template_index* const template_index,char* const file_name);
+
+/*
+ * The index is only valid for the file it was built from. A file rewritten
+ * with the same size within the same second is told apart by the
+ * nanoseconds of its modification time and its inode
+ */
+void gt_template_index_set_data(gt_template_index* const template_index,struct stat* const data_stat);
+bool gt_template_index_bind_data(gt_template_index* const template_index,char* const data_file_name);
+bool gt_template_index_check_data(gt_template_index* const template_index,char* const data_file_name);
+
+#endif /* GT_TEMPLATE_INDEX_H_ */
@@ -20,7 +20,7 @@ gt_option gt_filter_options[] = {
   { 200, "annotation", GT_OPT_REQUIRED, GT_OPT_STRING, 2 , true, "<file> (GTF Annotation)" , "" },
   { 201, "mmap-input", GT_OPT_NO_ARGUMENT, GT_OPT_NONE, 2 , false, "" , "" },
   { 'p', "paired-end", GT_OPT_NO_ARGUMENT, GT_OPT_NONE, 2 , true, "" , "" },
-  { 202, "output-format", GT_OPT_REQUIRED, GT_OPT_STRING, 2 , true, "'FASTA'|'MAP'|'SAM' (default='InputFormat')" , "" },
+  { 202, "output-format", GT_OPT_REQUIRED, GT_OPT_STRING, 2 , true, "'FASTA'|'MAP'|'SAM'|'GTB' (default='InputFormat')" , "" },
   { 203, "discarded-output", GT_OPT_REQUIRED, GT_OPT_STRING, 2 , true, "" , "" },
   { 204, "no-output", GT_OPT_NO_ARGUMENT, GT_OPT_NONE, 2 , true, "" , "" },
   { 205, "check-duplicates", GT_OPT_NO_ARGUMENT, GT_OPT_NONE, 2 , true, "" , "Check for duplicated mappings" },
@@ -360,6 +360,32 @@ char* gt_region_groups[] = {
   /*  5 */ "Misc",
 };
 
+/*
+ * BGZip
+ */
+gt_option gt_bgzip_options[] = {
+  /* I/O */
+  { 'i', "input", GT_OPT_REQUIRED, GT_OPT_STRING, 2 , true, "<file>" , "(default=stdin)" },
+  { 'o', "output", GT_OPT_REQUIRED, GT_OPT_STRING, 2 , true, "<file>" , "(default=stdout)" },
+  { 'x', "index", GT_OPT_REQUIRED, GT_OPT_STRING, 2 , true, "<file>" , "Write the template index to the file" },
+  /* Index */
+  { 'k', "index-interval", GT_OPT_REQUIRED, GT_OPT_INT, 3 , true, "<number>" , "Templates between two index entries (default=4096)" },
+  { 'l', "template-lines", GT_OPT_REQUIRED, GT_OPT_INT, 3 , true, "<number>" , "Lines per template, i.e. 1 for MAP, 4 for FASTQ (default=1)" },
+  /* Misc */
+  { 'c', "level", GT_OPT_REQUIRED, GT_OPT_INT, 5 , true, "<number>" , "Compression level (default=6)" },
+  { 't', "threads", GT_OPT_REQUIRED, GT_OPT_INT, 5 , true, "" , "" },
+  { 'h', "help", GT_OPT_NO_ARGUMENT, GT_OPT_NONE, 5 , true, "" , "" },
+  { 'J', "help-json", GT_OPT_NO_ARGUMENT, GT_OPT_NONE, 5 , false, "" , "" },
+  {  0, "", 0, 0, 0, false, "", ""}
+};
+char* gt_bgzip_groups[] = {
+  /*  0 */ "Null",
+  /*  1 */ "Unclassified",
+  /*  2 */ "I/O",
+  /*  3 */ "Index",
+  /*  4 */ "Format",
+  /*  5 */ "Misc",
+};
 
 
 GT_INLINE uint64_t gt_options_get_num_options(const gt_option* const options) {
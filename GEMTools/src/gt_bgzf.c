@@ -0,0 +1,500 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt_bgzf.c
+ * DATE: 18/10/2026
+ * DESCRIPTION: BGZF (blocked gzip) reader and writer with parallel block (de)compression.
+ *   The reader reads a batch of compressed blocks sequentially and inflates
+ *   the blocks of the batch concurrently into the output buffer. The writer
+ *   deflates a batch of blocks concurrently and writes them sequentially.
+ */
+
+#include "gt_bgzf.h"
+
+#define GT_BGZF_ID1 31
+#define GT_BGZF_ID2 139
+#define GT_BGZF_CM_DEFLATE 8
+#define GT_BGZF_FLG_FEXTRA 4
+#define GT_BGZF_FIXED_HEADER_SIZE 12
+#define GT_BGZF_TRAILER_SIZE 8
+
+#define GT_BGZF_XLEN 6
+
+#define gt_bgzf_le16(p) ((uint16_t)((p)[0] | ((p)[1]<<8)))
+#define gt_bgzf_le32(p) ((uint32_t)((p)[0] | ((p)[1]<<8) | ((p)[2]<<16) | ((uint32_t)(p)[3]<<24)))
+#define gt_bgzf_set_le16(p,value) { (p)[0]=(value)&0xff; (p)[1]=((value)>>8)&0xff; }
+#define gt_bgzf_set_le32(p,value) { gt_bgzf_set_le16(p,(value)&0xffff); gt_bgzf_set_le16((p)+2,((value)>>16)&0xffff); }
+
+/*
+ * Format detection
+ */
+GT_INLINE int64_t gt_bgzf_block_size(const uint8_t* const header,const uint64_t length) {
+  // Returns the total size of the block or -1 if this is not a BGZF header
+  if (length < GT_BGZF_FIXED_HEADER_SIZE) return -1;
+  if (header[0]!=GT_BGZF_ID1 || header[1]!=GT_BGZF_ID2 ||
+      header[2]!=GT_BGZF_CM_DEFLATE || !(header[3]&GT_BGZF_FLG_FEXTRA)) return -1;
+  const uint64_t xlen = gt_bgzf_le16(header+10);
+  if (length < GT_BGZF_FIXED_HEADER_SIZE+xlen) return -1;
+  // Look for the BC subfield
+  const uint8_t* extra = header+GT_BGZF_FIXED_HEADER_SIZE;
+  uint64_t pos = 0;
+  while (pos+4 <= xlen) {
+    const uint64_t slen = gt_bgzf_le16(extra+pos+2);
+    if (extra[pos]=='B' && extra[pos+1]=='C' && slen==2 && pos+6 <= xlen) {
+      return (int64_t)gt_bgzf_le16(extra+pos+4)+1;
+    }
+    pos += 4+slen;
+  }
+  return -1;
+}
+GT_INLINE bool gt_bgzf_is_bgzf(const uint8_t* const header,const uint64_t length) {
+  return gt_bgzf_block_size(header,length) > 0;
+}
+
+/*
+ * Reader
+ */
+gt_bgzf_reader* gt_bgzf_reader_new(FILE* const file,char* const file_name,const uint64_t num_threads) {
+  GT_NULL_CHECK(file);
+  gt_bgzf_reader* const bgzf_reader = gt_alloc(gt_bgzf_reader);
+  bgzf_reader->file = file;
+  bgzf_reader->file_name = file_name;
+  bgzf_reader->num_threads = (num_threads>0) ? num_threads : 1;
+  bgzf_reader->eof = false;
+  bgzf_reader->eof_marker = false;
+  bgzf_reader->truncated = false;
+  bgzf_reader->address = 0;
+  bgzf_reader->end = UINT64_MAX;
+  // Allocated on the first read
+  bgzf_reader->compressed_buffer = NULL;
+  bgzf_reader->blocks = gt_calloc(GT_BGZF_BATCH_BLOCKS,gt_bgzf_block,false);
+  bgzf_reader->num_blocks = 0;
+  bgzf_reader->output = NULL;
+  bgzf_reader->error = false;
+  bgzf_reader->pending = NULL;
+  bgzf_reader->pending_size = 0;
+  bgzf_reader->pending_pos = 0;
+  return bgzf_reader;
+}
+void gt_bgzf_reader_delete(gt_bgzf_reader* const bgzf_reader) {
+  GT_BGZF_READER_CHECK(bgzf_reader);
+  if (bgzf_reader->compressed_buffer!=NULL) gt_free(bgzf_reader->compressed_buffer);
+  if (bgzf_reader->pending!=NULL) gt_free(bgzf_reader->pending);
+  gt_free(bgzf_reader->blocks);
+  gt_free(bgzf_reader);
+}
+GT_INLINE void gt_bgzf_reader_set_threads(gt_bgzf_reader* const bgzf_reader,const uint64_t num_threads) {
+  GT_BGZF_READER_CHECK(bgzf_reader);
+  bgzf_reader->num_threads = (num_threads>0) ? num_threads : 1;
+}
+void gt_bgzf_reader_unread(gt_bgzf_reader* const bgzf_reader,const uint8_t* const data,const uint64_t length) {
+  GT_BGZF_READER_CHECK(bgzf_reader);
+  const uint64_t remaining = bgzf_reader->pending_size-bgzf_reader->pending_pos;
+  uint8_t* const pending = gt_malloc(remaining+length);
+  memcpy(pending,data,length);
+  if (remaining>0) memcpy(pending+length,bgzf_reader->pending+bgzf_reader->pending_pos,remaining);
+  if (bgzf_reader->pending!=NULL) gt_free(bgzf_reader->pending);
+  bgzf_reader->pending = pending;
+  bgzf_reader->pending_size = remaining+length;
+  bgzf_reader->pending_pos = 0;
+}
+GT_INLINE uint64_t gt_bgzf_reader_fread(gt_bgzf_reader* const bgzf_reader,uint8_t* const data,const uint64_t length) {
+  uint64_t read = 0;
+  if (bgzf_reader->pending!=NULL) {
+    read = GT_MIN(length,bgzf_reader->pending_size-bgzf_reader->pending_pos);
+    memcpy(data,bgzf_reader->pending+bgzf_reader->pending_pos,read);
+    bgzf_reader->pending_pos += read;
+    if (bgzf_reader->pending_pos==bgzf_reader->pending_size) {
+      gt_free(bgzf_reader->pending);
+      bgzf_reader->pending = NULL;
+      bgzf_reader->pending_size = 0;
+      bgzf_reader->pending_pos = 0;
+    }
+  }
+  if (read<length) read += fread(data+read,1,length-read,bgzf_reader->file);
+  return read;
+}
+/*
+ * Reads the next block into the compressed buffer at the given position.
+ * Returns the number of bytes used, 0 at EOF and -1 on error
+ */
+GT_INLINE int64_t gt_bgzf_reader_read_block(
+    gt_bgzf_reader* const bgzf_reader,uint8_t* const data,gt_bgzf_block* const block) {
+  // Read the fixed header and the extra field
+  uint64_t read = gt_bgzf_reader_fread(bgzf_reader,data,GT_BGZF_FIXED_HEADER_SIZE);
+  if (read==0) return 0;
+  if (read < GT_BGZF_FIXED_HEADER_SIZE) return -1;
+  const uint64_t xlen = gt_bgzf_le16(data+10);
+  if (gt_bgzf_reader_fread(bgzf_reader,data+GT_BGZF_FIXED_HEADER_SIZE,xlen)!=xlen) return -1;
+  const int64_t block_size = gt_bgzf_block_size(data,GT_BGZF_FIXED_HEADER_SIZE+xlen);
+  const uint64_t header_size = GT_BGZF_FIXED_HEADER_SIZE+xlen;
+  if (block_size < 0 || block_size > GT_BGZF_MAX_BLOCK_SIZE ||
+      (uint64_t)block_size < header_size+GT_BGZF_TRAILER_SIZE) return -1;
+  // Read the compressed data and the trailer
+  const uint64_t remaining = block_size-header_size;
+  if (gt_bgzf_reader_fread(bgzf_reader,data+header_size,remaining)!=remaining) return -1;
+  const uint8_t* const trailer = data+block_size-GT_BGZF_TRAILER_SIZE;
+  block->data = data+header_size;
+  block->data_size = remaining-GT_BGZF_TRAILER_SIZE;
+  block->crc = gt_bgzf_le32(trailer);
+  block->size = gt_bgzf_le32(trailer+4);
+  if (block->size > GT_BGZF_MAX_BLOCK_SIZE) return -1;
+  return block_size;
+}
+GT_INLINE bool gt_bgzf_inflate_block(gt_bgzf_block* const block,uint8_t* const output) {
+#ifdef HAVE_ZLIB
+  if (block->size==0) return true;
+  z_stream stream;
+  stream.zalloc = Z_NULL;
+  stream.zfree = Z_NULL;
+  stream.opaque = Z_NULL;
+  stream.next_in = block->data;
+  stream.avail_in = block->data_size;
+  if (inflateInit2(&stream,-15)!=Z_OK) return false;
+  stream.next_out = output+block->offset;
+  stream.avail_out = block->size;
+  const int status = inflate(&stream,Z_FINISH);
+  const uint64_t inflated = stream.total_out;
+  inflateEnd(&stream);
+  if (status!=Z_STREAM_END || inflated!=block->size) return false;
+  return crc32(crc32(0L,Z_NULL,0),output+block->offset,block->size)==block->crc;
+#else
+  return false;
+#endif
+}
+typedef struct {
+  gt_bgzf_reader* bgzf_reader;
+  uint64_t thread_id;
+  uint64_t num_threads;
+} gt_bgzf_worker_args;
+void* gt_bgzf_reader_worker(void* const worker_args) {
+  gt_bgzf_worker_args* const args = (gt_bgzf_worker_args*) worker_args;
+  gt_bgzf_reader* const bgzf_reader = args->bgzf_reader;
+  uint64_t i;
+  // Blocks are striped over the threads
+  for (i=args->thread_id;i<bgzf_reader->num_blocks;i+=args->num_threads) {
+    if (!gt_bgzf_inflate_block(bgzf_reader->blocks+i,bgzf_reader->output)) {
+      bgzf_reader->blocks[i].error = true;
+      break;
+    }
+  }
+  return NULL;
+}
+GT_INLINE void gt_bgzf_reader_inflate_batch(gt_bgzf_reader* const bgzf_reader) {
+  const uint64_t num_threads = GT_MAX(GT_MIN(bgzf_reader->num_threads,bgzf_reader->num_blocks),1);
+  pthread_t* const threads = gt_calloc(num_threads,pthread_t,false);
+  gt_bgzf_worker_args* const args = gt_calloc(num_threads,gt_bgzf_worker_args,false);
+  uint64_t i;
+  for (i=0;i<num_threads;++i) {
+    args[i].bgzf_reader = bgzf_reader;
+    args[i].thread_id = i;
+    args[i].num_threads = num_threads;
+  }
+  // The calling thread inflates the first stripe
+  for (i=1;i<num_threads;++i) {
+    gt_cond_fatal_error(pthread_create(threads+i,NULL,gt_bgzf_reader_worker,args+i),SYS_THREAD);
+  }
+  gt_bgzf_reader_worker(args);
+  for (i=1;i<num_threads;++i) {
+    gt_cond_fatal_error(pthread_join(threads[i],NULL),SYS_THREAD_JOIN);
+  }
+  gt_free(threads);
+  gt_free(args);
+}
+int64_t gt_bgzf_reader_read(gt_bgzf_reader* const bgzf_reader,uint8_t* const buffer,const uint64_t buffer_size) {
+  GT_BGZF_READER_CHECK(bgzf_reader);
+  if (bgzf_reader->error) return -1;
+  if (bgzf_reader->eof) return 0;
+  if (buffer_size < GT_BGZF_MAX_BLOCK_SIZE) {
+    bgzf_reader->error = true;
+    return -1;
+  }
+  if (bgzf_reader->compressed_buffer==NULL) {
+    bgzf_reader->compressed_buffer = gt_malloc((uint64_t)GT_BGZF_BATCH_BLOCKS*GT_BGZF_MAX_BLOCK_SIZE);
+  }
+  // Read the batch of blocks that fits into the buffer
+  uint64_t output_size = 0, compressed_pos = 0;
+  bgzf_reader->num_blocks = 0;
+  while (bgzf_reader->num_blocks < GT_BGZF_BATCH_BLOCKS &&
+         output_size+GT_BGZF_MAX_BLOCK_SIZE <= buffer_size) {
+    // Blocks past the end are not read
+    if (bgzf_reader->address > GT_BGZF_BLOCK_ADDRESS(bgzf_reader->end)) {
+      bgzf_reader->eof = true;
+      break;
+    }
+    gt_bgzf_block* const block = bgzf_reader->blocks+bgzf_reader->num_blocks;
+    const int64_t block_size = gt_bgzf_reader_read_block(bgzf_reader,bgzf_reader->compressed_buffer+compressed_pos,block);
+    if (block_size==0) {
+      bgzf_reader->eof = true;
+      bgzf_reader->truncated = !bgzf_reader->eof_marker;
+      break;
+    }
+    if (block_size < 0) {
+      // The blocks read so far are returned
+      gt_error(FILE_BGZF_BLOCK,bgzf_reader->file_name);
+      bgzf_reader->error = true;
+      break;
+    }
+    block->offset = output_size;
+    block->error = false;
+    bgzf_reader->eof_marker = (block->size==0);
+    block->address = bgzf_reader->address;
+    bgzf_reader->address += block_size;
+    compressed_pos += block_size;
+    ++(bgzf_reader->num_blocks);
+    // The content of the end block is truncated at the end offset
+    if (block->address==GT_BGZF_BLOCK_ADDRESS(bgzf_reader->end)) {
+      output_size += GT_MIN(block->size,GT_BGZF_BLOCK_OFFSET(bgzf_reader->end));
+      bgzf_reader->eof = true;
+      break;
+    }
+    output_size += block->size;
+  }
+  // Inflate the blocks in parallel
+  bgzf_reader->output = buffer;
+  gt_bgzf_reader_inflate_batch(bgzf_reader);
+  bgzf_reader->output = NULL;
+  // The batch ends at the first block that could not be inflated
+  uint64_t i;
+  for (i=0;i<bgzf_reader->num_blocks;++i) {
+    if (bgzf_reader->blocks[i].error) {
+      gt_error(FILE_BGZF_INFLATE,bgzf_reader->file_name);
+      bgzf_reader->error = true;
+      bgzf_reader->num_blocks = i;
+      output_size = bgzf_reader->blocks[i].offset;
+      break;
+    }
+  }
+  if (bgzf_reader->error) return (output_size>0) ? (int64_t)output_size : -1;
+  // Batches of empty blocks (i.e. the EOF marker) are skipped
+  if (output_size==0 && !bgzf_reader->eof) return gt_bgzf_reader_read(bgzf_reader,buffer,buffer_size);
+  return output_size;
+}
+bool gt_bgzf_reader_seek(gt_bgzf_reader* const bgzf_reader,const uint64_t block_address) {
+  GT_BGZF_READER_CHECK(bgzf_reader);
+  if (fseeko(bgzf_reader->file,block_address,SEEK_SET)!=0) return false;
+  if (bgzf_reader->pending!=NULL) {
+    gt_free(bgzf_reader->pending);
+    bgzf_reader->pending = NULL;
+    bgzf_reader->pending_size = 0;
+    bgzf_reader->pending_pos = 0;
+  }
+  bgzf_reader->address = block_address;
+  bgzf_reader->num_blocks = 0;
+  bgzf_reader->eof = false;
+  bgzf_reader->eof_marker = false;
+  bgzf_reader->truncated = false;
+  bgzf_reader->error = false;
+  return true;
+}
+GT_INLINE void gt_bgzf_reader_set_end(gt_bgzf_reader* const bgzf_reader,const uint64_t virtual_offset) {
+  GT_BGZF_READER_CHECK(bgzf_reader);
+  bgzf_reader->end = virtual_offset;
+  if (bgzf_reader->address > GT_BGZF_BLOCK_ADDRESS(virtual_offset)) bgzf_reader->eof = true;
+}
+GT_INLINE uint64_t gt_bgzf_reader_get_virtual_offset(gt_bgzf_reader* const bgzf_reader,const uint64_t buffer_pos) {
+  GT_BGZF_READER_CHECK(bgzf_reader);
+  uint64_t i;
+  for (i=0;i<bgzf_reader->num_blocks;++i) {
+    gt_bgzf_block* const block = bgzf_reader->blocks+i;
+    if (block->offset<=buffer_pos && buffer_pos<block->offset+block->size) {
+      return GT_BGZF_VIRTUAL_OFFSET(block->address,buffer_pos-block->offset);
+    }
+  }
+  // End of the batch
+  return GT_BGZF_VIRTUAL_OFFSET(bgzf_reader->address,0);
+}
+GT_INLINE bool gt_bgzf_reader_get_buffer_pos(
+    gt_bgzf_reader* const bgzf_reader,const uint64_t virtual_offset,uint64_t* const buffer_pos) {
+  GT_BGZF_READER_CHECK(bgzf_reader);
+  const uint64_t block_address = GT_BGZF_BLOCK_ADDRESS(virtual_offset);
+  uint64_t i;
+  for (i=0;i<bgzf_reader->num_blocks;++i) {
+    gt_bgzf_block* const block = bgzf_reader->blocks+i;
+    if (block->address==block_address) {
+      *buffer_pos = block->offset+GT_MIN(GT_BGZF_BLOCK_OFFSET(virtual_offset),block->size);
+      return true;
+    }
+  }
+  return false;
+}
+
+/*
+ * Writer
+ */
+gt_bgzf_writer* gt_bgzf_writer_new(FILE* const file,const uint64_t num_threads,const int level) {
+  GT_NULL_CHECK(file);
+  gt_bgzf_writer* const bgzf_writer = gt_alloc(gt_bgzf_writer);
+  bgzf_writer->file = file;
+  bgzf_writer->num_threads = (num_threads>0) ? num_threads : 1;
+  bgzf_writer->level = (level>=0 && level<=9) ? level : Z_DEFAULT_COMPRESSION;
+  bgzf_writer->buffer = gt_malloc((uint64_t)GT_BGZF_WRITE_BATCH_BLOCKS*GT_BGZF_BLOCK_SIZE);
+  bgzf_writer->buffer_size = 0;
+  bgzf_writer->compressed_buffer = gt_malloc((uint64_t)GT_BGZF_WRITE_BATCH_BLOCKS*GT_BGZF_MAX_BLOCK_SIZE);
+  bgzf_writer->compressed_sizes = gt_calloc(GT_BGZF_WRITE_BATCH_BLOCKS,uint64_t,false);
+  bgzf_writer->block_address = 0;
+  bgzf_writer->error = false;
+  bgzf_writer->marks = gt_vector_new(64,sizeof(uint64_t));
+  bgzf_writer->index = gt_vector_new(1024,sizeof(uint64_t));
+  return bgzf_writer;
+}
+void gt_bgzf_writer_delete(gt_bgzf_writer* const bgzf_writer) {
+  GT_BGZF_WRITER_CHECK(bgzf_writer);
+  gt_free(bgzf_writer->buffer);
+  gt_free(bgzf_writer->compressed_buffer);
+  gt_free(bgzf_writer->compressed_sizes);
+  gt_vector_delete(bgzf_writer->marks);
+  gt_vector_delete(bgzf_writer->index);
+  gt_free(bgzf_writer);
+}
+GT_INLINE void gt_bgzf_writer_set_threads(gt_bgzf_writer* const bgzf_writer,const uint64_t num_threads) {
+  GT_BGZF_WRITER_CHECK(bgzf_writer);
+  bgzf_writer->num_threads = (num_threads>0) ? num_threads : 1;
+}
+/*
+ * Deflates the data into a complete BGZF block and
+ * returns the size of the block or 0 on error
+ */
+GT_INLINE uint64_t gt_bgzf_deflate_block(const uint8_t* const data,const uint64_t length,uint8_t* const block,int level) {
+#ifdef HAVE_ZLIB
+  z_stream stream;
+  int status;
+  do {
+    stream.zalloc = Z_NULL;
+    stream.zfree = Z_NULL;
+    stream.opaque = Z_NULL;
+    if (deflateInit2(&stream,level,Z_DEFLATED,-15,8,Z_DEFAULT_STRATEGY)!=Z_OK) return 0;
+    stream.next_in = (uint8_t*)data;
+    stream.avail_in = length;
+    stream.next_out = block+GT_BGZF_HEADER_SIZE;
+    stream.avail_out = GT_BGZF_MAX_BLOCK_SIZE-GT_BGZF_HEADER_SIZE-GT_BGZF_TRAILER_SIZE;
+    status = deflate(&stream,Z_FINISH);
+    deflateEnd(&stream);
+    // Incompressible data is stored, which always fits
+    if (status!=Z_STREAM_END) {
+      if (level==0) return 0;
+      level = 0;
+    }
+  } while (status!=Z_STREAM_END);
+  const uint64_t block_size = GT_BGZF_HEADER_SIZE+stream.total_out+GT_BGZF_TRAILER_SIZE;
+  // Header
+  memset(block,0,GT_BGZF_HEADER_SIZE);
+  block[0] = GT_BGZF_ID1;
+  block[1] = GT_BGZF_ID2;
+  block[2] = GT_BGZF_CM_DEFLATE;
+  block[3] = GT_BGZF_FLG_FEXTRA;
+  block[9] = 255; // Unknown OS
+  gt_bgzf_set_le16(block+10,GT_BGZF_XLEN);
+  block[12] = 'B';
+  block[13] = 'C';
+  gt_bgzf_set_le16(block+14,2);
+  gt_bgzf_set_le16(block+16,block_size-1);
+  // Trailer
+  uint8_t* const trailer = block+block_size-GT_BGZF_TRAILER_SIZE;
+  const uint32_t crc = crc32(crc32(0L,Z_NULL,0),data,length);
+  gt_bgzf_set_le32(trailer,crc);
+  gt_bgzf_set_le32(trailer+4,length);
+  return block_size;
+#else
+  return 0;
+#endif
+}
+typedef struct {
+  gt_bgzf_writer* bgzf_writer;
+  uint64_t num_blocks;
+  uint64_t thread_id;
+  uint64_t num_threads;
+} gt_bgzf_writer_worker_args;
+void* gt_bgzf_writer_worker(void* const worker_args) {
+  gt_bgzf_writer_worker_args* const args = (gt_bgzf_writer_worker_args*) worker_args;
+  gt_bgzf_writer* const bgzf_writer = args->bgzf_writer;
+  uint64_t i;
+  for (i=args->thread_id;i<args->num_blocks;i+=args->num_threads) {
+    const uint64_t begin = i*GT_BGZF_BLOCK_SIZE;
+    const uint64_t length = GT_MIN(GT_BGZF_BLOCK_SIZE,bgzf_writer->buffer_size-begin);
+    bgzf_writer->compressed_sizes[i] = gt_bgzf_deflate_block(bgzf_writer->buffer+begin,length,
+        bgzf_writer->compressed_buffer+i*GT_BGZF_MAX_BLOCK_SIZE,bgzf_writer->level);
+    if (bgzf_writer->compressed_sizes[i]==0) {
+      bgzf_writer->error = true;
+      break;
+    }
+  }
+  return NULL;
+}
+bool gt_bgzf_writer_flush(gt_bgzf_writer* const bgzf_writer) {
+  GT_BGZF_WRITER_CHECK(bgzf_writer);
+  if (bgzf_writer->error) return false;
+  if (bgzf_writer->buffer_size==0 && gt_vector_get_used(bgzf_writer->marks)==0) return true;
+  const uint64_t num_blocks = (bgzf_writer->buffer_size+GT_BGZF_BLOCK_SIZE-1)/GT_BGZF_BLOCK_SIZE;
+  // Deflate the blocks in parallel
+  const uint64_t num_threads = GT_MAX(GT_MIN(bgzf_writer->num_threads,num_blocks),1);
+  pthread_t* const threads = gt_calloc(num_threads,pthread_t,false);
+  gt_bgzf_writer_worker_args* const args = gt_calloc(num_threads,gt_bgzf_writer_worker_args,false);
+  uint64_t i;
+  for (i=0;i<num_threads;++i) {
+    args[i].bgzf_writer = bgzf_writer;
+    args[i].num_blocks = num_blocks;
+    args[i].thread_id = i;
+    args[i].num_threads = num_threads;
+  }
+  for (i=1;i<num_threads;++i) {
+    gt_cond_fatal_error(pthread_create(threads+i,NULL,gt_bgzf_writer_worker,args+i),SYS_THREAD);
+  }
+  gt_bgzf_writer_worker(args);
+  for (i=1;i<num_threads;++i) {
+    gt_cond_fatal_error(pthread_join(threads[i],NULL),SYS_THREAD_JOIN);
+  }
+  gt_free(threads);
+  gt_free(args);
+  if (bgzf_writer->error) return false;
+  // Resolve the marks of the batch. A mark at the end of the batch
+  // points to the start of the next block
+  GT_VECTOR_ITERATE(bgzf_writer->marks,mark,mark_pos,uint64_t) {
+    const uint64_t block = *mark/GT_BGZF_BLOCK_SIZE;
+    uint64_t address = bgzf_writer->block_address;
+    for (i=0;i<block;++i) address += bgzf_writer->compressed_sizes[i];
+    gt_vector_insert(bgzf_writer->index,GT_BGZF_VIRTUAL_OFFSET(address,*mark%GT_BGZF_BLOCK_SIZE),uint64_t);
+  }
+  gt_vector_clear(bgzf_writer->marks);
+  // Write the blocks
+  for (i=0;i<num_blocks;++i) {
+    const uint64_t size = bgzf_writer->compressed_sizes[i];
+    if (fwrite(bgzf_writer->compressed_buffer+i*GT_BGZF_MAX_BLOCK_SIZE,1,size,bgzf_writer->file)!=size) {
+      bgzf_writer->error = true;
+      return false;
+    }
+    bgzf_writer->block_address += size;
+  }
+  bgzf_writer->buffer_size = 0;
+  return true;
+}
+bool gt_bgzf_writer_write(gt_bgzf_writer* const bgzf_writer,const uint8_t* data,uint64_t length) {
+  GT_BGZF_WRITER_CHECK(bgzf_writer);
+  const uint64_t capacity = (uint64_t)GT_BGZF_WRITE_BATCH_BLOCKS*GT_BGZF_BLOCK_SIZE;
+  while (length > 0) {
+    if (bgzf_writer->buffer_size==capacity && !gt_bgzf_writer_flush(bgzf_writer)) return false;
+    const uint64_t chunk = GT_MIN(length,capacity-bgzf_writer->buffer_size);
+    memcpy(bgzf_writer->buffer+bgzf_writer->buffer_size,data,chunk);
+    bgzf_writer->buffer_size += chunk;
+    data += chunk;
+    length -= chunk;
+  }
+  return !bgzf_writer->error;
+}
+GT_INLINE void gt_bgzf_writer_mark(gt_bgzf_writer* const bgzf_writer) {
+  GT_BGZF_WRITER_CHECK(bgzf_writer);
+  gt_vector_insert(bgzf_writer->marks,bgzf_writer->buffer_size,uint64_t);
+}
+bool gt_bgzf_writer_close(gt_bgzf_writer* const bgzf_writer) {
+  GT_BGZF_WRITER_CHECK(bgzf_writer);
+  if (!gt_bgzf_writer_flush(bgzf_writer)) return false;
+  // EOF marker (empty block)
+  uint8_t eof_block[GT_BGZF_MAX_BLOCK_SIZE];
+  const uint64_t size = gt_bgzf_deflate_block(NULL,0,eof_block,bgzf_writer->level);
+  if (size==0 || fwrite(eof_block,1,size,bgzf_writer->file)!=size) return false;
+  bgzf_writer->block_address += size;
+  return fflush(bgzf_writer->file)==0;
+}
+GT_INLINE gt_vector* gt_bgzf_writer_get_index(gt_bgzf_writer* const bgzf_writer) {
+  GT_BGZF_WRITER_CHECK(bgzf_writer);
+  return bgzf_writer->index;
+}
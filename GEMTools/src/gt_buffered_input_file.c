@@ -79,6 +79,10 @@ GT_INLINE gt_status gt_buffered_input_file_add_lines_to_block(
   buffered_input_file->cursor = gt_vector_get_elm(buffered_input_file->block_buffer,current_position,char);
   return lines_added;
 }
+GT_INLINE void gt_buffered_input_file_clear_block(gt_buffered_input_file* const buffered_input_file) {
+  GT_BUFFERED_INPUT_FILE_CHECK(buffered_input_file);
+  gt_vector_clear(buffered_input_file->block_buffer);
+}
 /*
  * Block Synchronization with Output
  *   In the weird case that multiple buffers are attached,
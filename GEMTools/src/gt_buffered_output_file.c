@@ -102,3 +102,12 @@ GT_INLINE gt_status gt_bofprintf(gt_buffered_output_file* const buffered_output_
   va_end(v_args);
   return chars_printed;
 }
+GT_INLINE gt_status gt_bofwrite(gt_buffered_output_file* const buffered_output_file,const void* const data,const uint64_t length) {
+  GT_BUFFERED_OUTPUT_FILE_CHECK(buffered_output_file);
+  GT_NULL_CHECK(data);
+  if (gt_expect_false(
+      gt_output_buffer_get_used(buffered_output_file->buffer)>=GT_BUFFERED_OUTPUT_FILE_FORCE_DUMP_SIZE)) {
+    gt_buffered_output_file_safety_dump(buffered_output_file);
+  }
+  return gt_bwrite(buffered_output_file->buffer,data,length);
+}
@@ -89,4 +89,42 @@ GT_INLINE gt_status gt_gprintf(gt_generic_printer* const generic_printer,const c
   va_end(v_args);
   return chars_printed;
 }
-
+GT_INLINE gt_status gt_gwrite(gt_generic_printer* const generic_printer,const void* const data,const uint64_t length) {
+  GT_GENERIC_PRINTER_CHECK(generic_printer);
+  GT_NULL_CHECK(data);
+  gt_status bytes_written = 0;
+  switch (generic_printer->printer_type) {
+    case GT_FILE_PRINTER:
+      GT_NULL_CHECK(generic_printer->file);
+      gt_cond_fatal_error(fwrite(data,1,length,generic_printer->file)!=length,FWRITE);
+      bytes_written = length;
+      break;
+    case GT_STRING_PRINTER: {
+      gt_string* const string = generic_printer->string;
+      GT_STRING_CHECK_NO_STATIC(string);
+      gt_string_resize(string,string->length+length+1);
+      memcpy(string->buffer+string->length,data,length);
+      string->length += length;
+      string->buffer[string->length] = EOS;
+      bytes_written = length;
+      break;
+    }
+    case GT_BUFFER_PRINTER:
+      GT_OUTPUT_BUFFER_CHECK(generic_printer->output_buffer);
+      bytes_written = gt_bwrite(generic_printer->output_buffer,data,length);
+      break;
+    case GT_OUTPUT_FILE_PRINTER:
+      GT_OUTPUT_FILE_CHECK(generic_printer->output_file);
+      gt_cond_fatal_error( (bytes_written=
+          gt_ofwrite(generic_printer->output_file,data,length))<0,FWRITE);
+      break;
+    case GT_BOF_PRINTER:
+      GT_BUFFERED_OUTPUT_FILE_CHECK(generic_printer->buffered_output_file);
+      bytes_written = gt_bofwrite(generic_printer->buffered_output_file,data,length);
+      break;
+    default:
+      gt_fatal_error(SELECTION_NOT_IMPLEMENTED);
+      break;
+  }
+  return bytes_written;
+}
@@ -0,0 +1,625 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt_input_bam_parser.c
+ * DATE: 18/10/2026
+ * DESCRIPTION: Input parser for BAM format. The BGZF blocks are inflated by
+ *   the input file, the blocks of the buffered input hold complete binary
+ *   records (block_size included) that are decoded into templates/alignments
+ */
+
+#include "gt_input_bam_parser.h"
+
+// Constants
+#define GT_IBP_NUM_RECORDS GT_NUM_LINES_10K
+#define GT_IBP_NUM_INITIAL_MAPS 5
+
+// Little-endian accessors
+#define gt_bam_le16(p) ((uint16_t)((p)[0] | ((p)[1]<<8)))
+#define gt_bam_le32(p) ((uint32_t)((p)[0] | ((p)[1]<<8) | ((p)[2]<<16) | ((uint32_t)(p)[3]<<24)))
+
+// Record fields
+#define GT_BAM_RECORD_REFID(record) ((int32_t)gt_bam_le32((record)))
+#define GT_BAM_RECORD_POS(record) ((int32_t)gt_bam_le32((record)+4))
+#define GT_BAM_RECORD_L_READ_NAME(record) ((record)[8])
+#define GT_BAM_RECORD_MAPQ(record) ((record)[9])
+#define GT_BAM_RECORD_N_CIGAR_OP(record) (gt_bam_le16((record)+12))
+#define GT_BAM_RECORD_FLAG(record) (gt_bam_le16((record)+14))
+#define GT_BAM_RECORD_L_SEQ(record) ((int32_t)gt_bam_le32((record)+16))
+#define GT_BAM_RECORD_NEXT_REFID(record) ((int32_t)gt_bam_le32((record)+20))
+#define GT_BAM_RECORD_NEXT_POS(record) ((int32_t)gt_bam_le32((record)+24))
+#define GT_BAM_RECORD_READ_NAME(record) ((char*)(record)+GT_BAM_RECORD_CORE_SIZE)
+
+/*
+ * BAM File Format test
+ *   magic, l_text, text, n_ref, n_ref*(l_name, name, l_ref)
+ */
+GT_INLINE bool gt_input_file_bam_read_int32(gt_input_file* const input_file,int32_t* const value) {
+  if (!gt_input_file_reserve(input_file,4)) return false;
+  *value = (int32_t)gt_bam_le32(input_file->file_buffer+input_file->buffer_pos);
+  input_file->buffer_pos += 4;
+  return true;
+}
+GT_INLINE bool gt_input_file_test_bam(
+    gt_input_file* const input_file,gt_bam_headers** const bam_headers,const bool show_errors) {
+  GT_INPUT_FILE_CHECK(input_file);
+  GT_NULL_CHECK(bam_headers);
+  // Check the magic
+  if (input_file->buffer_size-input_file->buffer_pos < GT_BAM_MAGIC_LENGTH ||
+      memcmp(input_file->file_buffer+input_file->buffer_pos,GT_BAM_MAGIC,GT_BAM_MAGIC_LENGTH)!=0) return false;
+  input_file->buffer_pos += GT_BAM_MAGIC_LENGTH;
+  input_file->buffer_begin = input_file->buffer_pos;
+  // Read the headers
+  gt_bam_headers* const headers = gt_bam_header_new();
+  int32_t l_text, n_ref, l_name, l_ref = 0, i;
+  if (!gt_input_file_bam_read_int32(input_file,&l_text) || l_text<0) goto truncated;
+  if (!gt_input_file_reserve(input_file,l_text)) goto truncated;
+  // The text can be padded with NULs
+  uint64_t text_length = 0;
+  char* const text = (char*)input_file->file_buffer+input_file->buffer_pos;
+  while (text_length<(uint64_t)l_text && text[text_length]!=EOS) ++text_length;
+  gt_string_set_nstring(headers->text,text,text_length);
+  input_file->buffer_pos += l_text;
+  if (!gt_input_file_bam_read_int32(input_file,&n_ref) || n_ref<0) goto truncated;
+  for (i=0;i<n_ref;++i) {
+    if (!gt_input_file_bam_read_int32(input_file,&l_name) || l_name<1) goto truncated;
+    if (!gt_input_file_reserve(input_file,l_name+4)) goto truncated;
+    char* const name = (char*)input_file->file_buffer+input_file->buffer_pos;
+    input_file->buffer_pos += l_name;
+    gt_input_file_bam_read_int32(input_file,&l_ref);
+    gt_bam_header_add_reference(headers,name,l_name-1,l_ref);
+  }
+  input_file->buffer_begin = input_file->buffer_pos;
+  *bam_headers = headers;
+  return true;
+truncated:
+  gt_bam_header_delete(headers);
+  gt_cond_error(show_errors,PARSE_BAM_BAD_FILE_FORMAT,input_file->file_name,(uint64_t)0);
+  return false;
+}
+
+/*
+ * BAM File basics
+ */
+/* Error handler */
+GT_INLINE void gt_input_bam_parser_prompt_error(
+    gt_buffered_input_file* const buffered_bam_input,uint64_t record_num,const gt_status error_code) {
+  // Display textual error msg
+  const char* const file_name = buffered_bam_input->input_file->file_name;
+  switch (error_code) {
+    case 0: /* No error */ break;
+    case GT_IBP_PE_WRONG_FILE_FORMAT: gt_error(PARSE_BAM_BAD_FILE_FORMAT,file_name,record_num); break;
+    case GT_IBP_PE_TRUNCATED_RECORD: gt_error(PARSE_BAM_TRUNCATED_RECORD,file_name,record_num); break;
+    case GT_IBP_PE_BAD_REFERENCE: gt_error(PARSE_BAM_BAD_REFERENCE,file_name,record_num); break;
+    case GT_IBP_PE_BAD_CIGAR: gt_error(PARSE_BAM_BAD_CIGAR,file_name,record_num); break;
+    case GT_IBP_PE_UNSOLVED_PENDING_MAPS: gt_error(PARSE_BAM_UNSOLVED_PENDING_MAPS,file_name,record_num); break;
+    default:
+      gt_error(PARSE_BAM,file_name,record_num);
+      break;
+  }
+}
+/* Read name of the record (optionally without the /1 /2 pair information) */
+GT_INLINE void gt_ibp_record_tag(uint8_t* const record,gt_string* const tag,const bool chomp_tag) {
+  // The tag ends at the first space (like in SAM)
+  char* const read_name = GT_BAM_RECORD_READ_NAME(record);
+  const uint64_t l_read_name = GT_BAM_RECORD_L_READ_NAME(record);
+  const char* const space = memchr(read_name,SPACE,(l_read_name>0) ? l_read_name-1 : 0);
+  gt_string_set_nstring(tag,read_name,(space!=NULL) ? space-read_name : ((l_read_name>0) ? l_read_name-1 : 0));
+  if (chomp_tag) gt_input_parse_tag_chomp_pairend_info(tag);
+}
+/* Current record of the block (NULL at the end of the block) */
+GT_INLINE uint8_t* gt_ibp_current_record(gt_buffered_input_file* const buffered_bam_input,uint64_t* const record_size) {
+  if (gt_buffered_input_file_eob(buffered_bam_input)) return NULL;
+  uint8_t* const record = (uint8_t*)buffered_bam_input->cursor;
+  *record_size = gt_bam_le32(record);
+  return record+4;
+}
+GT_INLINE void gt_ibp_next_record(gt_buffered_input_file* const buffered_bam_input) {
+  if (!gt_buffered_input_file_eob(buffered_bam_input)) {
+    buffered_bam_input->cursor += 4+gt_bam_le32((uint8_t*)buffered_bam_input->cursor);
+    ++buffered_bam_input->current_line_num;
+  }
+}
+
+/*
+ * BAM file. Synchronized get block wrt to the read names of the records
+ */
+GT_INLINE gt_status gt_input_bam_parser_get_block(
+    gt_buffered_input_file* const buffered_bam_input,const uint64_t num_records) {
+  GT_BUFFERED_INPUT_FILE_CHECK(buffered_bam_input);
+  gt_input_file* const input_file = buffered_bam_input->input_file;
+  // Read records
+  if (input_file->eof) return GT_BMI_EOF;
+  gt_input_file_lock(input_file);
+  if (input_file->eof) {
+    gt_input_file_unlock(input_file);
+    return GT_BMI_EOF;
+  }
+  buffered_bam_input->block_id = gt_input_file_next_id(input_file) % UINT32_MAX;
+  buffered_bam_input->current_line_num = input_file->processed_lines+1;
+  gt_buffered_input_file_clear_block(buffered_bam_input); // Clear dst buffer
+  // Copy complete records. Records of the same template are kept together
+  gt_string* const reference_tag = gt_string_new(30);
+  gt_string* const tag = gt_string_new(0);
+  uint64_t records_read = 0;
+  bool truncated = false;
+  while (true) {
+    if (!gt_input_file_reserve(input_file,4)) {
+      // The file ends in the middle of a record or without the BGZF EOF marker
+      truncated = input_file->buffer_pos<input_file->buffer_size ||
+          (input_file->bgzf_reader!=NULL && input_file->bgzf_reader->truncated);
+      break;
+    }
+    const uint64_t record_size = 4+gt_bam_le32(input_file->file_buffer+input_file->buffer_pos);
+    // The record has to hold the fixed fields and the read name
+    if (record_size<4+GT_BAM_RECORD_CORE_SIZE || !gt_input_file_reserve(input_file,record_size) ||
+        record_size<4+GT_BAM_RECORD_CORE_SIZE+GT_BAM_RECORD_L_READ_NAME(input_file->file_buffer+input_file->buffer_pos+4)) {
+      truncated = true;
+      break;
+    }
+    gt_ibp_record_tag(input_file->file_buffer+input_file->buffer_pos+4,tag,true);
+    if (records_read>=num_records && !gt_string_equals(reference_tag,tag)) break;
+    if (++records_read==num_records) gt_string_copy(reference_tag,tag);
+    input_file->buffer_pos += record_size;
+    gt_input_file_dump_to_buffer(input_file,buffered_bam_input->block_buffer);
+  }
+  gt_string_delete(reference_tag);
+  gt_string_delete(tag);
+  // The records read so far are returned, the truncation by the next block
+  if (truncated) input_file->error = true;
+  input_file->processed_lines+=records_read;
+  buffered_bam_input->lines_in_buffer = records_read;
+  gt_input_file_unlock(input_file);
+  // Setup the block
+  buffered_bam_input->cursor = gt_vector_get_mem(buffered_bam_input->block_buffer,char);
+  return buffered_bam_input->lines_in_buffer;
+}
+/* BAM file. Reload internal buffer */
+GT_INLINE gt_status gt_input_bam_parser_reload_buffer(gt_buffered_input_file* const buffered_bam_input) {
+  GT_BUFFERED_INPUT_FILE_CHECK(buffered_bam_input);
+  // Dump buffer if BOF it attached to BAM-input, and get new out block (always FIRST)
+  gt_buffered_input_file_dump_attached_buffers(buffered_bam_input->attached_buffered_output_file);
+  // Read new input block
+  const uint64_t read_records = gt_input_bam_parser_get_block(buffered_bam_input,GT_IBP_NUM_RECORDS);
+  if (gt_expect_false(read_records==0)) {
+    if (!buffered_bam_input->input_file->error) return GT_IBP_EOF;
+    gt_input_bam_parser_prompt_error(buffered_bam_input,buffered_bam_input->current_line_num,GT_IBP_PE_TRUNCATED_RECORD);
+    return GT_IBP_PE_TRUNCATED_RECORD;
+  }
+  // Assign block ID
+  gt_buffered_input_file_set_id_attached_buffers(buffered_bam_input->attached_buffered_output_file,buffered_bam_input->block_id);
+  return GT_IBP_OK;
+}
+
+/*
+ * BAM CIGAR (same semantics as the SAM CIGAR parser)
+ */
+GT_INLINE gt_status gt_ibp_parse_bam_cigar(
+    const uint8_t* const cigar,const uint64_t num_operations,gt_map** _map,const bool reverse_strand) {
+  gt_map* map = *_map;
+  // Clear mismatches
+  gt_map_clear_misms(map);
+  // Aux variables as to track the position in the read and the genome span
+  uint64_t i, position = 0, reference_span=0;
+  for (i=0;i<num_operations;++i) {
+    const uint32_t operation = gt_bam_le32(cigar+4*i);
+    const uint64_t length = operation>>4;
+    gt_misms misms;
+    switch (operation&0xf) {
+      case 0: // M
+      case 7: // =
+      case 8: // X
+        position += length;
+        reference_span += length;
+        break;
+      case 6: // Padding. Nothing specific implemented
+      case 4: // Soft clipping. Nothing specific implemented
+      case 5: // Hard clipping. Nothing specific implemented
+      case 1: // Insertion to the reference
+        misms.misms_type = DEL;
+        misms.position = position;
+        misms.size = length;
+        position += length;
+        gt_map_add_misms(map,&misms);
+        break;
+      case 2: // Deletion from the reference
+        misms.misms_type = INS;
+        misms.position = position;
+        misms.size = length;
+        reference_span += length;
+        gt_map_add_misms(map,&misms);
+        break;
+      case 3: { // Split
+        // Create a new map block
+        gt_map* next_map = gt_map_new();
+        gt_map_set_seq_name(next_map,gt_map_get_seq_name(map),gt_map_get_seq_name_length(map));
+        gt_map_set_position(next_map,gt_map_get_position(map)+reference_span+length);
+        gt_map_set_strand(next_map,gt_map_get_strand(map));
+        gt_map_set_base_length(next_map,gt_map_get_base_length(map)-position);
+        // Close current map block
+        gt_map_set_base_length(map,position);
+        if (reverse_strand) {
+          gt_map_set_next_block(next_map,map,SPLICE,length);
+        } else {
+          gt_map_set_next_block(map,next_map,SPLICE,length);
+        }
+        // Swap maps & Reset position,reference_span
+        map = next_map;
+        position=0; reference_span=0;
+        }
+        break;
+      default:
+        return GT_IBP_PE_BAD_CIGAR;
+    }
+  }
+  gt_map_set_base_length(map,position);
+  // Consider map CIGAR in the reverse strand
+  if (reverse_strand) {
+    *_map = map;
+    GT_MAP_ITERATE(map,map_it) {
+      gt_map_reverse_misms(map_it);
+    }
+  }
+  return 0;
+}
+
+/*
+ * BAM optional fields
+ *   tag(2) type(1) value. Returns the value of the field (NULL if not present)
+ */
+GT_INLINE char* gt_ibp_find_optional_field(
+    uint8_t* optional_fields,uint8_t* const end,const char char1,const char char2,const char type_char) {
+  while (optional_fields+3 <= end) {
+    const char type = optional_fields[2];
+    uint8_t* const value = optional_fields+3;
+    if (optional_fields[0]==char1 && optional_fields[1]==char2 && type==type_char) return (char*)value;
+    switch (type) {
+      case 'A': case 'c': case 'C': optional_fields = value+1; break;
+      case 's': case 'S': optional_fields = value+2; break;
+      case 'i': case 'I': case 'f': optional_fields = value+4; break;
+      case 'Z': case 'H': {
+        uint8_t* const value_end = memchr(value,EOS,end-value);
+        if (value_end==NULL) return NULL;
+        optional_fields = value_end+1;
+        break;
+      }
+      case 'B': {
+        if (value+5 > end) return NULL;
+        const uint64_t count = gt_bam_le32(value+1);
+        const uint64_t size = (value[0]=='c' || value[0]=='C') ? 1 : ((value[0]=='s' || value[0]=='S') ? 2 : 4);
+        optional_fields = value+5+count*size;
+        break;
+      }
+      default:
+        return NULL;
+    }
+  }
+  return NULL;
+}
+
+/*
+ * BAM record
+ *   refID pos l_read_name mapq bin n_cigar_op flag l_seq next_refID next_pos tlen
+ *   read_name cigar seq qual tags
+ */
+GT_INLINE gt_status gt_ibp_parse_bam_alignment(
+    gt_bam_headers* const bam_headers,uint8_t* const record,const uint64_t record_size,
+    gt_template* const _template,gt_alignment* const _alignment,
+    uint64_t* const alignment_flag,gt_sam_pending_end* const pending,const bool override_pairing) {
+  gt_status error_code;
+  if (record_size<GT_BAM_RECORD_CORE_SIZE) return GT_IBP_PE_TRUNCATED_RECORD;
+  const uint64_t l_read_name = GT_BAM_RECORD_L_READ_NAME(record);
+  const uint64_t n_cigar_op = GT_BAM_RECORD_N_CIGAR_OP(record);
+  const int32_t l_seq = GT_BAM_RECORD_L_SEQ(record);
+  if (l_seq<0 || GT_BAM_RECORD_CORE_SIZE+l_read_name+4*n_cigar_op+(l_seq+1)/2+l_seq > record_size) {
+    return GT_IBP_PE_TRUNCATED_RECORD;
+  }
+  const uint8_t* const cigar = record+GT_BAM_RECORD_CORE_SIZE+l_read_name;
+  const uint8_t* const seq = cigar+4*n_cigar_op;
+  const uint8_t* const qual = seq+(l_seq+1)/2;
+  const uint64_t num_references = gt_bam_header_get_num_references(bam_headers);
+  /*
+   * FLAG
+   */
+  *alignment_flag = GT_BAM_RECORD_FLAG(record);
+  const bool reverse_strand = (*alignment_flag&GT_SAM_FLAG_REVERSE_COMPLEMENT);
+  bool is_mapped = !(*alignment_flag&GT_SAM_FLAG_UNMAPPED);
+  const bool is_single_segment = override_pairing || !(*alignment_flag&GT_SAM_FLAG_MULTIPLE_SEGMENTS);
+  pending->end_position = (is_single_segment) ? 0 : ((*alignment_flag&GT_SAM_FLAG_FIRST_SEGMENT)?0:1);
+  gt_map* map = gt_map_new();
+  gt_map_set_strand(map,(reverse_strand) ? REVERSE : FORWARD);
+  // Allocate template/alignment handlers
+  gt_alignment* alignment;
+  if (_template) {
+    alignment = gt_template_get_block_dyn(_template,0);
+    if (pending->end_position==1) {
+      alignment = gt_template_get_block_dyn(_template,1);
+    }
+  } else {
+    GT_NULL_CHECK(_alignment);
+    alignment = _alignment;
+  }
+  if (!gt_attributes_get(alignment->attributes,GT_ATTR_ID_SAM_FLAGS)) {
+    gt_attributes_add(alignment->attributes,GT_ATTR_ID_SAM_FLAGS,alignment_flag,uint64_t);
+  }
+  /*
+   * RNAME & POS (0-based)
+   */
+  const int32_t reference_id = GT_BAM_RECORD_REFID(record);
+  gt_string* seq_name = NULL;
+  if (reference_id<0) {
+    is_mapped = false;
+  } else {
+    if ((uint64_t)reference_id>=num_references) {
+      gt_map_delete(map); return GT_IBP_PE_BAD_REFERENCE;
+    }
+    seq_name = gt_bam_header_get_reference_name(bam_headers,reference_id);
+    gt_map_set_seq_name(map,gt_string_get_string(seq_name),gt_string_get_length(seq_name));
+  }
+  const int32_t position = GT_BAM_RECORD_POS(record);
+  if (position<0) is_mapped = false;
+  gt_map_set_position(map,position+1);
+  /*
+   * MAPQ (Score)
+   */
+  map->phred_score = GT_BAM_RECORD_MAPQ(record);
+  /*
+   * CIGAR
+   */
+  if ((error_code=gt_ibp_parse_bam_cigar(cigar,n_cigar_op,&map,reverse_strand))) {
+    gt_map_delete(map); return error_code;
+  }
+  /*
+   * RNEXT & PNEXT
+   */
+  const int32_t next_reference_id = GT_BAM_RECORD_NEXT_REFID(record);
+  const int32_t next_position = GT_BAM_RECORD_NEXT_POS(record);
+  if (next_reference_id<0 || is_single_segment || !is_mapped ||
+      (*alignment_flag&GT_SAM_FLAG_NEXT_UNMAPPED) || next_position<0) {
+    gt_string_clear(&pending->next_seq_name);
+  } else {
+    if ((uint64_t)next_reference_id>=num_references) {
+      gt_map_delete(map); return GT_IBP_PE_BAD_REFERENCE;
+    }
+    gt_string* const next_seq_name = gt_bam_header_get_reference_name(bam_headers,next_reference_id);
+    gt_string_set_nstring(&pending->next_seq_name,gt_string_get_string(next_seq_name),gt_string_get_length(next_seq_name));
+    pending->next_position = next_position+1;
+    gt_string_set_nstring(&pending->map_seq_name,gt_string_get_string(seq_name),gt_string_get_length(seq_name));
+    pending->num_maps = 1;
+    pending->map_position = gt_map_get_global_coordinate(map);
+  }
+  /*
+   * SEQ (READ)
+   */
+  if (l_seq>0) {
+    if (gt_string_is_null(alignment->read)) {
+      gt_string_resize(alignment->read,l_seq+1);
+      char* const read = gt_string_get_string(alignment->read);
+      int32_t i;
+      for (i=0;i<l_seq;++i) {
+        const uint8_t code = (i%2==0) ? seq[i/2]>>4 : seq[i/2]&0xf;
+        read[i] = gt_get_dna_normalized(GT_BAM_SEQ_CODES[code]);
+      }
+      read[l_seq] = EOS;
+      gt_string_set_length(alignment->read,l_seq);
+      if (reverse_strand) {
+        gt_dna_string_reverse_complement(alignment->read);
+      }
+    }
+    if (gt_map_get_base_length(map)==0) gt_map_set_base_length(map,gt_alignment_get_read_length(alignment));
+    /*
+     * QUAL (QUALITY STRING)
+     */
+    if (qual[0]!=GT_BAM_NO_QUALITY && gt_string_is_null(alignment->qualities)) {
+      gt_string_resize(alignment->qualities,l_seq+1);
+      char* const qualities = gt_string_get_string(alignment->qualities);
+      int32_t i;
+      for (i=0;i<l_seq;++i) qualities[i] = qual[i]+33;
+      qualities[l_seq] = EOS;
+      gt_string_set_length(alignment->qualities,l_seq);
+      if (reverse_strand) {
+        gt_string_reverse(alignment->qualities);
+      }
+    }
+  }
+  if (!gt_string_is_null(alignment->read) && !gt_string_is_null(alignment->qualities)) {
+    gt_fatal_check(gt_string_get_length(alignment->read)!=gt_string_get_length(alignment->qualities),ALIGNMENT_READ_QUAL_LENGTH);
+  }
+  /*
+   * OPTIONAL FIELDS (XA attached maps)
+   */
+  gt_vector* maps_vector = NULL;
+  if (is_mapped) {
+    maps_vector = gt_vector_new(10,sizeof(gt_map*));
+    gt_vector_insert(maps_vector,map,gt_map*);
+    char* xa_maps = gt_ibp_find_optional_field(
+        (uint8_t*)qual+l_seq,record+record_size,'X','A','Z');
+    if (xa_maps!=NULL) {
+      const uint64_t num_maps = gt_vector_get_used(maps_vector);
+      if (gt_isp_parse_sam_xa_maps(&xa_maps,alignment,maps_vector,pending)) {
+        // Ignore a malformed XA field (like the SAM parser)
+        GT_VECTOR_ITERATE_OFFSET(maps_vector,map_elm,map_pos,num_maps,gt_map*) gt_map_delete(*map_elm);
+        gt_vector_set_used(maps_vector,num_maps);
+      }
+    }
+  } else {
+    gt_map_delete(map);
+  }
+  /*
+   * Add the maps
+   */
+  if (is_mapped) {
+    pending->map_displacement = gt_alignment_get_num_maps(alignment);
+    if (override_pairing) {
+      gt_alignment_insert_map_gt_vector(alignment,maps_vector);
+    } else {
+      GT_VECTOR_ITERATE(maps_vector,map_elm,map_pos,gt_map*) {
+        gt_alignment_inc_counter(alignment,gt_map_get_global_distance(*map_elm));
+        gt_alignment_add_map(alignment,*map_elm);
+      }
+    }
+    gt_vector_delete(maps_vector);
+  }
+  return 0;
+}
+
+/* Moves to the next record if it belongs to the same template/alignment */
+GT_INLINE bool gt_ibp_fetch_next_record(
+    gt_buffered_input_file* const buffered_bam_input,gt_string* const expected_tag,const bool chomp_tag) {
+  gt_ibp_next_record(buffered_bam_input);
+  uint64_t record_size;
+  uint8_t* const record = gt_ibp_current_record(buffered_bam_input,&record_size);
+  if (record==NULL) return false;
+  gt_string* const next_tag = gt_string_new(0);
+  gt_ibp_record_tag(record,next_tag,chomp_tag);
+  const bool same_tag = gt_string_equals(expected_tag,next_tag);
+  gt_string_delete(next_tag);
+  return same_tag;
+}
+
+#define gt_ibp_skip_remaining_records(buffered_bam_input,tag,chomp_tag) \
+  while (gt_ibp_fetch_next_record(buffered_bam_input,tag,chomp_tag))
+
+/* BAM general */
+GT_INLINE gt_status gt_input_bam_parser_parse_template(
+    gt_buffered_input_file* const buffered_bam_input,gt_template* const template) {
+  gt_bam_headers* const bam_headers = buffered_bam_input->input_file->bam_headers;
+  gt_status error_code = 0;
+  uint64_t record_size;
+  uint8_t* record = gt_ibp_current_record(buffered_bam_input,&record_size);
+  // Read initial TAG (QNAME := Query template)
+  gt_string* const tag = gt_string_new(0);
+  gt_ibp_record_tag(record,tag,true);
+  gt_string_copy(template->tag,tag);
+  gt_string_delete(tag);
+  // Read all maps related to this TAG
+  gt_vector* pending_v = gt_vector_new(GT_IBP_NUM_INITIAL_MAPS,sizeof(gt_sam_pending_end));
+  do {
+    record = gt_ibp_current_record(buffered_bam_input,&record_size);
+    // Parse BAM Alignment
+    gt_sam_pending_end pending = GT_SAM_INIT_PENDING;
+    uint64_t alignment_flag;
+    if (gt_expect_false(error_code=gt_ibp_parse_bam_alignment(bam_headers,
+          record,record_size,template,NULL,&alignment_flag,&pending,false))) {
+      gt_vector_delete(pending_v);
+      gt_ibp_skip_remaining_records(buffered_bam_input,template->tag,true);
+      return error_code;
+    }
+    // Solve pending ends
+    if (!gt_string_is_null(&pending.next_seq_name)) gt_isp_solve_pending_maps(pending_v,&pending,template);
+  } while (gt_ibp_fetch_next_record(buffered_bam_input,template->tag,true));
+  // Check for unsolved pending maps (try to solve them)
+  if (gt_isp_solve_remaining_maps(pending_v,template)) error_code = GT_IBP_PE_UNSOLVED_PENDING_MAPS;
+  gt_vector_delete(pending_v);
+  // Setup alignment's tag info
+  gt_template_setup_pair_attributes_to_alignments(template,true);
+  return error_code;
+}
+/* SE-BAM */
+GT_INLINE gt_status gt_input_bam_parser_parse_alignment(
+    gt_buffered_input_file* const buffered_bam_input,gt_alignment* alignment) {
+  gt_bam_headers* const bam_headers = buffered_bam_input->input_file->bam_headers;
+  gt_status error_code;
+  uint64_t record_size;
+  uint8_t* record = gt_ibp_current_record(buffered_bam_input,&record_size);
+  // Read initial TAG (QNAME := Query template)
+  gt_string* const tag = gt_string_new(0);
+  gt_ibp_record_tag(record,tag,false);
+  gt_string_copy(alignment->tag,tag);
+  gt_string_delete(tag);
+  // Read all maps related to this TAG
+  do {
+    record = gt_ibp_current_record(buffered_bam_input,&record_size);
+    // Parse BAM Alignment
+    gt_sam_pending_end pending = GT_SAM_INIT_PENDING;
+    uint64_t alignment_flag;
+    if (gt_expect_false((error_code=gt_ibp_parse_bam_alignment(bam_headers,
+        record,record_size,NULL,alignment,&alignment_flag,&pending,true))!=0)) {
+      gt_ibp_skip_remaining_records(buffered_bam_input,alignment->tag,false);
+      return error_code;
+    }
+  } while (gt_ibp_fetch_next_record(buffered_bam_input,alignment->tag,false));
+  // Chomp /1/2 and add the pair info
+  int64_t pair = gt_input_parse_tag_chomp_pairend_info(alignment->tag);
+  if (pair) gt_attributes_add(alignment->attributes,GT_ATTR_ID_TAG_PAIR,&pair,int64_t);
+  return 0;
+}
+
+/*
+ * High Level Parsers
+ */
+GT_INLINE gt_status gt_input_bam_parser_get_template(
+    gt_buffered_input_file* const buffered_bam_input,gt_template* const template) {
+  GT_BUFFERED_INPUT_FILE_CHECK(buffered_bam_input);
+  GT_TEMPLATE_CHECK(template);
+  gt_status error_code;
+  // Check the end_of_block. Reload buffer if needed
+  if (gt_buffered_input_file_eob(buffered_bam_input)) {
+    if ((error_code=gt_input_bam_parser_reload_buffer(buffered_bam_input))!=GT_IBP_OK) return error_code;
+  }
+  // Check file format
+  if (buffered_bam_input->input_file->file_format!=BAM) {
+    gt_input_bam_parser_prompt_error(buffered_bam_input,buffered_bam_input->current_line_num,GT_IBP_PE_WRONG_FILE_FORMAT);
+    return GT_IBP_FAIL;
+  }
+  // Prepare the template
+  const uint64_t record_num = buffered_bam_input->current_line_num;
+  gt_template_clear(template,true);
+  template->template_id = record_num;
+  // Parse template
+  if ((error_code=gt_input_bam_parser_parse_template(buffered_bam_input,template))) {
+    gt_input_bam_parser_prompt_error(buffered_bam_input,record_num,error_code);
+    gt_ibp_next_record(buffered_bam_input);
+    return GT_IBP_FAIL;
+  }
+  return GT_IBP_OK;
+}
+GT_INLINE gt_status gt_input_bam_parser_get_alignment(
+    gt_buffered_input_file* const buffered_bam_input,gt_alignment* const alignment) {
+  GT_BUFFERED_INPUT_FILE_CHECK(buffered_bam_input);
+  GT_ALIGNMENT_CHECK(alignment);
+  gt_status error_code;
+  // Check the end_of_block. Reload buffer if needed
+  if (gt_buffered_input_file_eob(buffered_bam_input)) {
+    if ((error_code=gt_input_bam_parser_reload_buffer(buffered_bam_input))!=GT_IBP_OK) return error_code;
+  }
+  // Check file format
+  if (buffered_bam_input->input_file->file_format!=BAM) {
+    gt_input_bam_parser_prompt_error(buffered_bam_input,buffered_bam_input->current_line_num,GT_IBP_PE_WRONG_FILE_FORMAT);
+    return GT_IBP_FAIL;
+  }
+  // Allocate memory for the alignment
+  const uint64_t record_num = buffered_bam_input->current_line_num;
+  gt_alignment_clear(alignment);
+  alignment->alignment_id = record_num;
+  // Parse alignment
+  if ((error_code=gt_input_bam_parser_parse_alignment(buffered_bam_input,alignment))) {
+    gt_input_bam_parser_prompt_error(buffered_bam_input,record_num,error_code);
+    gt_ibp_next_record(buffered_bam_input);
+    return GT_IBP_FAIL;
+  }
+  return GT_IBP_OK;
+}
+
+/*
+ * Synch read of blocks
+ */
+GT_INLINE gt_status gt_input_bam_parser_synch_blocks_a(
+    pthread_mutex_t* const input_mutex,gt_buffered_input_file** const buffered_input,const uint64_t num_inputs) {
+  GT_BUFFERED_INPUT_FILE_CHECK(buffered_input[0]);
+  gt_status error_code;
+  // Check the end_of_block. Reload buffer if needed (synch)
+  if (gt_buffered_input_file_eob(buffered_input[0])) {
+    GT_BEGIN_MUTEX_SECTION(*input_mutex) {
+      uint64_t i;
+      for (i=0;i<num_inputs;++i) {
+        // Reload the 'buffered_input' files
+        GT_BUFFERED_INPUT_FILE_CHECK(buffered_input[i]);
+        if ((error_code=gt_input_bam_parser_reload_buffer(buffered_input[i]))!=GT_IBP_OK) {
+          GT_END_MUTEX_SECTION(*input_mutex);
+          return error_code;
+        }
+      }
+    } GT_END_MUTEX_SECTION(*input_mutex);
+  }
+  return GT_IBP_OK;
+}
@@ -17,6 +17,61 @@
 // Internal constants
 #define GT_INPUT_BUFFER_SIZE GT_BUFFER_SIZE_64M
 
+GT_INLINE uint64_t gt_input_file_default_bgzf_threads() {
+  const long num_processors = sysconf(_SC_NPROCESSORS_ONLN);
+  return GT_MIN(GT_BGZF_DEFAULT_THREADS,(num_processors>0) ? (uint64_t)num_processors : 1);
+}
+/*
+ * BGZF compressed streams (i.e. BAM) are inflated like BGZF files.
+ * The content read for the detection is handed to the BGZF reader
+ */
+GT_INLINE void gt_input_stream_detect_bgzf(gt_input_file* const input_file) {
+  if (input_file->eof) return;
+  gt_input_file_fill_buffer(input_file);
+  if (gt_bgzf_is_bgzf(input_file->file_buffer,input_file->buffer_size)) {
+    input_file->bgzf_reader = gt_bgzf_reader_new(input_file->file,input_file->file_name,gt_input_file_default_bgzf_threads());
+    gt_bgzf_reader_unread(input_file->bgzf_reader,input_file->file_buffer,input_file->buffer_size);
+    input_file->global_pos = 0;
+    input_file->buffer_size = 0;
+    input_file->eof = false;
+  }
+}
+
+/*
+ * Mapped files
+ *   Uncompressed regular files are mapped read-only as a whole. Lines are copied
+ *   into the block buffers like the content of the other files and the consumed
+ *   pages are released, so the memory used does not grow with the file
+ */
+#define GT_INPUT_FILE_RELEASE_SIZE (8*1024*1024) /* Consumed content released at once (page aligned) */
+GT_INLINE bool gt_input_file_is_compressed(const uint8_t* const buffer,const uint64_t size) {
+  if (size<4) return false;
+  return gt_bgzf_is_bgzf((uint8_t*)buffer,size) ||
+      (buffer[0]==0x1f && buffer[1]==0x8b && buffer[2]==0x08) ||
+      (buffer[0]=='B' && buffer[1]=='Z' && buffer[2]=='h' && buffer[3]>='0' && buffer[3]<='9');
+}
+GT_INLINE bool gt_input_file_map(gt_input_file* const input_file,char* const file_name) {
+  const int fildes = open(file_name,O_RDONLY,0); // TODO: O_NOATIME condCompl (Thanks Jordi Camps)
+  gt_cond_fatal_error(fildes==-1,FILE_OPEN,file_name);
+  uint8_t* const file_buffer =
+      (uint8_t*) mmap(0,input_file->file_size,PROT_READ,MAP_PRIVATE,fildes,0);
+  gt_cond_fatal_error(file_buffer==MAP_FAILED,SYS_MMAP_FILE,file_name);
+  // Compressed content is never mapped
+  if (gt_input_file_is_compressed(file_buffer,input_file->file_size)) {
+    gt_cond_error(munmap(file_buffer,input_file->file_size)==-1,SYS_UNMAP);
+    close(fildes);
+    return false;
+  }
+  // The content is read once, front to back
+  madvise(file_buffer,input_file->file_size,MADV_SEQUENTIAL);
+  madvise(file_buffer,input_file->file_size,MADV_WILLNEED);
+  input_file->file = NULL;
+  input_file->fildes = fildes;
+  input_file->file_buffer = file_buffer;
+  input_file->file_type = MAPPED_FILE;
+  return true;
+}
+
 /*
  * Basic I/O functions
  */
@@ -29,7 +84,9 @@ gt_input_file* gt_input_stream_open(FILE* stream) {
   input_file->file_type = STREAM;
   input_file->file = stream;
   input_file->fildes = -1;
+  input_file->bgzf_reader = NULL;
   input_file->eof = feof(stream);
+  input_file->error = false;
   input_file->file_size = UINT64_MAX;
   input_file->file_format = FILE_FORMAT_UNKNOWN;
   gt_cond_fatal_error(pthread_mutex_init(&input_file->input_mutex, NULL),SYS_MUTEX_INIT);
@@ -40,9 +97,11 @@ gt_input_file* gt_input_stream_open(FILE* stream) {
   input_file->buffer_pos = 0;
   input_file->global_pos = 0;
   input_file->processed_lines = 0;
+  input_file->content_end = UINT64_MAX;
   // ID generator
   input_file->processed_id = 0;
   // Detect file format
+  gt_input_stream_detect_bgzf(input_file);
   gt_input_file_detect_file_format(input_file);
   return input_file;
 }
@@ -52,30 +111,32 @@ gt_input_file* gt_input_file_open(char* const file_name,const bool mmap_file) {
   gt_input_file* input_file = gt_alloc(gt_input_file);
   // Input file
   struct stat stat_info;
-  unsigned char tbuf[4];
+  unsigned char tbuf[GT_BGZF_HEADER_SIZE];
   int i;
   gt_cond_fatal_error(stat(file_name,&stat_info)==-1,FILE_STAT,file_name);
   input_file->file_name = file_name;
+  input_file->bgzf_reader = NULL;
   input_file->file_size = stat_info.st_size;
   input_file->eof = (input_file->file_size==0);
+  input_file->error = false;
   input_file->file_format = FILE_FORMAT_UNKNOWN;
   gt_cond_fatal_error(pthread_mutex_init(&input_file->input_mutex,NULL),SYS_MUTEX_INIT);
-  if (mmap_file) {
-    input_file->file = NULL;
-    input_file->fildes = open(file_name,O_RDONLY,0); // TODO: O_NOATIME condCompl (Thanks Jordi Camps)
-    gt_cond_fatal_error(input_file->fildes==-1,FILE_OPEN,file_name);
-    input_file->file_buffer =
-      (uint8_t*) mmap(0,input_file->file_size,PROT_READ,MAP_PRIVATE,input_file->fildes,0);
-    gt_cond_fatal_error(input_file->file_buffer==MAP_FAILED,SYS_MMAP_FILE,file_name);
-    input_file->file_type = MAPPED_FILE;
-  } else {
+  // Only uncompressed, non-empty regular files are mapped
+  const bool mapped_file = mmap_file && S_ISREG(stat_info.st_mode) &&
+      input_file->file_size>0 && gt_input_file_map(input_file,file_name);
+  if (!mapped_file) {
     input_file->fildes = -1;
     gt_cond_fatal_error(!(input_file->file=fopen(file_name,"r")),FILE_OPEN,file_name);
     input_file->file_type = REGULAR_FILE;
     if(S_ISREG(stat_info.st_mode)) {
       // Regular file - check if gzip or bzip compressed
-      i=(int)fread(tbuf,(size_t)1,(size_t)4,input_file->file);
-      if(tbuf[0]==0x1f && tbuf[1]==0x8b && tbuf[2]==0x08) {
+      i=(int)fread(tbuf,(size_t)1,(size_t)GT_BGZF_HEADER_SIZE,input_file->file);
+      if(i>=4 && gt_bgzf_is_bgzf(tbuf,i)) {
+        // BGZF blocks are inflated in parallel
+        fseek(input_file->file,0L,SEEK_SET);
+        input_file->file_type=BGZIPPED_FILE;
+        input_file->bgzf_reader = gt_bgzf_reader_new(input_file->file,file_name,gt_input_file_default_bgzf_threads());
+      } else if(i>=4 && tbuf[0]==0x1f && tbuf[1]==0x8b && tbuf[2]==0x08) {
         input_file->file_type=GZIPPED_FILE;
         fclose(input_file->file);
 #ifdef HAVE_ZLIB
@@ -83,7 +144,7 @@ gt_input_file* gt_input_file_open(char* const file_name,const bool mmap_file) {
 #else
         gt_fatal_error(FILE_GZIP_NO_ZLIB,file_name);
 #endif
-      } else if(tbuf[0]=='B' && tbuf[1]=='Z' && tbuf[2]=='h' && tbuf[3]>='0' && tbuf[3]<='9') {
+      } else if(i>=4 && tbuf[0]=='B' && tbuf[1]=='Z' && tbuf[2]=='h' && tbuf[3]>='0' && tbuf[3]<='9') {
         fseek(input_file->file,0L,SEEK_SET);
         input_file->file_type=BZIPPED_FILE;
 #ifdef HAVE_BZLIB
@@ -106,6 +167,7 @@ gt_input_file* gt_input_file_open(char* const file_name,const bool mmap_file) {
   input_file->buffer_pos = 0;
   input_file->global_pos = 0;
   input_file->processed_lines = 0;
+  input_file->content_end = UINT64_MAX;
   // ID generator
   input_file->processed_id = 0;
   // Detect file format
@@ -122,6 +184,7 @@ gt_status gt_input_file_close(gt_input_file* const input_file) {
 #ifdef HAVE_BZLIB
   int bzerr;
 #endif
+  if (input_file->file_format==BAM) gt_bam_header_delete(input_file->bam_headers);
   switch (input_file->file_type) {
     case REGULAR_FILE:
       gt_free(input_file->file_buffer);
@@ -133,6 +196,11 @@ gt_status gt_input_file_close(gt_input_file* const input_file) {
       if (gzclose((gzFile)input_file->file)) status = GT_INPUT_FILE_CLOSE_ERR;
 #endif
       break;
+    case BGZIPPED_FILE:
+      gt_free(input_file->file_buffer);
+      gt_bgzf_reader_delete(input_file->bgzf_reader);
+      if (fclose(input_file->file)) status = GT_INPUT_FILE_CLOSE_ERR;
+      break;
     case BZIPPED_FILE:
       gt_free(input_file->file_buffer);
 #ifdef HAVE_BZLIB
@@ -141,17 +209,151 @@ gt_status gt_input_file_close(gt_input_file* const input_file) {
 #endif
       break;
     case MAPPED_FILE:
-      gt_cond_error(munmap(input_file->file,input_file->file_size)==-1,SYS_UNMAP);
+      gt_cond_error(munmap(input_file->file_buffer,input_file->file_size)==-1,SYS_UNMAP);
       if (close(input_file->fildes)) status = GT_INPUT_FILE_CLOSE_ERR;
       break;
     case STREAM:
       gt_free(input_file->file_buffer);
+      if (input_file->bgzf_reader!=NULL) gt_bgzf_reader_delete(input_file->bgzf_reader);
       break;
   }
   gt_free(input_file);
   return status;
 }
 
+void gt_input_file_set_threads(gt_input_file* const input_file,const uint64_t num_threads) {
+  GT_INPUT_FILE_CHECK(input_file);
+  if (input_file->bgzf_reader!=NULL) gt_bgzf_reader_set_threads(input_file->bgzf_reader,num_threads);
+}
+
+/*
+ * Random access (uncompressed and BGZF files)
+ */
+GT_INLINE bool gt_input_file_is_seekable(gt_input_file* const input_file) {
+  GT_INPUT_FILE_CHECK(input_file);
+  return input_file->file_type==REGULAR_FILE || input_file->file_type==MAPPED_FILE ||
+      input_file->file_type==BGZIPPED_FILE;
+}
+GT_INLINE bool gt_input_file_seek(gt_input_file* const input_file,const uint64_t offset) {
+  GT_INPUT_FILE_CHECK(input_file);
+  switch (input_file->file_type) {
+    case MAPPED_FILE:
+      // The whole file is in the buffer
+      if (offset > input_file->file_size) return false;
+      input_file->global_pos = 0;
+      input_file->buffer_size = GT_MIN(input_file->file_size,input_file->content_end);
+      input_file->buffer_begin = offset;
+      input_file->buffer_pos = offset;
+      input_file->eof = false;
+      break;
+    case REGULAR_FILE:
+      if (fseeko(input_file->file,offset,SEEK_SET)!=0) return false;
+      input_file->global_pos = offset;
+      input_file->buffer_size = 0;
+      input_file->buffer_begin = 0;
+      input_file->buffer_pos = 0;
+      input_file->eof = false;
+      gt_input_file_fill_buffer(input_file);
+      return true;
+    case BGZIPPED_FILE:
+      if (!gt_bgzf_reader_seek(input_file->bgzf_reader,GT_BGZF_BLOCK_ADDRESS(offset))) return false;
+      input_file->global_pos = 0;
+      input_file->buffer_size = 0;
+      input_file->eof = false;
+      input_file->error = false;
+      gt_input_file_fill_buffer(input_file);
+      if (GT_BGZF_BLOCK_OFFSET(offset) > input_file->buffer_size) return false;
+      input_file->buffer_begin = GT_BGZF_BLOCK_OFFSET(offset);
+      input_file->buffer_pos = GT_BGZF_BLOCK_OFFSET(offset);
+      break;
+    default:
+      return false;
+  }
+  GT_INPUT_FILE_CHECK_BUFFER(input_file);
+  return true;
+}
+GT_INLINE uint64_t gt_input_file_tell(gt_input_file* const input_file) {
+  GT_INPUT_FILE_CHECK(input_file);
+  if (input_file->bgzf_reader!=NULL) {
+    return gt_bgzf_reader_get_virtual_offset(input_file->bgzf_reader,input_file->buffer_pos);
+  }
+  return input_file->global_pos+input_file->buffer_pos;
+}
+GT_INLINE void gt_input_file_set_end(gt_input_file* const input_file,const uint64_t offset) {
+  GT_INPUT_FILE_CHECK(input_file);
+  if (input_file->bgzf_reader!=NULL) {
+    uint64_t buffer_end;
+    if (gt_bgzf_reader_get_buffer_pos(input_file->bgzf_reader,offset,&buffer_end)) {
+      input_file->buffer_size = GT_MAX(GT_MIN(input_file->buffer_size,buffer_end),input_file->buffer_pos);
+    }
+    gt_bgzf_reader_set_end(input_file->bgzf_reader,offset);
+  } else {
+    input_file->content_end = offset;
+    if (input_file->global_pos+input_file->buffer_size > offset) {
+      const uint64_t buffer_end = (offset > input_file->global_pos) ? offset-input_file->global_pos : 0;
+      input_file->buffer_size = GT_MAX(buffer_end,input_file->buffer_pos);
+    }
+  }
+}
+
+/*
+ * Template index
+ */
+gt_template_index* gt_input_file_index_templates(
+    gt_input_file* const input_file,const uint64_t interval,const uint64_t template_lines) {
+  GT_INPUT_FILE_CHECK(input_file);
+  gt_template_index* const template_index = gt_template_index_new(interval,
+      (input_file->bgzf_reader!=NULL) ? GT_TEMPLATE_INDEX_VIRTUAL_OFFSETS : 0);
+  const uint64_t lines_per_entry = template_index->interval*template_lines;
+  uint64_t num_lines = 0;
+  while (true) {
+    GT_INPUT_FILE_CHECK_BUFFER(input_file);
+    if (input_file->eof) break;
+    const uint64_t offset = gt_input_file_tell(input_file);
+    gt_vector_insert(template_index->offsets,offset,uint64_t);
+    const uint64_t lines = gt_input_file_skip_lines(input_file,lines_per_entry);
+    num_lines += lines;
+    if (lines<lines_per_entry) break;
+  }
+  template_index->num_templates = (num_lines+template_lines-1)/template_lines;
+  return template_index;
+}
+/*
+ * Positions the input file at the given template using the closest entry
+ */
+GT_INLINE bool gt_input_file_seek_template(
+    gt_input_file* const input_file,gt_template_index* const template_index,
+    const uint64_t template_lines,const uint64_t template) {
+  const uint64_t num_offsets = gt_vector_get_used(template_index->offsets);
+  const uint64_t entry = GT_MIN(template/template_index->interval,num_offsets-1);
+  const uint64_t num_lines = (template-entry*template_index->interval)*template_lines;
+  if (!gt_input_file_seek(input_file,*gt_vector_get_elm(template_index->offsets,entry,uint64_t))) return false;
+  return gt_input_file_skip_lines(input_file,num_lines)==num_lines;
+}
+bool gt_input_file_seek_templates(
+    gt_input_file* const input_file,gt_template_index* const template_index,
+    const uint64_t template_lines,const uint64_t begin,const uint64_t end) {
+  GT_INPUT_FILE_CHECK(input_file);
+  GT_NULL_CHECK(template_index);
+  // The offsets have to match the file
+  const bool virtual_offsets = (template_index->flags&GT_TEMPLATE_INDEX_VIRTUAL_OFFSETS);
+  if (!gt_input_file_is_seekable(input_file) || virtual_offsets!=(input_file->bgzf_reader!=NULL)) return false;
+  const uint64_t range_end = GT_MIN(end,template_index->num_templates);
+  const uint64_t range_begin = GT_MIN(begin,range_end);
+  if (gt_vector_get_used(template_index->offsets)==0) return true; // Empty file
+  // Locate the end of the range
+  uint64_t end_offset = UINT64_MAX;
+  if (range_end<template_index->num_templates) {
+    if (!gt_input_file_seek_template(input_file,template_index,template_lines,range_end)) return false;
+    end_offset = gt_input_file_tell(input_file);
+  }
+  // Position at the beginning
+  if (!gt_input_file_seek_template(input_file,template_index,template_lines,range_begin)) return false;
+  if (end_offset!=UINT64_MAX) gt_input_file_set_end(input_file,end_offset);
+  input_file->processed_lines = range_begin*template_lines;
+  return true;
+}
+
 /*
  * Accessors (Mutex,ID,...) functions
  */
@@ -171,6 +373,15 @@ GT_INLINE uint64_t gt_input_file_next_id(gt_input_file* const input_file) {
 /*
  * Basic line functions
  */
+GT_INLINE void gt_input_file_consume(gt_input_file* const input_file) {
+  if (input_file->file_type==MAPPED_FILE) {
+    // Release the mapped pages that have been consumed completely
+    const uint64_t begin = (input_file->buffer_begin/GT_INPUT_FILE_RELEASE_SIZE)*GT_INPUT_FILE_RELEASE_SIZE;
+    const uint64_t end = (input_file->buffer_pos/GT_INPUT_FILE_RELEASE_SIZE)*GT_INPUT_FILE_RELEASE_SIZE;
+    if (begin<end) madvise(input_file->file_buffer+begin,end-begin,MADV_DONTNEED);
+  }
+  input_file->buffer_begin = input_file->buffer_pos;
+}
 GT_INLINE size_t gt_input_file_dump_to_buffer(gt_input_file* const input_file,gt_vector* const buffer_dst) { // FIXME: If mmap file, internal buffer is just pointers to mem
   GT_INPUT_FILE_CHECK(input_file);
   // Copy internal file buffer to buffer_dst
@@ -181,10 +392,26 @@ GT_INLINE size_t gt_input_file_dump_to_buffer(gt_input_file* const input_file,gt
       input_file->file_buffer+input_file->buffer_begin,chunk_size);
   gt_vector_add_used(buffer_dst,chunk_size);
   // Update position
-  input_file->buffer_begin=input_file->buffer_pos;
+  gt_input_file_consume(input_file);
   // Return number of written bytes
   return chunk_size;
 }
+/*
+ * Corrupt or truncated compressed content (reported as an error, not as EOF)
+ */
+#ifdef HAVE_ZLIB
+GT_INLINE bool gt_input_file_gzip_error(gzFile const file) {
+  int errnum;
+  gzerror(file,&errnum); // Truncated files are reported as Z_BUF_ERROR
+  return errnum!=Z_OK && errnum!=Z_STREAM_END;
+}
+#endif
+#ifdef HAVE_BZLIB
+GT_INLINE bool gt_input_file_bzip_error(const int bzerr) {
+  // Reading again after the end of the stream is a sequence error
+  return bzerr!=BZ_OK && bzerr!=BZ_STREAM_END && bzerr!=BZ_SEQUENCE_ERROR;
+}
+#endif
 GT_INLINE size_t gt_input_file_fill_buffer(gt_input_file* const input_file) {
 #ifdef HAVE_BZLIB
   int bzerr;
@@ -193,21 +420,33 @@ GT_INLINE size_t gt_input_file_fill_buffer(gt_input_file* const input_file) {
   input_file->global_pos += input_file->buffer_size;
   input_file->buffer_pos = 0;
   input_file->buffer_begin = 0;
-  if (gt_expect_true(
+  if (input_file->bgzf_reader!=NULL) {
+    const int64_t size = gt_bgzf_reader_read(input_file->bgzf_reader,input_file->file_buffer,GT_INPUT_BUFFER_SIZE);
+    if (size < 0) input_file->error = true;
+    input_file->buffer_size = (size>0) ? size : 0;
+    if (input_file->buffer_size==0) {
+      input_file->eof = true;
+    }
+    return input_file->buffer_size;
+  } else if (gt_expect_true(
       (input_file->file_type==STREAM && !feof(input_file->file)) ||
       (input_file->file_type==REGULAR_FILE && !feof(input_file->file)))) {
-    input_file->buffer_size =
-        fread(input_file->file_buffer,sizeof(uint8_t),GT_INPUT_BUFFER_SIZE,input_file->file);
+    const uint64_t size = (input_file->content_end > input_file->global_pos) ?
+        GT_MIN(GT_INPUT_BUFFER_SIZE,input_file->content_end-input_file->global_pos) : 0;
+    input_file->buffer_size = fread(input_file->file_buffer,sizeof(uint8_t),size,input_file->file);
     if (input_file->buffer_size==0) {
       input_file->eof = true;
     }
     return input_file->buffer_size;
-  } else if (input_file->file_type==MAPPED_FILE && input_file->global_pos < input_file->file_size) {
-    input_file->buffer_size = input_file->file_size-input_file->global_pos;
+  } else if (input_file->file_type==MAPPED_FILE &&
+      input_file->global_pos < GT_MIN(input_file->file_size,input_file->content_end)) {
+    input_file->buffer_size = GT_MIN(input_file->file_size,input_file->content_end)-input_file->global_pos;
     return input_file->buffer_size;
 #ifdef HAVE_ZLIB
   } else if (input_file->file_type==GZIPPED_FILE && !gzeof((gzFile)input_file->file)) {
-    input_file->buffer_size = gzread((gzFile)input_file->file,input_file->file_buffer,GT_INPUT_BUFFER_SIZE);
+    const int size = gzread((gzFile)input_file->file,input_file->file_buffer,GT_INPUT_BUFFER_SIZE);
+    if (gt_input_file_gzip_error((gzFile)input_file->file)) input_file->error = true;
+    input_file->buffer_size = (size>0) ? size : 0;
     if (input_file->buffer_size==0) {
       input_file->eof = true;
     }
@@ -215,7 +454,9 @@ GT_INLINE size_t gt_input_file_fill_buffer(gt_input_file* const input_file) {
 #endif
 #ifdef HAVE_BZLIB
   } else if (input_file->file_type==BZIPPED_FILE) {
-    input_file->buffer_size = BZ2_bzRead(&bzerr,input_file->file,input_file->file_buffer,GT_INPUT_BUFFER_SIZE);
+    const int size = BZ2_bzRead(&bzerr,input_file->file,input_file->file_buffer,GT_INPUT_BUFFER_SIZE);
+    if (gt_input_file_bzip_error(bzerr)) input_file->error = true;
+    input_file->buffer_size = (size>0) ? size : 0;
     if(input_file->buffer_size==0) {
       input_file->eof=true;
     }
@@ -241,6 +482,86 @@ GT_INLINE size_t gt_input_file_next_line(gt_input_file* const input_file,gt_vect
   GT_INPUT_FILE_HANDLE_EOL(input_file,buffer_dst);
   return GT_INPUT_FILE_LINE_READ;
 }
+GT_INLINE uint64_t gt_input_file_skip_lines(gt_input_file* const input_file,const uint64_t num_lines) {
+  GT_INPUT_FILE_CHECK(input_file);
+  uint64_t lines = 0;
+  bool line_open = false;
+  while (lines<num_lines) {
+    GT_INPUT_FILE_CHECK_BUFFER(input_file);
+    if (input_file->eof) {
+      if (line_open) ++lines; // Last line without EOL
+      break;
+    }
+    uint8_t* const begin = input_file->file_buffer+input_file->buffer_pos;
+    uint8_t* const eol = memchr(begin,EOL,input_file->buffer_size-input_file->buffer_pos);
+    if (eol==NULL) {
+      input_file->buffer_pos = input_file->buffer_size;
+      line_open = true;
+    } else {
+      input_file->buffer_pos = (eol+1)-input_file->file_buffer;
+      line_open = false;
+      ++lines;
+    }
+  }
+  gt_input_file_consume(input_file);
+  input_file->processed_lines += lines;
+  return lines;
+}
+/*
+ * Reads up to size bytes of content into the destination (no EOF/buffer handling)
+ */
+GT_INLINE size_t gt_input_file_read(gt_input_file* const input_file,uint8_t* const destination,const uint64_t size) {
+#ifdef HAVE_BZLIB
+  int bzerr;
+#endif
+  if (input_file->bgzf_reader!=NULL) {
+    const int64_t read = gt_bgzf_reader_read(input_file->bgzf_reader,destination,size);
+    if (read < 0) input_file->error = true;
+    return (read>0) ? read : 0;
+  }
+  switch (input_file->file_type) {
+    case STREAM:
+    case REGULAR_FILE:
+      return fread(destination,sizeof(uint8_t),size,input_file->file);
+#ifdef HAVE_ZLIB
+    case GZIPPED_FILE: {
+      const int read = gzread((gzFile)input_file->file,destination,size);
+      if (gt_input_file_gzip_error((gzFile)input_file->file)) input_file->error = true;
+      return (read>0) ? read : 0;
+    }
+#endif
+#ifdef HAVE_BZLIB
+    case BZIPPED_FILE: {
+      const int read = BZ2_bzRead(&bzerr,input_file->file,destination,size);
+      if (gt_input_file_bzip_error(bzerr)) input_file->error = true;
+      return (read>0) ? read : 0;
+    }
+#endif
+    default:
+      return 0;
+  }
+}
+GT_INLINE bool gt_input_file_reserve(gt_input_file* const input_file,const uint64_t num_bytes) {
+  GT_INPUT_FILE_CHECK(input_file);
+  uint64_t available = input_file->buffer_size-input_file->buffer_pos;
+  if (gt_expect_true(available>=num_bytes)) return true;
+  // Mapped files are available as a whole. Leave room for a complete BGZF block
+  if (input_file->file_type==MAPPED_FILE || num_bytes>GT_INPUT_BUFFER_SIZE-GT_BGZF_MAX_BLOCK_SIZE) return false;
+  // Move the remaining content to the beginning of the buffer
+  memmove(input_file->file_buffer,input_file->file_buffer+input_file->buffer_pos,available);
+  input_file->global_pos += input_file->buffer_pos;
+  input_file->buffer_begin = 0;
+  input_file->buffer_pos = 0;
+  // Append new content
+  while (available<num_bytes) {
+    const size_t read = gt_input_file_read(input_file,input_file->file_buffer+available,GT_INPUT_BUFFER_SIZE-available);
+    if (read==0) break;
+    available += read;
+  }
+  input_file->buffer_size = available;
+  input_file->eof = (available==0);
+  return available>=num_bytes;
+}
 GT_INLINE size_t gt_input_file_next_record(
     gt_input_file* const input_file,gt_vector* const buffer_dst,gt_string* const first_field,
     uint64_t* const num_blocks,uint64_t* const num_tabs) {
@@ -328,12 +649,26 @@ GT_INLINE bool gt_input_file_test_map(
     gt_input_file* const input_file,gt_map_file_format* const map_file_format,const bool show_errors);
 GT_INLINE bool gt_input_file_test_sam(
     gt_input_file* const input_file,gt_sam_headers* const sam_headers,const bool show_errors);
+GT_INLINE bool gt_input_file_test_bam(
+    gt_input_file* const input_file,gt_bam_headers** const bam_headers,const bool show_errors);
+GT_INLINE bool gt_input_file_test_gtb(
+    gt_input_file* const input_file,gt_gtb_file_format* const gtb_file_format,const bool show_errors);
 /* */
 gt_file_format gt_input_file_detect_file_format(gt_input_file* const input_file) {
   GT_INPUT_FILE_CHECK(input_file);
   if (input_file->file_format != FILE_FORMAT_UNKNOWN) return input_file->file_format;
-  // Try to determine the file format
-  gt_input_file_fill_buffer(input_file);
+  // Try to determine the file format (streams can be filled already)
+  if (input_file->buffer_size==0) gt_input_file_fill_buffer(input_file);
+  // BAM test (binary)
+  if (gt_input_file_test_bam(input_file,&(input_file->bam_headers),false)) {
+    input_file->file_format = BAM;
+    return BAM;
+  }
+  // GTB test (binary)
+  if (gt_input_file_test_gtb(input_file,&(input_file->gtb_type),false)) {
+    input_file->file_format = GTB;
+    return GTB;
+  }
   // MAP test
   if (gt_input_file_test_map(input_file,&(input_file->map_type),false)) {
     input_file->file_format = MAP;
@@ -3,7 +3,7 @@
  * FILE: gt_input_generic_parser.c
  * DATE: 28/01/2013
  * AUTHOR(S): Santiago Marco-Sola <santiagomsola@gmail.com>
- * DESCRIPTION: Generic parser for {MAP,SAM,FASTQ}
+ * DESCRIPTION: Generic parser for {MAP,SAM,BAM,GTB,FASTQ}
  */
 
 #include "gt_input_generic_parser.h"
@@ -51,16 +51,24 @@ GT_INLINE gt_status gt_input_generic_parser_get_alignment(
   gt_status error_code = GT_IGP_FAIL;
   switch (buffered_input->input_file->file_format) {
     case SAM:
-      return gt_input_sam_parser_get_alignment(buffered_input,alignment,attributes->sam_parser_attributes);
+      error_code = gt_input_sam_parser_get_alignment(buffered_input,alignment,attributes->sam_parser_attributes);
+      break;
+    case BAM:
+      error_code = gt_input_bam_parser_get_alignment(buffered_input,alignment);
+      break;
+    case GTB:
+      error_code = gt_input_gtb_parser_get_alignment(buffered_input,alignment);
       break;
     case FASTA:
-      return gt_input_fasta_parser_get_alignment(buffered_input,alignment);
+      error_code = gt_input_fasta_parser_get_alignment(buffered_input,alignment);
       break;
     case MAP:
     default: // gt_fatal_error_msg("File type not supported");
-      return gt_input_map_parser_get_alignment(buffered_input,alignment,attributes->map_parser_attributes);
+      error_code = gt_input_map_parser_get_alignment(buffered_input,alignment,attributes->map_parser_attributes);
       break;
   }
+  // Corrupt or truncated input ends like EOF, but is reported as a failure
+  if (error_code==GT_IGP_EOF && buffered_input->input_file->error) return GT_IGP_FAIL;
   return error_code;
 }
 GT_INLINE gt_status gt_input_generic_parser_get_template(
@@ -72,20 +80,33 @@ GT_INLINE gt_status gt_input_generic_parser_get_template(
         error_code = gt_input_sam_parser_get_template(buffered_input,template,attributes->sam_parser_attributes);
         gt_template_get_block_dyn(template,0);
         gt_template_get_block_dyn(template,1); // Make sure is a template
-        return error_code;
       } else {
-        return gt_input_sam_parser_get_alignment(
+        error_code = gt_input_sam_parser_get_alignment(
             buffered_input,gt_template_get_block_dyn(template,0),attributes->sam_parser_attributes);
       }
       break;
+    case BAM:
+      if (gt_input_generic_parser_attributes_is_paired(attributes)) {
+        error_code = gt_input_bam_parser_get_template(buffered_input,template);
+        gt_template_get_block_dyn(template,0);
+        gt_template_get_block_dyn(template,1); // Make sure is a template
+      } else {
+        error_code = gt_input_bam_parser_get_alignment(buffered_input,gt_template_get_block_dyn(template,0));
+      }
+      break;
+    case GTB:
+      error_code = gt_input_gtb_parser_get_template(buffered_input,template,gt_input_generic_parser_attributes_is_paired(attributes));
+      break;
     case FASTA:
-      return gt_input_fasta_parser_get_template(buffered_input,template,gt_input_generic_parser_attributes_is_paired(attributes));
+      error_code = gt_input_fasta_parser_get_template(buffered_input,template,gt_input_generic_parser_attributes_is_paired(attributes));
       break;
     case MAP:
     default: // gt_fatal_error_msg("File type not supported");
-      return gt_input_map_parser_get_template(buffered_input,template,attributes->map_parser_attributes);
+      error_code = gt_input_map_parser_get_template(buffered_input,template,attributes->map_parser_attributes);
       break;
   }
+  // Corrupt or truncated input ends like EOF, but is reported as a failure
+  if (error_code==GT_IGP_EOF && buffered_input->input_file->error) return GT_IGP_FAIL;
   return error_code;
 }
 
@@ -137,6 +158,12 @@ GT_INLINE gt_status gt_input_generic_parser_synch_blocks_a(
     case SAM:
       gt_fatal_error(SELECTION_NOT_IMPLEMENTED);
       break;
+    case BAM:
+      return gt_input_bam_parser_synch_blocks_a(input_mutex,buffered_input,num_inputs);
+      break;
+    case GTB:
+      return gt_input_gtb_parser_synch_blocks_a(input_mutex,buffered_input,num_inputs);
+      break;
     case FASTA:
       return gt_input_fasta_parser_synch_blocks_a(input_mutex,buffered_input,num_inputs);
       break;
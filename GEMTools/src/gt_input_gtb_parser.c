@@ -0,0 +1,600 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt_input_gtb_parser.c
+ * DATE: 18/10/2026
+ * DESCRIPTION: Input parser for GTB format (binary templates). The blocks of the
+ *   buffered input hold complete records (record_size included) that are decoded
+ *   into templates/alignments
+ */
+
+#include "gt_input_gtb_parser.h"
+
+// Constants
+#define GT_IGTB_NUM_RECORDS GT_NUM_LINES_10K
+
+/*
+ * Record decoding buffer (bounds checked)
+ */
+typedef struct {
+  uint8_t* data;
+  uint8_t* end;
+} gt_gtb_record;
+typedef struct {
+  char* name;
+  uint64_t length;
+} gt_gtb_seq_name;
+
+GT_INLINE bool gt_igtb_read_varint(gt_gtb_record* const record,uint64_t* const value) {
+  uint64_t result = 0, shift = 0;
+  while (record->data < record->end && shift<64) {
+    const uint8_t byte = *(record->data++);
+    result |= ((uint64_t)(byte&0x7f))<<shift;
+    if (!(byte&0x80)) {
+      *value = result;
+      return true;
+    }
+    shift += 7;
+  }
+  return false;
+}
+GT_INLINE bool gt_igtb_read_byte(gt_gtb_record* const record,uint8_t* const value) {
+  if (record->data >= record->end) return false;
+  *value = *(record->data++);
+  return true;
+}
+GT_INLINE bool gt_igtb_read_bytes(gt_gtb_record* const record,char** const bytes,uint64_t* const length) {
+  if (!gt_igtb_read_varint(record,length)) return false;
+  if (*length > (uint64_t)(record->end-record->data)) return false;
+  *bytes = (char*)record->data;
+  record->data += *length;
+  return true;
+}
+/* Record size (varint header). Returns the length of the header (0 if incomplete) */
+GT_INLINE uint64_t gt_igtb_record_header(const uint8_t* const data,const uint64_t available,uint64_t* const record_size) {
+  gt_gtb_record header = { .data=(uint8_t*)data,
+      .end=(uint8_t*)data+GT_MIN(available,GT_GTB_MAX_RECORD_SIZE_LENGTH) };
+  if (!gt_igtb_read_varint(&header,record_size)) return 0;
+  return header.data-data;
+}
+/* Reads (2 bits per base if packed, exceptions included) */
+GT_INLINE bool gt_igtb_read_read(gt_gtb_record* const record,gt_string* const read) {
+  uint64_t header, num_exceptions, i;
+  if (!gt_igtb_read_varint(record,&header)) return false;
+  const uint64_t length = header>>1;
+  if (!(header&GT_GTB_READ_PACKED)) {
+    if (length > (uint64_t)(record->end-record->data)) return false;
+    gt_string_set_nstring(read,(char*)record->data,length);
+    record->data += length;
+    return true;
+  }
+  // Exceptions (positions relative to the previous one)
+  if (!gt_igtb_read_varint(record,&num_exceptions)) return false;
+  if (num_exceptions > length || 2*num_exceptions > (uint64_t)(record->end-record->data)) return false;
+  uint8_t* const exceptions = record->data;
+  for (i=0;i<num_exceptions;++i) {
+    uint64_t position_delta;
+    uint8_t base;
+    if (!gt_igtb_read_varint(record,&position_delta) || !gt_igtb_read_byte(record,&base)) return false;
+  }
+  // Packed bases
+  const uint64_t packed_length = GT_GTB_PACKED_LENGTH(length);
+  if (packed_length > (uint64_t)(record->end-record->data)) return false;
+  gt_string_resize(read,length+1);
+  char* const bases = gt_string_get_string(read);
+  for (i=0;i<length;++i) {
+    bases[i] = GT_GTB_BASES[(record->data[i/4]>>(2*(i%4)))&3];
+  }
+  bases[length] = EOS;
+  gt_string_set_length(read,length);
+  record->data += packed_length;
+  gt_gtb_record exception_record = { .data=exceptions, .end=record->end };
+  uint64_t position = 0;
+  for (i=0;i<num_exceptions;++i) {
+    uint64_t position_delta;
+    uint8_t base;
+    gt_igtb_read_varint(&exception_record,&position_delta);
+    gt_igtb_read_byte(&exception_record,&base);
+    position += position_delta;
+    if (position>=length) return false;
+    bases[position] = base;
+  }
+  return true;
+}
+
+/*
+ * GTB File Format test
+ *   The qualities of the first record tell whether the file contains qualities
+ */
+GT_INLINE bool gt_input_file_test_gtb(
+    gt_input_file* const input_file,gt_gtb_file_format* const gtb_file_format,const bool show_errors) {
+  GT_INPUT_FILE_CHECK(input_file);
+  GT_NULL_CHECK(gtb_file_format);
+  // Check the magic
+  if (input_file->buffer_size-input_file->buffer_pos < GT_GTB_HEADER_LENGTH ||
+      memcmp(input_file->file_buffer+input_file->buffer_pos,GT_GTB_MAGIC,GT_GTB_MAGIC_LENGTH)!=0) return false;
+  const uint8_t version = input_file->file_buffer[input_file->buffer_pos+GT_GTB_MAGIC_LENGTH];
+  if (version!=GT_GTB_VERSION) {
+    gt_cond_error(show_errors,PARSE_GTB_BAD_VERSION,input_file->file_name,(uint64_t)version,(uint64_t)GT_GTB_VERSION);
+    return false;
+  }
+  input_file->buffer_pos += GT_GTB_HEADER_LENGTH;
+  input_file->buffer_begin = input_file->buffer_pos;
+  gtb_file_format->version = version;
+  gtb_file_format->contains_qualities = false;
+  // Peek the first record
+  uint64_t record_size, header_length = 0;
+  if (gt_input_file_reserve(input_file,1)) {
+    gt_input_file_reserve(input_file,GT_GTB_MAX_RECORD_SIZE_LENGTH); // Short files hold less
+    header_length = gt_igtb_record_header(input_file->file_buffer+input_file->buffer_pos,
+        input_file->buffer_size-input_file->buffer_pos,&record_size);
+  }
+  if (header_length>0 && gt_input_file_reserve(input_file,header_length+record_size)) {
+    gt_gtb_record record = {
+        .data=input_file->file_buffer+input_file->buffer_pos+header_length,
+        .end=input_file->file_buffer+input_file->buffer_pos+header_length+record_size };
+    uint8_t* const tab = memchr(record.data,TAB,record_size);
+    uint64_t num_blocks, length;
+    char* bytes;
+    if (tab!=NULL) {
+      record.data = tab+1;
+      gt_string* const read = gt_string_new(16);
+      if (gt_igtb_read_varint(&record,&num_blocks) && num_blocks>0 &&
+          gt_igtb_read_read(&record,read) && gt_igtb_read_bytes(&record,&bytes,&length)) {
+        gtb_file_format->contains_qualities = (length>0);
+      }
+      gt_string_delete(read);
+    }
+  }
+  return true;
+}
+
+/*
+ * GTB File basics
+ */
+/* Error handler */
+GT_INLINE void gt_input_gtb_parser_prompt_error(
+    gt_buffered_input_file* const buffered_gtb_input,uint64_t record_num,const gt_status error_code) {
+  // Display textual error msg
+  const char* const file_name = buffered_gtb_input->input_file->file_name;
+  switch (error_code) {
+    case 0: /* No error */ break;
+    case GT_IGTB_PE_WRONG_FILE_FORMAT: gt_error(PARSE_GTB_BAD_FILE_FORMAT,file_name,record_num); break;
+    case GT_IGTB_PE_TRUNCATED_RECORD: gt_error(PARSE_GTB_TRUNCATED_RECORD,file_name,record_num); break;
+    case GT_IGTB_PE_BAD_SEQ_NAME: gt_error(PARSE_GTB_BAD_SEQ_NAME,file_name,record_num); break;
+    case GT_IGTB_PE_BAD_OPERATION: gt_error(PARSE_GTB_BAD_OPERATION,file_name,record_num); break;
+    case GT_IGTB_PE_BAD_NUMBER_OF_BLOCKS: gt_error(PARSE_GTB_BAD_NUMBER_OF_BLOCKS,file_name,record_num); break;
+    case GT_IGTB_PE_UNPAIRED: gt_error(PARSE_GTB_UNPAIRED,file_name,record_num); break;
+    default:
+      gt_error(PARSE_GTB,file_name,record_num);
+      break;
+  }
+}
+/* Tag of the record (without the /1 /2 pair information) */
+GT_INLINE void gt_igtb_record_tag(uint8_t* const record,const uint64_t record_size,gt_string* const tag) {
+  // The tag ends at the first space or TAB (like in MAP)
+  uint64_t length = 0;
+  while (length<record_size && record[length]!=TAB && record[length]!=SPACE) ++length;
+  gt_string_set_nstring(tag,(char*)record,length);
+  gt_input_parse_tag_chomp_pairend_info(tag);
+}
+/* Current record of the block (NULL at the end of the block) */
+GT_INLINE uint8_t* gt_igtb_current_record(gt_buffered_input_file* const buffered_gtb_input,uint64_t* const record_size) {
+  if (gt_buffered_input_file_eob(buffered_gtb_input)) return NULL;
+  uint8_t* const record = (uint8_t*)buffered_gtb_input->cursor;
+  // Complete records are copied into the block (the header is always there)
+  return record+gt_igtb_record_header(record,GT_GTB_MAX_RECORD_SIZE_LENGTH,record_size);
+}
+GT_INLINE void gt_igtb_next_record(gt_buffered_input_file* const buffered_gtb_input) {
+  if (!gt_buffered_input_file_eob(buffered_gtb_input)) {
+    uint64_t record_size;
+    uint8_t* const record = gt_igtb_current_record(buffered_gtb_input,&record_size);
+    buffered_gtb_input->cursor = (char*)record+record_size;
+    ++buffered_gtb_input->current_line_num;
+  }
+}
+
+/*
+ * GTB file. Synchronized get block wrt to the tags of the records
+ */
+GT_INLINE gt_status gt_input_gtb_parser_get_block(
+    gt_buffered_input_file* const buffered_gtb_input,const uint64_t num_records) {
+  GT_BUFFERED_INPUT_FILE_CHECK(buffered_gtb_input);
+  gt_input_file* const input_file = buffered_gtb_input->input_file;
+  // Read records
+  if (input_file->eof) return GT_BMI_EOF;
+  gt_input_file_lock(input_file);
+  if (input_file->eof) {
+    gt_input_file_unlock(input_file);
+    return GT_BMI_EOF;
+  }
+  buffered_gtb_input->block_id = gt_input_file_next_id(input_file) % UINT32_MAX;
+  buffered_gtb_input->current_line_num = input_file->processed_lines+1;
+  gt_buffered_input_file_clear_block(buffered_gtb_input); // Clear dst buffer
+  // Copy complete records. Single-end records of the same template are kept together
+  gt_string* const reference_tag = gt_string_new(30);
+  gt_string* const tag = gt_string_new(0);
+  uint64_t records_read = 0;
+  while (gt_input_file_reserve(input_file,1)) {
+    gt_input_file_reserve(input_file,GT_GTB_MAX_RECORD_SIZE_LENGTH); // The last record can be shorter
+    uint64_t record_size;
+    const uint64_t header_length = gt_igtb_record_header(input_file->file_buffer+input_file->buffer_pos,
+        input_file->buffer_size-input_file->buffer_pos,&record_size);
+    if (header_length==0) break; // Truncated (reported by the parser)
+    record_size += header_length;
+    if (!gt_input_file_reserve(input_file,record_size)) break; // Truncated (reported by the parser)
+    if (records_read>=num_records-1) {
+      gt_igtb_record_tag(input_file->file_buffer+input_file->buffer_pos+header_length,record_size-header_length,tag);
+      if (records_read>=num_records && !gt_string_equals(reference_tag,tag)) break;
+      gt_string_copy(reference_tag,tag);
+    }
+    ++records_read;
+    input_file->buffer_pos += record_size;
+    gt_input_file_dump_to_buffer(input_file,buffered_gtb_input->block_buffer);
+  }
+  gt_string_delete(reference_tag);
+  gt_string_delete(tag);
+  input_file->processed_lines+=records_read;
+  buffered_gtb_input->lines_in_buffer = records_read;
+  gt_input_file_unlock(input_file);
+  // Setup the block
+  buffered_gtb_input->cursor = gt_vector_get_mem(buffered_gtb_input->block_buffer,char);
+  return buffered_gtb_input->lines_in_buffer;
+}
+/* GTB file. Reload internal buffer */
+GT_INLINE gt_status gt_input_gtb_parser_reload_buffer(gt_buffered_input_file* const buffered_gtb_input) {
+  GT_BUFFERED_INPUT_FILE_CHECK(buffered_gtb_input);
+  // Dump buffer if BOF it attached to GTB-input, and get new out block (always FIRST)
+  gt_buffered_input_file_dump_attached_buffers(buffered_gtb_input->attached_buffered_output_file);
+  // Read new input block
+  const uint64_t read_records = gt_input_gtb_parser_get_block(buffered_gtb_input,GT_IGTB_NUM_RECORDS);
+  if (gt_expect_false(read_records==0)) return GT_IGTB_EOF;
+  // Assign block ID
+  gt_buffered_input_file_set_id_attached_buffers(buffered_gtb_input->attached_buffered_output_file,buffered_gtb_input->block_id);
+  return GT_IGTB_OK;
+}
+
+/*
+ * GTB record fields
+ */
+GT_INLINE gt_status gt_igtb_parse_tag(gt_gtb_record* const record,gt_string* const tag,gt_attributes* const attributes) {
+  uint8_t* const tab = memchr(record->data,TAB,record->end-record->data);
+  if (tab==NULL) return GT_IGTB_PE_TRUNCATED_RECORD;
+  const char* text_line = (const char*)record->data;
+  gt_input_parse_tag(&text_line,tag,attributes);
+  record->data = tab+1;
+  return 0;
+}
+GT_INLINE gt_status gt_igtb_parse_read(gt_gtb_record* const record,gt_alignment* const alignment) {
+  char* qualities;
+  uint64_t qualities_length;
+  if (!gt_igtb_read_read(record,alignment->read)) return GT_IGTB_PE_TRUNCATED_RECORD;
+  if (!gt_igtb_read_bytes(record,&qualities,&qualities_length)) return GT_IGTB_PE_TRUNCATED_RECORD;
+  gt_string_set_nstring(alignment->qualities,qualities,qualities_length); // Empty without qualities
+  return 0;
+}
+GT_INLINE gt_status gt_igtb_parse_counters(
+    gt_gtb_record* const record,gt_vector* const counters,uint64_t* const mcs,bool* const not_unique) {
+  uint64_t num_counters, i;
+  if (!gt_igtb_read_varint(record,&num_counters)) return GT_IGTB_PE_TRUNCATED_RECORD;
+  if (num_counters > (uint64_t)(record->end-record->data)) return GT_IGTB_PE_TRUNCATED_RECORD;
+  gt_vector_clear(counters);
+  gt_vector_reserve(counters,num_counters,false);
+  for (i=0;i<num_counters;++i) {
+    uint64_t counter;
+    if (!gt_igtb_read_varint(record,&counter)) return GT_IGTB_PE_TRUNCATED_RECORD;
+    gt_vector_insert(counters,counter,uint64_t);
+  }
+  uint64_t mcs_flag;
+  if (!gt_igtb_read_varint(record,&mcs_flag)) return GT_IGTB_PE_TRUNCATED_RECORD;
+  *mcs = (mcs_flag>>1)-1; // Undefined MCS (0) wraps back to UINT64_MAX
+  *not_unique = mcs_flag&1;
+  return 0;
+}
+GT_INLINE gt_status gt_igtb_parse_seq_names(gt_gtb_record* const record,gt_vector* const seq_names) {
+  uint64_t num_seq_names, i;
+  if (!gt_igtb_read_varint(record,&num_seq_names)) return GT_IGTB_PE_TRUNCATED_RECORD;
+  if (num_seq_names > (uint64_t)(record->end-record->data)) return GT_IGTB_PE_TRUNCATED_RECORD;
+  gt_vector_clear(seq_names);
+  gt_vector_reserve(seq_names,num_seq_names,false);
+  for (i=0;i<num_seq_names;++i) {
+    gt_gtb_seq_name seq_name;
+    if (!gt_igtb_read_bytes(record,&seq_name.name,&seq_name.length)) return GT_IGTB_PE_TRUNCATED_RECORD;
+    gt_vector_insert(seq_names,seq_name,gt_gtb_seq_name);
+  }
+  return 0;
+}
+/*
+ * Map block
+ *   seq_name_idx<<5|flags(strand,junction) position_delta(zigzag) base_length [junction_size]
+ *   gt_score phred_score(uint8) num_misms {position_delta(zigzag)<<2|misms_type (base(uint8)|size)}
+ *   Positions are relative to the previous map block of the record (mismatches, to the previous mismatch)
+ */
+GT_INLINE gt_status gt_igtb_parse_map_block(
+    gt_gtb_record* const record,gt_vector* const seq_names,gt_map* const map,
+    uint64_t* const last_position,gt_junction_t* const junction,int64_t* const junction_size) {
+  uint64_t seq_name_flags, position_delta, base_length, gt_score, num_misms, i;
+  uint8_t phred_score;
+  if (!gt_igtb_read_varint(record,&seq_name_flags) || !gt_igtb_read_varint(record,&position_delta) ||
+      !gt_igtb_read_varint(record,&base_length)) return GT_IGTB_PE_TRUNCATED_RECORD;
+  const uint64_t seq_name_idx = seq_name_flags>>GT_GTB_FLAG_BITS;
+  const uint64_t flags = seq_name_flags&((1<<GT_GTB_FLAG_BITS)-1);
+  if (seq_name_idx>=gt_vector_get_used(seq_names)) return GT_IGTB_PE_BAD_SEQ_NAME;
+  gt_gtb_seq_name* const seq_name = gt_vector_get_elm(seq_names,seq_name_idx,gt_gtb_seq_name);
+  gt_map_set_seq_name(map,seq_name->name,seq_name->length);
+  *last_position += gt_gtb_zigzag_decode(position_delta);
+  gt_map_set_position(map,*last_position);
+  gt_map_set_base_length(map,base_length);
+  // Strand & Junction
+  const uint8_t strand = flags&GT_GTB_FLAG_STRAND_MASK;
+  if (strand>UNKNOWN) return GT_IGTB_PE_BAD_OPERATION;
+  gt_map_set_strand(map,strand);
+  *junction = (flags>>GT_GTB_FLAG_JUNCTION_SHIFT)&GT_GTB_FLAG_JUNCTION_MASK;
+  if (*junction>QUIMERA) return GT_IGTB_PE_BAD_OPERATION;
+  if (*junction!=NO_JUNCTION) {
+    uint64_t zigzag_size;
+    if (!gt_igtb_read_varint(record,&zigzag_size)) return GT_IGTB_PE_TRUNCATED_RECORD;
+    *junction_size = gt_gtb_zigzag_decode(zigzag_size);
+  }
+  // Scores
+  if (!gt_igtb_read_varint(record,&gt_score) || !gt_igtb_read_byte(record,&phred_score)) return GT_IGTB_PE_TRUNCATED_RECORD;
+  map->gt_score = gt_score-1;
+  map->phred_score = phred_score;
+  // Mismatches
+  if (!gt_igtb_read_varint(record,&num_misms)) return GT_IGTB_PE_TRUNCATED_RECORD;
+  uint64_t last_misms_position = 0;
+  for (i=0;i<num_misms;++i) {
+    gt_misms misms;
+    uint64_t position_type;
+    uint8_t base;
+    if (!gt_igtb_read_varint(record,&position_type)) return GT_IGTB_PE_TRUNCATED_RECORD;
+    const uint64_t misms_type = position_type&GT_GTB_MISMS_TYPE_MASK;
+    last_misms_position += gt_gtb_zigzag_decode(position_type>>GT_GTB_MISMS_TYPE_BITS);
+    misms.position = last_misms_position;
+    switch (misms_type) {
+      case MISMS:
+        if (!gt_igtb_read_byte(record,&base)) return GT_IGTB_PE_TRUNCATED_RECORD;
+        misms.base = base;
+        break;
+      case INS:
+      case DEL:
+        if (!gt_igtb_read_varint(record,&misms.size)) return GT_IGTB_PE_TRUNCATED_RECORD;
+        break;
+      default:
+        return GT_IGTB_PE_BAD_OPERATION;
+    }
+    misms.misms_type = misms_type;
+    gt_map_add_misms(map,&misms);
+  }
+  return 0;
+}
+GT_INLINE gt_status gt_igtb_parse_maps(
+    gt_gtb_record* const record,gt_vector* const seq_names,uint64_t* const last_position,gt_alignment* const alignment) {
+  gt_status error_code;
+  uint64_t num_maps, i;
+  if (!gt_igtb_read_varint(record,&num_maps)) return GT_IGTB_PE_TRUNCATED_RECORD;
+  for (i=0;i<num_maps;++i) {
+    gt_map *map = NULL, *last_map_block = NULL;
+    gt_junction_t junction = NO_JUNCTION, last_junction = NO_JUNCTION;
+    int64_t junction_size = 0, last_junction_size = 0;
+    do {
+      gt_map* const map_block = gt_map_new();
+      if ((error_code=gt_igtb_parse_map_block(record,seq_names,map_block,last_position,&junction,&junction_size))) {
+        gt_map_delete(map_block);
+        if (map!=NULL) gt_map_delete(map);
+        return error_code;
+      }
+      if (map==NULL) {
+        map = map_block;
+      } else {
+        gt_map_set_next_block(last_map_block,map_block,last_junction,last_junction_size);
+      }
+      last_map_block = map_block;
+      last_junction = junction;
+      last_junction_size = junction_size;
+    } while (junction!=NO_JUNCTION);
+    gt_alignment_add_map(alignment,map);
+  }
+  return 0;
+}
+/*
+ * MMap
+ *   end1_map_idx end2_map_idx (0 for none, idx+1 otherwise) distance gt_score phred_score(uint8)
+ */
+GT_INLINE gt_status gt_igtb_parse_mmaps(gt_gtb_record* const record,gt_template* const template) {
+  gt_alignment* const end1 = gt_template_get_block(template,0);
+  gt_alignment* const end2 = gt_template_get_block(template,1);
+  uint64_t num_mmaps, i;
+  if (!gt_igtb_read_varint(record,&num_mmaps)) return GT_IGTB_PE_TRUNCATED_RECORD;
+  for (i=0;i<num_mmaps;++i) {
+    uint64_t end1_idx, end2_idx, gt_score;
+    gt_mmap_attributes mmap_attributes;
+    if (!gt_igtb_read_varint(record,&end1_idx) || !gt_igtb_read_varint(record,&end2_idx) ||
+        !gt_igtb_read_varint(record,&mmap_attributes.distance) || !gt_igtb_read_varint(record,&gt_score) ||
+        !gt_igtb_read_byte(record,&mmap_attributes.phred_score)) return GT_IGTB_PE_TRUNCATED_RECORD;
+    if ((end1_idx==0 && end2_idx==0) ||
+        end1_idx>gt_alignment_get_num_maps(end1) || end2_idx>gt_alignment_get_num_maps(end2)) {
+      return GT_IGTB_PE_BAD_OPERATION;
+    }
+    mmap_attributes.gt_score = gt_score-1;
+    gt_template_add_mmap_ends(template,
+        (end1_idx>0) ? gt_alignment_get_map(end1,end1_idx-1) : NULL,
+        (end2_idx>0) ? gt_alignment_get_map(end2,end2_idx-1) : NULL,&mmap_attributes);
+  }
+  return 0;
+}
+
+/*
+ * GTB record
+ */
+GT_INLINE gt_status gt_igtb_parse_alignment_fields(
+    gt_gtb_record* const record,gt_alignment* const alignment,gt_vector* const seq_names) {
+  gt_status error_code;
+  uint64_t mcs;
+  bool not_unique;
+  if ((error_code=gt_igtb_parse_counters(record,gt_alignment_get_counters_vector(alignment),&mcs,&not_unique))) return error_code;
+  if (mcs!=UINT64_MAX) gt_alignment_set_mcs(alignment,mcs);
+  if (not_unique) gt_alignment_set_not_unique_flag(alignment,true);
+  if ((error_code=gt_igtb_parse_seq_names(record,seq_names))) return error_code;
+  uint64_t last_position = 0;
+  return gt_igtb_parse_maps(record,seq_names,&last_position,alignment);
+}
+GT_INLINE gt_status gt_igtb_parse_alignment(gt_gtb_record* const record,gt_alignment* const alignment) {
+  gt_status error_code;
+  uint64_t num_blocks;
+  // TAG
+  if ((error_code=gt_igtb_parse_tag(record,alignment->tag,alignment->attributes))) return error_code;
+  // READ & QUALITIES
+  if (!gt_igtb_read_varint(record,&num_blocks)) return GT_IGTB_PE_TRUNCATED_RECORD;
+  if (num_blocks!=1) return GT_IGTB_PE_BAD_NUMBER_OF_BLOCKS;
+  if ((error_code=gt_igtb_parse_read(record,alignment))) return error_code;
+  // COUNTERS & MAPS
+  gt_vector* const seq_names = gt_vector_new(10,sizeof(gt_gtb_seq_name));
+  error_code = gt_igtb_parse_alignment_fields(record,alignment,seq_names);
+  gt_vector_delete(seq_names);
+  return error_code;
+}
+GT_INLINE gt_status gt_igtb_parse_template(gt_gtb_record* const record,gt_template* const template) {
+  gt_status error_code;
+  uint64_t num_blocks, i;
+  // TAG
+  if ((error_code=gt_igtb_parse_tag(record,template->tag,template->attributes))) return error_code;
+  // READ(s) & QUALITIES
+  if (!gt_igtb_read_varint(record,&num_blocks)) return GT_IGTB_PE_TRUNCATED_RECORD;
+  if (num_blocks==0 || num_blocks>2) return GT_IGTB_PE_BAD_NUMBER_OF_BLOCKS;
+  for (i=0;i<num_blocks;++i) {
+    if ((error_code=gt_igtb_parse_read(record,gt_template_get_block_dyn(template,i)))) return error_code;
+  }
+  // TAG Setup (Pair information based on template pair and num_blocks)
+  gt_template_setup_pair_attributes_to_alignments(template,true);
+  // Template COUNTERS
+  if (num_blocks>1) {
+    uint64_t mcs;
+    bool not_unique;
+    if ((error_code=gt_igtb_parse_counters(record,gt_template_get_counters_vector(template),&mcs,&not_unique))) return error_code;
+    if (mcs!=UINT64_MAX) gt_template_set_mcs(template,mcs);
+    if (not_unique) gt_template_set_not_unique_flag(template,true);
+  }
+  // Alignments COUNTERS & MAPS
+  gt_vector* const seq_names = gt_vector_new(10,sizeof(gt_gtb_seq_name));
+  for (i=0;i<num_blocks;++i) {
+    uint64_t mcs;
+    bool not_unique;
+    gt_alignment* const alignment = gt_template_get_block(template,i);
+    if ((error_code=gt_igtb_parse_counters(record,gt_alignment_get_counters_vector(alignment),&mcs,&not_unique))) break;
+    if (mcs!=UINT64_MAX) gt_alignment_set_mcs(alignment,mcs);
+    if (not_unique) gt_alignment_set_not_unique_flag(alignment,true);
+  }
+  if (!error_code) error_code = gt_igtb_parse_seq_names(record,seq_names);
+  uint64_t last_position = 0;
+  for (i=0;i<num_blocks && !error_code;++i) {
+    error_code = gt_igtb_parse_maps(record,seq_names,&last_position,gt_template_get_block(template,i));
+  }
+  gt_vector_delete(seq_names);
+  if (error_code) return error_code;
+  // MMAPS
+  if (num_blocks>1) return gt_igtb_parse_mmaps(record,template);
+  return 0;
+}
+
+/*
+ * High Level Parsers
+ */
+GT_INLINE gt_status gt_input_gtb_parser_check_block(gt_buffered_input_file* const buffered_gtb_input) {
+  gt_status error_code;
+  // Check the end_of_block. Reload buffer if needed
+  if (gt_buffered_input_file_eob(buffered_gtb_input)) {
+    if ((error_code=gt_input_gtb_parser_reload_buffer(buffered_gtb_input))!=GT_IGTB_OK) return error_code;
+  }
+  // Check file format
+  if (buffered_gtb_input->input_file->file_format!=GTB) {
+    gt_input_gtb_parser_prompt_error(buffered_gtb_input,buffered_gtb_input->current_line_num,GT_IGTB_PE_WRONG_FILE_FORMAT);
+    return GT_IGTB_FAIL;
+  }
+  return GT_IGTB_OK;
+}
+GT_INLINE gt_status gt_input_gtb_parser_get_template(
+    gt_buffered_input_file* const buffered_gtb_input,gt_template* const template,const bool force_read_paired) {
+  GT_BUFFERED_INPUT_FILE_CHECK(buffered_gtb_input);
+  GT_TEMPLATE_CHECK(template);
+  gt_status error_code;
+  if ((error_code=gt_input_gtb_parser_check_block(buffered_gtb_input))!=GT_IGTB_OK) return error_code;
+  // Prepare the template
+  uint64_t record_num = buffered_gtb_input->current_line_num, record_size = 0;
+  gt_template_clear(template,true);
+  template->template_id = record_num;
+  // Parse template
+  uint8_t* data = gt_igtb_current_record(buffered_gtb_input,&record_size);
+  gt_gtb_record record = { .data=data, .end=data+record_size };
+  error_code = gt_igtb_parse_template(&record,template);
+  gt_igtb_next_record(buffered_gtb_input);
+  // Join the single-end records of the template
+  if (!error_code && force_read_paired && gt_template_get_num_blocks(template)==1) {
+    record_num = buffered_gtb_input->current_line_num;
+    data = gt_igtb_current_record(buffered_gtb_input,&record_size);
+    if (data==NULL) {
+      error_code = GT_IGTB_PE_UNPAIRED;
+    } else {
+      record.data = data; record.end = data+record_size;
+      gt_alignment* const end2 = gt_template_get_block_dyn(template,1);
+      if (!(error_code=gt_igtb_parse_alignment(&record,end2))) {
+        if (!gt_string_equals(gt_template_get_block(template,0)->tag,end2->tag)) {
+          error_code = GT_IGTB_PE_UNPAIRED;
+        } else {
+          gt_template_setup_pair_attributes_to_alignments(template,false);
+        }
+      }
+      gt_igtb_next_record(buffered_gtb_input);
+    }
+  }
+  if (error_code) {
+    gt_input_gtb_parser_prompt_error(buffered_gtb_input,record_num,error_code);
+    return GT_IGTB_FAIL;
+  }
+  return GT_IGTB_OK;
+}
+GT_INLINE gt_status gt_input_gtb_parser_get_alignment(
+    gt_buffered_input_file* const buffered_gtb_input,gt_alignment* const alignment) {
+  GT_BUFFERED_INPUT_FILE_CHECK(buffered_gtb_input);
+  GT_ALIGNMENT_CHECK(alignment);
+  gt_status error_code;
+  if ((error_code=gt_input_gtb_parser_check_block(buffered_gtb_input))!=GT_IGTB_OK) return error_code;
+  // Allocate memory for the alignment
+  const uint64_t record_num = buffered_gtb_input->current_line_num;
+  uint64_t record_size = 0;
+  gt_alignment_clear(alignment);
+  alignment->alignment_id = record_num;
+  // Parse alignment
+  uint8_t* const data = gt_igtb_current_record(buffered_gtb_input,&record_size);
+  gt_gtb_record record = { .data=data, .end=data+record_size };
+  error_code = gt_igtb_parse_alignment(&record,alignment);
+  gt_igtb_next_record(buffered_gtb_input);
+  if (error_code) {
+    gt_input_gtb_parser_prompt_error(buffered_gtb_input,record_num,error_code);
+    return GT_IGTB_FAIL;
+  }
+  return GT_IGTB_OK;
+}
+
+/*
+ * Synch read of blocks
+ */
+GT_INLINE gt_status gt_input_gtb_parser_synch_blocks_a(
+    pthread_mutex_t* const input_mutex,gt_buffered_input_file** const buffered_input,const uint64_t num_inputs) {
+  GT_BUFFERED_INPUT_FILE_CHECK(buffered_input[0]);
+  gt_status error_code;
+  // Check the end_of_block. Reload buffer if needed (synch)
+  if (gt_buffered_input_file_eob(buffered_input[0])) {
+    GT_BEGIN_MUTEX_SECTION(*input_mutex) {
+      uint64_t i;
+      for (i=0;i<num_inputs;++i) {
+        // Reload the 'buffered_input' files
+        GT_BUFFERED_INPUT_FILE_CHECK(buffered_input[i]);
+        if ((error_code=gt_input_gtb_parser_reload_buffer(buffered_input[i]))!=GT_IGTB_OK) {
+          GT_END_MUTEX_SECTION(*input_mutex);
+          return error_code;
+        }
+      }
+    } GT_END_MUTEX_SECTION(*input_mutex);
+  }
+  return GT_IGTB_OK;
+}
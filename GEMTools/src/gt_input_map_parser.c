@@ -262,7 +262,7 @@ GT_INLINE gt_status gt_imp_reload_buffer_matching_tag(
   }
   buffered_map_input->block_id = gt_input_file_next_id(input_file) % UINT32_MAX;
   buffered_map_input->current_line_num = input_file->processed_lines+1;
-  gt_vector_clear(buffered_map_input->block_buffer); // Clear dst buffer
+  gt_buffered_input_file_clear_block(buffered_map_input); // Clear dst buffer
   // Read lines
   if (read_paired) gt_input_parse_tag_chomp_pairend_info(reference_tag);
   gt_string* const last_tag = gt_string_new(0);
@@ -308,7 +308,7 @@ GT_INLINE gt_status gt_imp_get_block(
   }
   buffered_map_input->block_id = gt_input_file_next_id(input_file) % UINT32_MAX;
   buffered_map_input->current_line_num = input_file->processed_lines+1;
-  gt_vector_clear(buffered_map_input->block_buffer); // Clear dst buffer
+  gt_buffered_input_file_clear_block(buffered_map_input); // Clear dst buffer
   // Read lines
   uint64_t lines_read = 0, num_blocks = 0, num_tabs = 0;
   while ( (lines_read<num_records || num_blocks%2!=0) &&
@@ -31,22 +31,6 @@ GT_INLINE void gt_input_sam_parser_attributes_set_soap_compilant(gt_sam_parser_a
   attributes->sam_soap_style = true;
 }
 
-// Internal pair-pending
-typedef struct {
-  // Current map info
-  gt_string map_seq_name;
-  uint64_t map_position;
-  uint64_t end_position; // 0/1
-  // Next map info
-  gt_string next_seq_name;
-  uint64_t next_position;
-  // Map location and span info
-  uint64_t map_displacement; // In alignment's map vector
-  uint64_t num_maps; // Maps in the vector coupled to the first one
-} gt_sam_pending_end;
-
-#define GT_SAM_INIT_PENDING { .map_seq_name.allocated=0, .next_seq_name.allocated=0 }
-
 /*
  * SAM File Format test
  */
@@ -240,7 +224,7 @@ GT_INLINE gt_status gt_input_sam_parser_get_block(
   }
   buffered_sam_input->block_id = gt_input_file_next_id(input_file) % UINT32_MAX;
   buffered_sam_input->current_line_num = input_file->processed_lines+1;
-  gt_vector_clear(buffered_sam_input->block_buffer); // Clear dst buffer
+  gt_buffered_input_file_clear_block(buffered_sam_input); // Clear dst buffer
   // Read lines & synch SAM records
   uint64_t lines_read = 0;
   while (lines_read<num_records &&
@@ -408,11 +392,10 @@ GT_INLINE gt_status gt_isp_parse_sam_cigar(char** const text_line,gt_map** _map,
   if ((*text_line)[0]==char1 && (*text_line)[1]==char2 && (*text_line)[2]!=EOL && (*text_line)[3]==type_char) {
 #define GT_ISP_END_OPT_FIELD }}
 
-GT_INLINE gt_status gt_isp_parse_sam_opt_xa_bwa(
+GT_INLINE gt_status gt_isp_parse_sam_xa_maps(
     char** const text_line,gt_alignment* const alignment,
     gt_vector* const maps_vector,gt_sam_pending_end* const pending) {
-  *text_line+=5;
-  while (**text_line!=TAB && **text_line!=EOL) { // Read new attached maps
+  while (**text_line!=TAB && !GT_IS_EOL(text_line)) { // Read new attached maps
     gt_map* map = gt_map_new();
     gt_map_set_base_length(map,gt_alignment_get_read_length(alignment));
     // Sequence-name/Chromosome
@@ -449,6 +432,12 @@ GT_INLINE gt_status gt_isp_parse_sam_opt_xa_bwa(
   }
   return 0;
 }
+GT_INLINE gt_status gt_isp_parse_sam_opt_xa_bwa(
+    char** const text_line,gt_alignment* const alignment,
+    gt_vector* const maps_vector,gt_sam_pending_end* const pending) {
+  *text_line+=5;
+  return gt_isp_parse_sam_xa_maps(text_line,alignment,maps_vector,pending);
+}
 
 GT_INLINE gt_status gt_isp_parse_sam_optional_field(
     char** const text_line,gt_alignment* const alignment,
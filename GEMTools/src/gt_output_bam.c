@@ -0,0 +1,456 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt_output_bam.c
+ * DATE: 18/10/2026
+ * DESCRIPTION: BAM writer. SAM records are encoded into binary BAM records
+ *   and compressed as BGZF blocks (no samtools stage)
+ */
+
+#include "gt_output_bam.h"
+
+// Constants
+#define GT_OBW_NUM_CORE_FIELDS 11
+#define GT_OBW_INITIAL_RECORD_SIZE 1024
+#define GT_OBW_MAX_NUMBER_LENGTH 64
+
+/*
+ * Little-endian appenders
+ */
+GT_INLINE void gt_obw_append(gt_vector* const record,const void* const data,const uint64_t length) {
+  gt_vector_reserve_additional(record,length);
+  memcpy(gt_vector_get_mem(record,uint8_t)+gt_vector_get_used(record),data,length);
+  gt_vector_add_used(record,length);
+}
+GT_INLINE void gt_obw_append_uint8(gt_vector* const record,const uint8_t value) {
+  gt_obw_append(record,&value,1);
+}
+GT_INLINE void gt_obw_append_uint16(gt_vector* const record,const uint16_t value) {
+  const uint8_t data[2] = { value&0xff, (value>>8)&0xff };
+  gt_obw_append(record,data,2);
+}
+GT_INLINE void gt_obw_append_uint32(gt_vector* const record,const uint32_t value) {
+  const uint8_t data[4] = { value&0xff, (value>>8)&0xff, (value>>16)&0xff, (value>>24)&0xff };
+  gt_obw_append(record,data,4);
+}
+GT_INLINE void gt_obw_append_float(gt_vector* const record,const float value) {
+  uint32_t bits;
+  memcpy(&bits,&value,4);
+  gt_obw_append_uint32(record,bits);
+}
+GT_INLINE void gt_obw_set_uint32(gt_vector* const record,const uint64_t offset,const uint32_t value) {
+  uint8_t* const data = gt_vector_get_mem(record,uint8_t)+offset;
+  data[0] = value&0xff; data[1] = (value>>8)&0xff; data[2] = (value>>16)&0xff; data[3] = (value>>24)&0xff;
+}
+
+/*
+ * Field parsing helpers (fields are not NULL terminated)
+ */
+GT_INLINE bool gt_obw_next_field(
+    const char** const cursor,const char* const end,const char separator,
+    const char** const field,uint64_t* const field_length) {
+  if (*cursor > end) return false;
+  *field = *cursor;
+  const char* const field_end = memchr(*cursor,separator,end-*cursor);
+  *field_length = (field_end==NULL) ? end-*cursor : field_end-*cursor;
+  *cursor += *field_length+1;
+  return true;
+}
+GT_INLINE bool gt_obw_parse_int64(const char* const field,const uint64_t length,int64_t* const value) {
+  uint64_t i = 0;
+  bool negative = false;
+  if (length>0 && (field[0]=='-' || field[0]=='+')) {
+    negative = (field[0]=='-'); ++i;
+  }
+  if (i==length) return false;
+  int64_t number = 0;
+  for (;i<length;++i) {
+    if (!gt_is_number(field[i])) return false;
+    number = number*10 + gt_get_cipher(field[i]);
+  }
+  *value = (negative) ? -number : number;
+  return true;
+}
+GT_INLINE bool gt_obw_parse_float(const char* const field,const uint64_t length,float* const value) {
+  char number[GT_OBW_MAX_NUMBER_LENGTH];
+  if (length==0 || length>=GT_OBW_MAX_NUMBER_LENGTH) return false;
+  memcpy(number,field,length);
+  number[length] = EOS;
+  char* number_end;
+  *value = strtof(number,&number_end);
+  return (*number_end==EOS);
+}
+GT_INLINE bool gt_obw_is_null_field(const char* const field,const uint64_t length) {
+  return length==1 && field[0]=='*';
+}
+
+/*
+ * BAM binning scheme
+ */
+GT_INLINE uint16_t gt_bam_reg2bin(const int64_t begin,int64_t end) {
+  --end;
+  if (begin>>14 == end>>14) return ((1<<15)-1)/7 + (begin>>14);
+  if (begin>>17 == end>>17) return ((1<<12)-1)/7 + (begin>>17);
+  if (begin>>20 == end>>20) return ((1<<9)-1)/7 + (begin>>20);
+  if (begin>>23 == end>>23) return ((1<<6)-1)/7 + (begin>>23);
+  if (begin>>26 == end>>26) return ((1<<3)-1)/7 + (begin>>26);
+  return 0;
+}
+
+/*
+ * Setup
+ */
+gt_bam_writer* gt_bam_writer_new(FILE* const file,const uint64_t num_threads,const int level) {
+  GT_NULL_CHECK(file);
+  gt_bam_writer* const bam_writer = gt_alloc(gt_bam_writer);
+  bam_writer->bgzf_writer = gt_bgzf_writer_new(file,num_threads,level);
+  bam_writer->bam_headers = gt_bam_header_new();
+  bam_writer->reference_ids = gt_shash_new();
+  bam_writer->header_written = false;
+  bam_writer->min_mapq = 0;
+  bam_writer->record = gt_vector_new(GT_OBW_INITIAL_RECORD_SIZE,sizeof(uint8_t));
+  return bam_writer;
+}
+void gt_bam_writer_delete(gt_bam_writer* const bam_writer) {
+  GT_BAM_WRITER_CHECK(bam_writer);
+  gt_bgzf_writer_delete(bam_writer->bgzf_writer);
+  gt_bam_header_delete(bam_writer->bam_headers);
+  gt_shash_delete(bam_writer->reference_ids,true);
+  gt_vector_delete(bam_writer->record);
+  gt_free(bam_writer);
+}
+GT_INLINE void gt_bam_writer_set_min_mapq(gt_bam_writer* const bam_writer,const uint8_t min_mapq) {
+  GT_BAM_WRITER_CHECK(bam_writer);
+  bam_writer->min_mapq = min_mapq;
+}
+
+/*
+ * Header
+ */
+gt_status gt_bam_writer_add_header_line(gt_bam_writer* const bam_writer,const char* const line,const uint64_t length) {
+  GT_BAM_WRITER_CHECK(bam_writer);
+  if (bam_writer->header_written || length==0 || line[0]!='@') return GT_OBW_PE_BAD_RECORD;
+  gt_string_right_append_string(bam_writer->bam_headers->text,line,length);
+  gt_string_append_char(bam_writer->bam_headers->text,EOL);
+  // Register the references declared by @SQ lines
+  if (length<3 || strncmp(line,"@SQ",3)!=0) return 0;
+  const char* cursor = line;
+  const char* const end = line+length;
+  const char *field, *name = NULL;
+  uint64_t field_length, name_length = 0;
+  int64_t reference_length = -1;
+  while (gt_obw_next_field(&cursor,end,TAB,&field,&field_length)) {
+    if (field_length<3) continue;
+    if (strncmp(field,"SN:",3)==0) {
+      name = field+3;
+      name_length = field_length-3;
+    } else if (strncmp(field,"LN:",3)==0) {
+      if (!gt_obw_parse_int64(field+3,field_length-3,&reference_length)) return GT_OBW_PE_BAD_RECORD;
+    }
+  }
+  if (name==NULL || name_length==0 || reference_length<0) return GT_OBW_PE_BAD_RECORD;
+  const uint64_t reference_id = gt_bam_header_get_num_references(bam_writer->bam_headers);
+  gt_bam_header_add_reference(bam_writer->bam_headers,name,name_length,reference_length);
+  uint64_t* const id = gt_alloc(uint64_t);
+  *id = reference_id;
+  gt_shash_insert(bam_writer->reference_ids,
+      gt_string_get_string(gt_bam_header_get_reference_name(bam_writer->bam_headers,reference_id)),id,uint64_t);
+  return 0;
+}
+/*
+ * magic, l_text, text, n_ref, n_ref*(l_name, name, l_ref)
+ */
+GT_INLINE bool gt_bam_writer_write_header(gt_bam_writer* const bam_writer) {
+  gt_bam_headers* const bam_headers = bam_writer->bam_headers;
+  gt_vector* const record = bam_writer->record;
+  gt_vector_clear(record);
+  gt_obw_append(record,GT_BAM_MAGIC,GT_BAM_MAGIC_LENGTH);
+  gt_obw_append_uint32(record,gt_string_get_length(bam_headers->text));
+  gt_obw_append(record,gt_string_get_string(bam_headers->text),gt_string_get_length(bam_headers->text));
+  const uint64_t num_references = gt_bam_header_get_num_references(bam_headers);
+  gt_obw_append_uint32(record,num_references);
+  uint64_t i;
+  for (i=0;i<num_references;++i) {
+    gt_string* const name = gt_bam_header_get_reference_name(bam_headers,i);
+    gt_obw_append_uint32(record,gt_string_get_length(name)+1);
+    gt_obw_append(record,gt_string_get_string(name),gt_string_get_length(name));
+    gt_obw_append_uint8(record,EOS);
+    gt_obw_append_uint32(record,*gt_vector_get_elm(bam_headers->reference_lengths,i,uint64_t));
+  }
+  bam_writer->header_written = true;
+  return gt_bgzf_writer_write(bam_writer->bgzf_writer,gt_vector_get_mem(record,uint8_t),gt_vector_get_used(record));
+}
+
+/*
+ * Records
+ */
+GT_INLINE gt_status gt_obw_reference_id(
+    gt_bam_writer* const bam_writer,const char* const name,const uint64_t name_length,int32_t* const reference_id) {
+  if (gt_obw_is_null_field(name,name_length)) {
+    *reference_id = -1;
+    return 0;
+  }
+  char* const key = gt_strndup(name,name_length);
+  uint64_t* const id = gt_shash_get(bam_writer->reference_ids,key,uint64_t);
+  gt_free(key);
+  if (id==NULL) return GT_OBW_PE_BAD_REFERENCE;
+  *reference_id = *id;
+  return 0;
+}
+/* Encodes the CIGAR and returns the span over the reference */
+GT_INLINE gt_status gt_obw_encode_cigar(
+    gt_vector* const record,const char* const cigar,const uint64_t length,
+    uint64_t* const num_operations,uint64_t* const reference_span) {
+  *num_operations = 0;
+  *reference_span = 0;
+  if (gt_obw_is_null_field(cigar,length)) return 0;
+  uint64_t i = 0;
+  while (i<length) {
+    uint64_t operation_length = 0;
+    if (!gt_is_number(cigar[i])) return GT_OBW_PE_BAD_CIGAR;
+    while (i<length && gt_is_number(cigar[i])) {
+      operation_length = operation_length*10 + gt_get_cipher(cigar[i]); ++i;
+    }
+    if (i==length) return GT_OBW_PE_BAD_CIGAR;
+    const char* const operation = strchr(GT_BAM_CIGAR_OPERATIONS,cigar[i]);
+    if (operation==NULL || cigar[i]==EOS) return GT_OBW_PE_BAD_CIGAR;
+    const uint32_t code = operation-GT_BAM_CIGAR_OPERATIONS;
+    gt_obw_append_uint32(record,(operation_length<<4)|code);
+    switch (cigar[i]) {
+      case 'M': case 'D': case 'N': case '=': case 'X':
+        *reference_span += operation_length;
+        break;
+      default: break;
+    }
+    ++(*num_operations);
+    ++i;
+  }
+  return 0;
+}
+/* SEQ as 4-bit codes, high nybble first */
+GT_INLINE uint8_t gt_obw_seq_code(const char base) {
+  const char* const code = strchr(GT_BAM_SEQ_CODES,toupper(base));
+  return (code==NULL || base==EOS) ? 15 : code-GT_BAM_SEQ_CODES;
+}
+GT_INLINE void gt_obw_encode_seq(gt_vector* const record,const char* const seq,const uint64_t length) {
+  uint64_t i;
+  for (i=0;i+1<length;i+=2) {
+    gt_obw_append_uint8(record,(gt_obw_seq_code(seq[i])<<4)|gt_obw_seq_code(seq[i+1]));
+  }
+  if (i<length) gt_obw_append_uint8(record,gt_obw_seq_code(seq[i])<<4);
+}
+/* Integers are stored with the smallest type that holds them */
+GT_INLINE void gt_obw_encode_integer_field(gt_vector* const record,const int64_t value) {
+  if (value<0) {
+    if (value>=INT8_MIN) {
+      gt_obw_append_uint8(record,'c'); gt_obw_append_uint8(record,(uint8_t)value);
+    } else if (value>=INT16_MIN) {
+      gt_obw_append_uint8(record,'s'); gt_obw_append_uint16(record,(uint16_t)value);
+    } else {
+      gt_obw_append_uint8(record,'i'); gt_obw_append_uint32(record,(uint32_t)value);
+    }
+  } else {
+    if (value<=UINT8_MAX) {
+      gt_obw_append_uint8(record,'C'); gt_obw_append_uint8(record,value);
+    } else if (value<=UINT16_MAX) {
+      gt_obw_append_uint8(record,'S'); gt_obw_append_uint16(record,value);
+    } else {
+      gt_obw_append_uint8(record,'I'); gt_obw_append_uint32(record,value);
+    }
+  }
+}
+GT_INLINE gt_status gt_obw_encode_array_field(gt_vector* const record,const char* const field,const uint64_t length) {
+  if (length<1) return GT_OBW_PE_BAD_OPTIONAL_FIELD;
+  const char type = field[0];
+  if (strchr("cCsSiIf",type)==NULL) return GT_OBW_PE_BAD_OPTIONAL_FIELD;
+  gt_obw_append_uint8(record,type);
+  // Count placeholder
+  const uint64_t count_offset = gt_vector_get_used(record);
+  gt_obw_append_uint32(record,0);
+  const char* cursor = field+1;
+  const char* const end = field+length;
+  const char* value;
+  uint64_t value_length, count = 0;
+  if (cursor<end) {
+    if (*cursor!=',') return GT_OBW_PE_BAD_OPTIONAL_FIELD;
+    ++cursor;
+    while (gt_obw_next_field(&cursor,end,',',&value,&value_length)) {
+      if (type=='f') {
+        float number;
+        if (!gt_obw_parse_float(value,value_length,&number)) return GT_OBW_PE_BAD_OPTIONAL_FIELD;
+        gt_obw_append_float(record,number);
+      } else {
+        int64_t number;
+        if (!gt_obw_parse_int64(value,value_length,&number)) return GT_OBW_PE_BAD_OPTIONAL_FIELD;
+        switch (type) {
+          case 'c': case 'C': gt_obw_append_uint8(record,(uint8_t)number); break;
+          case 's': case 'S': gt_obw_append_uint16(record,(uint16_t)number); break;
+          default: gt_obw_append_uint32(record,(uint32_t)number); break;
+        }
+      }
+      ++count;
+    }
+  }
+  gt_obw_set_uint32(record,count_offset,count);
+  return 0;
+}
+/* TAG:TYPE:VALUE */
+GT_INLINE gt_status gt_obw_encode_optional_field(gt_vector* const record,const char* const field,const uint64_t length) {
+  if (length<5 || field[2]!=':' || field[4]!=':') return GT_OBW_PE_BAD_OPTIONAL_FIELD;
+  const char* const value = field+5;
+  const uint64_t value_length = length-5;
+  gt_obw_append(record,field,2);
+  switch (field[3]) {
+    case 'A':
+      if (value_length!=1) return GT_OBW_PE_BAD_OPTIONAL_FIELD;
+      gt_obw_append_uint8(record,'A');
+      gt_obw_append_uint8(record,value[0]);
+      break;
+    case 'i': {
+      int64_t number;
+      if (!gt_obw_parse_int64(value,value_length,&number) ||
+          number<INT32_MIN || number>UINT32_MAX) return GT_OBW_PE_BAD_OPTIONAL_FIELD;
+      gt_obw_encode_integer_field(record,number);
+      break;
+    }
+    case 'f': {
+      float number;
+      if (!gt_obw_parse_float(value,value_length,&number)) return GT_OBW_PE_BAD_OPTIONAL_FIELD;
+      gt_obw_append_uint8(record,'f');
+      gt_obw_append_float(record,number);
+      break;
+    }
+    case 'Z':
+    case 'H':
+      gt_obw_append_uint8(record,field[3]);
+      gt_obw_append(record,value,value_length);
+      gt_obw_append_uint8(record,EOS);
+      break;
+    case 'B':
+      return gt_obw_encode_array_field(record,value,value_length);
+    default:
+      return GT_OBW_PE_BAD_OPTIONAL_FIELD;
+  }
+  return 0;
+}
+/*
+ * QNAME FLAG RNAME POS MAPQ CIGAR RNEXT PNEXT TLEN SEQ QUAL [TAG:TYPE:VALUE]*
+ */
+gt_status gt_bam_writer_write_sam_record(gt_bam_writer* const bam_writer,const char* const line,const uint64_t length) {
+  GT_BAM_WRITER_CHECK(bam_writer);
+  gt_status error_code;
+  // Split the core fields
+  const char* fields[GT_OBW_NUM_CORE_FIELDS];
+  uint64_t lengths[GT_OBW_NUM_CORE_FIELDS], i;
+  const char* cursor = line;
+  const char* const end = line+length;
+  for (i=0;i<GT_OBW_NUM_CORE_FIELDS;++i) {
+    if (!gt_obw_next_field(&cursor,end,TAB,fields+i,lengths+i)) return GT_OBW_PE_BAD_RECORD;
+  }
+  // Numeric fields
+  int64_t flag, position, mapq, next_position, template_length;
+  if (!gt_obw_parse_int64(fields[1],lengths[1],&flag) ||
+      !gt_obw_parse_int64(fields[3],lengths[3],&position) ||
+      !gt_obw_parse_int64(fields[4],lengths[4],&mapq) ||
+      !gt_obw_parse_int64(fields[7],lengths[7],&next_position) ||
+      !gt_obw_parse_int64(fields[8],lengths[8],&template_length)) return GT_OBW_PE_BAD_RECORD;
+  if (flag<0 || flag>UINT16_MAX || mapq<0 || mapq>UINT8_MAX) return GT_OBW_PE_BAD_RECORD;
+  if (lengths[0]==0 || lengths[0]>254) return GT_OBW_PE_BAD_RECORD;
+  // Filter
+  if (mapq<bam_writer->min_mapq) return 0;
+  // References
+  int32_t reference_id, next_reference_id;
+  if ((error_code=gt_obw_reference_id(bam_writer,fields[2],lengths[2],&reference_id))) return error_code;
+  if (lengths[6]==1 && fields[6][0]=='=') {
+    next_reference_id = reference_id;
+  } else if ((error_code=gt_obw_reference_id(bam_writer,fields[6],lengths[6],&next_reference_id))) {
+    return error_code;
+  }
+  // SEQ & QUAL
+  const uint64_t seq_length = gt_obw_is_null_field(fields[9],lengths[9]) ? 0 : lengths[9];
+  const bool has_qualities = !gt_obw_is_null_field(fields[10],lengths[10]);
+  if (has_qualities && lengths[10]!=seq_length) return GT_OBW_PE_BAD_RECORD;
+  // Write the header before the first record
+  if (!bam_writer->header_written && !gt_bam_writer_write_header(bam_writer)) return GT_OBW_PE_WRITE;
+  // Encode the variable length data (block_size and core fields are filled later)
+  gt_vector* const record = bam_writer->record;
+  gt_vector_clear(record);
+  gt_vector_reserve(record,4+GT_BAM_RECORD_CORE_SIZE,false);
+  gt_vector_set_used(record,4+GT_BAM_RECORD_CORE_SIZE);
+  gt_obw_append(record,fields[0],lengths[0]);
+  gt_obw_append_uint8(record,EOS);
+  uint64_t num_operations, reference_span;
+  if ((error_code=gt_obw_encode_cigar(record,fields[5],lengths[5],&num_operations,&reference_span))) return error_code;
+  if (num_operations>UINT16_MAX) return GT_OBW_PE_BAD_CIGAR;
+  gt_obw_encode_seq(record,fields[9],seq_length);
+  if (has_qualities) {
+    for (i=0;i<seq_length;++i) gt_obw_append_uint8(record,fields[10][i]-33);
+  } else {
+    for (i=0;i<seq_length;++i) gt_obw_append_uint8(record,GT_BAM_NO_QUALITY);
+  }
+  // Optional fields
+  const char* field;
+  uint64_t field_length;
+  while (gt_obw_next_field(&cursor,end,TAB,&field,&field_length)) {
+    if ((error_code=gt_obw_encode_optional_field(record,field,field_length))) return error_code;
+  }
+  // Core fields
+  const int64_t begin = position-1;
+  const uint16_t bin = gt_bam_reg2bin(begin,(reference_span>0) ? begin+reference_span : begin+1);
+  gt_obw_set_uint32(record,0,gt_vector_get_used(record)-4);
+  gt_obw_set_uint32(record,4,reference_id);
+  gt_obw_set_uint32(record,8,begin);
+  gt_obw_set_uint32(record,12,((uint32_t)bin<<16)|((uint32_t)mapq<<8)|(lengths[0]+1));
+  gt_obw_set_uint32(record,16,((uint32_t)flag<<16)|num_operations);
+  gt_obw_set_uint32(record,20,seq_length);
+  gt_obw_set_uint32(record,24,next_reference_id);
+  gt_obw_set_uint32(record,28,next_position-1);
+  gt_obw_set_uint32(record,32,template_length);
+  // Write
+  if (!gt_bgzf_writer_write(bam_writer->bgzf_writer,gt_vector_get_mem(record,uint8_t),gt_vector_get_used(record))) {
+    return GT_OBW_PE_WRITE;
+  }
+  return 0;
+}
+GT_INLINE void gt_bam_writer_prompt_error(const uint64_t line_num,const gt_status error_code) {
+  switch (error_code) {
+    case GT_OBW_PE_BAD_RECORD: gt_error(OUTPUT_BAM_BAD_RECORD,line_num); break;
+    case GT_OBW_PE_BAD_REFERENCE: gt_error(OUTPUT_BAM_BAD_REFERENCE,line_num); break;
+    case GT_OBW_PE_BAD_CIGAR: gt_error(OUTPUT_BAM_BAD_CIGAR,line_num); break;
+    case GT_OBW_PE_BAD_OPTIONAL_FIELD: gt_error(OUTPUT_BAM_BAD_OPTIONAL_FIELD,line_num); break;
+    case GT_OBW_PE_WRITE: gt_error(OUTPUT_BAM_WRITE,line_num); break;
+    default:
+      gt_error(OUTPUT_BAM,line_num);
+      break;
+  }
+}
+gt_status gt_bam_writer_write_sam_stream(gt_bam_writer* const bam_writer,FILE* const sam_stream) {
+  GT_BAM_WRITER_CHECK(bam_writer);
+  GT_NULL_CHECK(sam_stream);
+  char* line = NULL;
+  size_t line_size = 0;
+  ssize_t length;
+  uint64_t line_num = 0;
+  gt_status error_code = 0;
+  while ((length=getline(&line,&line_size,sam_stream))!=-1) {
+    ++line_num;
+    // Chomp EOL
+    while (length>0 && (line[length-1]==EOL || line[length-1]==DOS_EOL)) --length;
+    if (length==0) continue;
+    if (line[0]=='@') {
+      error_code = gt_bam_writer_add_header_line(bam_writer,line,length);
+    } else {
+      error_code = gt_bam_writer_write_sam_record(bam_writer,line,length);
+    }
+    if (error_code) {
+      gt_bam_writer_prompt_error(line_num,error_code);
+      break;
+    }
+  }
+  free(line);
+  return (error_code) ? GT_OBW_FAIL : GT_OBW_OK;
+}
+bool gt_bam_writer_close(gt_bam_writer* const bam_writer) {
+  GT_BAM_WRITER_CHECK(bam_writer);
+  if (!bam_writer->header_written && !gt_bam_writer_write_header(bam_writer)) return false;
+  return gt_bgzf_writer_close(bam_writer->bgzf_writer);
+}
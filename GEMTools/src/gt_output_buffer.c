@@ -132,3 +132,15 @@ GT_INLINE gt_status gt_bprintf_(
   va_end(v_args);
   return chars_printed;
 }
+
+/*
+ * Buffer raw writer (binary content, no formating)
+ */
+GT_INLINE gt_status gt_bwrite(gt_output_buffer* const output_buffer,const void* const data,const uint64_t length) {
+  GT_OUTPUT_BUFFER_CHECK(output_buffer);
+  GT_NULL_CHECK(data);
+  gt_vector_reserve_additional(output_buffer->buffer,length);
+  memcpy(gt_vector_get_free_elm(output_buffer->buffer,char),data,length);
+  gt_vector_add_used(output_buffer->buffer,length);
+  return length;
+}
@@ -13,6 +13,7 @@
 #include <bzlib.h>
 #endif
 #include "gt_output_file.h"
+#include "gt_bgzf.h"
 
 /*
  * Setup
@@ -28,6 +29,9 @@ GT_INLINE void gt_output_file_init_buffers(gt_output_file* const output_file) {
   /* Block ID (for synchronization purposes) */
   output_file->mayor_block_id=0;
   output_file->minor_block_id=0;
+  /* Template index */
+  output_file->template_index=NULL;
+  output_file->template_index_file_name=NULL;
   /* Mutexes */
   gt_cond_fatal_error(pthread_cond_init(&output_file->out_buffer_cond,NULL),SYS_COND_VAR_INIT);
   gt_cond_fatal_error(pthread_cond_init(&output_file->out_write_cond,NULL),SYS_COND_VAR_INIT);
@@ -86,7 +90,7 @@ gt_output_file* gt_output_stream_new_compress(FILE* const file,const gt_output_f
   output_file->file_type=output_file_type;
 
 #ifndef HAVE_ZLIB
-  if(compression_type==GZIP) compression_type=NONE;
+  if(compression_type==GZIP || compression_type==BGZF) compression_type=NONE;
 #endif
 #ifndef HAVE_BZLIB
   if(compression_type==BZIP2) compression_type=NONE;
@@ -115,6 +119,10 @@ gt_output_file* gt_output_stream_new_compress(FILE* const file,const gt_output_f
 	  gt_cond_fatal_error(!(output_file->file=fdopen(output_file->pipe_fd[1],"w")),FILE_FDOPEN);
 #endif
   	break;
+  case BGZF:
+    // Blocks are compressed in parallel as they are written, see gt_output_file_fwrite
+    output_file->cfile=gt_bgzf_writer_new(file,GT_BGZF_DEFAULT_THREADS,Z_DEFAULT_COMPRESSION);
+    break;
   default:
   	break;
   }
@@ -130,7 +138,7 @@ gt_output_file* gt_output_file_new_compress(char* const file_name,const gt_outpu
   /* Output file */
   output_file->file_name=file_name;
 #ifndef HAVE_ZLIB
-  if(compression_type==GZIP) compression_type=NONE;
+  if(compression_type==GZIP || compression_type==BGZF) compression_type=NONE;
 #endif
 #ifndef HAVE_BZLIB
   if(compression_type==BZIP2) compression_type=NONE;
@@ -156,6 +164,10 @@ gt_output_file* gt_output_file_new_compress(char* const file_name,const gt_outpu
   	  gt_cond_fatal_error(!(output_file->file=fdopen(output_file->pipe_fd[1],"w")),FILE_FDOPEN);
 #endif
   	  break;
+  	case BGZF:
+  	  gt_cond_fatal_error(!(output_file->file=fopen(file_name,"w")),FILE_OPEN,file_name);
+  	  output_file->cfile=gt_bgzf_writer_new(output_file->file,GT_BGZF_DEFAULT_THREADS,Z_DEFAULT_COMPRESSION);
+  	  break;
   	default:
   		gt_cond_fatal_error(!(output_file->file=fopen(file_name,"w")),FILE_OPEN,file_name);
   		break;
@@ -166,9 +178,79 @@ gt_output_file* gt_output_file_new_compress(char* const file_name,const gt_outpu
   return output_file;
 }
 
+bool gt_output_file_set_template_index(
+    gt_output_file* const output_file,char* const index_file_name,
+    const uint64_t interval,const uint64_t template_lines) {
+  GT_OUTPUT_FILE_CHECK(output_file);
+  GT_NULL_CHECK(index_file_name);
+  const bool bgzf = output_file->compression_type==BGZF;
+  if ((output_file->compression_type!=NONE && !bgzf) || output_file->template_index!=NULL) return false;
+  output_file->template_index = gt_template_index_new(interval,bgzf ? GT_TEMPLATE_INDEX_VIRTUAL_OFFSETS : 0);
+  output_file->template_index_file_name = index_file_name;
+  output_file->template_lines = (template_lines>0) ? template_lines : 1;
+  output_file->bytes_written = 0;
+  output_file->lines_written = 0;
+  output_file->line_open = false;
+  return true;
+}
+void gt_output_file_set_threads(gt_output_file* const output_file,const uint64_t num_threads) {
+  GT_OUTPUT_FILE_CHECK(output_file);
+  if (output_file->compression_type==BGZF) gt_bgzf_writer_set_threads(output_file->cfile,num_threads);
+}
+/*
+ * Writes the data to the file or the BGZF writer
+ */
+GT_INLINE size_t gt_output_file_write_data(gt_output_file* const output_file,const char* const data,const uint64_t length) {
+  if (output_file->compression_type==BGZF) {
+    return gt_bgzf_writer_write(output_file->cfile,(const uint8_t*)data,length) ? length : 0;
+  }
+  return fwrite(data,1,length,output_file->file);
+}
+/*
+ * Writes the data recording the offsets of the indexed lines
+ */
+GT_INLINE size_t gt_output_file_fwrite(gt_output_file* const output_file,const char* const data,const uint64_t length) {
+  gt_template_index* const template_index = output_file->template_index;
+  if (template_index!=NULL) {
+    const uint64_t lines_per_entry = template_index->interval*output_file->template_lines;
+    const bool bgzf = output_file->compression_type==BGZF;
+    uint64_t pos = 0, written = 0;
+    while (pos<length) {
+      if (!output_file->line_open) {
+        if (output_file->lines_written%lines_per_entry==0) {
+          if (bgzf) {
+            // Marks record the current position of the writer
+            if (pos>written && gt_output_file_write_data(output_file,data+written,pos-written)!=pos-written) return 0;
+            written = pos;
+            gt_bgzf_writer_mark(output_file->cfile);
+          } else {
+            gt_vector_insert(template_index->offsets,output_file->bytes_written+pos,uint64_t);
+          }
+        }
+        output_file->line_open = true;
+      }
+      const char* const eol = memchr(data+pos,EOL,length-pos);
+      if (eol==NULL) break;
+      pos = (eol-data)+1;
+      ++output_file->lines_written;
+      output_file->line_open = false;
+    }
+    output_file->bytes_written += length;
+    if (written==length) return length;
+    return (gt_output_file_write_data(output_file,data+written,length-written)==length-written) ? length : 0;
+  }
+  output_file->bytes_written += length;
+  return gt_output_file_write_data(output_file,data,length);
+}
+
 gt_status gt_output_file_close(gt_output_file* const output_file) {
   GT_OUTPUT_FILE_CONSISTENCY_CHECK(output_file);
   gt_status error_code = 0;
+  // Content written through another handle (i.e. by a forked writer)
+  // is complete and comes with its own EOF marker and index
+  struct stat stat_info;
+  const bool foreign_content = output_file->bytes_written==0 &&
+      fstat(fileno(output_file->file),&stat_info)==0 && stat_info.st_size>0;
   switch(output_file->compression_type) {
   case GZIP:
   case BZIP2:
@@ -176,6 +258,21 @@ gt_status gt_output_file_close(gt_output_file* const output_file) {
 	  gt_cond_error(error_code,FILE_CLOSE,output_file->file_name);
   	pthread_join(output_file->pth,NULL);
   	break;
+  case BGZF:
+    // Flush the pending blocks and write the EOF marker
+    if (!foreign_content && !gt_bgzf_writer_close(output_file->cfile)) {
+      gt_error(FILE_WRITE,output_file->file_name);
+      error_code |= GT_OUTPUT_FILE_FAIL;
+    }
+    if (output_file->template_index!=NULL) {
+      gt_vector_copy(output_file->template_index->offsets,gt_bgzf_writer_get_index(output_file->cfile));
+    }
+    gt_bgzf_writer_delete(output_file->cfile);
+    if(strcmp(output_file->file_name, GT_STREAM_FILE_NAME)) {
+      error_code|=fclose(output_file->file);
+      gt_cond_error(error_code,FILE_CLOSE,output_file->file_name);
+    }
+    break;
   default:
     // Close file not stream
     if(strcmp(output_file->file_name, GT_STREAM_FILE_NAME)) {
@@ -184,6 +281,21 @@ gt_status gt_output_file_close(gt_output_file* const output_file) {
     }
   	break;
   }
+  // Write the template index
+  if (output_file->template_index!=NULL) {
+    gt_template_index* const template_index = output_file->template_index;
+    if (!foreign_content) {
+      const uint64_t num_lines = output_file->lines_written+(output_file->line_open ? 1 : 0);
+      template_index->num_templates = (num_lines+output_file->template_lines-1)/output_file->template_lines;
+      // Bind the index to the file as it is now (readers reject a rewritten file)
+      if (!gt_template_index_bind_data(template_index,output_file->file_name) ||
+          !gt_template_index_write(template_index,output_file->template_index_file_name)) {
+        gt_error(FILE_WRITE,output_file->template_index_file_name);
+        error_code |= GT_OUTPUT_FILE_FAIL;
+      }
+    }
+    gt_template_index_delete(template_index);
+  }
   // Delete allocated buffers
   uint64_t i;
   for (i=0;i<GT_MAX_OUTPUT_BUFFERS&&output_file->buffer[i]!=NULL;++i) {
@@ -207,7 +319,20 @@ GT_INLINE gt_status gt_vofprintf(gt_output_file* const output_file,const char *t
   gt_status error_code;
   GT_BEGIN_MUTEX_SECTION(output_file->out_file_mutex)
   {
-    error_code = vfprintf(output_file->file,template,v_args);
+    if (output_file->template_index!=NULL || output_file->compression_type==BGZF) {
+      // Indexed and BGZF compressed content is formatted first
+      va_list v_args_cpy;
+      va_copy(v_args_cpy,v_args);
+      const int length = vsnprintf(NULL,0,template,v_args_cpy);
+      va_end(v_args_cpy);
+      char* const buffer = gt_malloc(length+1);
+      vsnprintf(buffer,length+1,template,v_args);
+      error_code = (gt_output_file_fwrite(output_file,buffer,length)==length) ? length : -1;
+      gt_free(buffer);
+    } else {
+      error_code = vfprintf(output_file->file,template,v_args);
+      if (error_code>0) output_file->bytes_written += error_code;
+    }
   }
   GT_END_MUTEX_SECTION(output_file->out_file_mutex);
   return error_code;
@@ -221,6 +346,17 @@ GT_INLINE gt_status gt_ofprintf(gt_output_file* const output_file,const char *te
   va_end(v_args);
   return error_code;
 }
+GT_INLINE gt_status gt_ofwrite(gt_output_file* const output_file,const void* const data,const uint64_t length) {
+  GT_OUTPUT_FILE_CHECK(output_file);
+  GT_NULL_CHECK(data);
+  uint64_t bytes_written;
+  GT_BEGIN_MUTEX_SECTION(output_file->out_file_mutex)
+  {
+    bytes_written = gt_output_file_fwrite(output_file,data,length);
+  }
+  GT_END_MUTEX_SECTION(output_file->out_file_mutex);
+  return (bytes_written==length) ? (gt_status)length : -1;
+}
 
 /*
  * Internal Buffers Accessors
@@ -287,8 +423,7 @@ GT_INLINE gt_output_buffer* gt_output_file_write_buffer(
     gt_vector* const vbuffer = gt_output_buffer_to_vchar(output_buffer);
     GT_BEGIN_MUTEX_SECTION(output_file->out_file_mutex)
     {
-      bytes_written = fwrite(gt_vector_get_mem(vbuffer,char),1,
-          gt_vector_get_used(vbuffer),output_file->file);
+      bytes_written = gt_output_file_fwrite(output_file,gt_vector_get_mem(vbuffer,char),gt_vector_get_used(vbuffer));
     }
     GT_END_MUTEX_SECTION(output_file->out_file_mutex);
     gt_cond_fatal_error(bytes_written!=gt_vector_get_used(vbuffer),OUTPUT_FILE_FAIL_WRITE);
@@ -330,7 +465,7 @@ GT_INLINE gt_output_buffer* gt_output_file_sorted_write_buffer_asynchronous(
     if (gt_output_buffer_get_used(output_buffer) > 0) {
       gt_vector* const vbuffer = gt_output_buffer_to_vchar(output_buffer);
       const int64_t bytes_written =
-          fwrite(gt_vector_get_mem(vbuffer,char),1,gt_vector_get_used(vbuffer),output_file->file);
+          gt_output_file_fwrite(output_file,gt_vector_get_mem(vbuffer,char),gt_vector_get_used(vbuffer));
       gt_cond_fatal_error(bytes_written!=gt_vector_get_used(vbuffer),OUTPUT_FILE_FAIL_WRITE);
     }
     // Update buffers' state
@@ -38,6 +38,10 @@ GT_INLINE void gt_generic_printer_attributes_set_format(
       attributes->output_format = FASTA;
       attributes->output_fasta_attributes = gt_output_fasta_attributes_new();
       break;
+    case GTB:
+      attributes->output_format = GTB;
+      attributes->output_map_attributes = gt_output_map_attributes_new();
+      break;
     case MAP:
     default:
       attributes->output_format = MAP;
@@ -64,6 +68,9 @@ GT_INLINE gt_status gt_output_generic_gprint_alignment(gt_generic_printer* const
     case FASTA:
       gt_output_fasta_gprint_alignment(gprinter,alignment,attributes->output_fasta_attributes);
       break;
+    case GTB:
+      gt_output_gtb_gprint_alignment(gprinter,alignment,attributes->output_map_attributes);
+      break;
     case MAP:
     default:
       gt_output_map_gprint_alignment(gprinter,alignment,attributes->output_map_attributes);
@@ -86,6 +93,9 @@ GT_INLINE gt_status gt_output_generic_gprint_template(gt_generic_printer* const
     case FASTA:
       gt_output_fasta_gprint_template(gprinter,template,attributes->output_fasta_attributes);
       break;
+    case GTB:
+      gt_output_gtb_gprint_template(gprinter,template,attributes->output_map_attributes);
+      break;
     case MAP:
     default:
       gt_output_map_gprint_gem_template(gprinter,template,attributes->output_map_attributes);
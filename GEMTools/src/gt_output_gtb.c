@@ -0,0 +1,327 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt_output_gtb.c
+ * DATE: 18/10/2026
+ * DESCRIPTION: GTB writer (binary templates). Records are encoded straight into the
+ *   output buffer of buffered printers (other printers use a record buffer)
+ */
+
+#include "gt_output_gtb.h"
+
+#define GT_OGTB_RECORD_BUFFER_SIZE GT_BUFFER_SIZE_1K
+#define GT_OGTB_NUM_INITIAL_SEQ_NAMES 10
+
+/*
+ * Record encoding
+ */
+GT_INLINE void gt_ogtb_write_byte(gt_output_buffer* const record_buffer,const uint8_t value) {
+  gt_vector_reserve_additional(record_buffer->buffer,1);
+  *gt_vector_get_free_elm(record_buffer->buffer,uint8_t) = value;
+  gt_vector_inc_used(record_buffer->buffer);
+}
+GT_INLINE void gt_ogtb_write_varint(gt_output_buffer* const record_buffer,uint64_t value) {
+  gt_vector_reserve_additional(record_buffer->buffer,10);
+  uint8_t* const varint = gt_vector_get_free_elm(record_buffer->buffer,uint8_t);
+  uint64_t length = 0;
+  while (value>=0x80) {
+    varint[length++] = (value&0x7f)|0x80;
+    value >>= 7;
+  }
+  varint[length++] = value;
+  gt_vector_add_used(record_buffer->buffer,length);
+}
+GT_INLINE void gt_ogtb_write_string(gt_output_buffer* const record_buffer,gt_string* const string) {
+  const uint64_t length = gt_string_get_length(string);
+  gt_ogtb_write_varint(record_buffer,length);
+  if (length>0) gt_bwrite(record_buffer,gt_string_get_string(string),length);
+}
+/* Reads made mostly of ACGT are packed into 2 bits per base (other bases are listed as exceptions) */
+#define GT_OGTB_NO_BASE_CODE 4
+GT_INLINE uint8_t gt_ogtb_base_code(const char base) {
+  switch (base) {
+    case 'A': return 0;
+    case 'C': return 1;
+    case 'G': return 2;
+    case 'T': return 3;
+    default: return GT_OGTB_NO_BASE_CODE;
+  }
+}
+GT_INLINE void gt_ogtb_write_read(gt_output_buffer* const record_buffer,gt_string* const read) {
+  const uint64_t length = gt_string_get_length(read);
+  const char* const bases = gt_string_get_string(read);
+  const uint64_t packed_length = GT_GTB_PACKED_LENGTH(length);
+  uint64_t i, num_exceptions = 0;
+  for (i=0;i<length;++i) {
+    if (gt_ogtb_base_code(bases[i])==GT_OGTB_NO_BASE_CODE) ++num_exceptions;
+  }
+  // Exceptions take at least 2 bytes each
+  if (length==0 || packed_length+1+2*num_exceptions>=length) {
+    gt_ogtb_write_varint(record_buffer,length<<1);
+    if (length>0) gt_bwrite(record_buffer,bases,length);
+    return;
+  }
+  gt_ogtb_write_varint(record_buffer,(length<<1)|GT_GTB_READ_PACKED);
+  gt_ogtb_write_varint(record_buffer,num_exceptions);
+  uint64_t last_exception = 0;
+  for (i=0;i<length && num_exceptions>0;++i) {
+    if (gt_ogtb_base_code(bases[i])==GT_OGTB_NO_BASE_CODE) {
+      gt_ogtb_write_varint(record_buffer,i-last_exception);
+      gt_ogtb_write_byte(record_buffer,bases[i]);
+      last_exception = i;
+      --num_exceptions;
+    }
+  }
+  gt_vector_reserve_additional(record_buffer->buffer,packed_length);
+  uint8_t* const packed = gt_vector_get_free_elm(record_buffer->buffer,uint8_t);
+  memset(packed,0,packed_length);
+  for (i=0;i<length;++i) {
+    const uint8_t code = gt_ogtb_base_code(bases[i]);
+    if (code!=GT_OGTB_NO_BASE_CODE) packed[i/4] |= code<<(2*(i%4));
+  }
+  gt_vector_add_used(record_buffer->buffer,packed_length);
+}
+GT_INLINE void gt_ogtb_write_counters(
+    gt_output_buffer* const record_buffer,gt_vector* const counters,const uint64_t mcs,const bool not_unique) {
+  gt_ogtb_write_varint(record_buffer,gt_vector_get_used(counters));
+  GT_VECTOR_ITERATE(counters,counter,counter_pos,uint64_t) {
+    gt_ogtb_write_varint(record_buffer,*counter);
+  }
+  // Undefined MCS (UINT64_MAX) wraps to 0
+  gt_ogtb_write_varint(record_buffer,((mcs+1)<<1)|(not_unique?1:0));
+}
+/* Sequence names of the record */
+GT_INLINE uint64_t gt_ogtb_seq_name_idx(gt_vector* const seq_names,gt_string* const seq_name) {
+  const uint64_t num_seq_names = gt_vector_get_used(seq_names);
+  gt_string** const names = gt_vector_get_mem(seq_names,gt_string*);
+  uint64_t i;
+  for (i=num_seq_names;i>0;--i) { // Last names first (maps are usually sorted)
+    if (names[i-1]==seq_name || gt_string_equals(names[i-1],seq_name)) return i-1;
+  }
+  return num_seq_names;
+}
+GT_INLINE void gt_ogtb_add_seq_names(gt_vector* const seq_names,gt_alignment* const alignment) {
+  GT_ALIGNMENT_ITERATE(alignment,map) {
+    GT_MAP_ITERATE(map,map_block) {
+      if (gt_ogtb_seq_name_idx(seq_names,map_block->seq_name)==gt_vector_get_used(seq_names)) {
+        gt_vector_insert(seq_names,map_block->seq_name,gt_string*);
+      }
+    }
+  }
+}
+GT_INLINE void gt_ogtb_write_maps(
+    gt_output_buffer* const record_buffer,gt_alignment* const alignment,
+    gt_vector* const seq_names,uint64_t* const last_position,const bool print_scores) {
+  gt_ogtb_write_varint(record_buffer,gt_alignment_get_num_maps(alignment));
+  GT_ALIGNMENT_ITERATE(alignment,map) {
+    GT_MAP_ITERATE(map,map_block) {
+      const gt_junction_t junction = (gt_map_has_next_block(map_block)) ? gt_map_get_junction(map_block) : NO_JUNCTION;
+      const uint64_t flags = (gt_map_get_strand(map_block)&GT_GTB_FLAG_STRAND_MASK) |
+          ((junction&GT_GTB_FLAG_JUNCTION_MASK)<<GT_GTB_FLAG_JUNCTION_SHIFT);
+      gt_ogtb_write_varint(record_buffer,
+          (gt_ogtb_seq_name_idx(seq_names,map_block->seq_name)<<GT_GTB_FLAG_BITS)|flags);
+      // Positions are deltas to the previous map block of the record
+      const uint64_t position = gt_map_get_position(map_block);
+      gt_ogtb_write_varint(record_buffer,gt_gtb_zigzag_encode(position-*last_position));
+      *last_position = position;
+      gt_ogtb_write_varint(record_buffer,gt_map_get_base_length(map_block));
+      if (junction!=NO_JUNCTION) {
+        gt_ogtb_write_varint(record_buffer,gt_gtb_zigzag_encode(gt_map_get_junction_size(map_block)));
+      }
+      gt_ogtb_write_varint(record_buffer,(print_scores) ? map_block->gt_score+1 : 0);
+      gt_ogtb_write_byte(record_buffer,map_block->phred_score);
+      // Mismatches
+      gt_ogtb_write_varint(record_buffer,gt_map_get_num_misms(map_block));
+      uint64_t last_misms_position = 0;
+      GT_MISMS_ITERATE(map_block,misms) {
+        gt_ogtb_write_varint(record_buffer,
+            (gt_gtb_zigzag_encode(misms->position-last_misms_position)<<GT_GTB_MISMS_TYPE_BITS)|misms->misms_type);
+        last_misms_position = misms->position;
+        if (misms->misms_type==MISMS) {
+          gt_ogtb_write_byte(record_buffer,misms->base);
+        } else {
+          gt_ogtb_write_varint(record_buffer,misms->size);
+        }
+      }
+    }
+  }
+}
+GT_INLINE uint64_t gt_ogtb_map_idx(gt_alignment* const alignment,gt_map* const map,uint64_t* const hint) {
+  if (map==NULL) return 0;
+  gt_map** const maps = gt_vector_get_mem(alignment->maps,gt_map*);
+  const uint64_t num_maps = gt_alignment_get_num_maps(alignment);
+  uint64_t i;
+  for (i=*hint;i<num_maps;++i) { // MMaps are usually sorted as the maps of each end
+    if (maps[i]==map) { *hint = i+1; return i+1; }
+  }
+  for (i=0;i<*hint && i<num_maps;++i) {
+    if (maps[i]==map) { *hint = i+1; return i+1; }
+  }
+  return UINT64_MAX;
+}
+GT_INLINE gt_status gt_ogtb_write_mmaps(
+    gt_output_buffer* const record_buffer,gt_template* const template,const bool print_scores) {
+  gt_alignment* const end1 = gt_template_get_block(template,0);
+  gt_alignment* const end2 = gt_template_get_block(template,1);
+  uint64_t end1_hint = 0, end2_hint = 0;
+  gt_ogtb_write_varint(record_buffer,gt_template_get_num_mmaps(template));
+  GT_VECTOR_ITERATE(template->mmaps,mmap,mmap_pos,gt_mmap) {
+    const uint64_t end1_idx = gt_ogtb_map_idx(end1,mmap->mmap[0],&end1_hint);
+    const uint64_t end2_idx = gt_ogtb_map_idx(end2,mmap->mmap[1],&end2_hint);
+    if (end1_idx==UINT64_MAX || end2_idx==UINT64_MAX) return GT_OGTB_MMAP_NOT_FOUND;
+    gt_ogtb_write_varint(record_buffer,end1_idx);
+    gt_ogtb_write_varint(record_buffer,end2_idx);
+    gt_ogtb_write_varint(record_buffer,mmap->attributes.distance);
+    gt_ogtb_write_varint(record_buffer,(print_scores) ? mmap->attributes.gt_score+1 : 0);
+    gt_ogtb_write_byte(record_buffer,mmap->attributes.phred_score);
+  }
+  return 0;
+}
+/* Encodes the template (num_blocks>1 for templates, 1 for alignments) */
+GT_INLINE gt_status gt_ogtb_write_record(
+    gt_output_buffer* const record_buffer,gt_template* const template,gt_alignment* const alignment,
+    gt_output_map_attributes* const output_map_attributes) {
+  gt_vector* const buffer = record_buffer->buffer;
+  const uint64_t record_offset = gt_vector_get_used(buffer);
+  const uint64_t num_blocks = (template!=NULL) ? gt_template_get_num_blocks(template) : 1;
+  gt_status error_code = 0;
+  uint64_t i;
+  // Record size (set at the end)
+  gt_vector_reserve_additional(buffer,GT_GTB_MAX_RECORD_SIZE_LENGTH);
+  gt_vector_add_used(buffer,GT_GTB_MAX_RECORD_SIZE_LENGTH);
+  // TAG
+  if (template!=NULL) {
+    gt_output_map_bprint_tag(record_buffer,template->tag,template->attributes,output_map_attributes);
+  } else {
+    gt_output_map_bprint_tag(record_buffer,alignment->tag,alignment->attributes,output_map_attributes);
+  }
+  gt_ogtb_write_byte(record_buffer,TAB);
+  // READ(s) & QUALITIES
+  gt_ogtb_write_varint(record_buffer,num_blocks);
+  for (i=0;i<num_blocks;++i) {
+    gt_alignment* const block = (template!=NULL) ? gt_template_get_block(template,i) : alignment;
+    gt_ogtb_write_read(record_buffer,block->read);
+    gt_ogtb_write_string(record_buffer,block->qualities);
+  }
+  // COUNTERS
+  if (num_blocks>1) {
+    gt_ogtb_write_counters(record_buffer,gt_template_get_counters_vector(template),
+        gt_template_get_mcs(template),gt_template_get_not_unique_flag(template));
+  }
+  for (i=0;i<num_blocks;++i) {
+    gt_alignment* const block = (template!=NULL) ? gt_template_get_block(template,i) : alignment;
+    gt_ogtb_write_counters(record_buffer,gt_alignment_get_counters_vector(block),
+        gt_alignment_get_mcs(block),gt_alignment_get_not_unique_flag(block));
+  }
+  // SEQUENCE NAMES & MAPS
+  gt_vector* const seq_names = gt_vector_new(GT_OGTB_NUM_INITIAL_SEQ_NAMES,sizeof(gt_string*));
+  for (i=0;i<num_blocks;++i) {
+    gt_ogtb_add_seq_names(seq_names,(template!=NULL) ? gt_template_get_block(template,i) : alignment);
+  }
+  gt_ogtb_write_varint(record_buffer,gt_vector_get_used(seq_names));
+  GT_VECTOR_ITERATE(seq_names,seq_name,seq_name_pos,gt_string*) {
+    gt_ogtb_write_string(record_buffer,*seq_name);
+  }
+  uint64_t last_position = 0;
+  for (i=0;i<num_blocks;++i) {
+    gt_ogtb_write_maps(record_buffer,(template!=NULL) ? gt_template_get_block(template,i) : alignment,
+        seq_names,&last_position,output_map_attributes->print_scores);
+  }
+  gt_vector_delete(seq_names);
+  // MMAPS
+  if (num_blocks>1) {
+    error_code = gt_ogtb_write_mmaps(record_buffer,template,output_map_attributes->print_scores);
+  }
+  if (error_code) {
+    gt_vector_set_used(buffer,record_offset); // Discard the record
+    gt_error(OUTPUT_GTB_MMAP_NOT_FOUND,gt_template_get_tag(template));
+    return error_code;
+  }
+  // Set the record size (varint placed right before the record body)
+  const uint64_t record_size = gt_vector_get_used(buffer)-record_offset-GT_GTB_MAX_RECORD_SIZE_LENGTH;
+  uint8_t* const record = gt_vector_get_mem(buffer,uint8_t)+record_offset;
+  uint8_t record_header[GT_GTB_MAX_RECORD_SIZE_LENGTH];
+  uint64_t header_length = 0, value = record_size;
+  while (value>=0x80) {
+    record_header[header_length++] = (value&0x7f)|0x80;
+    value >>= 7;
+  }
+  record_header[header_length++] = value;
+  memcpy(record,record_header,header_length);
+  memmove(record+header_length,record+GT_GTB_MAX_RECORD_SIZE_LENGTH,record_size);
+  gt_vector_set_used(buffer,record_offset+header_length+record_size);
+  return 0;
+}
+/* Encodes the record into the buffer of the printer (if any) or writes it through */
+GT_INLINE gt_status gt_ogtb_gprint_record(
+    gt_generic_printer* const gprinter,gt_template* const template,gt_alignment* const alignment,
+    gt_output_map_attributes* const output_map_attributes) {
+  switch (gprinter->printer_type) {
+    case GT_BUFFER_PRINTER:
+      return gt_ogtb_write_record(gprinter->output_buffer,template,alignment,output_map_attributes);
+    case GT_BOF_PRINTER: {
+      gt_buffered_output_file* const buffered_output_file = gprinter->buffered_output_file;
+      gt_bofwrite(buffered_output_file,"",0); // Safety dump (if needed)
+      return gt_ogtb_write_record(buffered_output_file->buffer,template,alignment,output_map_attributes);
+    }
+    default: {
+      gt_output_buffer record_buffer;
+      record_buffer.buffer = gt_vector_new(GT_OGTB_RECORD_BUFFER_SIZE,sizeof(char));
+      gt_output_buffer_initiallize(&record_buffer,GT_OUTPUT_BUFFER_BUSY);
+      const gt_status error_code = gt_ogtb_write_record(&record_buffer,template,alignment,output_map_attributes);
+      if (!error_code) {
+        gt_gwrite(gprinter,gt_vector_get_mem(record_buffer.buffer,char),gt_vector_get_used(record_buffer.buffer));
+      }
+      gt_vector_delete(record_buffer.buffer);
+      return error_code;
+    }
+  }
+}
+
+/*
+ * Header
+ */
+GT_INLINE gt_status gt_output_gtb_gprint_header(gt_generic_printer* const gprinter) {
+  GT_GENERIC_PRINTER_CHECK(gprinter);
+  const char header[GT_GTB_HEADER_LENGTH] = { GT_GTB_MAGIC[0], GT_GTB_MAGIC[1], GT_GTB_MAGIC[2], GT_GTB_VERSION };
+  gt_gwrite(gprinter,header,GT_GTB_HEADER_LENGTH);
+  return 0;
+}
+GT_INLINE gt_status gt_output_gtb_fprint_header(FILE* file) {
+  GT_NULL_CHECK(file);
+  gt_generic_printer gprinter;
+  gt_generic_new_file_printer(&gprinter,file);
+  return gt_output_gtb_gprint_header(&gprinter);
+}
+GT_INLINE gt_status gt_output_gtb_ofprint_header(gt_output_file* const output_file) {
+  GT_OUTPUT_FILE_CHECK(output_file);
+  gt_generic_printer gprinter;
+  gt_generic_new_output_file_printer(&gprinter,output_file);
+  return gt_output_gtb_gprint_header(&gprinter);
+}
+
+/*
+ * Records
+ */
+#undef GT_GENERIC_PRINTER_DELEGATE_CALL_PARAMS
+#define GT_GENERIC_PRINTER_DELEGATE_CALL_PARAMS template,output_map_attributes
+GT_GENERIC_PRINTER_IMPLEMENTATION(gt_output_gtb,print_template,gt_template* const template,gt_output_map_attributes* const output_map_attributes);
+GT_INLINE gt_status gt_output_gtb_gprint_template(
+    gt_generic_printer* const gprinter,gt_template* const template,gt_output_map_attributes* const output_map_attributes) {
+  GT_GENERIC_PRINTER_CHECK(gprinter);
+  GT_TEMPLATE_CHECK(template);
+  GT_NULL_CHECK(output_map_attributes);
+  GT_TEMPLATE_IF_REDUCES_TO_ALINGMENT(template,alignment) {
+    return gt_ogtb_gprint_record(gprinter,NULL,alignment,output_map_attributes);
+  } GT_TEMPLATE_END_REDUCTION;
+  return gt_ogtb_gprint_record(gprinter,template,NULL,output_map_attributes);
+}
+#undef GT_GENERIC_PRINTER_DELEGATE_CALL_PARAMS
+#define GT_GENERIC_PRINTER_DELEGATE_CALL_PARAMS alignment,output_map_attributes
+GT_GENERIC_PRINTER_IMPLEMENTATION(gt_output_gtb,print_alignment,gt_alignment* const alignment,gt_output_map_attributes* const output_map_attributes);
+GT_INLINE gt_status gt_output_gtb_gprint_alignment(
+    gt_generic_printer* const gprinter,gt_alignment* const alignment,gt_output_map_attributes* const output_map_attributes) {
+  GT_GENERIC_PRINTER_CHECK(gprinter);
+  GT_ALIGNMENT_CHECK(alignment);
+  GT_NULL_CHECK(output_map_attributes);
+  return gt_ogtb_gprint_record(gprinter,NULL,alignment,output_map_attributes);
+}
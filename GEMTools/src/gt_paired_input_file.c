@@ -0,0 +1,230 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt_paired_input_file.c
+ * DATE: 18/10/2026
+ * DESCRIPTION: Paired input of two mate files. One reader thread per mate file
+ *   fills a bounded ring of blocks; the merger zips matching blocks.
+ */
+
+#include "gt_paired_input_file.h"
+
+#define GT_PIF_NUM_MATES 2
+
+typedef struct {
+  gt_paired_input_file* paired_input_file;
+  gt_paired_input_mate* mate;
+} gt_paired_input_reader_args;
+
+/*
+ * Reader threads
+ *   The block being read is owned by the reader until it is published
+ *   (blocks_used is incremented); the merger only touches published blocks.
+ */
+void* gt_paired_input_file_reader(void* const args) {
+  gt_paired_input_file* const paired_input_file = ((gt_paired_input_reader_args*)args)->paired_input_file;
+  gt_paired_input_mate* const mate = ((gt_paired_input_reader_args*)args)->mate;
+  gt_free(args);
+  gt_input_file* const input_file = mate->input_file;
+  while (true) {
+    // Wait for a free block
+    gt_paired_input_block* block;
+    GT_BEGIN_MUTEX_SECTION(paired_input_file->ring_mutex) {
+      while (!paired_input_file->closed && mate->blocks_used==paired_input_file->num_blocks) {
+        GT_CV_WAIT(paired_input_file->block_free_cond,paired_input_file->ring_mutex);
+      }
+      if (paired_input_file->closed) {
+        GT_END_MUTEX_SECTION(paired_input_file->ring_mutex);
+        break;
+      }
+      block = mate->blocks + ((mate->blocks_begin+mate->blocks_used)%paired_input_file->num_blocks);
+    } GT_END_MUTEX_SECTION(paired_input_file->ring_mutex);
+    // Read (and decompress) the block
+    gt_input_file_lock(input_file);
+    block->first_line_num = input_file->processed_lines+1;
+    block->lines_in_buffer = (input_file->eof) ? 0 :
+        gt_input_file_get_lines(input_file,block->block_buffer,paired_input_file->num_lines);
+    gt_input_file_unlock(input_file);
+    // Publish
+    GT_BEGIN_MUTEX_SECTION(paired_input_file->ring_mutex) {
+      if (block->lines_in_buffer==0) {
+        mate->eof = true;
+      } else {
+        ++(mate->blocks_used);
+      }
+      GT_CV_BROADCAST(paired_input_file->block_read_cond);
+    } GT_END_MUTEX_SECTION(paired_input_file->ring_mutex);
+    if (mate->eof) break;
+  }
+  return NULL;
+}
+
+/*
+ * Setup
+ */
+gt_paired_input_file* gt_paired_input_file_new(
+    gt_input_file* const end1_input_file,gt_input_file* const end2_input_file,const uint64_t num_blocks) {
+  GT_INPUT_FILE_CHECK(end1_input_file);
+  GT_INPUT_FILE_CHECK(end2_input_file);
+  gt_paired_input_file* const paired_input_file = gt_alloc(gt_paired_input_file);
+  paired_input_file->num_blocks = (num_blocks>0) ? num_blocks : GT_PIF_DEFAULT_NUM_BLOCKS;
+  paired_input_file->num_lines = GT_PIF_NUM_LINES;
+  paired_input_file->closed = false;
+  paired_input_file->processed_id = 0;
+  gt_cond_fatal_error(pthread_mutex_init(&paired_input_file->ring_mutex,NULL),SYS_MUTEX_INIT);
+  gt_cond_fatal_error(pthread_cond_init(&paired_input_file->block_read_cond,NULL),SYS_COND_VAR_INIT);
+  gt_cond_fatal_error(pthread_cond_init(&paired_input_file->block_free_cond,NULL),SYS_COND_VAR_INIT);
+  // Mates
+  gt_input_file* const input_files[GT_PIF_NUM_MATES] = { end1_input_file, end2_input_file };
+  paired_input_file->mates = gt_calloc(GT_PIF_NUM_MATES,gt_paired_input_mate,true);
+  uint64_t i, j;
+  for (i=0;i<GT_PIF_NUM_MATES;++i) {
+    gt_paired_input_mate* const mate = paired_input_file->mates+i;
+    mate->input_file = input_files[i];
+    mate->blocks = gt_calloc(paired_input_file->num_blocks,gt_paired_input_block,true);
+    for (j=0;j<paired_input_file->num_blocks;++j) {
+      mate->blocks[j].block_buffer = gt_vector_new(GT_BUFFER_SIZE_4M,sizeof(uint8_t));
+    }
+    mate->blocks_begin = 0;
+    mate->blocks_used = 0;
+    mate->eof = false;
+  }
+  // Launch the readers
+  for (i=0;i<GT_PIF_NUM_MATES;++i) {
+    gt_paired_input_reader_args* const args = gt_alloc(gt_paired_input_reader_args);
+    args->paired_input_file = paired_input_file;
+    args->mate = paired_input_file->mates+i;
+    gt_cond_fatal_error(pthread_create(&(paired_input_file->mates[i].reader_thread),
+        NULL,gt_paired_input_file_reader,args),SYS_THREAD);
+  }
+  return paired_input_file;
+}
+void gt_paired_input_file_abort(gt_paired_input_file* const paired_input_file) {
+  GT_PAIRED_INPUT_FILE_CHECK(paired_input_file);
+  GT_BEGIN_MUTEX_SECTION(paired_input_file->ring_mutex) {
+    paired_input_file->closed = true;
+    GT_CV_BROADCAST(paired_input_file->block_free_cond);
+    GT_CV_BROADCAST(paired_input_file->block_read_cond);
+  } GT_END_MUTEX_SECTION(paired_input_file->ring_mutex);
+}
+void gt_paired_input_file_close(gt_paired_input_file* const paired_input_file) {
+  GT_PAIRED_INPUT_FILE_CHECK(paired_input_file);
+  gt_paired_input_file_abort(paired_input_file);
+  uint64_t i, j;
+  for (i=0;i<GT_PIF_NUM_MATES;++i) {
+    gt_paired_input_mate* const mate = paired_input_file->mates+i;
+    gt_cond_fatal_error(pthread_join(mate->reader_thread,NULL),SYS_THREAD_JOIN);
+    for (j=0;j<paired_input_file->num_blocks;++j) {
+      gt_vector_delete(mate->blocks[j].block_buffer);
+    }
+    gt_free(mate->blocks);
+  }
+  gt_free(paired_input_file->mates);
+  gt_cond_fatal_error(pthread_cond_destroy(&paired_input_file->block_read_cond),SYS_COND_VAR_DESTROY);
+  gt_cond_fatal_error(pthread_cond_destroy(&paired_input_file->block_free_cond),SYS_COND_VAR_DESTROY);
+  gt_cond_fatal_error(pthread_mutex_destroy(&paired_input_file->ring_mutex),SYS_MUTEX_DESTROY);
+  gt_free(paired_input_file);
+}
+
+/*
+ * Merger
+ */
+#define GT_PIF_MATE_READY(mate) ((mate)->blocks_used>0 || (mate)->eof)
+GT_INLINE void gt_paired_input_file_swap_block(
+    gt_paired_input_block* const block,gt_buffered_input_file* const buffered_input,const uint64_t block_id) {
+  // Hand the block buffer over (the old buffer is recycled by the reader)
+  gt_vector* const block_buffer = buffered_input->block_buffer;
+  buffered_input->block_buffer = block->block_buffer;
+  block->block_buffer = block_buffer;
+  buffered_input->block_id = block_id % UINT32_MAX;
+  buffered_input->lines_in_buffer = block->lines_in_buffer;
+  buffered_input->current_line_num = block->first_line_num;
+  buffered_input->cursor = gt_vector_get_mem(buffered_input->block_buffer,char);
+}
+GT_INLINE gt_status gt_paired_input_file_get_blocks(
+    gt_paired_input_file* const paired_input_file,
+    gt_buffered_input_file* const buffered_end1,gt_buffered_input_file* const buffered_end2) {
+  GT_PAIRED_INPUT_FILE_CHECK(paired_input_file);
+  GT_BUFFERED_INPUT_FILE_CHECK(buffered_end1);
+  GT_BUFFERED_INPUT_FILE_CHECK(buffered_end2);
+  gt_paired_input_mate* const end1 = paired_input_file->mates;
+  gt_paired_input_mate* const end2 = paired_input_file->mates+1;
+  gt_status error_code = GT_PIF_OK;
+  GT_BEGIN_MUTEX_SECTION(paired_input_file->ring_mutex) {
+    while (!paired_input_file->closed && !(GT_PIF_MATE_READY(end1) && GT_PIF_MATE_READY(end2))) {
+      GT_CV_WAIT(paired_input_file->block_read_cond,paired_input_file->ring_mutex);
+    }
+    if (paired_input_file->closed || (end1->blocks_used==0 && end2->blocks_used==0)) {
+      error_code = GT_PIF_EOF;
+    } else if (end1->blocks_used==0 || end2->blocks_used==0) {
+      error_code = GT_PIF_PE_UNSYNCH_FILES;
+    } else {
+      const uint64_t block_id = (paired_input_file->processed_id)++;
+      gt_paired_input_file_swap_block(end1->blocks+end1->blocks_begin,buffered_end1,block_id);
+      gt_paired_input_file_swap_block(end2->blocks+end2->blocks_begin,buffered_end2,block_id);
+      end1->blocks_begin = (end1->blocks_begin+1) % paired_input_file->num_blocks;
+      end2->blocks_begin = (end2->blocks_begin+1) % paired_input_file->num_blocks;
+      --(end1->blocks_used);
+      --(end2->blocks_used);
+      GT_CV_BROADCAST(paired_input_file->block_free_cond);
+    }
+  } GT_END_MUTEX_SECTION(paired_input_file->ring_mutex);
+  return error_code;
+}
+GT_INLINE gt_status gt_paired_input_file_synch_blocks(
+    gt_paired_input_file* const paired_input_file,
+    gt_buffered_input_file* const buffered_end1,gt_buffered_input_file* const buffered_end2) {
+  GT_PAIRED_INPUT_FILE_CHECK(paired_input_file);
+  GT_BUFFERED_INPUT_FILE_CHECK(buffered_end1);
+  // Check the end_of_block. Reload buffer if needed (synch)
+  if (gt_buffered_input_file_eob(buffered_end1)) {
+    // Dump buffer if BOF it attached to the input, and get new out block (always FIRST)
+    gt_buffered_input_file_dump_attached_buffers(buffered_end1->attached_buffered_output_file);
+    gt_status error_code;
+    if ((error_code=gt_paired_input_file_get_blocks(paired_input_file,buffered_end1,buffered_end2))!=GT_PIF_OK) {
+      return error_code;
+    }
+    // Assign block ID
+    gt_buffered_input_file_set_id_attached_buffers(buffered_end1->attached_buffered_output_file,buffered_end1->block_id);
+  }
+  return GT_PIF_OK;
+}
+
+/*
+ * Parsers
+ */
+GT_INLINE gt_status gt_paired_input_file_get_templates(
+    gt_buffered_input_file* const buffered_end1,gt_buffered_input_file* const buffered_end2,
+    gt_template* const end1_template,gt_template* const end2_template,
+    gt_generic_parser_attributes* const attributes) {
+  GT_BUFFERED_INPUT_FILE_CHECK(buffered_end1);
+  GT_BUFFERED_INPUT_FILE_CHECK(buffered_end2);
+  // Both blocks hold the same number of lines. The parsers must never
+  // reload a block themselves (the input files belong to the readers)
+  if (gt_buffered_input_file_eob(buffered_end1) || gt_buffered_input_file_eob(buffered_end2)) {
+    return GT_PIF_PE_UNSYNCH_FILES;
+  }
+  gt_status error_code;
+  if ((error_code=gt_input_generic_parser_get_template(buffered_end1,end1_template,attributes))!=GT_STATUS_OK) return error_code;
+  if ((error_code=gt_input_generic_parser_get_template(buffered_end2,end2_template,attributes))!=GT_STATUS_OK) return error_code;
+  // Check the read ids
+  if (!gt_string_equals(gt_template_get_string_tag(end1_template),gt_template_get_string_tag(end2_template))) {
+    return GT_PIF_PE_ID_MISMATCH;
+  }
+  return GT_PIF_OK;
+}
+GT_INLINE void gt_paired_input_file_prompt_error(
+    gt_buffered_input_file* const buffered_end1,gt_buffered_input_file* const buffered_end2,
+    gt_template* const end1_template,gt_template* const end2_template,const gt_status error_code) {
+  const char* const end1_file_name = buffered_end1->input_file->file_name;
+  const char* const end2_file_name = buffered_end2->input_file->file_name;
+  switch (error_code) {
+    case GT_PIF_PE_UNSYNCH_FILES:
+      gt_error(PAIRED_INPUT_UNSYNCH_FILES,end1_file_name,end2_file_name);
+      break;
+    case GT_PIF_PE_ID_MISMATCH:
+      gt_error(PAIRED_INPUT_ID_MISMATCH,end1_file_name,end2_file_name,
+          gt_template_get_tag(end1_template),gt_template_get_tag(end2_template));
+      break;
+    default: /* Reported by the parser */ break;
+  }
+}
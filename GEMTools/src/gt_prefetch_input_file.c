@@ -0,0 +1,157 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt_prefetch_input_file.c
+ * DATE: 18/10/2026
+ * DESCRIPTION: Prefetching input. One reader thread parses blocks of templates
+ *   into a bounded ring; the consumer swaps the parsed templates out.
+ */
+
+#include "gt_prefetch_input_file.h"
+
+/*
+ * Reader thread
+ *   The block being parsed is owned by the reader until it is published
+ *   (blocks_used is incremented); the consumer only touches published blocks.
+ */
+void* gt_prefetch_input_file_reader(void* const args) {
+  gt_prefetch_input_file* const prefetch_input_file = (gt_prefetch_input_file*)args;
+  gt_buffered_input_file* const buffered_input = gt_buffered_input_file_new(prefetch_input_file->input_file);
+  gt_status status = GT_PRF_OK;
+  while (status==GT_PRF_OK) {
+    // Wait for a free block
+    gt_prefetch_input_block* block;
+    GT_BEGIN_MUTEX_SECTION(prefetch_input_file->ring_mutex) {
+      while (!prefetch_input_file->closed && prefetch_input_file->blocks_used==prefetch_input_file->num_blocks) {
+        GT_CV_WAIT(prefetch_input_file->block_free_cond,prefetch_input_file->ring_mutex);
+      }
+      if (prefetch_input_file->closed) {
+        GT_END_MUTEX_SECTION(prefetch_input_file->ring_mutex);
+        break;
+      }
+      block = prefetch_input_file->blocks +
+          ((prefetch_input_file->blocks_begin+prefetch_input_file->blocks_used)%prefetch_input_file->num_blocks);
+    } GT_END_MUTEX_SECTION(prefetch_input_file->ring_mutex);
+    // Read and parse the block
+    block->num_templates = 0;
+    while (block->num_templates < prefetch_input_file->block_size) {
+      status = gt_input_generic_parser_get_template(buffered_input,
+          block->templates[block->num_templates],prefetch_input_file->parser_attributes);
+      if (status!=GT_STATUS_OK) break;
+      ++(block->num_templates);
+    }
+    block->status = (status==GT_STATUS_OK) ? GT_PRF_OK : status;
+    // Publish
+    GT_BEGIN_MUTEX_SECTION(prefetch_input_file->ring_mutex) {
+      ++(prefetch_input_file->blocks_used);
+      GT_CV_BROADCAST(prefetch_input_file->block_read_cond);
+    } GT_END_MUTEX_SECTION(prefetch_input_file->ring_mutex);
+  }
+  gt_buffered_input_file_close(buffered_input);
+  return NULL;
+}
+
+/*
+ * Setup
+ */
+gt_prefetch_input_file* gt_prefetch_input_file_new(
+    gt_input_file* const input_file,const uint64_t num_blocks,const uint64_t block_size,const bool paired_read) {
+  GT_INPUT_FILE_CHECK(input_file);
+  gt_prefetch_input_file* const prefetch_input_file = gt_alloc(gt_prefetch_input_file);
+  prefetch_input_file->input_file = input_file;
+  prefetch_input_file->parser_attributes = gt_input_generic_parser_attributes_new(paired_read);
+  prefetch_input_file->num_blocks = (num_blocks>0) ? num_blocks : GT_PRF_DEFAULT_NUM_BLOCKS;
+  prefetch_input_file->block_size = (block_size>0) ? block_size : GT_PRF_DEFAULT_BLOCK_SIZE;
+  prefetch_input_file->blocks_begin = 0;
+  prefetch_input_file->blocks_used = 0;
+  prefetch_input_file->current_block = NULL;
+  prefetch_input_file->next_template = 0;
+  prefetch_input_file->closed = false;
+  gt_cond_fatal_error(pthread_mutex_init(&prefetch_input_file->ring_mutex,NULL),SYS_MUTEX_INIT);
+  gt_cond_fatal_error(pthread_cond_init(&prefetch_input_file->block_read_cond,NULL),SYS_COND_VAR_INIT);
+  gt_cond_fatal_error(pthread_cond_init(&prefetch_input_file->block_free_cond,NULL),SYS_COND_VAR_INIT);
+  // Blocks
+  prefetch_input_file->blocks = gt_calloc(prefetch_input_file->num_blocks,gt_prefetch_input_block,true);
+  uint64_t i, j;
+  for (i=0;i<prefetch_input_file->num_blocks;++i) {
+    gt_prefetch_input_block* const block = prefetch_input_file->blocks+i;
+    block->templates = gt_calloc(prefetch_input_file->block_size,gt_template*,false);
+    for (j=0;j<prefetch_input_file->block_size;++j) {
+      block->templates[j] = gt_template_new();
+    }
+    block->num_templates = 0;
+    block->status = GT_PRF_OK;
+  }
+  // Launch the reader
+  gt_cond_fatal_error(pthread_create(&prefetch_input_file->reader_thread,
+      NULL,gt_prefetch_input_file_reader,prefetch_input_file),SYS_THREAD);
+  return prefetch_input_file;
+}
+void gt_prefetch_input_file_close(gt_prefetch_input_file* const prefetch_input_file) {
+  GT_PREFETCH_INPUT_FILE_CHECK(prefetch_input_file);
+  GT_BEGIN_MUTEX_SECTION(prefetch_input_file->ring_mutex) {
+    prefetch_input_file->closed = true;
+    GT_CV_BROADCAST(prefetch_input_file->block_free_cond);
+    GT_CV_BROADCAST(prefetch_input_file->block_read_cond);
+  } GT_END_MUTEX_SECTION(prefetch_input_file->ring_mutex);
+  gt_cond_fatal_error(pthread_join(prefetch_input_file->reader_thread,NULL),SYS_THREAD_JOIN);
+  uint64_t i, j;
+  for (i=0;i<prefetch_input_file->num_blocks;++i) {
+    gt_prefetch_input_block* const block = prefetch_input_file->blocks+i;
+    for (j=0;j<prefetch_input_file->block_size;++j) {
+      gt_template_delete(block->templates[j]);
+    }
+    gt_free(block->templates);
+  }
+  gt_free(prefetch_input_file->blocks);
+  gt_input_generic_parser_attributes_delete(prefetch_input_file->parser_attributes);
+  gt_cond_fatal_error(pthread_cond_destroy(&prefetch_input_file->block_read_cond),SYS_COND_VAR_DESTROY);
+  gt_cond_fatal_error(pthread_cond_destroy(&prefetch_input_file->block_free_cond),SYS_COND_VAR_DESTROY);
+  gt_cond_fatal_error(pthread_mutex_destroy(&prefetch_input_file->ring_mutex),SYS_MUTEX_DESTROY);
+  gt_free(prefetch_input_file);
+}
+
+/*
+ * Consumer
+ *   The current block is owned by the consumer, the templates are taken
+ *   without locking. The mutex is only held to release/take a block
+ */
+GT_INLINE gt_status gt_prefetch_input_file_get_template(
+    gt_prefetch_input_file* const prefetch_input_file,gt_template** const template) {
+  GT_PREFETCH_INPUT_FILE_CHECK(prefetch_input_file);
+  GT_NULL_CHECK(template);
+  while (true) {
+    gt_prefetch_input_block* const block = prefetch_input_file->current_block;
+    if (block!=NULL) {
+      if (prefetch_input_file->next_template < block->num_templates) {
+        gt_template* const parsed_template = block->templates[prefetch_input_file->next_template];
+        block->templates[prefetch_input_file->next_template] = *template;
+        *template = parsed_template;
+        ++(prefetch_input_file->next_template);
+        return GT_PRF_OK;
+      }
+      // The last block is kept, the status is returned from now on
+      if (block->status!=GT_PRF_OK) return block->status;
+      // Release the block
+      GT_BEGIN_MUTEX_SECTION(prefetch_input_file->ring_mutex) {
+        prefetch_input_file->blocks_begin = (prefetch_input_file->blocks_begin+1) % prefetch_input_file->num_blocks;
+        --(prefetch_input_file->blocks_used);
+        prefetch_input_file->current_block = NULL;
+        GT_CV_BROADCAST(prefetch_input_file->block_free_cond);
+      } GT_END_MUTEX_SECTION(prefetch_input_file->ring_mutex);
+    }
+    // Take the next block
+    bool eof = false;
+    GT_BEGIN_MUTEX_SECTION(prefetch_input_file->ring_mutex) {
+      while (!prefetch_input_file->closed && prefetch_input_file->blocks_used==0) {
+        GT_CV_WAIT(prefetch_input_file->block_read_cond,prefetch_input_file->ring_mutex);
+      }
+      if (prefetch_input_file->blocks_used==0) {
+        eof = true;
+      } else {
+        prefetch_input_file->current_block = prefetch_input_file->blocks+prefetch_input_file->blocks_begin;
+        prefetch_input_file->next_template = 0;
+      }
+    } GT_END_MUTEX_SECTION(prefetch_input_file->ring_mutex);
+    if (eof) return GT_PRF_EOF;
+  }
+}
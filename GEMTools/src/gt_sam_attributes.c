@@ -73,6 +73,47 @@ GT_INLINE void gt_sam_header_add_comment(gt_sam_headers* const sam_headers,gt_st
   GT_STRING_CHECK(comment);
   gt_vector_insert(sam_headers->comments,comment,gt_string*);
 }
+/*
+ * BAM File specifics (SAM header text & reference dictionary)
+ */
+GT_INLINE gt_bam_headers* gt_bam_header_new(void) {
+  gt_bam_headers* bam_headers = gt_alloc(gt_bam_headers);
+  bam_headers->text = gt_string_new(64);
+  bam_headers->reference_names = gt_vector_new(GT_ATTR_SAM_INIT_ELEMENTS,sizeof(gt_string*));
+  bam_headers->reference_lengths = gt_vector_new(GT_ATTR_SAM_INIT_ELEMENTS,sizeof(uint64_t));
+  return bam_headers;
+}
+GT_INLINE void gt_bam_header_clear(gt_bam_headers* const bam_headers) {
+  GT_BAM_HEADERS_CHECK(bam_headers);
+  gt_string_clear(bam_headers->text);
+  GT_VECTOR_ITERATE(bam_headers->reference_names,name,nn,gt_string*) { gt_string_delete(*name); }
+  gt_vector_clear(bam_headers->reference_names);
+  gt_vector_clear(bam_headers->reference_lengths);
+}
+GT_INLINE void gt_bam_header_delete(gt_bam_headers* const bam_headers) {
+  GT_BAM_HEADERS_CHECK(bam_headers);
+  gt_bam_header_clear(bam_headers);
+  gt_string_delete(bam_headers->text);
+  gt_vector_delete(bam_headers->reference_names);
+  gt_vector_delete(bam_headers->reference_lengths);
+  gt_free(bam_headers);
+}
+GT_INLINE void gt_bam_header_add_reference(
+    gt_bam_headers* const bam_headers,const char* const name,const uint64_t name_length,const uint64_t length) {
+  GT_BAM_HEADERS_CHECK(bam_headers);
+  gt_string* const reference_name = gt_string_new(name_length+1);
+  gt_string_set_nstring(reference_name,(char*)name,name_length);
+  gt_vector_insert(bam_headers->reference_names,reference_name,gt_string*);
+  gt_vector_insert(bam_headers->reference_lengths,length,uint64_t);
+}
+GT_INLINE uint64_t gt_bam_header_get_num_references(gt_bam_headers* const bam_headers) {
+  GT_BAM_HEADERS_CHECK(bam_headers);
+  return gt_vector_get_used(bam_headers->reference_names);
+}
+GT_INLINE gt_string* gt_bam_header_get_reference_name(gt_bam_headers* const bam_headers,const uint64_t reference_id) {
+  GT_BAM_HEADERS_CHECK(bam_headers);
+  return *gt_vector_get_elm(bam_headers->reference_names,reference_id,gt_string*);
+}
 /*
  * SAM Optional Fields
  *   - SAM Attributes(optional fields) are just a hash of @gt_sam_attribute
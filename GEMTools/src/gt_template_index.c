@@ -0,0 +1,113 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt_template_index.c
+ * DATE: 18/10/2026
+ * DESCRIPTION: Sidecar index with the offset of every K-th template of a file.
+ */
+
+#include "gt_template_index.h"
+
+gt_template_index* gt_template_index_new(const uint64_t interval,const uint32_t flags) {
+  gt_template_index* const template_index = gt_alloc(gt_template_index);
+  template_index->flags = flags;
+  template_index->interval = (interval>0) ? interval : GT_TEMPLATE_INDEX_DEFAULT_INTERVAL;
+  template_index->num_templates = 0;
+  template_index->data_size = 0;
+  template_index->data_mtime = 0;
+  template_index->data_mtime_nsec = 0;
+  template_index->data_inode = 0;
+  template_index->offsets = gt_vector_new(1024,sizeof(uint64_t));
+  return template_index;
+}
+void gt_template_index_delete(gt_template_index* const template_index) {
+  GT_NULL_CHECK(template_index);
+  gt_vector_delete(template_index->offsets);
+  gt_free(template_index);
+}
+gt_template_index* gt_template_index_read(char* const file_name) {
+  GT_NULL_CHECK(file_name);
+  FILE* const file = fopen(file_name,"rb");
+  if (file==NULL) return NULL;
+  char magic[4];
+  uint32_t version, flags;
+  uint64_t interval, num_templates, num_offsets, data_size, data_mtime, data_mtime_nsec, data_inode;
+  if (fread(magic,1,4,file)!=4 || memcmp(magic,GT_TEMPLATE_INDEX_MAGIC,4)!=0 ||
+      fread(&version,sizeof(uint32_t),1,file)!=1 || version!=GT_TEMPLATE_INDEX_VERSION ||
+      fread(&flags,sizeof(uint32_t),1,file)!=1 ||
+      fread(&interval,sizeof(uint64_t),1,file)!=1 ||
+      fread(&num_templates,sizeof(uint64_t),1,file)!=1 ||
+      fread(&num_offsets,sizeof(uint64_t),1,file)!=1 ||
+      fread(&data_size,sizeof(uint64_t),1,file)!=1 ||
+      fread(&data_mtime,sizeof(uint64_t),1,file)!=1 ||
+      fread(&data_mtime_nsec,sizeof(uint64_t),1,file)!=1 ||
+      fread(&data_inode,sizeof(uint64_t),1,file)!=1) {
+    fclose(file);
+    return NULL;
+  }
+  gt_template_index* const template_index = gt_template_index_new(interval,flags);
+  template_index->num_templates = num_templates;
+  template_index->data_size = data_size;
+  template_index->data_mtime = data_mtime;
+  template_index->data_mtime_nsec = data_mtime_nsec;
+  template_index->data_inode = data_inode;
+  gt_vector_reserve(template_index->offsets,num_offsets,false);
+  if (fread(gt_vector_get_mem(template_index->offsets,uint64_t),sizeof(uint64_t),num_offsets,file)!=num_offsets) {
+    gt_template_index_delete(template_index);
+    fclose(file);
+    return NULL;
+  }
+  gt_vector_set_used(template_index->offsets,num_offsets);
+  fclose(file);
+  return template_index;
+}
+bool gt_template_index_write(gt_template_index* const template_index,char* const file_name) {
+  GT_NULL_CHECK(template_index);
+  GT_NULL_CHECK(file_name);
+  FILE* const file = fopen(file_name,"wb");
+  if (file==NULL) return false;
+  const uint32_t version = GT_TEMPLATE_INDEX_VERSION;
+  const uint64_t num_offsets = gt_vector_get_used(template_index->offsets);
+  bool ok = fwrite(GT_TEMPLATE_INDEX_MAGIC,1,4,file)==4 &&
+      fwrite(&version,sizeof(uint32_t),1,file)==1 &&
+      fwrite(&template_index->flags,sizeof(uint32_t),1,file)==1 &&
+      fwrite(&template_index->interval,sizeof(uint64_t),1,file)==1 &&
+      fwrite(&template_index->num_templates,sizeof(uint64_t),1,file)==1 &&
+      fwrite(&num_offsets,sizeof(uint64_t),1,file)==1 &&
+      fwrite(&template_index->data_size,sizeof(uint64_t),1,file)==1 &&
+      fwrite(&template_index->data_mtime,sizeof(uint64_t),1,file)==1 &&
+      fwrite(&template_index->data_mtime_nsec,sizeof(uint64_t),1,file)==1 &&
+      fwrite(&template_index->data_inode,sizeof(uint64_t),1,file)==1 &&
+      fwrite(gt_vector_get_mem(template_index->offsets,uint64_t),sizeof(uint64_t),num_offsets,file)==num_offsets;
+  ok = (fclose(file)==0) && ok;
+  return ok;
+}
+
+/*
+ * The index is only valid for the file it was built from
+ */
+void gt_template_index_set_data(gt_template_index* const template_index,struct stat* const data_stat) {
+  GT_NULL_CHECK(template_index);
+  GT_NULL_CHECK(data_stat);
+  template_index->data_size = data_stat->st_size;
+  template_index->data_mtime = data_stat->st_mtime;
+  template_index->data_mtime_nsec = data_stat->st_mtim.tv_nsec;
+  template_index->data_inode = data_stat->st_ino;
+}
+bool gt_template_index_bind_data(gt_template_index* const template_index,char* const data_file_name) {
+  GT_NULL_CHECK(template_index);
+  GT_NULL_CHECK(data_file_name);
+  struct stat data_stat;
+  if (stat(data_file_name,&data_stat)!=0) return false;
+  gt_template_index_set_data(template_index,&data_stat);
+  return true;
+}
+bool gt_template_index_check_data(gt_template_index* const template_index,char* const data_file_name) {
+  GT_NULL_CHECK(template_index);
+  GT_NULL_CHECK(data_file_name);
+  struct stat data_stat;
+  if (stat(data_file_name,&data_stat)!=0) return false;
+  return template_index->data_size==(uint64_t)data_stat.st_size &&
+         template_index->data_mtime==(uint64_t)data_stat.st_mtime &&
+         template_index->data_mtime_nsec==(uint64_t)data_stat.st_mtim.tv_nsec &&
+         template_index->data_inode==(uint64_t)data_stat.st_ino;
+}
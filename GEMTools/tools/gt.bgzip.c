@@ -0,0 +1,156 @@
+/*
+ * PROJECT: GEM-Tools library
+ * FILE: gt.bgzip.c
+ * DATE: 18/10/2026
+ * DESCRIPTION: Compress a stream to BGZF and write an index with the
+ *   virtual offset of every K-th template
+ */
+
+#include <getopt.h>
+
+#include "gem_tools.h"
+
+#define GT_BGZIP_READ_SIZE (1<<20)
+
+typedef struct {
+  char* input_file;
+  char* output_file;
+  char* index_file;
+  uint64_t index_interval;
+  uint64_t template_lines;
+  int level;
+  uint64_t num_threads;
+} gt_bgzip_args;
+
+gt_bgzip_args parameters = {
+    .input_file=NULL,
+    .output_file=NULL,
+    .index_file=NULL,
+    .index_interval=GT_TEMPLATE_INDEX_DEFAULT_INTERVAL,
+    .template_lines=1,
+    .level=6,
+    .num_threads=1
+};
+
+void gt_bgzip_compress() {
+  // Open file IN/OUT
+  FILE* const input = (parameters.input_file==NULL) ? stdin : fopen(parameters.input_file,"rb");
+  gt_cond_fatal_error(input==NULL,FILE_OPEN,parameters.input_file);
+  FILE* const output = (parameters.output_file==NULL) ? stdout : fopen(parameters.output_file,"wb");
+  gt_cond_fatal_error(output==NULL,FILE_OPEN,parameters.output_file);
+  gt_bgzf_writer* const bgzf_writer = gt_bgzf_writer_new(output,parameters.num_threads,parameters.level);
+  // Mark the start of every index_interval-th template
+  const uint64_t lines_per_entry = parameters.index_interval*parameters.template_lines;
+  uint8_t* const buffer = gt_malloc(GT_BGZIP_READ_SIZE);
+  uint64_t num_lines = 0;
+  bool line_open = false, mark = true;
+  size_t read;
+  while ((read=fread(buffer,1,GT_BGZIP_READ_SIZE,input)) > 0) {
+    uint8_t* begin = buffer;
+    uint8_t* const end = buffer+read;
+    while (begin < end) {
+      if (mark) {
+        gt_bgzf_writer_mark(bgzf_writer);
+        mark = false;
+      }
+      uint8_t* const eol = memchr(begin,EOL,end-begin);
+      uint8_t* const chunk_end = (eol==NULL) ? end : eol+1;
+      gt_cond_fatal_error(!gt_bgzf_writer_write(bgzf_writer,begin,chunk_end-begin),FILE_WRITE,parameters.output_file);
+      line_open = (eol==NULL);
+      if (eol!=NULL) {
+        ++num_lines;
+        mark = (num_lines%lines_per_entry==0);
+      }
+      begin = chunk_end;
+    }
+  }
+  gt_cond_fatal_error(ferror(input),FILE_READ,parameters.input_file);
+  gt_cond_fatal_error(!gt_bgzf_writer_close(bgzf_writer),FILE_WRITE,parameters.output_file);
+  if (line_open) ++num_lines;
+  // Write the index
+  if (parameters.index_file!=NULL) {
+    gt_template_index* const template_index =
+        gt_template_index_new(parameters.index_interval,GT_TEMPLATE_INDEX_VIRTUAL_OFFSETS);
+    template_index->num_templates = (num_lines+parameters.template_lines-1)/parameters.template_lines;
+    struct stat output_stat;
+    gt_cond_fatal_error(fflush(output)!=0 || fstat(fileno(output),&output_stat)!=0,FILE_WRITE,parameters.output_file);
+    gt_template_index_set_data(template_index,&output_stat);
+    gt_vector_copy(template_index->offsets,gt_bgzf_writer_get_index(bgzf_writer));
+    gt_cond_fatal_error(!gt_template_index_write(template_index,parameters.index_file),FILE_WRITE,parameters.index_file);
+    gt_template_index_delete(template_index);
+  }
+  // Free
+  gt_free(buffer);
+  gt_bgzf_writer_delete(bgzf_writer);
+  if (parameters.input_file!=NULL) fclose(input);
+  if (parameters.output_file!=NULL) fclose(output);
+}
+
+void parse_arguments(int argc,char** argv) {
+  struct option* gt_bgzip_getopt = gt_options_adaptor_getopt(gt_bgzip_options);
+  gt_string* const gt_bgzip_short_getopt = gt_options_adaptor_getopt_short(gt_bgzip_options);
+
+  int option, option_index;
+  while (true) {
+    // Get option & Select case
+    if ((option=getopt_long(argc,argv,
+        gt_string_get_string(gt_bgzip_short_getopt),gt_bgzip_getopt,&option_index))==-1) break;
+    switch (option) {
+    /* I/O */
+    case 'i':
+      parameters.input_file = optarg;
+      break;
+    case 'o':
+      parameters.output_file = optarg;
+      break;
+    case 'x':
+      parameters.index_file = optarg;
+      break;
+    /* Index */
+    case 'k':
+      parameters.index_interval = atol(optarg);
+      break;
+    case 'l':
+      parameters.template_lines = atol(optarg);
+      break;
+    /* Misc */
+    case 'c':
+      parameters.level = atoi(optarg);
+      break;
+    case 't':
+      parameters.num_threads = atol(optarg);
+      break;
+    case 'h':
+      fprintf(stderr, "USE: gt.bgzip [ARGS]...\n");
+      gt_options_fprint_menu(stderr,gt_bgzip_options,gt_bgzip_groups,false,false);
+      exit(1);
+    case 'J':
+      gt_options_fprint_json_menu(stderr,gt_bgzip_options,gt_bgzip_groups,true,false);
+      exit(1);
+      break;
+    case '?':
+    default:
+      gt_fatal_error_msg("Option not recognized");
+    }
+  }
+  // Check parameters
+  if (parameters.index_interval==0) {
+    gt_fatal_error_msg("The index interval has to be at least one template");
+  }
+  if (parameters.template_lines==0) {
+    gt_fatal_error_msg("Templates have at least one line");
+  }
+  if (parameters.level<0 || parameters.level>9) {
+    gt_fatal_error_msg("The compression level has to be in [0,9]");
+  }
+  // Free
+  gt_string_delete(gt_bgzip_short_getopt);
+}
+
+int main(int argc,char** argv) {
+  // GT error handler
+  gt_handle_error_signals();
+  parse_arguments(argc,argv);
+  gt_bgzip_compress();
+  return 0;
+}
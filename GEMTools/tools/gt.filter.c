@@ -3,7 +3,7 @@
  * FILE: gt.filter.c
  * DATE: 02/08/2012
  * AUTHOR(S): Santiago Marco-Sola <santiagomsola@gmail.com>
- * DESCRIPTION: Application to filter {MAP,SAM,FASTQ} files and output the filtered result
+ * DESCRIPTION: Application to filter {MAP,SAM,BAM,GTB,FASTQ} files and output the filtered result
  */
 #ifdef HAVE_OPENMP
 #include <omp.h>
@@ -1141,6 +1141,7 @@ GT_INLINE void gt_filter_group_reads() {
   // Prepare out-printers
   if (parameters.output_format==FILE_FORMAT_UNKNOWN) parameters.output_format = input_file->file_format; // Select output format
   gt_generic_printer_attributes* const generic_printer_attributes = gt_generic_printer_attributes_new(parameters.output_format);
+  if (parameters.output_format==GTB) gt_output_gtb_ofprint_header(output_file);
   // SegmentedRead aux variables
   gt_template* const group_template = gt_template_new();
   uint64_t total_segments = 0, last_segment_id = 0;
@@ -1385,6 +1386,13 @@ void gt_filter_read__write() {
         dicarded_output_file = gt_output_file_new(parameters.name_discarded_output_file,SORTED_FILE);
       }
     }
+    // Binary outputs (GTB) start with a header
+    if (parameters.output_format==FILE_FORMAT_UNKNOWN) parameters.output_format = input_file->file_format;
+    if (parameters.output_format==GTB) gt_output_gtb_ofprint_header(output_file);
+    if (parameters.discarded_output) {
+      if (parameters.discarded_output_format==FILE_FORMAT_UNKNOWN) parameters.discarded_output_format = input_file->file_format;
+      if (parameters.discarded_output_format==GTB) gt_output_gtb_ofprint_header(dicarded_output_file);
+    }
   }
 
   // Open reference file
@@ -1556,6 +1564,8 @@ void gt_filter_get_discarded_output_arguments(char* const optarg) {
       parameters.discarded_output_format = MAP;
     } else if (gt_streq(opt,"SAM")) {
       parameters.discarded_output_format = SAM;
+    } else if (gt_streq(opt,"GTB")) {
+      parameters.discarded_output_format = GTB;
     } else {
       gt_fatal_error_msg("Output format '%s' not recognized",opt);
     }
@@ -1649,6 +1659,8 @@ void parse_arguments(int argc,char** argv) {
         parameters.output_format = MAP;
       } else if (gt_streq(optarg,"SAM")) {
         parameters.output_format = SAM;
+      } else if (gt_streq(optarg,"GTB")) {
+        parameters.output_format = GTB;
       } else {
         gt_fatal_error_msg("Output format '%s' not recognized",optarg);
       }
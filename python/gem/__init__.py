@@ -11,6 +11,7 @@ import files
 from . import utils
 import pkg_resources
 import splits
+import scatter
 import gem.filter as gemfilter
 import gem.gemtools as gt
 import gem
@@ -76,6 +77,20 @@ default_filter = "same-chromosome,same-strand"
 ## use the bundled executables
 use_bundled_executables = True
 
+## expected relative cpu load of the tools. The costs are used to
+## split a thread budget between the processes of a pipe
+thread_costs = {
+    "gem-mapper": 8,
+    "gem-2-gem": 2,
+    "gem-rna-tools": 1,
+    "gt.filter": 1,
+    "gt.mapset": 2,
+    "junctions": 1,
+    "compressor": 2,
+    "bam-encoder": 1,
+    "samtools-sort": 2,
+}
+
 ## max mappings to replace mapping counts for + and ! summaries
 _max_mappings = 999999999
 
@@ -145,7 +160,8 @@ executables = execs_dict({
     "gt.map.2.sam": "gt.map.2.sam",
     "gt.mapset": "gt.mapset",
     "gt.gtfcount": "gt.gtfcount",
-    "gt.stats": "gt.stats"
+    "gt.stats": "gt.stats",
+    "gt.bgzip": "gt.bgzip"
     })
 
 
@@ -282,6 +298,9 @@ def _prepare_output(process, output=None, quality=None, bam=False):
         if process is not None:
             for k, p in enumerate(process):
                 if p is not None and p.wait() != 0:
+                    error = getattr(p, "error", None)
+                    if error is not None:
+                        raise error
                     raise gem.utils.ProcessError("Execution failed!")
                 # close streams next process in
                 if (k + 1) < len(process):
@@ -290,13 +309,10 @@ def _prepare_output(process, output=None, quality=None, bam=False):
                        next_process.stdin is not None:
                         next_process.stdin.close()
         logging.debug("Opening output file %s" % (output))
-        if output.endswith(".bam") or bam:
-            return gt.InputFile(gem.files.open_bam(output), quality=quality, process=process[0])
+        # BAM content is decoded natively
         return gt.InputFile(output, quality=quality, process=process[0])
     else:
         logging.debug("Opening output stream")
-        if bam:
-            return gt.InputFile(gem.files.open_bam(process[0].stdout), quality=quality, process=process[0])
         ## running in async mode, return iterator on
         ## the output stream
         return gt.InputFile(process[0].stdout, quality=quality, process=process[0])
@@ -333,7 +349,10 @@ def mapper(input, index, output=None,
            extra=None,
            key_file=None,
            force_min_decoded_strata=False,
-           compress=False
+           compress=False,
+           chunks=1,
+           executor=None,
+           checkpoint=None
            ):
     """Start the GEM mapper on the given input.
     If input is a file handle, it is assumed to
@@ -359,7 +378,13 @@ def mapper(input, index, output=None,
     min_matched_bases -- minimum number (or %) of matched bases, defaults to 0.80
     trim -- tuple or list that specifies left and right trimmings
     extra -- list of additional parameters added to gem mapper call
+    chunks -- split the input into chunks that are mapped independently
+    executor -- executor for the chunk jobs, defaults to a local executor
+                that runs one chunk at a time
+    checkpoint -- directory that keeps completed chunks to resume a failed run
     """
+    if chunks > 1:
+        return scatter.scatter("mapper", locals())
 
     ## prepare inputs
     index = _prepare_index_parameter(index)
@@ -373,8 +398,7 @@ def mapper(input, index, output=None,
         logging.warning("Disabeling stream compression")
         compress = False
 
-    if compress and not output.endswith(".gz"):
-        output += ".gz"
+    output = files.compressed_file_name(output, compress)
 
     ## prepare the input
     pa = [executables['gem-mapper'], '-I', index,
@@ -387,7 +411,7 @@ def mapper(input, index, output=None,
           '--gem-quality-threshold', str(quality_threshold),
           '--max-big-indel-length', str(max_big_indel_length),
           '--mismatch-alphabet', mismatch_alphabet,
-          '-T', str(threads)
+          '-T', utils.Threads(thread_costs['gem-mapper'])
     ]
 
     if unique_mapping:
@@ -400,7 +424,7 @@ def mapper(input, index, output=None,
     ## extend with additional parameters
     _extend_parameters(pa, extra)
 
-    trim_c = [executables['gem-2-gem'], '-c', '-T', str(threads)]
+    trim_c = [executables['gem-2-gem'], '-c', '-T', utils.Threads(thread_costs['gem-2-gem'])]
     if trim is not None:
         ## check type
         if not isinstance(trim, (list, tuple)) or len(trim) != 2:
@@ -421,12 +445,14 @@ def mapper(input, index, output=None,
         convert_to_genome = [executables['gem-rna-tools'],
                              'transcriptome-2-genome',
                              '-k', key_file,
-                             '--threads', str(max(1, threads / 2))
+                             '--threads', utils.Threads(thread_costs['gem-rna-tools'])
                              ]
         tools.append(convert_to_genome)
 
     if compress:
-        gzip = _compressor(threads=max(1, threads / 2))
+        gzip = _compressor(threads=utils.Threads(thread_costs['compressor']),
+                           index=files.template_index_file(output),
+                           codec=compress)
         tools.append(gzip)
 
     raw = False
@@ -437,7 +463,7 @@ def mapper(input, index, output=None,
         input = None
 
     ## run the mapper
-    process = utils.run_tools(tools, input=input, output=output, name="GEM-Mapper", raw=raw)
+    process = utils.run_tools(tools, input=input, output=output, name="GEM-Mapper", raw=raw, threads=threads)
     return _prepare_output(process, output=output, quality=quality)
 
 
@@ -544,7 +570,10 @@ def splitmapper(input,
                 filter_splitmaps=True,
                 post_validate=True,
                 threads=1,
-                extra=None):
+                extra=None,
+                chunks=1,
+                executor=None,
+                checkpoint=None):
     """Start the GEM split mapper on the given input.
     If input is a file handle, it is assumed to
     provide fastq entries. If input is a string,
@@ -559,7 +588,13 @@ def splitmapper(input,
     input -- string with the input file or a file handle or a generator
     output -- output file name or file handle
     index -- valid GEM2 index
+    chunks -- split the input into chunks that are mapped independently
+    executor -- executor for the chunk jobs, defaults to a local executor
+                that runs one chunk at a time
+    checkpoint -- directory that keeps completed chunks to resume a failed run
     """
+    if chunks > 1:
+        return scatter.scatter("splitmapper", locals())
 
     ## check the index
     index = _prepare_index_parameter(index, gem_suffix=True)
@@ -578,9 +613,8 @@ def splitmapper(input,
           '--matches-threshold', str(matches_threshold),
           '-s', str(strata_after_first),
           '--mismatch-alphabet', mismatch_alphabet,
-          '-T', str(threads)
+          '-T', utils.Threads(thread_costs['gem-mapper'])
     ]
-    min_threads = int(round(max(1, threads / 2)))
 
     if filter is not None:
         pa.append("-f")
@@ -591,7 +625,7 @@ def splitmapper(input,
 
     ## extend with additional parameters
     _extend_parameters(pa, extra)
-    trim_c = [executables['gem-2-gem'], '-c', '-T', str(min_threads)]
+    trim_c = [executables['gem-2-gem'], '-c', '-T', utils.Threads(thread_costs['gem-2-gem'])]
     if trim is not None:
         ## check type
         if not isinstance(trim, (list, tuple)) or len(trim) != 2:
@@ -607,8 +641,12 @@ def splitmapper(input,
     ## run the mapper
     process = None
     original_output = output
+    validate_threads = threads
     if post_validate:
         output = None
+        # the validation runs concurrently on the mapper output
+        threads, validate_threads = utils.allocate_threads(threads, [thread_costs['gem-mapper'],
+                                                                     thread_costs['gem-2-gem']])
 
     raw = False
     if isinstance(input, gt.InputFile) and input.raw_sequence_stream():
@@ -617,11 +655,11 @@ def splitmapper(input,
         pa.append(input.filename)
         input = None
 
-    process = utils.run_tools(tools, input=input, output=output, name="GEM-Split-Mapper", raw=raw)
+    process = utils.run_tools(tools, input=input, output=output, name="GEM-Split-Mapper", raw=raw, threads=threads)
     splitmap_out = _prepare_output(process, output=output, quality=quality)
 
     if post_validate:
-        return validate(splitmap_out, index, original_output, threads=threads)
+        return validate(splitmap_out, index, original_output, threads=validate_threads)
 
     return splitmap_out
 
@@ -645,6 +683,9 @@ def extract_junctions(input,
                       tmpdir=None,
                       annotation=None,
                       extra=None):
+    ## the extraction runs concurrently on the splitmapper output
+    map_threads, extract_threads = utils.allocate_threads(threads, [thread_costs['gem-mapper'],
+                                                                    thread_costs['junctions']])
     ## run the splitmapper
     splitmap = splitmapper(input,
         index,
@@ -659,7 +700,7 @@ def extract_junctions(input,
         strata_after_first=strata_after_first,
         filter_splitmaps=False,
         post_validate=False,
-        threads=threads,
+        threads=map_threads,
         extra=extra)
 
     annotation_junctions = None
@@ -676,7 +717,7 @@ def extract_junctions(input,
         sites=merge_with,
         max_junction_matches=max_junction_matches,
         process=splitmap.process,
-        threads=max(1, threads / 2),
+        threads=extract_threads,
         annotation_junctions=annotation_junctions
     )
     return denovo_junctions
@@ -698,7 +739,19 @@ def pairalign(input, index, output=None,
               filter_max_matches=0,
               threads=1,
               compress=False,
-              extra=None):
+              extra=None,
+              chunks=1,
+              executor=None,
+              checkpoint=None):
+    """Start the GEM pair aligner on the given mappings.
+
+    chunks -- split the input into chunks that are paired independently
+    executor -- executor for the chunk jobs, defaults to a local executor
+                that runs one chunk at a time
+    checkpoint -- directory that keeps completed chunks to resume a failed run
+    """
+    if chunks > 1:
+        return scatter.scatter("pairalign", locals())
     ## check the index
     index = _prepare_index_parameter(index)
     quality = _prepare_quality_parameter(quality, input)
@@ -706,8 +759,7 @@ def pairalign(input, index, output=None,
         logging.warning("Disabeling stream compression")
         compress = False
 
-    if compress and not output.endswith(".gz"):
-        output += ".gz"
+    output = files.compressed_file_name(output, compress)
 
     pa = [executables['gem-mapper'],
           '-p',
@@ -722,7 +774,7 @@ def pairalign(input, index, output=None,
           '--min-matched-bases', str(min_matched_bases),
           '--max-extendable-matches', str(max_extendable_matches),
           '--max-extensions-per-match', str(max_matches_per_extension),
-          '-T', str(threads)
+          '-T', utils.Threads(thread_costs['gem-mapper'])
     ]
 
     ## extend with additional parameters
@@ -740,12 +792,14 @@ def pairalign(input, index, output=None,
         tools.append(__awk_pair_quality_fix)
     tools.append(pa)
 
-    filter_pa = [executables["gt.filter"], "-t", str(threads), "-p"]
+    filter_pa = [executables["gt.filter"], "-t", utils.Threads(thread_costs['gt.filter']), "-p"]
     if filter_max_matches > 0:
         filter_pa.extend(["--max-output-matches", str(filter_max_matches)])
     tools.append(filter_pa)
     if compress:
-        gzip = _compressor(threads=max(1, threads / 2))
+        gzip = _compressor(threads=utils.Threads(thread_costs['compressor']),
+                           index=files.template_index_file(output),
+                           codec=compress)
         tools.append(gzip)
 
     raw = False
@@ -753,7 +807,7 @@ def pairalign(input, index, output=None,
         raw = True
 
     ## run the mapper and trim away all the unused stuff from the ids
-    process = utils.run_tools(tools, input=input, output=output, name="GEM-Pair-align", write_map=True, clean_id=True, append_extra=False, raw=raw)
+    process = utils.run_tools(tools, input=input, output=output, name="GEM-Pair-align", write_map=True, clean_id=True, append_extra=False, raw=raw, threads=threads)
     return _prepare_output(process, output=output, quality=quality)
 
 
@@ -809,8 +863,7 @@ def score(input,
         logging.warning("Disabeling stream compression")
         compress = False
 
-    if compress and not output.endswith(".gz"):
-        output += ".gz"
+    output = files.compressed_file_name(output, compress)
 
     quality = _prepare_quality_parameter(quality)
     if quality in ['none', 'ignore']:
@@ -820,7 +873,7 @@ def score(input,
                '-I', index,
                '-q', quality,
                '-s', scoring,
-               '-T', str(threads)
+               '-T', utils.Threads(thread_costs['gem-2-gem'])
     ]
 
     if filter is not None:
@@ -840,10 +893,12 @@ def score(input,
     tools = [score_p]
 
     if compress:
-        gzip = _compressor(threads=threads)
+        gzip = _compressor(threads=utils.Threads(thread_costs['compressor']),
+                           index=files.template_index_file(output),
+                           codec=compress)
         tools.append(gzip)
 
-    process = utils.run_tools(tools, input=input, output=output, name="GEM-Score", write_map=True, raw=raw)
+    process = utils.run_tools(tools, input=input, output=output, name="GEM-Score", write_map=True, raw=raw, threads=threads)
     return _prepare_output(process, output=output)
 
 
@@ -915,41 +970,55 @@ def __is_parallel_samtools():
     return __parallel_samtools
 
 def sam2bam(input, output=None, sorted=False, tmpdir=None, mapq=None, threads=1, sort_memory="768M"):
-    sam2bam_p = _check_samtools("view", threads=threads, extend=["-S", "-b"])
-    if mapq is not None and int(mapq) > 0:
-        sam2bam_p.append("-q")
-        sam2bam_p.append(str(mapq))
-    sam2bam_p.append('-')
-
-    tools = [sam2bam_p]
-    out_name = output
+    """Convert SAM to BAM. The SAM records are encoded natively and the
+    BGZF blocks are compressed in parallel. samtools is only used to
+    sort the BAM content.
+
+    input       -- the SAM input
+    output      -- optional output file name, the content is streamed otherwise
+    sorted      -- sort the BAM content
+    tmpdir      -- not used
+    mapq        -- skip records with a lower mapping quality
+    threads     -- the thread budget
+    sort_memory -- memory used by samtools sort per thread
+    """
+    encode_threads = sort_threads = utils.thread_budget(threads)
     if sorted:
-        if not __is_parallel_samtools():
-            # check the memory paramters
-            try:
-                m = int(sort_memory)
-                if m < 128 * 1024 * 128:  # ugly but we assume you give it at least 128 mb
-                    sort_memory = 768 * 1024 * 1024
-                    if m < 1024 * 32:
-                        sort_memory = m * 1024 * 1024
-            except Exception, e:
-                # convert to default byte
+        # encoder and sort run concurrently
+        encode_threads, sort_threads = utils.allocate_threads(encode_threads, [thread_costs['bam-encoder'],
+                                                                               thread_costs['samtools-sort']])
+    parent = input.process if isinstance(input, gt.InputFile) else None
+    stream = gem.files.get_stream(input)
+    if not sorted:
+        encoder = gem.files.BamEncoder(stream, output=output, threads=encode_threads, mapq=mapq, process=parent)
+        return _prepare_output(encoder, output=output, quality=33, bam=True)
+
+    if not __is_parallel_samtools():
+        # check the memory paramters
+        try:
+            m = int(sort_memory)
+            if m < 128 * 1024 * 128:  # ugly but we assume you give it at least 128 mb
                 sort_memory = 768 * 1024 * 1024
+                if m < 1024 * 32:
+                    sort_memory = m * 1024 * 1024
+        except Exception, e:
+            # convert to default byte
+            sort_memory = 768 * 1024 * 1024
+
+    bam_sort = _check_samtools("sort", threads=sort_threads, extend=["-m", str(sort_memory), "-o", "-"])
+    suffix = ""
+    if output is not None:
+        suffix = "-" + os.path.basename(output)
+    tmpfile = tempfile.NamedTemporaryFile(prefix="sort", suffix=suffix)
+    tmpfile.close()
+    if os.path.exists(tmpfile.name):
+        os.remove(tmpfile.name)
+    out_name = os.path.basename(tmpfile.name)
+    bam_sort.append(out_name)
 
-        bam_sort = _check_samtools("sort", threads=threads, extend=["-m", str(sort_memory), "-o", "-"])
-        suffix = ""
-        if output is not None:
-            suffix = "-" + os.path.basename(output)
-        tmpfile = tempfile.NamedTemporaryFile(prefix="sort", suffix=suffix)
-        tmpfile.close()
-        if os.path.exists(tmpfile.name):
-            os.remove(tmpfile.name)
-        out_name = os.path.basename(tmpfile.name)
-        bam_sort.append(out_name)
-        tools.append(bam_sort)
-
-    process = utils.run_tools(tools, input=input, output=output, name="SAM-2-BAM", raw=True)
-    return _prepare_output(process, output=output, quality=33, bam=True)
+    encoder = gem.files.BamEncoder(stream, threads=encode_threads, mapq=mapq, process=parent)
+    process = utils.run_tools([bam_sort], input=encoder.stdout, output=output, name="SAM-2-BAM")
+    return _prepare_output([process, encoder], output=output, quality=33, bam=True)
 
 
 def bamIndex(input, output=None):
@@ -1147,14 +1216,16 @@ def stats(inputs, output=None, json_output=None, threads=1, paired=False):
     return json.loads("\n".join(lines))
 
 
-def _compressor(threads=1):
+def _compressor(threads=1, index=None, codec=None):
     """Returns compressor configuration
-    for compressing streams"""
-    pigz = gem.utils.which("pigz")
-    if threads == 1 or pigz is None:
-        return ["gzip", "-"]
-    else:
-        return [pigz, "-p", str(threads), "-"]
+    for compressing streams. The threads can be
+    a utils.Threads placeholder that is resolved
+    by utils.run_tools(). The codec is a codec name
+    (see gem.files.codecs) and defaults to gzip. Gzip
+    streams are BGZF compressed if gt.bgzip is available
+    and the template index is written to the index file
+    if one is given."""
+    return files.get_codec(codec or True).compressor(threads=threads, index=index)
 
 
 def merge(master, slaves, output=None, paired=False, same_content=False,
@@ -1163,6 +1234,12 @@ def merge(master, slaves, output=None, paired=False, same_content=False,
     of the salve(s).
 
     """
+    # the merge processes and the compressor run concurrently
+    costs = [thread_costs['gt.mapset']] * max(1, len(slaves))
+    if compress and output is not None and output != sys.stdout:
+        costs.append(thread_costs['compressor'])
+    allocation = utils.allocate_threads(utils.thread_budget(threads), costs)
+
     merge_out = subprocess.PIPE
     if output is not None:
         if output == sys.stdout:
@@ -1174,7 +1251,9 @@ def merge(master, slaves, output=None, paired=False, same_content=False,
                 if isinstance(output, basestring):
                     merge_out = open(output, 'wb')
             else:
-                p = subprocess.Popen(_compressor(threads=max(1, threads / 2)),
+                p = subprocess.Popen(_compressor(threads=allocation[-1],
+                                                 index=files.template_index_file(output),
+                                                 codec=compress),
                                      stdout=open(output, 'wb'),
                                      stdin=subprocess.PIPE, close_fds=True)
                 merge_out = p.stdin
@@ -1190,7 +1269,7 @@ def merge(master, slaves, output=None, paired=False, same_content=False,
             # last one
             current_output = merge_out
         current_process = _merge_two(current_master, slave, current_output,
-                                     tmpdir, i, paired, same_content, threads)
+                                     tmpdir, i, paired, same_content, allocation[i])
         current_master = current_process.stdout
     return _prepare_output(current_process, output=output)
 
@@ -25,6 +25,7 @@ def gemtools():
             "t-index": gem.production.TranscriptIndex,
             "gtfcount": gem.production.GtfCount,
             "merge": gem.production.Merge,
+            "map-index": gem.production.MapIndex,
             "convert": gem.production.Convert,
             "gtf-junctions": gem.production.Junctions,
             "denovo-junctions": gem.production.JunctionExtraction,
@@ -0,0 +1,435 @@
+#!/usr/bin/env python
+"""Execution backends for pipeline steps.
+
+The StepScheduler decides when a step runs, an executor decides
+where it runs. The InProcessExecutor runs the step in the scheduler
+process. All other executors serialize the pipeline and the step
+into a json job file, hand the job to a worker and wait for the json
+result file the worker writes when the step is finished. Workers run
+
+    python -m gem.executors <job_file>
+
+or, for the queue executor
+
+    python -m gem.executors --queue <queue_directory>
+
+Job and result files are written to a temporary name and renamed,
+so a reader never sees a partial file and the queue workers can
+claim jobs with an atomic rename.
+
+While a job runs, the worker touches a heartbeat file next to the
+result file. A job whose heartbeat stops, i.e. the worker was killed
+by the batch system or crashed, fails instead of being waited for
+forever. Jobs that never start, i.e. a queue without workers, can
+only be detected with a timeout.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import signal
+import subprocess
+import tempfile
+import threading
+import traceback
+import logging
+
+import gem
+import gem.utils
+
+
+def _write_json(data, target):
+    """Atomically write the data as json to the target file. Raises
+    a ValueError if the data can not be serialized, values are
+    never converted silently as they would not be restored"""
+    try:
+        content = json.dumps(data)
+    except TypeError, e:
+        raise ValueError("Unable to serialize %s : %s" % (os.path.basename(target), str(e)))
+    with open(target + ".tmp", "w") as f:
+        f.write(content)
+    os.rename(target + ".tmp", target)
+
+
+def _start_worker(command):
+    """Start a worker process in its own process group, so
+    the worker and the tools it started can be stopped together"""
+    return subprocess.Popen(command, env=_environment(), close_fds=True, preexec_fn=os.setsid)
+
+
+def _stop_worker(worker):
+    """Terminate the process group of a running worker"""
+    if worker.poll() is None:
+        try:
+            os.killpg(worker.pid, signal.SIGTERM)
+        except OSError:
+            pass
+
+
+def _environment():
+    """Return the environment for worker processes. The gem
+    package has to be importable by the worker"""
+    env = dict(os.environ)
+    path = os.path.dirname(os.path.dirname(os.path.abspath(gem.__file__)))
+    pythonpath = [path]
+    if env.get("PYTHONPATH"):
+        pythonpath.append(env["PYTHONPATH"])
+    env["PYTHONPATH"] = os.pathsep.join(pythonpath)
+    return env
+
+
+def _mtime(path):
+    """Return the modification time of the file or None if
+    it does not exist"""
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _heartbeat(path, interval, stop):
+    """Touch the heartbeat file every interval seconds until stopped"""
+    while True:
+        with open(path, "a"):
+            pass
+        os.utime(path, None)
+        if stop.wait(interval):
+            break
+
+
+def worker_command(*args):
+    """Return the command that runs a worker with the given arguments"""
+    return [sys.executable, "-m", "gem.executors"] + list(args)
+
+
+class InProcessExecutor(object):
+    """Run the steps in the scheduler process. This is the
+    default and the only executor that can run steps that share
+    an input stream with other steps."""
+    # steps can use the fifos of other steps
+    shares_host = True
+    # steps can share a stream object with other steps
+    shares_memory = True
+
+    def run(self, step):
+        """Run the step and return the usage records of
+        processes that are not visible to the caller"""
+        step.run()
+        return []
+
+    def close(self):
+        """Release all resources of this executor"""
+        pass
+
+
+class JobExecutor(object):
+    """Base class of the executors that run steps in other
+    processes. Subclasses implement submit(job_file, result_file)
+    and start the worker for the job. The job directory must be
+    visible to the workers."""
+    shares_host = True
+    shares_memory = False
+    # seconds between checks for the result file
+    poll_interval = 0.5
+    # seconds between two heartbeats of a running job
+    heartbeat_interval = 10
+    # seconds without heartbeat after which the worker of a job is dead
+    heartbeat_timeout = 120
+
+    def __init__(self, directory=None, timeout=None):
+        """Create a new executor
+
+        directory -- the directory for the job and result files. A
+                     temporary directory is created if this is None
+        timeout   -- seconds a job can take from its submission until
+                     it is failed, None to wait as long as the worker
+                     of the job is alive
+        """
+        self.timeout = timeout
+        self.__temporary = directory is None
+        if directory is None:
+            directory = tempfile.mkdtemp(prefix=".gem_jobs.")
+        self.directory = os.path.abspath(directory)
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+        # directory the job and result files are written to
+        self.job_directory = self.directory
+
+    def submit(self, job_file, result_file):
+        """Implement this to start a worker for the job"""
+        raise NotImplementedError()
+
+    def finished(self, job_file, result_file):
+        """Return true if the job finished. The default checks for
+        the result file. Subclasses can override this to detect
+        workers that died without a result"""
+        return os.path.exists(result_file)
+
+    def cancel(self, job_file):
+        """Withdraw a job that is given up. The default removes the
+        job file, subclasses stop the worker if they can"""
+        if os.path.exists(job_file):
+            os.remove(job_file)
+
+    def run(self, step):
+        """Run the step in a worker and return the usage records
+        of the processes the worker started. Raises a PipelineError
+        if the step failed"""
+        import gem.pipeline
+        job_id = "%s_%d_%s" % (step.name, step.id, uuid.uuid4().hex[:8])
+        job_file = os.path.join(self.job_directory, job_id + ".job.json")
+        result_file = os.path.join(self.job_directory, job_id + ".result.json")
+        heartbeat_file = os.path.join(self.job_directory, job_id + ".heartbeat")
+        try:
+            _write_json({"id": job_id,
+                         "step": step.id,
+                         "pipeline": step.pipeline.to_dict(),
+                         "result": result_file,
+                         "heartbeat": heartbeat_file,
+                         "heartbeat_interval": self.heartbeat_interval}, job_file)
+        except ValueError, e:
+            raise gem.pipeline.PipelineError("Unable to submit step %s : %s" % (step.name, str(e)))
+        logging.gemtools.debug("Submitting step %s as job %s", step.name, job_id)
+        self.submit(job_file, result_file)
+        try:
+            self.__wait(job_id, step, job_file, result_file, heartbeat_file)
+            with open(result_file) as f:
+                result = json.load(f)
+        finally:
+            for f in [job_file, result_file, heartbeat_file]:
+                if os.path.exists(f):
+                    os.remove(f)
+        if result["failed"]:
+            raise gem.pipeline.PipelineError("Job %s failed : %s" % (job_id, result["error"]))
+        return result["processes"]
+
+    def __wait(self, job_id, step, job_file, result_file, heartbeat_file):
+        """Wait for the result of the job. Raises a PipelineError if
+        the job timed out, its heartbeat stopped or it finished without
+        result. The heartbeat is checked against the local clock, so
+        the clocks of the workers do not matter"""
+        import gem.pipeline
+        submitted = time.time()
+        beat = None  # last heartbeat and the local time it was seen
+        while not self.finished(job_file, result_file):
+            now = time.time()
+            if self.timeout is not None and now - submitted > self.timeout:
+                self.cancel(job_file)
+                raise gem.pipeline.PipelineError("Job %s for step %s timed out after %d seconds" % (job_id, step.name, self.timeout))
+            mtime = _mtime(heartbeat_file)
+            if mtime is not None and (beat is None or beat[0] != mtime):
+                beat = (mtime, now)
+            elif beat is not None and now - beat[1] > self.heartbeat_timeout:
+                self.cancel(job_file)
+                raise gem.pipeline.PipelineError("The worker of job %s for step %s died, no heartbeat for %d seconds" % (job_id, step.name, now - beat[1]))
+            time.sleep(self.poll_interval)
+        if not os.path.exists(result_file):
+            raise gem.pipeline.PipelineError("Job %s for step %s finished without result" % (job_id, step.name))
+
+    def close(self):
+        """Release all resources of this executor"""
+        if self.__temporary:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class ProcessExecutor(JobExecutor):
+    """Run every step in its own local python process"""
+    def __init__(self, directory=None, timeout=None):
+        JobExecutor.__init__(self, directory, timeout=timeout)
+        self.workers = {}
+
+    def submit(self, job_file, result_file):
+        self.workers[job_file] = _start_worker(worker_command(job_file))
+
+    def finished(self, job_file, result_file):
+        worker = self.workers[job_file]
+        if worker.poll() is None:
+            return False
+        del self.workers[job_file]
+        return True
+
+    def cancel(self, job_file):
+        worker = self.workers.pop(job_file, None)
+        if worker is not None:
+            _stop_worker(worker)
+            worker.wait()
+        JobExecutor.cancel(self, job_file)
+
+    def close(self):
+        for worker in self.workers.values():
+            _stop_worker(worker)
+        JobExecutor.close(self)
+
+
+class QueueExecutor(JobExecutor):
+    """Put the jobs into a directory based queue. Jobs are moved
+    from pending/ to running/ by the worker that claims them and
+    the results are written to done/. Any number of workers can
+    serve the queue, on this machine or on other machines that
+    share the directory, started with
+
+        python -m gem.executors --queue <directory>
+
+    The executor starts the given number of local workers
+    when the first job is submitted. A job whose worker dies
+    fails once its heartbeat stops. Without local workers, set a
+    timeout to fail jobs that are never claimed."""
+    def __init__(self, directory, workers=1, timeout=None):
+        """Create a new queue executor
+
+        directory -- the queue directory
+        workers   -- number of local workers started by the
+                     executor. Use 0 if the queue is served by
+                     external workers
+        timeout   -- seconds a job can take from its submission
+                     until it is failed
+        """
+        JobExecutor.__init__(self, directory, timeout=timeout)
+        for d in ["pending", "running", "done"]:
+            path = os.path.join(self.directory, d)
+            if not os.path.exists(path):
+                os.makedirs(path)
+        # jobs are prepared and the results collected in done/
+        self.job_directory = os.path.join(self.directory, "done")
+        self.workers = max(0, workers)
+        self.__processes = []
+        self.__lock = threading.Lock()
+
+    def submit(self, job_file, result_file):
+        with self.__lock:
+            if len(self.__processes) < self.workers:
+                for i in range(self.workers):
+                    self.__processes.append(_start_worker(worker_command("--queue", self.directory)))
+        os.rename(job_file, os.path.join(self.directory, "pending", os.path.basename(job_file)))
+
+    def finished(self, job_file, result_file):
+        if os.path.exists(result_file):
+            return True
+        # the job can not finish if all local workers died
+        return self.workers > 0 and all(p.poll() is not None for p in self.__processes)
+
+    def cancel(self, job_file):
+        # remove the job from the queue, a worker that claims it
+        # later only finds the job of a dead worker in running/
+        name = os.path.basename(job_file)
+        for d in ["pending", "running"]:
+            path = os.path.join(self.directory, d, name)
+            if os.path.exists(path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+        JobExecutor.cancel(self, job_file)
+
+    def close(self):
+        for p in self.__processes:
+            _stop_worker(p)
+        for p in self.__processes:
+            p.wait()
+        self.__processes = []
+        JobExecutor.close(self)
+
+
+class BatchExecutor(JobExecutor):
+    """Submit the jobs to a batch system. The submit template is a
+    shell command with the placeholders {command} for the full worker
+    command and {job} for the job file, i.e.
+
+        sbatch --wrap '{command}'
+
+    The job directory has to be on a file system that is shared
+    with the compute nodes. Results are picked up by polling. Jobs
+    that are killed by the batch system, i.e. for their memory or
+    wall time, fail once their heartbeat stops. Jobs that wait in
+    the batch queue are only failed by the timeout."""
+    shares_host = False
+    poll_interval = 5
+
+    def __init__(self, submit_template, directory=None, timeout=None):
+        JobExecutor.__init__(self, directory, timeout=timeout)
+        self.submit_template = submit_template
+
+    def submit(self, job_file, result_file):
+        command = " ".join(worker_command(job_file))
+        submit = self.submit_template.format(command=command, job=job_file)
+        if subprocess.call(submit, shell=True, env=_environment(), close_fds=True) != 0:
+            # a failed submission never produces a result
+            _write_json({"failed": True, "error": "Unable to submit : %s" % (submit),
+                         "processes": []}, result_file)
+
+
+def run_job(job_file):
+    """Execute the step described by the job file and write the
+    result file. Returns true if the step succeeded"""
+    import gem.pipeline
+    with open(job_file) as f:
+        job = json.load(f)
+    result = {"failed": False, "error": None, "processes": []}
+    accounting = gem.utils.ProcessAccounting(str(job["id"]))
+    stop = threading.Event()
+    heartbeat = None
+    if job.get("heartbeat") is not None:
+        heartbeat = threading.Thread(target=_heartbeat, args=(job["heartbeat"], job["heartbeat_interval"], stop))
+        heartbeat.daemon = True
+        heartbeat.start()
+    try:
+        pipeline = gem.pipeline.pipeline_from_dict(job["pipeline"])
+        step = pipeline.steps[job["step"]]
+        with accounting:
+            step.run()
+    except Exception, e:
+        traceback.print_exc()
+        result["failed"] = True
+        result["error"] = str(e)
+    # no heartbeat after the result
+    stop.set()
+    if heartbeat is not None:
+        heartbeat.join()
+    result["processes"] = accounting.processes
+    _write_json(result, job["result"])
+    return not result["failed"]
+
+
+def serve(directory, idle=None):
+    """Serve the queue in the given directory until the worker is
+    terminated or, if idle is set, no job arrived for idle seconds"""
+    pending = os.path.join(directory, "pending")
+    running = os.path.join(directory, "running")
+    last = time.time()
+    while idle is None or time.time() - last < idle:
+        claimed = None
+        for name in sorted(f for f in os.listdir(pending) if f.endswith(".job.json")):
+            try:
+                # the rename fails if another worker claimed the job
+                os.rename(os.path.join(pending, name), os.path.join(running, name))
+                claimed = os.path.join(running, name)
+                break
+            except OSError:
+                pass
+        if claimed is None:
+            time.sleep(0.5)
+            continue
+        run_job(claimed)
+        os.remove(claimed)
+        last = time.time()
+
+
+def main(argv=None):
+    """Worker entry point"""
+    if argv is None:
+        argv = sys.argv[1:]
+    gem.loglevel("info")
+    if len(argv) == 2 and argv[0] == "--queue":
+        signal.signal(signal.SIGTERM, lambda s, f: sys.exit(0))
+        serve(argv[1])
+        return 0
+    if len(argv) != 1:
+        print >> sys.stderr, "Usage: python -m gem.executors <job_file> | --queue <directory>"
+        return 1
+    return 0 if run_job(argv[0]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,20 +3,26 @@
 gem.files handles opening files and streams
 """
 import subprocess
+import sys
+import logging
 import __builtin__
 import gem.gemtools as gt
-from utils import which
+from utils import which, Threads
 import shutil
 import os
+import errno
+import fcntl
+import select
+import struct
+import multiprocessing as mp
 
 __author__ = 'Thasso Griebel'
-__zcat_path = None
 
 __open_iterators = []
 
 delete_on_exit = []
 
-def open(input, quality=None):
+def open(input, quality=None, mmap_file=True, prefetch=0):
     """
     Open the given file and return on iterator
     over Reads.
@@ -25,6 +31,8 @@ def open(input, quality=None):
 
     @param input: string of the file name or an open stream
     @type input: string or stream
+    @param mmap_file: memory map uncompressed regular files
+    @type mmap_file: boolean
     @param type: the type of the input file or none for auto-detection
     @type type: string
     @param process: optional process associated with the input
@@ -33,26 +41,28 @@ def open(input, quality=None):
     @type remove_after_iteration: boolean
     @param quality: the gem quality parameter
     @type quality: string
+    @param prefetch: number of template blocks parsed ahead by a reader thread, 0 to disable
+    @type prefetch: integer
     """
     is_string = isinstance(input, basestring)
     stream = None
-    if is_string:
-        type = _guess_type(input)
-        if type == "bam":
-            stream = open_bam(input)
-    else:
+    if not is_string:
         stream = input
 
     it = None
     if stream is not None:
-        it = gt.InputFile(stream, quality=quality)
+        it = gt.InputFile(stream, quality=quality, prefetch=prefetch)
         __open_iterators.append(it)
     else:
-        it = gt.InputFile(input, quality=quality)
+        it = gt.InputFile(input, quality=quality, mmap_file=mmap_file, prefetch=prefetch)
     return it
 
 
 def open_bam(input):
+    """Open a samtools view process that prints the BAM content
+    as SAM. InputFiles read BAM natively, this is only needed
+    where the SAM text is required.
+    """
     if isinstance(input, basestring):
        return subprocess.Popen(["samtools", "view", "-h", input],
             stdout=subprocess.PIPE,
@@ -98,23 +108,153 @@ def get_stream(input):
     raise ValueError("Unable to open a stream on the given input")
 
 
-def open_file(file):
+def open_file(file, threads=0):
     """
     Open the given file and return a stream
     of the file content. The method checks if the file
-    ends with .gz and open a gzip stream in that case.
+    ends with the extension of a registered codec (i.e. .gz)
+    and opens a decompressed stream in that case, see
+    DecompressedStream.
 
     The file parameter has to be a string.
 
     @param file: string of the file name
     @type file: string
+    @param threads: number of threads that inflate BGZF files, 0 for the default
+    @type threads: int
     """
-    if file.endswith(".gz"):
-        return open_gzip(file)
+    codec = codec_for(file)
+    if codec is not None:
+        return DecompressedStream(codec.open(file, threads=threads), file)
     else:
         return __builtin__.open(file, 'r')
 
 
+class Tee(object):
+    """Read an input once and copy its raw content
+    to multiple consumer streams.
+
+    The copy is done by a separate process that writes
+    to one pipe per consumer. The pipes are the only buffers,
+    so a slow consumer slows down the copy but memory usage
+    stays bounded. Call abandon() for consumers that stopped
+    reading, i.e. failed, to keep feeding the others.
+    """
+    def __init__(self, input, consumers, buffer_size=1048576):
+        """Start copying the input to the given number
+        of consumers.
+
+        input -- file name or open stream
+        consumers -- number of consumer streams
+        buffer_size -- size of the chunks read from the input
+        """
+        self.decompressor = None
+        if isinstance(input, basestring):
+            codec = codec_for(input)
+            if codec is not None:
+                self.decompressor = codec.open(input)
+                source = self.decompressor.stdout
+            else:
+                source = __builtin__.open(input, 'rb')
+        else:
+            source = input
+
+        self.streams = []
+        self.__abandoned = []
+        targets = []
+        for i in range(consumers):
+            (r, w) = os.pipe()
+            for fd in (r, w):
+                fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.fcntl(fd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+            try:
+                # grow the pipe buffer to decouple the consumers a bit
+                fcntl.fcntl(w, _F_SETPIPE_SZ, buffer_size)
+            except IOError:
+                pass
+            self.streams.append(os.fdopen(r, 'rb'))
+            self.__abandoned.append(mp.Event())
+            targets.append(w)
+
+        inherited = [s.fileno() for s in self.streams]
+        self.process = mp.Process(target=_tee_copy,
+                                  args=(source.fileno(), targets, inherited,
+                                        self.__abandoned, buffer_size))
+        self.process.start()
+        # only the copy process keeps the write ends, so consumers
+        # get EOF as soon as the copy is done
+        for fd in targets:
+            os.close(fd)
+        source.close()
+
+    def abandon(self, consumer):
+        """Stop feeding the given consumer and close its stream"""
+        self.__abandoned[consumer].set()
+        self.streams[consumer].close()
+
+    def wait(self):
+        """Wait for the copy to finish and return 0 if the input
+        was read completely
+        """
+        self.process.join()
+        exit_value = self.process.exitcode
+        if self.decompressor is not None:
+            exit_value = exit_value or self.decompressor.wait()
+        for s in self.streams:
+            s.close()
+        return exit_value
+
+
+# fcntl command to change the pipe buffer size (linux only)
+_F_SETPIPE_SZ = 1031
+
+
+def _tee_copy(source, targets, streams, abandoned, buffer_size):
+    """Copy from the source file descriptor to all
+    target file descriptors. Writes are non blocking
+    so we can check for abandoned consumers
+    """
+    for fd in streams:
+        os.close(fd)
+    open_targets = dict(enumerate(targets))
+    for fd in targets:
+        fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+    while len(open_targets) > 0:
+        data = os.read(source, buffer_size)
+        if len(data) == 0:
+            break
+        written = dict([(i, 0) for i in open_targets.keys()])
+        while len(written) > 0:
+            for i in written.keys():
+                if abandoned[i].is_set():
+                    os.close(open_targets[i])
+                    del open_targets[i]
+                    del written[i]
+            if len(written) == 0:
+                break
+            writable = select.select([], [open_targets[i] for i in written.keys()], [], 1.0)[1]
+            for i in written.keys():
+                fd = open_targets[i]
+                if fd not in writable:
+                    continue
+                try:
+                    written[i] += os.write(fd, buffer(data, written[i]))
+                except OSError, e:
+                    if e.errno == errno.EAGAIN:
+                        continue
+                    if e.errno != errno.EPIPE:
+                        raise
+                    # the consumer is gone
+                    os.close(fd)
+                    del open_targets[i]
+                    del written[i]
+                    continue
+                if written[i] >= len(data):
+                    del written[i]
+    for fd in open_targets.values():
+        os.close(fd)
+
+
 def _guess_type(name):
     """
     guess the type based on the given file name
@@ -129,9 +269,7 @@ def _guess_type(name):
     @return: one of fasta, fastq, map or None
     @rtype: string
     """
-    name = name.upper()
-    if name.endswith(".GZ"):
-        name = name[:-3]
+    name = strip_codec_extension(name).upper()
     if name.endswith(".FASTA") or name.endswith("FA"):
         return "fasta"
     elif name.endswith(".FASTQ") or name.endswith("FQ"):  # fixes issue #5
@@ -145,33 +283,517 @@ def _guess_type(name):
     return None
 
 
-def open_gzip(file_name):
-    """Uses a separate zcat process to open a gzip
-    stream.
+class Codec(object):
+    """Compression codec of the files with the codec extension.
+    The codec compresses and decompresses through its command
+    line tool. Codecs are registered by name, see register_codec(),
+    and the compress parameters of the gem functions accept the
+    codec name.
+    """
+    ## the gemtools library reads the compressed content natively
+    native = False
+
+    def __init__(self, name, extension, executable, threads_format=None, level=None):
+        """Create a new codec
+
+        name           -- the name of the codec
+        extension      -- extension of compressed files, including the dot
+        executable     -- the command line tool
+        threads_format -- format of the thread parameter of the tool or
+                          None if the tool is single threaded
+        level          -- optional compression level
+        """
+        self.name = name
+        self.extension = extension
+        self.executable = executable
+        self.threads_format = threads_format
+        self.level = level
+
+    def available(self):
+        """Returns true if the codec tool is found"""
+        return which(self.executable) is not None
+
+    def compressor(self, threads=1, index=None):
+        """Returns the command line that compresses stdin to
+        stdout. The threads can be a utils.Threads placeholder
+        that is resolved by utils.run_tools(). Only BGZF
+        compressed files can be indexed, an existing index
+        file is removed.
+        """
+        _remove_stale_index(index)
+        compressor = [self.executable, "-q", "-c"]
+        if self.level is not None:
+            compressor.append("-%d" % (self.level))
+        if self.threads_format is not None:
+            if isinstance(threads, Threads):
+                compressor.append(Threads(threads.cost, format=self.threads_format))
+            elif threads > 1:
+                compressor.append(self.threads_format % (threads))
+        compressor.append("-")
+        return compressor
+
+    def decompressor(self, file_name=None):
+        """Returns the command line that writes the uncompressed
+        content of the file, or of stdin, to stdout"""
+        return [self.executable, "-d", "-q", "-c", file_name if file_name is not None else "-"]
+
+    def open(self, file_name, threads=0):
+        """Start decompressing the file. Returns a Decompressor
+        that provides the content through its stdout stream"""
+        if not os.path.exists(file_name):
+            raise IOError("File not found : %s" % (file_name))
+        return Decompressor(self.decompressor(file_name))
+
+
+def _remove_stale_index(index):
+    """Remove the template index of an earlier run, the
+    compressor of the new file does not write one"""
+    if index is not None and os.path.exists(index):
+        logging.warning("Removing template index %s, the output is not indexed" % (index))
+        os.remove(index)
+
+
+class GzipCodec(Codec):
+    """The gzip codec. Compressed content is inflated natively
+    and BGZF blocks in parallel, see Inflater. The content is
+    compressed by gt.bgzip if available, otherwise by pigz or gzip.
+    """
+    native = True
+
+    def __init__(self):
+        Codec.__init__(self, "gzip", ".gz", "gzip")
+
+    def available(self):
+        return True
+
+    def compressor(self, threads=1, index=None):
+        """Returns the command line that compresses stdin to stdout.
+        If gt.bgzip is available, the stream is BGZF compressed,
+        which is still readable by gzip, and the template index is
+        written to the index file if one is given. Otherwise an
+        existing index file is removed, it would not match the
+        new content."""
+        import gem
+        bgzip = which(gem.executables["gt.bgzip"])
+        if bgzip is not None:
+            if not isinstance(threads, Threads):
+                threads = str(threads)
+            compressor = [bgzip, "-t", threads]
+            if index is not None:
+                compressor.extend(["-x", index])
+            logging.debug("Compressing with %s" % (bgzip))
+            return compressor
+        # plain gzip can not be indexed
+        _remove_stale_index(index)
+        pigz = which("pigz")
+        if threads == 1 or pigz is None:
+            logging.debug("gt.bgzip not found, compressing with gzip")
+            return ["gzip", "-"]
+        if not isinstance(threads, Threads):
+            threads = str(threads)
+        logging.debug("gt.bgzip not found, compressing with %s" % (pigz))
+        return [pigz, "-p", threads, "-"]
+
+    def open(self, file_name, threads=0):
+        if not os.path.exists(file_name):
+            raise IOError("File not found : %s" % (file_name))
+        return Inflater(file_name, threads=threads)
+
+
+class DecompressedStream(object):
+    """The content stream of a decompressor, i.e. an Inflater.
+    Reading the end of the content or closing the stream raises
+    an IOError if the decompressor failed because the file is
+    corrupt or truncated. Processes that read the stream through
+    its file descriptor do not see the failure, call check() after
+    they are done.
+    """
+    def __init__(self, decompressor, file_name):
+        self.decompressor = decompressor
+        self.stream = decompressor.stdout
+        self.name = file_name
+        self.checked = False
+
+    @property
+    def closed(self):
+        return self.stream.closed
+
+    def fileno(self):
+        return self.stream.fileno()
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        # without size the content is read up to the end
+        if size < 0 or (len(data) == 0 and size != 0):
+            self.check()
+        return data
+
+    def readline(self, size=-1):
+        line = self.stream.readline(size)
+        if len(line) == 0 and size != 0:
+            self.check()
+        return line
+
+    def readlines(self):
+        return list(self)
+
+    def __iter__(self):
+        return self
+
+    def next(self):
+        line = self.readline()
+        if len(line) == 0:
+            raise StopIteration()
+        return line
+
+    def check(self):
+        """Wait for the decompressor once the end of the content
+        was read and raise an IOError if it failed"""
+        self.checked = True
+        if self.decompressor.wait() != 0:
+            raise IOError("Corrupt or truncated input : %s" % (self.name))
+
+    def failed(self):
+        """Return true if the decompressor already exited with an error.
+        Check before the pipe is closed, the tool fails once it can not
+        write its output"""
+        exit_value = self.decompressor.poll()
+        return exit_value is not None and exit_value != 0
+
+    def close(self):
+        """Close the stream. A decompressor that is still running
+        is stopped by the closed pipe, a failure that was not
+        reported at the end of the content is raised"""
+        if self.stream.closed:
+            return
+        failed = self.failed()
+        self.stream.close()
+        self.decompressor.wait()
+        if failed and not self.checked:
+            self.checked = True
+            raise IOError("Corrupt or truncated input : %s" % (self.name))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+class Decompressor(object):
+    """Decompress a file with the tool of a codec and provide
+    the content through the stdout stream, like Inflater.
+    """
+    def __init__(self, command):
+        self.process = subprocess.Popen(command, stdout=subprocess.PIPE,
+                                        stderr=__builtin__.open(os.devnull, 'w'),
+                                        close_fds=True)
+        self.stdout = self.process.stdout
+
+    def wait(self):
+        """Wait for the tool and return its exit value"""
+        return self.process.wait()
+
+    def poll(self):
+        """Return the exit value of the tool or None if
+        it is still running"""
+        return self.process.poll()
+
+
+## the registered codecs by name
+codecs = {}
+## the codec that is used if compression is enabled without a codec name
+default_codec = "gzip"
+
+
+def register_codec(codec):
+    """Register the codec by its name. A registered codec
+    with the same name is replaced."""
+    codecs[codec.name] = codec
+
+
+def get_codec(compress):
+    """Return the codec for a compress parameter. The parameter can be
+    a codec name, a Codec, True for the default codec or False/None if
+    the content is not compressed, in which case None is returned.
+    """
+    if compress is None or compress is False:
+        return None
+    if isinstance(compress, Codec):
+        return compress
+    if compress is True:
+        compress = default_codec
+    if compress not in codecs:
+        raise ValueError("Unknown compression codec '%s', available codecs : %s" % (
+            compress, ", ".join(sorted(codecs.keys()))))
+    return codecs[compress]
+
+
+def codec_for(file_name):
+    """Return the codec of the file based on the file
+    extension or None if the file is not compressed"""
+    if not isinstance(file_name, basestring):
+        return None
+    for codec in codecs.values():
+        if file_name.endswith(codec.extension):
+            return codec
+    return None
+
+
+def compressed_file_name(file_name, compress):
+    """Append the extension of the codec selected by the compress
+    parameter (see get_codec) to the file name, unless the file
+    name already ends with it"""
+    codec = get_codec(compress)
+    if codec is None or file_name.endswith(codec.extension):
+        return file_name
+    return file_name + codec.extension
+
+
+def strip_codec_extension(file_name):
+    """Remove the codec extension from the file name"""
+    codec = codec_for(file_name)
+    if codec is None:
+        return file_name
+    return file_name[:-len(codec.extension)]
+
+
+register_codec(GzipCodec())
+register_codec(Codec("zstd", ".zst", "zstd", threads_format="-T%s"))
+register_codec(Codec("lz4", ".lz4", "lz4"))
+
+
+## header of the template index, see GEMTools/include/gt_template_index.h
+_TEMPLATE_INDEX_HEADER = struct.Struct("<4sIIQQQQQQQ")
+_TEMPLATE_INDEX_VERSION = 2
+_TEMPLATE_INDEX_VIRTUAL_OFFSETS = 1
+
+
+class TemplateIndex(object):
+    """Index of a map file that stores the offset of every interval-th
+    template, see index_templates. For BGZF files the offsets are virtual
+    offsets, the offset of the block in the compressed file shifted
+    left by 16 bits plus the offset of the template in the uncompressed
+    block. The size, modification time and inode of the indexed file
+    are stored to detect files that were rewritten after indexing.
+    """
+    def __init__(self, interval, num_templates, offsets, virtual=True, data_size=0, data_mtime=0,
+                 data_mtime_nsec=0, data_inode=0, index_file=None):
+        self.interval = interval
+        self.num_templates = num_templates
+        self.offsets = offsets
+        self.virtual = virtual
+        self.data_size = data_size
+        self.data_mtime = data_mtime
+        self.data_mtime_nsec = data_mtime_nsec
+        self.data_inode = data_inode
+        self.index_file = index_file
+
+    def matches(self, file_name):
+        """Return true if the given file is the file this
+        index was built from, i.e. its size, modification
+        time (nanoseconds) and inode did not change"""
+        if self.index_file is None:
+            raise ValueError("The template index was not read from a file")
+        return gt.template_index_matches(self.index_file, file_name)
+
+    def ranges(self, chunks):
+        """Split the indexed templates into at most the given number of
+        consecutive chunks of whole index intervals. Returns a list of
+        (first_template, end_template, offset) tuples where offset is
+        the offset of the first template of the chunk.
+        """
+        entries = len(self.offsets)
+        if entries == 0:
+            return []
+        chunks = max(1, min(chunks, entries))
+        ranges = []
+        for i in range(chunks):
+            start = (entries * i) / chunks
+            end = (entries * (i + 1)) / chunks
+            ranges.append((start * self.interval,
+                           min(end * self.interval, self.num_templates),
+                           self.offsets[start]))
+        return ranges
+
+
+def template_index_file(file_name):
+    """Return the name of the template index of the given
+    file or None if the file is not a file name"""
+    if not isinstance(file_name, basestring):
+        return None
+    return file_name + ".idx"
+
+
+def index_templates(file_name, interval=4096, index_file=None):
+    """Write the template index of an uncompressed or BGZF compressed
+    map file. gemtools.InputFile uses the index to read template ranges.
+
+    @param file_name: the map file
+    @param interval: number of templates between two index entries
+    @param index_file: the index file, defaults to <file_name>.idx
+    @return index_file: the name of the index file
+    @rtype string
+    """
+    if index_file is None:
+        index_file = template_index_file(file_name)
+    gt.index_templates(file_name, index_file, interval=interval)
+    return index_file
+
+
+def read_template_index(file_name):
+    """Read the template index written by gt.bgzip, OutputFile or
+    index_templates
+
+    @param file_name: the index file
+    @return index: the template index
+    @rtype TemplateIndex
+    """
+    with __builtin__.open(file_name, 'rb') as f:
+        header = f.read(_TEMPLATE_INDEX_HEADER.size)
+        if len(header) != _TEMPLATE_INDEX_HEADER.size:
+            raise IOError("Truncated template index : %s" % (file_name))
+        (magic, version, flags, interval, num_templates, num_offsets,
+         data_size, data_mtime, data_mtime_nsec, data_inode) = \
+            _TEMPLATE_INDEX_HEADER.unpack(header)
+        if magic != "GTIX" or version != _TEMPLATE_INDEX_VERSION:
+            raise IOError("Not a template index : %s" % (file_name))
+        data = f.read(8 * num_offsets)
+        if len(data) != 8 * num_offsets:
+            raise IOError("Truncated template index : %s" % (file_name))
+    offsets = list(struct.unpack("<%dQ" % (num_offsets), data))
+    return TemplateIndex(interval, num_templates, offsets,
+                         virtual=(flags & _TEMPLATE_INDEX_VIRTUAL_OFFSETS) != 0,
+                         data_size=data_size, data_mtime=data_mtime,
+                         data_mtime_nsec=data_mtime_nsec, data_inode=data_inode,
+                         index_file=file_name)
+
+
+def open_gzip(file_name, threads=0):
+    """Open a stream on the uncompressed content of a gzip
+    or BGZF compressed file. The file is inflated by a
+    child process, see Inflater.
 
     @param file_name: the name of the input file
+    @param threads: number of threads that inflate BGZF files, 0 for the default
     @return stream: gzip stream
     @rtype stream
     """
     if not isinstance(file_name, basestring):
         raise ValueError("The provided file name is not a string : %s" % (file_name))
-    parameter = [__zcat(), file_name]
-    zcat = subprocess.Popen(parameter, stdout=subprocess.PIPE)
-    return zcat.stdout
+    if not os.path.exists(file_name):
+        raise IOError("File not found : %s" % (file_name))
+    return Inflater(file_name, threads=threads).stdout
 
 
-def __zcat():
+def _inflate(file_name, fd, threads, inherited):
+    """Inflate the file into the file descriptor, the child
+    process of an Inflater. Exits with 1 if the content was
+    not written completely"""
+    for i in inherited:
+        os.close(i)
+    if not gt.inflate(file_name, fd, threads):
+        sys.exit(1)
+
+
+def _encode_bam(input, fd, threads, mapq, inherited):
+    """Encode the SAM content of the input file descriptor
+    as BAM into the file descriptor, the child process of a
+    BamEncoder. Exits with 1 if the content was not encoded
+    completely"""
+    for i in inherited:
+        os.close(i)
+    if not gt.sam_to_bam(input, fd, threads, mapq):
+        sys.exit(1)
+
+
+class Inflater(object):
+    """Inflate a gzip or BGZF compressed file in a child
+    process and provide the content through the stdout pipe,
+    like a zcat process. The blocks of BGZF files are inflated
+    in parallel.
+
+    Only the child process keeps the write end of the pipe, so
+    the reader sees the end of the content as soon as the child
+    is done, no matter which other processes are forked meanwhile.
     """
-    get the path to the zcat/gzcat executable
-    or raise an exception
+    def __init__(self, file_name, threads=0):
+        """Start inflating the file
+
+        file_name -- the compressed file
+        threads -- number of threads that inflate BGZF files, 0 for the default
+        """
+        (r, w) = os.pipe()
+        for fd in (r, w):
+            fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.fcntl(fd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+        self.stdout = os.fdopen(r, 'rb')
+        self.__process = mp.Process(target=_inflate, args=(file_name, w, threads or 0, [r]))
+        self.__process.start()
+        os.close(w)
+
+    def wait(self):
+        """Wait for the inflater and return 0 if the
+        content was written completely"""
+        self.__process.join()
+        return 0 if self.__process.exitcode == 0 else 1
+
+    def poll(self):
+        """Return the exit value of wait() if the inflater
+        finished, otherwise None"""
+        exit_value = self.__process.exitcode
+        if exit_value is None:
+            return None
+        return 0 if exit_value == 0 else 1
+
+
+class BamEncoder(object):
+    """Encode SAM content as BAM in a child process, like a
+    samtools view -S -b process. The BGZF blocks are compressed
+    in parallel. The BAM content is written to the output file or,
+    if no output is given, provided through the stdout pipe.
+
+    Only the child process keeps the write end of the pipe and
+    the SAM input, see Inflater.
     """
-    global __zcat_path
-    if __zcat_path is not None:
-        return __zcat_path
+    def __init__(self, input, output=None, threads=0, mapq=0, process=None):
+        """Start encoding the SAM content
+
+        input   -- open stream of the SAM content
+        output  -- optional output file name
+        threads -- number of threads that compress BGZF blocks, 0 for the default
+        mapq    -- skip records with a lower mapping quality
+        process -- optional process that writes the SAM content
+        """
+        self.input = input
+        self.process = process
+        self.stdin = None
+        self.stdout = None
+        self.error = None
+        inherited = []
+        if output is None:
+            (r, w) = os.pipe()
+            for fd in (r, w):
+                fcntl.fcntl(fd, fcntl.F_SETFD, fcntl.fcntl(fd, fcntl.F_GETFD) | fcntl.FD_CLOEXEC)
+            self.stdout = os.fdopen(r, 'rb')
+            inherited.append(r)
+        else:
+            w = os.open(output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0644)
+        self.__process = mp.Process(target=_encode_bam,
+                                    args=(input.fileno(), w, threads or 0,
+                                          max(0, int(mapq or 0)), inherited))
+        self.__process.start()
+        os.close(w)
+        # the writer gets a broken pipe if the encoder stops early
+        input.close()
 
-    __zcat_path = which("gzcat")
-    if not __zcat_path:
-        __zcat_path = which("zcat")
-    if not __zcat_path:
-        raise ValueError("Unable to find a zcat|gzcat executable in PATH!")
-    return __zcat_path
+    def wait(self):
+        """Wait for the encoder and the process that writes
+        the SAM content. Returns 0 if the content was encoded
+        completely"""
+        self.__process.join()
+        if self.process is not None:
+            exit_value = self.process.wait()
+            if exit_value != 0:
+                self.error = getattr(self.process, "error", None)
+                return exit_value
+        return 0 if self.__process.exitcode == 0 else 1
@@ -5,6 +5,7 @@ import gem
 import gem.gemtools as gt
 import gem.files as gf
 
+import re
 import sys
 import subprocess
 
@@ -25,8 +26,9 @@ def create_output_stream(output, compress=False, threads=1):
     ---------
     output   - the target output, None, a file name or an already opend
                stream are allowed
-    compress - if set to True and the output is not stdout/err, the output
-               stream will be gzip compressed.
+    compress - if set to True or a codec name and the output is not
+               stdout/err, the output stream will be compressed with the
+               codec, gzip by default (see gem.files.codecs).
     threads  - if compression is enabled and installed compressors support
                multiple threads, they are passed on to the compressor
     """
@@ -51,7 +53,9 @@ def create_output_stream(output, compress=False, threads=1):
 
     p = None
     if compress and output is not None:
-        p = subprocess.Popen(gem._compressor(threads=threads),
+        p = subprocess.Popen(gem._compressor(threads=threads,
+                                             index=gf.template_index_file(output),
+                                             codec=compress),
                              stdout=output_stream,
                              stdin=subprocess.PIPE)
         input_stream = p.stdin
@@ -115,10 +119,15 @@ def run_filter(input, args, output=None,
     if isinstance(input, gt.InputFile):
         quality = input.quality
 
+    filter_threads = compress_threads = gem.utils.thread_budget(threads)
+    if compress and output is not None:
+        # filter and compressor run concurrently
+        filter_threads, compress_threads = gem.utils.allocate_threads(
+            filter_threads, [gem.thread_costs['gt.filter'], gem.thread_costs['compressor']])
     output_stream, output, compressor = create_output_stream(output,
                                                              compress=compress,
-                                                             threads=threads)
-    pa = [gem.executables['gt.filter'], '-t', str(threads)]
+                                                             threads=compress_threads)
+    pa = [gem.executables['gt.filter'], '-t', str(filter_threads)]
     if paired:
         pa.append('-p')
     if rna_seq:
@@ -140,6 +149,148 @@ def unmapped(reads, exclude=-1):
     return gt.unmapped(reads.__iter__(), exclude)
 
 
+def expression(text):
+    """Compile a filter expression into a native template filter
+    (gt.filter_expression). The filter runs in C, both when the filtered
+    reads are iterated and in the parallel stream writer.
+
+    An expression combines comparisons of template variables with
+    integers using and, or, not and parentheses, for example
+
+        mapped and mismatches <= 2 and num_maps < 5 and length >= 50
+
+    A variable on its own is true if it is not 0. The variables are
+
+    mapped         -- 1 if the template is mapped
+    paired         -- 1 if the template has more than one block
+    blocks         -- number of blocks (ends) of the template
+    num_maps       -- number of (paired) maps
+    length         -- total read length of all blocks
+    mismatches     -- stratum of the best map, -1 if unmapped
+    max_mismatches -- stratum of the worst map, -1 if unmapped
+    level          -- uniqueness level, -1 if the best stratum is not unique
+    mcs            -- max complete strata, -1 if not set
+    has_qualities  -- 1 if the reads have qualities
+
+    Raises a ValueError if the expression is not valid.
+    """
+    return gt.filter_expression(_ExpressionCompiler(text).compile(), text=text)
+
+
+def select(reads, text):
+    """Yield only the reads the filter expression is true for
+    (see expression())
+    """
+    return gt.filter(reads.__iter__(), expression(text))
+
+
+class _ExpressionCompiler(object):
+    """Recursive descent compiler of filter expressions to the
+    stack code of gt.filter_expression
+
+    expression := and_expr ("or" and_expr)*
+    and_expr   := not_expr ("and" not_expr)*
+    not_expr   := "not" not_expr | comparison
+    comparison := operand [("<"|"<="|">"|">="|"=="|"!=") operand]
+    operand    := ["-"] integer | variable | "(" expression ")"
+    """
+    tokens = re.compile(r"\s*(?:(\d+)|([A-Za-z_]\w*)|(<=|>=|==|!=|<|>|\(|\)|-))")
+    comparisons = ["<", "<=", ">", ">=", "==", "!="]
+
+    def __init__(self, text):
+        self.text = text
+        self.code = []
+        self.depth = 0
+        self.position = 0
+        self.token = None
+        self._next()
+
+    def compile(self):
+        self._expression()
+        if self.token is not None:
+            self._error("unexpected '%s'" % self.token)
+        return self.code
+
+    def _error(self, message):
+        raise ValueError("Invalid filter expression '%s': %s at position %d" % (
+            self.text, message, self.token_position))
+
+    def _next(self):
+        """Read the next token, None at the end of the expression"""
+        self.token_position = self.position
+        if self.text[self.position:].strip() == "":
+            self.token = None
+            return
+        m = self.tokens.match(self.text, self.position)
+        if m is None:
+            self.token_position = len(self.text) - len(self.text[self.position:].lstrip())
+            self._error("unexpected '%s'" % self.text[self.token_position])
+        self.token_position = m.start(m.lastindex)
+        self.token = m.group(m.lastindex)
+        self.position = m.end()
+
+    def _emit(self, operation, value=0, depth=-1):
+        self.depth += depth
+        if self.depth > gt.EXPRESSION_MAX_STACK:
+            self._error("expression too complex")
+        self.code.append((gt.EXPRESSION_OPERATIONS[operation], value))
+
+    def _expression(self):
+        self._and()
+        while self.token == "or":
+            self._next()
+            self._and()
+            self._emit("or")
+
+    def _and(self):
+        self._not()
+        while self.token == "and":
+            self._next()
+            self._not()
+            self._emit("and")
+
+    def _not(self):
+        if self.token == "not":
+            self._next()
+            self._not()
+            self._emit("not", depth=0)
+        else:
+            self._comparison()
+
+    def _comparison(self):
+        self._operand()
+        if self.token in self.comparisons:
+            operation = self.token
+            self._next()
+            self._operand()
+            self._emit(operation)
+
+    def _operand(self):
+        token = self.token
+        if token is None:
+            self._error("unexpected end")
+        if token == "(":
+            self._next()
+            self._expression()
+            if self.token != ")":
+                self._error("missing ')'")
+            self._next()
+        elif token == "-" or token.isdigit():
+            sign = 1
+            if token == "-":
+                sign = -1
+                self._next()
+                if self.token is None or not self.token.isdigit():
+                    self._error("number expected")
+            self._emit("const", sign * int(self.token), depth=1)
+            self._next()
+        elif token in gt.EXPRESSION_VARIABLES:
+            self._emit("variable", gt.EXPRESSION_VARIABLES[token], depth=1)
+            self._next()
+        else:
+            self._error("unknown variable '%s'" % token)
+
+
 def length(input, min=-1, max=65536):
     """Filter reads by sequence length"""
     for read in input:
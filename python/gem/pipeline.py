@@ -1,17 +1,25 @@
 #!/usr/bin/env
 """Pipeline utilities"""
 import gem
+import hashlib
 import json
 import logging
 import os
 import errno
+import shutil
 import signal
+import tempfile
+import threading
+import time
 import traceback
+import Queue
 
 from gem.utils import Timer
 import gem.gemtools as gt
 import gem.filter
 import gem.utils
+import gem.executors
+import gem.scatter
 
 class dotdict(dict):
     def __getattr__(self, attr):
@@ -28,6 +36,14 @@ class PipelineError(Exception):
 
 class PipelineStep(object):
     """General mapping pipeline step"""
+    # the step reads its input once as a stream and can
+    # consume a shared stream of the dependency output
+    fan_out = False
+    # the step output can be streamed to its consumer
+    stream_output = False
+    # the step can read all its inputs as streams at the same time
+    stream_input = False
+
     def __init__(self, name, dependencies=None, final=False, description="",
                  name_suffix=None, file_suffix=None):
         self.id = None
@@ -40,6 +56,9 @@ class PipelineStep(object):
         self._files = None
         self.configuration = None
         self.final = final
+        self.threads = 1  # threads assigned to this step
+        self.shared_input = None  # shared stream of the dependency output
+        self.stream = None  # fifo the output is streamed through
         if dependencies is not None:
             self.dependencies.extend(dependencies)
 
@@ -48,6 +67,7 @@ class PipelineStep(object):
         self.pipeline = pipeline
         self.id = id
         self.configuration = configuration
+        self.threads = pipeline.threads
         # initialize files
         self.files()
 
@@ -56,11 +76,20 @@ class PipelineStep(object):
         pass
 
     def cleanup(self, force=False):
+        """Remove the outputs of this step if forced or if they are
+        temporary. The manifest of removed temporary outputs is kept
+        and marked, see is_removed()"""
         if force or (not self.final and self.pipeline.remove_temp):
-            for f in self.files():
+            # compressed outputs can come with a template index
+            indexes = [gem.files.template_index_file(f) for f in self.files()]
+            for f in self.files() + indexes:
                 if os.path.exists(f):
                     logging.gemtools.debug("Remove temporary file %s" % f)
                     os.remove(f)
+            if force:
+                self.remove_manifest()
+            else:
+                self.mark_removed()
 
     def files(self):
         """Return the output files generated by this step.
@@ -75,10 +104,26 @@ class PipelineStep(object):
         return self._files
 
     def _compress(self):
-        """Returns true if this step needs compression for
-        all output
+        """Returns the codec of the intermediate output if this
+        step needs compression for all output, otherwise False
         """
-        return self.pipeline.compress_all
+        if self.pipeline.compress_all and self.stream is None:
+            return self.pipeline.intermediate_codec
+        return False
+
+    def _compress_final(self):
+        """Returns the codec of the final output if the final
+        output is compressed, otherwise False
+        """
+        if self.pipeline.compress:
+            return self.pipeline.codec
+        return False
+
+    def _allocate_threads(self, *tools):
+        """Split the threads of this step between tools
+        that run concurrently. The tools are referenced by
+        their name in gem.thread_costs"""
+        return gem.utils.allocate_threads(self.threads, [gem.thread_costs[t] for t in tools])
 
     def _output(self):
         """Return the output file if its not final
@@ -90,7 +135,10 @@ class PipelineStep(object):
             return self._final_output()
 
     def _final_output(self):
-        """Return the last file created by this step"""
+        """Return the last file created by this step or
+        the fifo if the output is streamed"""
+        if self.stream is not None:
+            return self.stream
         return self.files()[-1]
 
     def _input(self, raw=False):
@@ -98,6 +146,8 @@ class PipelineStep(object):
         has no dependencies or the
         output of the last dependency
         """
+        if self.shared_input is not None:
+            return self.shared_input
         if self.dependencies is None or len(self.dependencies) == 0:
             return self.pipeline.open_input()
         return self.pipeline.open_step(self.dependencies[-1], raw=raw)
@@ -105,14 +155,14 @@ class PipelineStep(object):
     def open(self, raw=False):
         """Open the steps output. The default implementation
         opnes the last file"""
-        fs = self.files()
+        fs = self.files() if self.stream is None else [self.stream]
         if len(fs) > 0:
             if raw:
                 logging.gemtools.debug("Returning raw step %s output : %s", self.name, fs[-1])
                 return fs[-1]
             else:
                 logging.gemtools.debug("Opening step %s output : %s", self.name, fs[-1])
-                return gem.files.open(fs[-1])
+                return gem.files.open(fs[-1], mmap_file=self.pipeline.mmap_input)
         else:
             logging.error("Step does not produce output files! Unable to open output")
             return None
@@ -121,13 +171,171 @@ class PipelineStep(object):
         """Return true if this step is done and
         does not need execution
 
-        The basic implementation checks if all files exists
+        The step is done if its manifest exists and the configuration,
+        the inputs and the outputs still match the manifest. Inputs
+        that do not exist any more, i.e. removed temporary files, are
+        not checked.
         """
-        for f in self.files():
-            if not os.path.exists(f):
+        manifest = self.read_manifest()
+        if manifest is None or manifest.get("removed", False):
+            return False
+        if not self.__manifest_matches(manifest):
+            return False
+        for (f, size) in manifest["outputs"]:
+            if not os.path.exists(f) or os.path.getsize(f) != size:
+                logging.gemtools.debug("Output of step %s changed : %s", self.name, f)
                 return False
         return True
 
+    def is_removed(self):
+        """Return true if this step was completed and its temporary
+        outputs were removed after the run, but the configuration and
+        the inputs still match the manifest. The step only has to be
+        executed again if one of its dependents needs the output.
+        """
+        manifest = self.read_manifest()
+        if manifest is None or not manifest.get("removed", False):
+            return False
+        return self.__manifest_matches(manifest)
+
+    def __manifest_matches(self, manifest):
+        """Return true if the configuration and the existing
+        inputs match the manifest"""
+        if manifest["configuration"] != self.configuration_hash():
+            logging.gemtools.debug("Configuration of step %s changed", self.name)
+            return False
+        for (f, size, mtime) in manifest["inputs"]:
+            if os.path.exists(f) and _file_fingerprint(f) != [f, size, mtime]:
+                logging.gemtools.debug("Input of step %s changed : %s", self.name, f)
+                return False
+        return True
+
+    def manifest(self):
+        """Return the path to the manifest file of this step"""
+        return os.path.join(self.pipeline.output_dir,
+                            ".%s_%s.manifest" % (self.pipeline.name, self.name))
+
+    def to_dict(self):
+        """Return the state of this step as a json serializable
+        dictionary. Use step_from_dict() to restore the step"""
+        state = dict((k, v) for k, v in self.__dict__.items()
+                     if k not in ["pipeline", "shared_input"])
+        return {"class": "%s.%s" % (self.__class__.__module__, self.__class__.__name__),
+                "state": state}
+
+    def checkpoint(self):
+        """Return the directory that keeps the completed
+        chunks of this step"""
+        return os.path.join(self.pipeline.output_dir,
+                            ".%s_%s.chunks" % (self.pipeline.name, self.name))
+
+    def remove_checkpoint(self):
+        """Remove the completed chunks of this step"""
+        if os.path.exists(self.checkpoint()):
+            shutil.rmtree(self.checkpoint(), ignore_errors=True)
+
+    def _chunk_arguments(self):
+        """Return the arguments that make the mapping tools process
+        the input in checkpointed chunks"""
+        if self.pipeline.chunks <= 1:
+            return {}
+        return {"chunks": self.pipeline.chunks, "checkpoint": self.checkpoint(),
+                "executor": gem.scatter.LocalExecutor(self.pipeline.chunk_workers)}
+
+    def effective_configuration(self):
+        """Return the configuration that determines the output
+        of this step, including the pipeline parameters used by
+        the steps"""
+        cfg = dict(self.configuration if self.configuration is not None else {})
+        cfg["step"] = self.__class__.__name__
+        cfg["final"] = self.final
+        cfg["files"] = self.files()
+        cfg["inputs"] = self.input_files()
+        for k in ["quality", "filter", "scoring_scheme", "single_end", "max_read_length"]:
+            cfg["pipeline." + k] = getattr(self.pipeline, k, None)
+        return cfg
+
+    def configuration_hash(self):
+        """Return a hash of the effective configuration"""
+        cfg = json.dumps(self.effective_configuration(), sort_keys=True, default=str)
+        return hashlib.sha1(cfg).hexdigest()
+
+    def input_files(self):
+        """Return the files this step reads"""
+        if self.dependencies is None or len(self.dependencies) == 0:
+            return list(self.pipeline.input if self.pipeline.input is not None else [])
+        files = []
+        for d in self.dependencies:
+            if d >= 0:
+                files.extend(self.pipeline.steps[d].output_files())
+        return files
+
+    def output_files(self):
+        """Return the files that have to exist for this
+        step to be done"""
+        return self.files()
+
+    def read_manifest(self):
+        """Read the manifest of this step or return None
+        if there is no valid manifest"""
+        try:
+            with open(self.manifest()) as f:
+                return json.load(f)
+        except (IOError, ValueError):
+            return None
+
+    def write_manifest(self, configuration_hash=None, streamed=False):
+        """Write the manifest of this step after
+        a successful execution
+
+        The output of a streamed step never exists as a file. Its
+        manifest is marked as removed, see mark_removed(), and the step
+        is only executed again if one of its dependents needs the output.
+
+        configuration_hash -- the configuration hash taken before the
+                              step was executed. Computed if not specified
+        streamed           -- the output was streamed to the consumer
+        """
+        if configuration_hash is None:
+            configuration_hash = self.configuration_hash()
+        manifest = {
+            "step": self.name,
+            "configuration": configuration_hash,
+            "inputs": [_file_fingerprint(f) for f in self.input_files() if os.path.exists(f)],
+            "outputs": [] if streamed else [[f, os.path.getsize(f)] for f in self.output_files()],
+        }
+        if streamed:
+            manifest["removed"] = True
+            manifest["streamed"] = True
+        self.__dump_manifest(manifest)
+
+    def mark_removed(self):
+        """Mark the manifest of this step after its outputs
+        were removed as temporary files"""
+        manifest = self.read_manifest()
+        if manifest is None or manifest.get("removed", False):
+            return
+        manifest["removed"] = True
+        self.__dump_manifest(manifest)
+
+    def __dump_manifest(self, manifest):
+        """Replace the manifest file atomically"""
+        tmp = self.manifest() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.rename(tmp, self.manifest())
+
+    def remove_manifest(self):
+        """Remove the manifest of this step"""
+        if os.path.exists(self.manifest()):
+            os.remove(self.manifest())
+
+
+def _file_fingerprint(f):
+    """Return path, size and modification time of the file"""
+    stat = os.stat(f)
+    return [f, stat.st_size, int(stat.st_mtime)]
+
 
 class PrepareInputStep(PipelineStep):
     """Prepare multiple input files,
@@ -160,6 +368,7 @@ class PrepareInputStep(PipelineStep):
 
 class MergeStep(PipelineStep):
     """Merge up to the current step"""
+    stream_input = True
 
     def run(self):
         """Merge current set of mappings and delete last ones"""
@@ -167,8 +376,11 @@ class MergeStep(PipelineStep):
         inputs = self._input()
         master = inputs[0]
         slaves = inputs[1:]
+        threads = [self.threads]
+        if self.final:
+            threads = self._allocate_threads("gt.mapset", "gem-2-gem")
         mapping = gem.merge(master, slaves, output=self._output(),
-                            threads=self.pipeline.threads,
+                            threads=threads[0],
                             same_content=same_content,
                             paired=False,
                             compress=self._compress())
@@ -176,9 +388,9 @@ class MergeStep(PipelineStep):
         if self.final:
             gem.score(mapping, self.configuration["index"], self._final_output(),
                 filter=self.pipeline.filter,
-                threads=max(2, self.pipeline.threads / 2),
+                threads=threads[1],
                 quality=self.pipeline.quality,
-                compress=self.pipeline.compress
+                compress=self._compress_final()
             )
 
     def _input(self):
@@ -191,6 +403,7 @@ class MergeStep(PipelineStep):
 
 class FilterStep(PipelineStep):
     """Filter the result mapping"""
+    fan_out = True
     def files(self):
         if self._files is None:
             self._files = []
@@ -208,7 +421,7 @@ class FilterStep(PipelineStep):
         gem.filter.rnaseq_filter(
             inputs,
             output=self._final_output(),
-            compress=self.pipeline.compress,
+            compress=self._compress_final(),
             annotation=cfg['annotation'],
             min_intron=cfg['min_intron'],
             min_block=cfg['min_block'],
@@ -217,22 +430,28 @@ class FilterStep(PipelineStep):
             max_multi_maps=cfg['max_multi_maps'],
             gene_pairing=cfg['filter_annotation'] if cfg['annotation'] is not None else False,
             junction_filter=cfg['filter_annotation'] if cfg['annotation'] is not None else False,
-            threads=self.pipeline.threads,
+            threads=self.threads,
             keep_unique=True,
         )
 
 
 class MergeAndPairStep(PipelineStep):
     """Do merging and pairing in one single step"""
+    stream_input = True
     def run(self):
         cfg = self.configuration
         same_content = self.configuration.get("same_content", True)
         inputs = self._input()
         master = inputs[0]
         slaves = inputs[1:]
+        # merge, pairalign and scoring run concurrently
+        tools = ["gt.mapset", "gem-mapper"]
+        if self.final:
+            tools.append("gem-2-gem")
+        threads = self._allocate_threads(*tools)
 
         mapping = gem.merge(master, slaves, output=None,
-                            threads=max(1, self.pipeline.threads / 2),  # self.pipeline.threads,
+                            threads=threads[0],
                             same_content=same_content,
                             paired=False,
                             compress=self._compress())
@@ -250,7 +469,7 @@ class MergeAndPairStep(PipelineStep):
           min_matched_bases=cfg["min_matched_bases"],
           max_extendable_matches=cfg["max_extendable_matches"],
           max_matches_per_extension=cfg["max_matches_per_extension"],
-          threads=max(1, self.pipeline.threads / 2),  # self.pipeline.threads,
+          threads=threads[1],
           filter_max_matches=0,
           quality=self.pipeline.quality,
           compress=self._compress())
@@ -258,9 +477,9 @@ class MergeAndPairStep(PipelineStep):
         if self.final:
             gem.score(pair_mapping, cfg["index"], self._final_output(),
                 filter=self.pipeline.filter,
-                threads=max(1, self.pipeline.threads / 2),
+                threads=threads[2],
                 quality=self.pipeline.quality,
-                compress=self.pipeline.compress,
+                compress=self._compress_final(),
                 raw=True)
 
     def _input(self):
@@ -273,6 +492,7 @@ class MergeAndPairStep(PipelineStep):
 
 class CreateStatsStep(PipelineStep):
     """Create stats file"""
+    fan_out = True
 
     def files(self):
         if self._files is None:
@@ -288,11 +508,12 @@ class CreateStatsStep(PipelineStep):
         infile = self._input()
         gem.stats(infile, output=outputs[0], json_output=outputs[1],
                   paired=cfg['paired'],
-                  threads=self.pipeline.threads)
+                  threads=self.threads)
 
 
 class CreateGtfStatsStep(PipelineStep):
     """Create gtf stats file"""
+    fan_out = True
 
     def files(self):
         if self._files is None:
@@ -314,7 +535,7 @@ class CreateGtfStatsStep(PipelineStep):
         counts_exon_threshold = cfg['counts_exon_threshold']
         gem.gtfcounts(infile, cfg['annotation'], output=output,
                       counts=gene_counts, json_output=json_stats,
-                      threads=self.pipeline.threads, weight=counts_weighted,
+                      threads=self.threads, weight=counts_weighted,
                       multimaps=counts_multimaps, paired=cfg['paired'],
                       coverage=True,
                       exon_threshold=counts_exon_threshold)
@@ -322,6 +543,7 @@ class CreateGtfStatsStep(PipelineStep):
 
 class CreateBamStep(PipelineStep):
     """Create BAM file"""
+    fan_out = True
 
 #    def files(self):
         #if self._files is None:
@@ -332,14 +554,14 @@ class CreateBamStep(PipelineStep):
     def run(self):
         cfg = self.configuration
         sam = gem.gem2sam(self._input(), cfg["index"],
-                          threads=self.pipeline.threads,
+                          threads=self.threads,
                           quality=self.pipeline.quality,
                           consensus=cfg['consensus'],
                           exclude_header=cfg['sam_no_seq_header'],
                           compact=cfg['sam_compact'],
                           single_end=not cfg['paired'],
                           calc_xs=cfg['calc_xs'])
-        gem.sam2bam(sam, self._final_output(), sorted=cfg["sort"], mapq=cfg["mapq"], threads=self.pipeline.threads, sort_memory=self.pipeline.sort_memory)
+        gem.sam2bam(sam, self._final_output(), sorted=cfg["sort"], mapq=cfg["mapq"], threads=self.threads, sort_memory=self.pipeline.sort_memory)
 
 
 class IndexBamStep(PipelineStep):
@@ -358,8 +580,12 @@ class IndexBamStep(PipelineStep):
 
 class MapStep(PipelineStep):
     """Mapping step"""
+    stream_output = True
     def run(self):
         cfg = self.configuration
+        threads = [self.threads]
+        if self.final:
+            threads = self._allocate_threads("gem-mapper", "gem-2-gem")
         mapping = gem.mapper(
             self._input(),
             cfg["index"],
@@ -375,22 +601,27 @@ class MapStep(PipelineStep):
             delta=cfg["strata_after_best"],
             trim=cfg["trim"],
             quality=self.pipeline.quality,
-            threads=self.pipeline.threads,
-            compress=self._compress()
+            threads=threads[0],
+            compress=self._compress(),
+            **self._chunk_arguments()
         )
         if self.final:
             gem.score(mapping, cfg["index"], self._final_output(),
                 filter=self.pipeline.filter,
-                threads=max(2, self.pipeline.threads / 2),
+                threads=threads[1],
                 quality=self.pipeline.quality,
-                compress=self.pipeline.compress
+                compress=self._compress_final()
             )
 
 
 class PairalignStep(PipelineStep):
     """Pairalign"""
+    stream_output = True
     def run(self):
         cfg = self.configuration
+        threads = [self.threads]
+        if self.final:
+            threads = self._allocate_threads("gem-mapper", "gem-2-gem")
         mapping = gem.pairalign(
             self._input(),
             cfg["index"],
@@ -404,16 +635,17 @@ class PairalignStep(PipelineStep):
           min_matched_bases=cfg["min_matched_bases"],
           max_extendable_matches=cfg["max_extendable_matches"],
           max_matches_per_extension=cfg["max_matches_per_extension"],
-          threads=self.pipeline.threads,
+          threads=threads[0],
           quality=self.pipeline.quality,
-          compress=self._compress())
+          compress=self._compress(),
+          **self._chunk_arguments())
 
         if self.final:
             gem.score(mapping, cfg["index"], self._final_output(),
                 filter=self.pipeline.filter,
-                threads=max(2, self.pipeline.threads / 2),
+                threads=threads[1],
                 quality=self.pipeline.quality,
-                compress=self.pipeline.compress)
+                compress=self._compress_final())
 
 
 class CreateDenovoTranscriptomeStep(PipelineStep):
@@ -451,7 +683,7 @@ class CreateDenovoTranscriptomeStep(PipelineStep):
             filter=cfg["filter"],
             splice_consensus=cfg["junctions_consensus"],
             mismatches=cfg["mismatches"],
-            threads=self.pipeline.threads,
+            threads=self.threads,
             strata_after_first=cfg["strata_after_best"],
             coverage=cfg["coverage"],
             min_split=cfg["min_split_length"],
@@ -486,7 +718,7 @@ class CreateDenovoTranscriptomeStep(PipelineStep):
         if max_len <= 0:
             logging.gemtools.gt("Calculating max read length")
             max_len = gem.utils.get_max_read_length(self._input(),
-                                                    threads=self.pipeline.threads)
+                                                    threads=self.threads)
             if max_len < 0:
                 raise PipelineError("Unable to calculate max read length: %s" % file)
             logging.gemtools.gt("Max read length: %d", max_len)
@@ -494,24 +726,23 @@ class CreateDenovoTranscriptomeStep(PipelineStep):
         (denovo_transcriptome, denovo_keys) = gem.compute_transcriptome(max_len, cfg["index"], self.junctions_out, junctions_gtf_out)
 
         logging.gemtools.gt("Indexing denovo transcriptome")
-        gem.index(denovo_transcriptome, self.index_denovo_out, threads=self.pipeline.threads)
+        gem.index(denovo_transcriptome, self.index_denovo_out, threads=self.threads)
         return (self.index_denovo_out, self.denovo_keys)
 
     def cleanup(self, force=False):
         if force or (not self.final and self.pipeline.remove_temp):
-            keep = [self.junctions_out, self.denovo_keys, self.denovo_out]
+            keep = self.output_files()
             for f in self.files():
                 if os.path.exists(f) and f not in keep:
                     logging.gemtools.debug("Remove temporary file %s" % f)
                     os.remove(f)
+        if force:
+            self.remove_manifest()
 
-    def is_done(self):
-        """Make sure we ignore the log file generated by the indexer"""
-        keep = [self.junctions_out, self.denovo_keys, self.denovo_out]
-        for f in keep:
-            if not os.path.exists(f) and not f.endswith(".log"):
-                return False
-        return True
+    def output_files(self):
+        """Only the junctions and keys are kept, the index and the
+        log file generated by the indexer are removed"""
+        return [self.junctions_out, self.denovo_keys, self.denovo_out]
 
 
 class ExtractJunctionsStep(PipelineStep):
@@ -534,7 +765,7 @@ class ExtractJunctionsStep(PipelineStep):
             filter=cfg["filter"],
             splice_consensus=cfg["junctions_consensus"],
             mismatches=cfg["mismatches"],
-            threads=self.pipeline.threads,
+            threads=self.threads,
             strata_after_first=cfg["strata_after_best"],
             coverage=cfg["coverage"],
             min_split=cfg["min_split_length"],
@@ -576,13 +807,14 @@ class SplitMapStep(PipelineStep):
                 trim=cfg["trim"],
                 filter_splitmaps=True,
                 post_validate=True,
-                threads=self.pipeline.threads,
+                threads=self.threads,
                 extra=None)
         return splitmap
 
 
 class TranscriptMapStep(PipelineStep):
     """Transcript Mapping step"""
+    stream_output = True
 
     def prepare(self, id, pipeline, config):
         PipelineStep.prepare(self, id, pipeline, config)
@@ -608,6 +840,8 @@ class TranscriptMapStep(PipelineStep):
             cfg["keys"] = step.denovo_keys
 
         outfile = self.files()[0]
+        # the filter runs concurrently on the mapper output
+        map_threads, filter_threads = self._allocate_threads("gem-mapper", "gt.filter")
         mapping = gem.mapper(
             self._input(),
             cfg["index"],
@@ -624,12 +858,12 @@ class TranscriptMapStep(PipelineStep):
             trim=cfg["trim"],
             key_file=cfg["keys"],
             quality=self.pipeline.quality,
-            threads=self.pipeline.threads
+            threads=map_threads
         )
         # filter for only split maps
         gem.filter.only_split_maps(mapping,
                                    outfile,
-                                   threads=self.pipeline.threads,
+                                   threads=filter_threads,
                                    compress=self._compress())
 
 
@@ -647,6 +881,414 @@ class TranscriptMapStep(PipelineStep):
             return PipelineStep._input(self, raw=raw)
 
 
+def step_from_dict(pipeline, data):
+    """Restore a step from its dictionary representation
+    without preparing it again
+
+    pipeline -- the pipeline the step belongs to
+    data -- the dictionary created by PipelineStep.to_dict()
+    """
+    (module, name) = data["class"].rsplit(".", 1)
+    cls = getattr(__import__(module, fromlist=[name]), name)
+    step = cls.__new__(cls)
+    step.__dict__.update(data["state"])
+    if step.configuration is not None:
+        step.configuration = dotdict(step.configuration)
+    step.pipeline = pipeline
+    step.shared_input = None
+    return step
+
+
+def pipeline_from_dict(data):
+    """Restore a pipeline and its steps from the dictionary
+    created by MappingPipeline.to_dict()"""
+    pipeline = MappingPipeline()
+    for k, v in data["pipeline"].items():
+        setattr(pipeline, k, v)
+    pipeline.steps = [step_from_dict(pipeline, s) for s in data["steps"]]
+    return pipeline
+
+
+# available step executors
+executors = ["inprocess", "process", "queue", "batch"]
+
+
+class StepScheduler(object):
+    """Execute pipeline steps along their dependency graph.
+
+    A step is started as soon as all its dependencies are
+    completed. Up to max_parallel steps run at the same time and
+    the thread budget is split between the steps that are started
+    together. The steps are executed in worker threads, the
+    heavy lifting is done by the external processes the steps start.
+
+    If fan-out is enabled on the pipeline, ready steps that read the
+    output of the same dependency are started together as a single
+    unit and share one pass over that output. If intermediate streaming
+    is enabled, producers and their consumer are started together and
+    the intermediate outputs are passed through fifos.
+
+    The executor decides where a step runs, see gem.executors.
+    Steps that share an input stream, or use fifos with an
+    executor that runs on other hosts, always run in-process.
+    """
+    def __init__(self, pipeline, ids, threads=1, max_parallel=1, force=False, executor=None):
+        """Create a scheduler for the given step ids
+
+        pipeline -- the mapping pipeline
+        ids -- the ids of the steps to execute
+        threads -- the total number of threads available to all running steps
+        max_parallel -- maximum number of steps executed concurrently
+        force -- execute steps even if they are done
+        executor -- the step executor, defaults to in-process execution
+        """
+        self.pipeline = pipeline
+        if executor is None:
+            executor = gem.executors.InProcessExecutor()
+        self.executor = executor
+        self.__in_process = gem.executors.InProcessExecutor()
+        self.ids = sorted(ids)
+        self.threads = max(1, threads)
+        self.max_parallel = max(1, max_parallel)
+        self.force = force
+        self.times = {}
+        self.timeline = []  # resource usage records of the executed steps
+        self.error = False
+        self.pending = [pipeline.steps[i] for i in self.ids]
+        self.running = {}  # running steps with the assigned threads
+        self.completed = set([])
+        self.executed = set([])  # steps executed in this run
+        self.__checked = set([])
+        self.__unit_of = {}
+        self.__consumer_done = {}
+        self.__results = Queue.Queue()
+
+    def dependencies(self, step):
+        """Return the dependencies of the given step that
+        are executed by this scheduler"""
+        return [d for d in step.dependencies if d >= 0 and d in self.ids]
+
+    def ready(self):
+        """Return the pending steps that have all
+        dependencies completed"""
+        return [s for s in self.pending
+                if all([d in self.completed for d in self.dependencies(s)])]
+
+    def run(self):
+        """Run all steps and return true if no
+        error occured"""
+        while len(self.pending) > 0 or len(self.running) > 0:
+            if not self.error:
+                self.__start_ready()
+            if len(self.running) == 0:
+                if len(self.pending) > 0 and not self.error:
+                    logging.gemtools.error("Unable to resolve dependencies for steps : %s",
+                                           ", ".join([s.name for s in self.pending]))
+                    self.error = True
+                break
+            try:
+                # wait with timeout to keep the main thread responsive to signals
+                (step, error) = self.__results.get(True, 1)
+            except Queue.Empty:
+                self.__unblock()
+                continue
+            del self.running[step]
+            for failed in self.__finished(step, error):
+                self.error = True
+                self.completed.discard(failed.id)
+                if len(self.running) > 0:
+                    logging.gemtools.warning("Waiting for %d running step(s) to finish",
+                                             len(self.running))
+        return not self.error
+
+    def cancel(self):
+        """Cleanup after all running steps"""
+        self.error = True
+        for step in self.running.keys():
+            logging.gemtools.warning("Job step %s canceled, forcing cleanup!", step.name)
+            step.cleanup(force=True)
+
+    def __start_ready(self):
+        """Skip all ready steps that are done and start
+        as many of the remaining ready steps as possible"""
+        skipped = True
+        while skipped:
+            skipped = False
+            for step in self.ready():
+                if step.id in self.__checked:
+                    continue
+                self.__checked.add(step.id)
+                if self.__is_done(step):
+                    if step.is_removed():
+                        logging.gemtools.warning("Skipping step %s, temporary output is not needed" % (step.name))
+                    else:
+                        logging.gemtools.warning("Skipping step %s, output already exists" % (step.name))
+                    self.pending.remove(step)
+                    self.completed.add(step.id)
+                    skipped = True
+
+        units = self.__units(self.ready())
+        free = self.threads - sum(self.running.values())
+        used = len(self.__active_units())
+        while len(units) > 0 and free > 0 and used < self.max_parallel:
+            slots = min(len(units), self.max_parallel - used)
+            threads = max(1, free / slots)
+            self.__start(units.pop(0), threads)
+            free -= threads
+            used += 1
+
+    def __is_done(self, step, visiting=()):
+        """Return true if the step does not have to be executed. A step
+        whose temporary outputs were removed is only done if all its
+        dependents are done, otherwise the outputs are needed again.
+        A step is not done if one of its dependencies will be executed.
+
+        visiting -- ids of the steps that are checked already
+        """
+        if step.id in self.completed:
+            return True
+        if self.force or self.__dependency_executed(step):
+            return False
+        visiting = visiting + (step.id,)
+        for d in self.dependencies(step):
+            if d not in visiting and not self.__is_done(self.pipeline.steps[d], visiting):
+                return False
+        if step.is_removed():
+            dependents = [s for s in self.pending
+                          if step.id in self.dependencies(s) and s.id not in visiting]
+            return all([self.__is_done(s, visiting) for s in dependents])
+        return step.is_done()
+
+    def __dependency_executed(self, step):
+        """Return true if one of the dependencies of the step
+        was executed in this run"""
+        return any([d in self.executed for d in self.dependencies(step)])
+
+    def __active_units(self):
+        """Return the units with running steps"""
+        units = []
+        for unit in self.__unit_of.values():
+            if unit not in units:
+                units.append(unit)
+        return units
+
+    def __units(self, ready):
+        """Group the ready steps into units that are started together.
+
+        Without fan-out or streaming, every step is its own unit. With
+        streaming, a step that reads all its inputs as streams is started
+        together with the producers of its inputs, connected through
+        fifos. With fan-out, steps that consume the output of the same
+        dependency share a single pass over that output.
+        """
+        units = []
+        claimed = set([])
+        if self.pipeline.stream_intermediates:
+            for consumer in self.pending:
+                producers = self.__stream_producers(consumer)
+                if producers is None:
+                    continue
+                # ready producers wait for the other producers of
+                # the consumer and are started together with them
+                claimed.update(producers)
+                if all([p in ready for p in producers]):
+                    units.append(dotdict(kind="stream", steps=producers + [consumer]))
+
+        shared = {}
+        for step in ready:
+            if step in claimed:
+                continue
+            source = step.dependencies[-1] if len(step.dependencies) > 0 else -1
+            if not self.pipeline.fan_out or not step.fan_out or source < 0:
+                units.append(dotdict(kind=None, steps=[step]))
+            elif source in shared:
+                shared[source].steps.append(step)
+                shared[source].kind = "fan-out"
+            else:
+                shared[source] = dotdict(kind=None, steps=[step], source=source)
+                units.append(shared[source])
+        units.sort(key=lambda u: min([s.id for s in u.steps]))
+        return units
+
+    def __stream_producers(self, consumer):
+        """Return the pending producer steps whose output can be streamed
+        to the given consumer or None if the consumer can not be started
+        in streaming mode. Outputs that are used by other steps, final
+        outputs and completed outputs are never streamed. The producers
+        are returned whether they are ready or not, the unit can only be
+        started once all of them are ready.
+        """
+        if not consumer.stream_input:
+            return None
+        producers = []
+        for d in self.dependencies(consumer):
+            if d in self.completed:
+                continue
+            step = self.pipeline.steps[d]
+            if step not in self.pending or not step.stream_output or step.final:
+                return None
+            dependents = [s.id for s in self.pipeline.steps
+                          if s.id in self.ids and d in s.dependencies]
+            if dependents != [consumer.id]:
+                return None
+            producers.append(step)
+        if len(producers) == 0:
+            return None
+        if consumer.id not in self.__consumer_done:
+            self.__consumer_done[consumer.id] = not self.force and \
+                not any([d in self.executed for d in self.dependencies(consumer)]) and \
+                consumer.is_done()
+        if self.__consumer_done[consumer.id]:
+            return None
+        return producers
+
+    def __start(self, unit, threads):
+        """Start the steps of a unit in worker threads"""
+        steps = unit.steps
+        unit.remaining = len(steps)
+        unit.failed = []
+        unit.tee = None
+        unit.fifo_dir = None
+        if unit.kind == "fan-out":
+            logging.gemtools.gt("Streaming output of step %s to : %s" % (
+                self.pipeline.steps[unit.source].name, ", ".join([s.name for s in steps])))
+            unit.tee = gem.files.Tee(self.pipeline.open_step(unit.source, raw=True), len(steps))
+            for i, step in enumerate(steps):
+                step.shared_input = gt.InputFile(unit.tee.streams[i])
+        elif unit.kind == "stream":
+            logging.gemtools.gt("Streaming output of %s to step %s" % (
+                ", ".join([s.name for s in steps[:-1]]), steps[-1].name))
+            unit.fifo_dir = tempfile.mkdtemp(prefix="gemtools_")
+            for step in steps[:-1]:
+                step.stream = os.path.join(unit.fifo_dir, "%d.map" % step.id)
+                os.mkfifo(step.stream)
+
+        threads = max(1, threads / len(steps))
+        for step in steps:
+            self.pending.remove(step)
+            self.running[step] = threads
+            self.__unit_of[step] = unit
+            step.threads = threads
+            if self.max_parallel > 1 or len(steps) > 1:
+                logging.gemtools.gt("Running step: %s (%d threads)" % (step.name, threads))
+            else:
+                logging.gemtools.gt("Running step: %s" % step.name)
+            worker = threading.Thread(target=self.__execute, args=(step,))
+            worker.daemon = True
+            worker.start()
+
+    def __unblock(self):
+        """Open and close the fifos of failed streaming units
+        to release steps that wait for the other side"""
+        for unit in self.__active_units():
+            if unit.fifo_dir is None or len(unit.failed) == 0:
+                continue
+            for step in unit.steps[:-1]:
+                for flags in [os.O_RDONLY | os.O_NONBLOCK, os.O_WRONLY | os.O_NONBLOCK]:
+                    try:
+                        os.close(os.open(step.stream, flags))
+                    except OSError:
+                        pass
+
+    def __finished(self, step, error):
+        """Update the unit of a finished step and return the list
+        of steps that failed"""
+        unit = self.__unit_of.pop(step)
+        unit.remaining -= 1
+        if error:
+            unit.failed.append(step)
+        else:
+            self.completed.add(step.id)
+            self.executed.add(step.id)
+        if unit.tee is not None:
+            unit.tee.abandon(unit.steps.index(step))
+            step.shared_input = None
+            if unit.remaining == 0 and unit.tee.wait() != 0:
+                logging.gemtools.error("Failed to read the output of step %s",
+                                       self.pipeline.steps[unit.source].name)
+                return self.__fail_unit(unit)
+        if unit.fifo_dir is not None:
+            if len(unit.failed) > 0:
+                self.__unblock()
+            if unit.remaining == 0:
+                for s in unit.steps[:-1]:
+                    s.stream = None
+                shutil.rmtree(unit.fifo_dir, ignore_errors=True)
+                if len(unit.failed) > 0:
+                    # a broken stream invalidates the whole unit
+                    return self.__fail_unit(unit)
+            return []
+        return [step] if error else []
+
+    def __fail_unit(self, unit):
+        """Cleanup after all steps of the unit that did not fail
+        already and return all steps of the unit"""
+        for s in unit.steps:
+            if s not in unit.failed:
+                logging.gemtools.warning("Cleaning up after failed step : %s", s.name)
+                s.cleanup(force=True)
+                unit.failed.append(s)
+        return unit.failed
+
+    def __executor_for(self, step):
+        """Return the executor that can run the given step"""
+        if step.shared_input is not None and not self.executor.shares_memory:
+            return self.__in_process
+        if not self.executor.shares_host:
+            streams = [step] + [self.pipeline.steps[d] for d in step.dependencies if d >= 0]
+            if any(s.stream is not None for s in streams):
+                return self.__in_process
+        return self.executor
+
+    def __execute(self, step):
+        """Execute a single step and report the result"""
+        t = Timer()
+        start = time.time()
+        error = False
+        accounting = gem.utils.ProcessAccounting(step.name)
+        try:
+            step.remove_manifest()
+            configuration_hash = step.configuration_hash()
+            with accounting:
+                for usage in self.__executor_for(step).run(step):
+                    accounting.add(usage)
+            step.write_manifest(configuration_hash, streamed=step.stream is not None)
+            step.remove_checkpoint()
+        except PipelineError, e:
+            logging.gemtools.error("Error while executing step %s : %s" % (step.name, str(e)))
+            error = True
+        except gem.utils.ProcessError, e:
+            logging.gemtools.error("Error while executing step %s : %s" % (step.name, str(e)))
+            error = True
+        except Exception, e:
+            traceback.print_exc()
+            logging.gemtools.error("Error while executing step %s : %s" % (step.name, str(e)))
+            error = True
+
+        if error:
+            logging.gemtools.warning("Cleaning up after failed step : %s", step.name)
+            step.cleanup(force=True)
+        t.stop(step.name + " completed in %s", loglevel=None)
+        self.times[step.id] = t.end
+        end = time.time()
+        self.timeline.append({
+            "step": step.name,
+            "id": step.id,
+            "threads": step.threads,
+            "start": start,
+            "end": end,
+            "wall": end - start,
+            "failed": error,
+            "totals": accounting.totals(),
+            "processes": accounting.processes
+        })
+        if not error:
+            logging.gemtools.gt("Step %s finished in : %s", step.name, t.end)
+        else:
+            logging.gemtools.gt("Step %s failed after : %s", step.name, t.end)
+        self.__results.put((step, error))
+
+
 class MappingPipeline(object):
     """General mapping pipeline class."""
 
@@ -672,6 +1314,8 @@ class MappingPipeline(object):
         self.scoring_scheme = "+U,+u,-s,-t,+1,-i,-a"  # scoring scheme
         self.compress = True  # compress final output
         self.compress_all = False  # also compress intermediate output
+        self.codec = "gzip"  # codec of the compressed final output
+        self.intermediate_codec = "gzip"  # codec of the compressed intermediate output
         self.remove_temp = True  # remove temporary
         self.bam_mapq = 0  # filter bam content mapq
         self.bam_create = True  # create bam
@@ -686,6 +1330,17 @@ class MappingPipeline(object):
         self.sort_memory = "768M"  # samtools sort memory
         self.direct_input = False  # if true, skip the preparation step
         self.force = False  # force computation of all steps
+        self.parallel_steps = 1  # maximum number of concurrently running steps
+        self.fan_out = False  # share one pass over a step output between consumers
+        self.stream_intermediates = False  # pass intermediate outputs through fifos
+        self.chunks = 1  # number of checkpointed chunks the mapping steps process
+        self.chunk_workers = 1  # number of chunks mapped concurrently
+        self.executor = "inprocess"  # execution backend of the steps
+        self.queue_dir = None  # job directory of the queue and batch executors
+        self.queue_workers = 1  # local workers started by the queue executor
+        self.submit_command = None  # batch submission command template
+        self.job_timeout = None  # seconds until a job of the process, queue and batch executors is failed
+        self.mmap_input = True  # memory map uncompressed input and intermediate files
 
         self.filter_max_matches = 25
         self.filter_min_strata = 1
@@ -1106,9 +1761,9 @@ class MappingPipeline(object):
     def open_input(self):
         """Open the original input files"""
         if len(self.input) == 1:
-            return gem.files.open(self.input[0])
+            return gem.files.open(self.input[0], mmap_file=self.mmap_input)
         else:
-            return gem.filter.interleave([gem.files.open(f) for f in self.input], threads=max(1, self.threads / 2))
+            return gem.filter.interleave([gem.files.open(f, mmap_file=self.mmap_input) for f in self.input], threads=max(1, self.threads / 2))
 
     def open_step(self, id, raw=False):
         """Open the original input files"""
@@ -1150,9 +1805,7 @@ class MappingPipeline(object):
 
         if self.name is None and self.input is not None and len(self.input) > 0:
             # get name from input files
-            name = os.path.basename(self.input[0])
-            if name.endswith(".gz"):
-                name = name[:-3]
+            name = gem.files.strip_codec_extension(os.path.basename(self.input[0]))
             idx = name.rfind(".")
             if idx > 0:
                 self.name = name[:idx]
@@ -1186,6 +1839,26 @@ class MappingPipeline(object):
 
         if self.threads <= 0:
             self.threads = 1
+        if self.threads > gem.utils.available_cpus():
+            logging.gemtools.warning("Requested %d threads but only %d cpus are available, limiting threads to %d" % (
+                self.threads, gem.utils.available_cpus(), gem.utils.available_cpus()))
+            self.threads = gem.utils.available_cpus()
+
+        if self.parallel_steps <= 0:
+            self.parallel_steps = 1
+
+        if self.chunks <= 0:
+            self.chunks = 1
+
+        if self.chunk_workers <= 0:
+            self.chunk_workers = 1
+
+        if self.executor not in executors:
+            raise PipelineError("Unknown executor %s, use one of %s" % (self.executor, ", ".join(sorted(executors))))
+        if self.executor == "queue" and self.queue_dir is None:
+            raise PipelineError("The queue executor needs a queue directory (--queue-dir)")
+        if self.executor == "batch" and self.submit_command is None:
+            raise PipelineError("The batch executor needs a submit command (--submit)")
 
         if self.transcript_index is None and self.annotation is not None:
             # guess the transcript index
@@ -1226,6 +1899,16 @@ index generated from your annotation.""")
         elif self.transcript_keys is not None and os.path.exists(self.transcript_keys):
             self.transcript_keys = os.path.abspath(self.transcript_keys)
 
+        # check the codecs
+        for (used, codec) in [(self.compress, self.codec), (self.compress_all, self.intermediate_codec)]:
+            if not used:
+                continue
+            if codec not in gem.files.codecs:
+                errors.append("Unknown compression codec '%s', available codecs : %s" % (
+                    codec, ", ".join(sorted(gem.files.codecs.keys()))))
+            elif not gem.files.codecs[codec].available():
+                errors.append("Compression codec '%s' not found" % (codec))
+
         # check inpuf compression
         if self.compress_all and not self.direct_input:
             logging.gemtools.warning("Enabeling direct input for compressed temporay files")
@@ -1326,12 +2009,22 @@ index generated from your annotation.""")
         printer("")
         printer("Compress output  : %s", self.compress)
         printer("Compress all     : %s", self.compress_all)
+        printer("Codec            : %s", self.codec)
+        printer("Temporary codec  : %s", self.intermediate_codec)
         printer("Create BAM       : %s", self.bam_create)
         printer("SAM/BAM compact  : %s", self.sam_compact)
         printer("Calculate XS     : %s", self.calc_xs)
         printer("Sort BAM         : %s", self.bam_sort)
         printer("Index BAM        : %s", self.bam_index)
         printer("Keep Temporary   : %s", not self.remove_temp)
+        printer("Parallel steps   : %s", self.parallel_steps)
+        printer("Fan-out          : %s", self.fan_out)
+        printer("Stream temporary : %s", self.stream_intermediates)
+        printer("Mapping chunks   : %s", self.chunks)
+        printer("Chunk workers    : %s", self.chunk_workers)
+        printer("Executor         : %s", self.executor)
+        printer("Job timeout      : %s", self.job_timeout)
+        printer("Memory map input : %s", self.mmap_input)
         printer("")
 
         if not run_step:
@@ -1428,91 +2121,56 @@ index generated from your annotation.""")
                 return
 
         time = Timer()
-        times = {}
 
-        if run_step:
-            # sort by id
-            self.run_steps.sort()
         ids = [s.id for s in self.steps]
         if run_step:
-            ids = self.run_steps
+            ids = sorted(self.run_steps)
+            # check dependencies outside of the selected steps are done
+            for step_id in ids:
+                for d in self.steps[step_id].dependencies:
+                    if d >= 0 and d not in ids and not self.steps[d].is_done():
+                        logging.gemtools.error("Step dependency is not completed : %s", self.steps[d].name)
+                        error = True
+            if error:
+                return
 
-        step = None
+        if not os.path.exists(self.output_dir):
+            # make sure we create the ouput folder
+            logging.gemtools.warn("Creating output folder %s", self.output_dir)
+            try:
+                os.makedirs(self.output_dir)
+            except OSError as exc:
+                if not (exc.errno == errno.EEXIST and os.path.isdir(self.output_dir)):
+                    logging.gemtools.error("unable to create output folder %s", self.output_dir)
+                    return
+
+        executor = self.create_executor()
+        scheduler = StepScheduler(self, ids, threads=self.threads,
+                                  max_parallel=self.parallel_steps,
+                                  force=run_step or self.force,
+                                  executor=executor)
 
         # register signal handler to catch
         # interruptions and perform cleanup
-         # register cleanup signal handler
         def cleanup_in_signal(signal, frame):
             logging.gemtools.warning("Job step canceled, forcing cleanup!")
-            step.cleanup(force=True)
+            scheduler.cancel()
 
         signal.signal(signal.SIGINT, cleanup_in_signal)
         signal.signal(signal.SIGQUIT, cleanup_in_signal)
         signal.signal(signal.SIGHUP, cleanup_in_signal)
         signal.signal(signal.SIGTERM, cleanup_in_signal)
 
-        for step_id in ids:
-            step = self.steps[step_id]
-
-            if run_step:
-                # check dependencies are done
-                for d in step.dependencies:
-                    if not self.steps[d].is_done():
-                        logging.gemtools.error("Step dependency is not completed : %s", self.steps[d].name)
-                        error = True
-                        break
-            if run_step or self.force or not step.is_done():
-                logging.gemtools.gt("Running step: %s" % step.name)
-                t = Timer()
-
-                if not os.path.exists(self.output_dir):
-                    # make sure we create the ouput folder
-                    logging.gemtools.warn("Creating output folder %s", self.output_dir)
-                    try:
-                        os.makedirs(self.output_dir)
-                    except OSError as exc: # Python >2.5
-                        if exc.errno == errno.EEXIST and os.path.isdir(path):
-                            pass
-                        else:
-                            logging.gemtools.error("unable to create output folder %s", self.output_dir)
-                            error = True
-                            break
-
-                try:
-                    step.run()
-                except KeyboardInterrupt:
-                    logging.gemtools.warning("Job step canceled, forcing cleanup!")
-                    error = True
-                    step.cleanup(force=True)
-                    break
-                except PipelineError, e:
-                    logging.gemtools.error("Error while executing step %s : %s" % (step.name, str(e)))
-                    logging.gemtools.warning("Cleaning up after failed step : %s", step.name)
-                    step.cleanup(force=True)
-                    error = True
-                    break
-                except gem.utils.ProcessError, e:
-                    logging.gemtools.error("Error while executing step %s : %s" % (step.name, str(e)))
-                    logging.gemtools.warning("Cleaning up after failed step : %s", step.name)
-                    step.cleanup(force=True)
-                    error = True
-                    break
-                except Exception, e:
-                    traceback.print_exc()
-                    logging.gemtools.error("Error while executing step %s : %s" % (step.name, str(e)))
-                    logging.gemtools.warning("Cleaning up after failed step : %s", step.name)
-                    step.cleanup(force=True)
-                    error = True
-                    break
-                finally:
-                    t.stop(step.name + " completed in %s", loglevel=None)
-                    times[step.id] = t.end
-                    if not error:
-                        logging.gemtools.gt("Step %s finished in : %s", step.name, t.end)
-                    else:
-                        logging.gemtools.gt("Step %s failed after : %s", step.name, t.end)
-            else:
-                logging.gemtools.warning("Skipping step %s, output already exists" % (step.name))
+        try:
+            error = not scheduler.run()
+        except KeyboardInterrupt:
+            logging.gemtools.warning("Job step canceled, forcing cleanup!")
+            scheduler.cancel()
+            error = True
+        finally:
+            executor.close()
+        times = scheduler.times
+        self.write_timeline(scheduler.timeline)
 
         # do celanup if not in error state
         if not error:
@@ -1536,6 +2194,42 @@ index generated from your annotation.""")
         """
         pass
 
+    def to_dict(self):
+        """Return the pipeline with its prepared steps as a json
+        serializable dictionary. Use pipeline_from_dict() to restore
+        the pipeline, i.e. in a worker process"""
+        state = dict((k, v) for k, v in self.__dict__.items()
+                     if k not in ["steps", "run_steps", "write_config"])
+        return {"pipeline": state, "steps": [s.to_dict() for s in self.steps]}
+
+    def create_executor(self):
+        """Create the executor for the configured backend"""
+        if self.executor == "process":
+            return gem.executors.ProcessExecutor(self.queue_dir, timeout=self.job_timeout)
+        if self.executor == "queue":
+            return gem.executors.QueueExecutor(self.queue_dir, workers=self.queue_workers, timeout=self.job_timeout)
+        if self.executor == "batch":
+            return gem.executors.BatchExecutor(self.submit_command, self.queue_dir, timeout=self.job_timeout)
+        return gem.executors.InProcessExecutor()
+
+    def timeline_file(self):
+        """Return the path to the json timeline of the last run"""
+        return "%s/%s.timeline.json" % (self.output_dir, self.name)
+
+    def write_timeline(self, timeline):
+        """Write the resource usage records of the executed steps
+        and their processes as json next to the outputs"""
+        if len(timeline) == 0:
+            return
+        try:
+            with open(self.timeline_file(), "w") as f:
+                json.dump({"name": self.name,
+                           "threads": self.threads,
+                           "steps": sorted(timeline, key=lambda x: x["start"])},
+                          f, indent=2, default=str)
+        except IOError, e:
+            logging.gemtools.warning("Unable to write timeline %s : %s", self.timeline_file(), str(e))
+
     def create_file_name(self, suffix, name_suffix=None, file_suffix="map", final=False):
         """Create a result file name"""
         file = ""
@@ -1548,8 +2242,11 @@ index generated from your annotation.""")
             file = "%s/%s%s_%s.%s" % (self.output_dir, self.name, name_suffix, suffix, file_suffix)
         else:
             file = "%s/%s%s.%s" % (self.output_dir, self.name, name_suffix, file_suffix)
-        if (self.compress_all or final and self.compress) and file_suffix in ["map", "fastq"]:
-            file += ".gz"
+        if file_suffix in ["map", "fastq"]:
+            if final and self.compress:
+                file = gem.files.compressed_file_name(file, self.codec)
+            elif self.compress_all:
+                file = gem.files.compressed_file_name(file, self.intermediate_codec)
         return file
 
     def gtf_junctions(self):
@@ -1705,6 +2402,11 @@ index generated from your annotation.""")
         output_group.add_argument('-o', '--output-dir', dest="output_dir", metavar="dir", help='Optional output folder. If not specified the current working directory is used.')
         output_group.add_argument('-g', '--no-gzip', dest="compress", action="store_false", default=None, help="Do not compress final mapping file")
         output_group.add_argument('--compress-all', dest="compress_all", action="store_true", default=None, help="Compress all intermediate output")
+        output_group.add_argument('--codec', dest="codec", metavar="codec", choices=sorted(gem.files.codecs.keys()), default=None,
+                                  help="Compression codec of the final output. Default %s" % (str(self.codec)))
+        output_group.add_argument('--intermediate-codec', dest="intermediate_codec", metavar="codec", choices=sorted(gem.files.codecs.keys()), default=None,
+                                  help="""Compression codec of the intermediate output if --compress-all is set. The fast codecs (zstd, lz4)
+            save scratch space at little cost. Default %s""" % (str(self.intermediate_codec)))
         output_group.add_argument('--keep-temp', dest="remove_temp", action="store_false", default=None, help="Keep temporary files")
 
     def register_execution(self, parser):
@@ -1720,6 +2422,46 @@ index generated from your annotation.""")
         execution_group.add_argument('--run', dest="run_steps", type=int, default=None, nargs="+", metavar="cfg", help="Run given pipeline steps idenfified by the step id")
         execution_group.add_argument('--force', dest="force", default=None, action="store_true", help="Force running all steps and skip checking for completed steps")
         execution_group.add_argument('-t', '--threads', dest="threads", metavar="threads", type=int, help="Number of threads to use. Default %d" % self.threads)
+        execution_group.add_argument('--parallel-steps', dest="parallel_steps", metavar="steps", type=int,
+                                     help="""Maximum number of independent pipeline steps that are executed concurrently.
+                                     The threads are split between the running steps. Default %d""" % self.parallel_steps)
+        execution_group.add_argument('--fan-out', dest="fan_out", default=None, action="store_true",
+                                     help="""Read the output of a step only once and stream it to all steps
+                                     that consume it (stats, bam, filtering and counts) at the same time""")
+        execution_group.add_argument('--stream-intermediates', dest="stream_intermediates", default=None, action="store_true",
+                                     help="""Run the mapping steps together with the merge step and stream the temporary
+                                     mappings through fifos instead of writing them to disk. Steps that have
+                                     to be re-run on their own still use files""")
+        execution_group.add_argument('--executor', dest="executor", choices=sorted(executors),
+                                     help="""Where the pipeline steps run. 'inprocess' runs them in this process,
+                                     'process' starts a python process per step, 'queue' puts the steps into
+                                     a directory queue served by local or remote workers and 'batch' submits
+                                     every step with the --submit command. Default %s""" % self.executor)
+        execution_group.add_argument('--queue-dir', dest="queue_dir", metavar="dir",
+                                     help="""Job directory of the queue and batch executors. It has to be shared
+                                     with the workers. Additional queue workers can be started with
+                                     'python -m gem.executors --queue <dir>'""")
+        execution_group.add_argument('--queue-workers', dest="queue_workers", metavar="workers", type=int,
+                                     help="""Number of local workers started by the queue executor. Use 0 if the
+                                     queue is served by external workers only. Default %d""" % self.queue_workers)
+        execution_group.add_argument('--submit', dest="submit_command", metavar="cmd",
+                                     help="""Submit command template of the batch executor. {command} is replaced
+                                     by the worker command and {job} by the job file, i.e. "sbatch --wrap '{command}'\"""")
+        execution_group.add_argument('--job-timeout', dest="job_timeout", metavar="seconds", type=int,
+                                     help="""Fail a step if its job of the process, queue or batch executor did not
+                                     finish within the given number of seconds. Jobs whose worker dies are failed
+                                     without timeout, jobs that are never started only with a timeout""")
+        execution_group.add_argument('--chunks', dest="chunks", metavar="chunks", type=int,
+                                     help="""Split the input of the mapping and pairing steps into chunks. Completed
+                                     chunks are kept, so a failed or killed step only maps the missing
+                                     chunks when it is re-run. Default %d""" % self.chunks)
+        execution_group.add_argument('--chunk-workers', dest="chunk_workers", metavar="workers", type=int,
+                                     help="""Number of chunks that are mapped concurrently. The threads of the step
+                                     are split between the workers and every worker loads its own copy of
+                                     the index. Default %d""" % self.chunk_workers)
+        execution_group.add_argument('--no-mmap', dest="mmap_input", action="store_false", default=None,
+                                     help="""Read uncompressed input and intermediate files instead of memory
+                                     mapping them""")
 
     def register_mapping(self, parser):
         """Register the genome mapping parameters with the
@@ -10,6 +10,7 @@ import subprocess
 
 import gem
 import gem.commands
+import gem.files
 import gem.reports
 import gem.gemtools as gt
 
@@ -111,6 +112,24 @@ class Convert(Command):
             gem.bamIndex(args.output)
 
 
+class MapIndex(Command):
+    title = "Index templates of .map files"
+    description = """Write the template index of uncompressed or BGZF
+    compressed .map files. The index stores the offset of every n-th
+    template and allows to read template ranges of the file.
+    """
+
+    def register(self, parser):
+        parser.add_argument('-i', '--input', dest="input", nargs="+", help='List of .map files to index', required=True)
+        parser.add_argument('--interval', dest="interval", default=4096, type=int,
+                            help="Number of templates between two index entries. Default 4096")
+
+    def run(self, args):
+        for f in args.input:
+            index_file = gem.files.index_templates(f, interval=args.interval)
+            logging.gemtools.info("Indexed %s : %s" % (f, index_file))
+
+
 class Stats(Command):
     title = "Create .map stats"
     description = """Calculate stats on a map file"""
@@ -215,7 +234,7 @@ class Index(Command):
             raise CommandException("Output file name has to end in .gem")
         if not os.path.exists(input):
             raise CommandException("Input file not found : %s" % input)
-        if input.endswith(".gz"):
+        if gem.files.codec_for(input) is not None:
             raise CommandException("Compressed input is currently not supported!")
 
         logging.gemtools.gt("Creating index")
@@ -304,7 +323,7 @@ class RnaPipeline(Command):
 
         # check if we want to do a preparation step
         input_dep = []
-        if not pipeline.direct_input and (pipeline.input is not None and ((len(pipeline.input) > 1 or len(filter(lambda x: x.endswith(".gz"), pipeline.input)) > 0))):
+        if not pipeline.direct_input and (pipeline.input is not None and ((len(pipeline.input) > 1 or len(filter(lambda x: gem.files.codec_for(x) is not None, pipeline.input)) > 0))):
             input_dep.append(pipeline.prepare_input(name="prepare"))
 
         # basic pipeline steps
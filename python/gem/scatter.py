@@ -0,0 +1,426 @@
+#!/usr/bin/env python
+"""Scatter-gather execution of the mapping tools.
+
+The input is split into read aligned chunks, every chunk is
+mapped by its own job and the chunk outputs are concatenated
+in the original order. Jobs are plain dictionaries that are
+executed by run_job(). An executor runs a list of jobs and
+returns their outputs in order. The LocalExecutor runs the jobs
+on this machine, other executors can ship the jobs to other nodes
+and only have to provide a map(function, jobs) method.
+"""
+import os
+import hashlib
+import json
+import shutil
+import tempfile
+import threading
+import logging
+
+import gem
+import gem.gemtools as gt
+import gem.utils
+import gem.files
+
+
+# number of lines per record of the supported formats
+_record_lines = {"fastq": 4, "fasta": 2, "map": 1}
+
+
+def _guess_format(file_name):
+    """Guess the format of the uncompressed file from its first byte"""
+    with open(file_name, "rb") as f:
+        first = f.read(1)
+    if first == "@":
+        return "fastq"
+    if first == ">":
+        return "fasta"
+    return "map"
+
+
+def _template_key(line, format):
+    """Return the template name of a record header line. Read pair
+    information (/1 /2 or anything after a whitespace) is removed
+    so both mates of a pair share the same key"""
+    if format == "map":
+        name = line.split("\t", 1)[0]
+    else:
+        name = line[1:]
+    name = name.split()[0] if len(name.strip()) > 0 else ""
+    if name.endswith("/1") or name.endswith("/2"):
+        name = name[:-2]
+    return name
+
+
+def _read_key(f, format):
+    """Read the next record and return its template key or
+    None at the end of the file"""
+    header = f.readline()
+    if len(header) == 0:
+        return None
+    for i in range(_record_lines[format] - 1):
+        f.readline()
+    return _template_key(header, format)
+
+
+def _boundary(f, offset, format):
+    """Return the offset of the first template that starts at or
+    after the given offset or None if there is no template left"""
+    if offset > 0:
+        f.seek(offset - 1)
+        if f.read(1) != "\n":
+            f.readline()
+    else:
+        f.seek(0)
+    # find the first record start
+    while True:
+        start = f.tell()
+        line = f.readline()
+        if len(line) == 0:
+            return None
+        if format == "map":
+            break
+        if format == "fasta" and line.startswith(">"):
+            break
+        if format == "fastq" and line.startswith("@"):
+            # the quality line can start with @, check the separator
+            f.readline()
+            if f.readline().startswith("+"):
+                break
+            f.seek(start)
+            f.readline()
+    if offset == 0:
+        return start
+    # the record might be the second mate of a pair. The template
+    # starts here if the next record is its mate, otherwise the
+    # next record starts a new template
+    f.seek(start)
+    first = _read_key(f, format)
+    second_start = f.tell()
+    second = _read_key(f, format)
+    if second is None:
+        return None
+    if first == second:
+        return start
+    return second_start
+
+
+def split(file_name, chunks):
+    """Split the uncompressed fasta, fastq or map file into at
+    most the given number of chunks. Chunks never separate the
+    mates of a pair. Returns a list of (start, end) byte ranges.
+
+    file_name -- the file to split
+    chunks    -- the number of chunks
+    """
+    size = os.path.getsize(file_name)
+    format = _guess_format(file_name)
+    offsets = [0]
+    with open(file_name, "rb") as f:
+        for i in range(1, chunks):
+            offset = _boundary(f, max(offsets[-1], size * i / chunks), format)
+            if offset is None:
+                break
+            if offset > offsets[-1]:
+                offsets.append(offset)
+    offsets.append(size)
+    return [(offsets[i], offsets[i + 1]) for i in range(len(offsets) - 1)
+            if offsets[i + 1] > offsets[i]]
+
+
+def _materialize(input, target):
+    """Write the raw content of the input to the target file
+    unless it is already an uncompressed file and return
+    the name of the file that can be split"""
+    if isinstance(input, basestring):
+        input = gt.InputFile(input)
+    if isinstance(input, gt.InputFile):
+        if input.filename is not None and gem.files.codec_for(input.filename) is None \
+                and not input.filename.endswith(".bz2"):
+            return input.filename
+        stream = input.raw_stream()
+        with open(target, "wb") as out:
+            shutil.copyfileobj(stream, out, 1048576)
+        stream.close()
+        if input.process is not None:
+            input.process.wait()
+    else:
+        # templates from an iterator are written in map format
+        p = gem.utils.run_tools([["cat", "-"]], input=input, output=target,
+                                write_map=True, name="Scatter-Input")
+        if p.wait() != 0:
+            raise gem.utils.ProcessError("Unable to write the input to %s" % (target))
+    return target
+
+
+def _open_chunk(chunk):
+    """Open the byte range of a chunk and return an
+    InputFile over its content"""
+    source = open(chunk["file"], "rb")
+    source.seek(chunk["start"])
+    reader = gem.utils.run_tool(["head", "-c", str(chunk["end"] - chunk["start"])],
+                                input=source, name="Chunk")
+    source.close()
+    return gt.InputFile(reader.stdout, quality=chunk["quality"], process=reader)
+
+
+def _committed(record):
+    """Return true if the chunk described by the checkpoint
+    record was completed by a previous run"""
+    try:
+        with open(record["output"] + ".json") as f:
+            committed = json.load(f)
+        size = committed.pop("size")
+        return committed == record and size == os.path.getsize(record["output"])
+    except (IOError, OSError, ValueError, KeyError):
+        return False
+
+
+def _commit(record):
+    """Write the checkpoint record of a completed chunk"""
+    committed = dict(record)
+    committed["size"] = os.path.getsize(record["output"])
+    target = record["output"] + ".json"
+    with open(target + ".tmp", "w") as f:
+        json.dump(committed, f)
+    os.rename(target + ".tmp", target)
+
+
+def _file_key(file_name):
+    """Return the name, size and modification time that identify
+    the version of a file"""
+    stat = os.stat(file_name)
+    return [os.path.abspath(file_name), stat.st_size, stat.st_mtime]
+
+
+def _content_key(file_name, block=1048576):
+    """Return a hash of the size and the first and last block of
+    the file. This tells apart inputs without a file name, i.e.
+    streams, that have the same size"""
+    size = os.path.getsize(file_name)
+    sha = hashlib.sha1(str(size))
+    with open(file_name, "rb") as f:
+        sha.update(f.read(block))
+        f.seek(max(0, size - block))
+        sha.update(f.read(block))
+    return sha.hexdigest()
+
+
+def _chunk_key(function, arguments, input, source, materialized):
+    """Return a hash of everything that determines the chunk
+    outputs. The threads do not change the output and are
+    ignored. Materialized inputs are identified by the original
+    input file, if there is one, and the content of the copy"""
+    args = dict(arguments)
+    args.pop("threads", None)
+    if materialized:
+        origin = input if isinstance(input, basestring) else getattr(input, "filename", None)
+        source = [_content_key(source)]
+        if isinstance(origin, basestring) and os.path.exists(origin):
+            source.extend(_file_key(origin))
+    else:
+        source = _file_key(source)
+    key = json.dumps({"function": function, "arguments": args, "source": source},
+                     sort_keys=True, default=str)
+    return hashlib.sha1(key).hexdigest()
+
+
+def _function(name):
+    """Resolve the job function. Names without module
+    refer to functions in the gem module"""
+    if "." not in name:
+        return getattr(gem, name)
+    (module, function) = name.rsplit(".", 1)
+    return getattr(__import__(module, fromlist=[function]), function)
+
+
+def run_job(job):
+    """Execute a single chunk job and return the name
+    of the chunk output file.
+
+    A job is a dictionary with the following keys:
+
+        function  -- name of the gem function, i.e. mapper, or the
+                     full name of a function in another module
+        input     -- the chunk, a dictionary with the file,
+                     the start and end offset and the quality
+        output    -- the chunk output file
+        arguments -- all other arguments of the function
+        record    -- optional checkpoint record. If set, the output
+                     is written to a temporary file that is renamed
+                     when the chunk is complete and the record is
+                     committed next to the output
+    """
+    function = _function(job["function"])
+    output = job["output"]
+    if "record" in job:
+        output = os.path.join(os.path.dirname(output), "part." + os.path.basename(output))
+    input = _open_chunk(job["input"])
+    reader = input.process
+    try:
+        function(input, output=output, **job["arguments"])
+        if reader.wait() != 0:
+            raise gem.utils.ProcessError("Unable to read chunk %s" % (str(job["input"])))
+    finally:
+        # a failed chunk leaves its reader running, stop it so its
+        # pipes and log file are released
+        if reader.exit_value is None:
+            reader.stdout.close()
+            reader.terminate()
+            reader.wait()
+    if "record" in job:
+        os.rename(output, job["output"])
+        _commit(job["record"])
+    return job["output"]
+
+
+class LocalExecutor(object):
+    """Execute jobs concurrently on this machine. The jobs run
+    in worker threads and the heavy lifting is done by the
+    tools they start.
+
+    Note that every concurrent mapper loads its own copy of the
+    index, so the number of workers is limited by the memory
+    of the machine.
+    """
+    def __init__(self, workers=1):
+        """Create a new executor
+
+        workers -- the maximum number of jobs running concurrently
+        """
+        self.workers = max(1, workers)
+
+    def map(self, function, jobs):
+        """Execute the function on all jobs and return the
+        results in the order of the jobs. If a job fails, the
+        first error is raised after all jobs finished"""
+        results = [None] * len(jobs)
+        errors = []
+        slots = threading.Semaphore(self.workers)
+        # jobs report their processes to the accounting of the caller
+        accounting = gem.utils.current_accounting()
+
+        def execute(i, job):
+            try:
+                if accounting is not None:
+                    with accounting:
+                        results[i] = function(job)
+                else:
+                    results[i] = function(job)
+            except Exception, e:
+                logging.error("Chunk job %d failed : %s" % (i, str(e)))
+                errors.append(e)
+            finally:
+                slots.release()
+
+        workers = []
+        for i, job in enumerate(jobs):
+            slots.acquire()
+            if len(errors) > 0:
+                slots.release()
+                break
+            worker = threading.Thread(target=execute, args=(i, job))
+            worker.daemon = True
+            worker.start()
+            workers.append(worker)
+        for worker in workers:
+            worker.join()
+        if len(errors) > 0:
+            raise errors[0]
+        return results
+
+
+def scatter(function, arguments):
+    """Run the gem function in scatter-gather mode. The input is
+    split into chunks, the chunks are mapped by the executor and the
+    chunk outputs are concatenated to the output. The result has
+    the same semantics as a single run of the function.
+
+    If the arguments contain a checkpoint directory, the completed
+    chunks are kept there together with a checkpoint record. A
+    later run with the same input and arguments only maps the
+    missing chunks. The directory is removed after the chunks
+    were gathered to an output file. For stream outputs, the
+    caller has to remove it.
+
+    function  -- name of the gem function, i.e. mapper
+    arguments -- the function arguments, including input, output,
+                 chunks, executor, threads and checkpoint
+    """
+    arguments = dict(arguments)
+    input = arguments.pop("input")
+    output = gem.utils._prepare_output(arguments.pop("output"))
+    chunks = arguments.pop("chunks")
+    executor = arguments.pop("executor")
+    checkpoint = arguments.pop("checkpoint", None)
+    if executor is None:
+        # chunks only make the run resumable, they are mapped one by one
+        # unless the caller asks for concurrent workers
+        executor = LocalExecutor(1)
+    compress = arguments.get("compress", False)
+    if compress and output is None:
+        logging.warning("Disabeling stream compression")
+        compress = False
+    output = gem.files.compressed_file_name(output, compress)
+    if "compress" in arguments:
+        arguments["compress"] = compress
+    # concurrent local workers share the thread budget
+    workers = getattr(executor, "workers", 1)
+    arguments["threads"] = max(1, arguments.get("threads", 1) / max(1, min(workers, chunks)))
+
+    directory = None
+    if output is not None:
+        directory = os.path.dirname(os.path.abspath(output))
+    tmpdir = tempfile.mkdtemp(prefix=".chunks.", dir=directory)
+    chunk_dir = tmpdir
+    if checkpoint is not None:
+        if not os.path.exists(checkpoint):
+            os.makedirs(checkpoint)
+        chunk_dir = checkpoint
+    quality = input.quality if isinstance(input, gt.InputFile) else None
+    output_quality = None
+    if "quality" in arguments:
+        output_quality = gem._prepare_quality_parameter(arguments["quality"], input)
+    try:
+        source = _materialize(input, os.path.join(tmpdir, "input"))
+        # an empty input is mapped as a single empty chunk
+        ranges = split(source, chunks) or [(0, 0)]
+        key = _chunk_key(function, arguments, input, source, source.startswith(tmpdir))
+        jobs = []
+        outputs = []
+        for i, (start, end) in enumerate(ranges):
+            chunk_output = os.path.join(chunk_dir, "chunk.%04d.map" % (i))
+            chunk_output = gem.files.compressed_file_name(chunk_output, compress)
+            outputs.append(chunk_output)
+            job = {
+                "function": function,
+                "input": {"file": source, "start": start, "end": end, "quality": quality},
+                "output": chunk_output,
+                "arguments": arguments
+            }
+            if checkpoint is not None:
+                job["record"] = {"chunk": i, "start": start, "end": end,
+                                 "key": key, "output": chunk_output}
+                if _committed(job["record"]):
+                    continue
+            jobs.append(job)
+        if len(jobs) < len(outputs):
+            logging.info("Resuming %s, %d of %d chunks are done" % (function, len(outputs) - len(jobs), len(outputs)))
+        logging.info("Running %s on %d chunks" % (function, len(jobs)))
+        executor.map(run_job, jobs)
+        # gzip members can be concatenated as well
+        gather = gem.utils.run_tools([["cat"] + outputs], output=output, name="Gather")
+    except:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        raise
+
+    if output is None:
+        gem.files.delete_on_exit.append(tmpdir)
+        return gem._prepare_output(gather, quality=output_quality)
+    try:
+        result = gem._prepare_output(gather, output=output, quality=output_quality)
+        if checkpoint is not None:
+            shutil.rmtree(checkpoint, ignore_errors=True)
+        return result
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
@@ -21,6 +21,11 @@ import multiprocessing as mp
 import json
 import subprocess
 import signal
+import errno
+import threading
+import ctypes
+import ctypes.util
+import multiprocessing.util
 
 
 # clobal process registry
@@ -83,6 +88,192 @@ class Timer(object):
                     logging.error(message % (str(self.end)))
 
 
+# the accounting contexts of the running threads
+_accounting = threading.local()
+
+
+class ProcessAccounting(object):
+    """Collects the resource usage of all processes started
+    through a ProcessWrapper while the accounting is active in the
+    current thread. Use it as a context manager:
+
+        with ProcessAccounting("mapping") as accounting:
+            ...<start and wait for processes>
+        print accounting.processes
+    """
+    def __init__(self, name=None):
+        """Create a new accounting context
+
+        name -- optional name of the context
+        """
+        self.name = name
+        self.processes = []
+        self.__lock = threading.Lock()
+        self.__previous = None
+
+    def add(self, usage):
+        """Add the usage record of a finished process"""
+        with self.__lock:
+            self.processes.append(usage)
+
+    def totals(self):
+        """Return the summed cpu times and io and the maximum
+        peak memory of all recorded processes"""
+        with self.__lock:
+            processes = list(self.processes)
+        totals = {"user": 0.0, "system": 0.0, "max_rss": 0, "read_bytes_total": 0, "write_bytes_total": 0,
+                  "stdin_bytes": 0, "stdout_bytes": 0}
+        for p in processes:
+            for k in ["user", "system", "read_bytes_total", "write_bytes_total", "stdin_bytes", "stdout_bytes"]:
+                if p.get(k) is not None:
+                    totals[k] += p[k]
+            if p.get("max_rss") is not None:
+                totals["max_rss"] = max(totals["max_rss"], p["max_rss"])
+        return totals
+
+    def __enter__(self):
+        self.__previous = current_accounting()
+        _accounting.current = self
+        return self
+
+    def __exit__(self, type, value, traceback):
+        _accounting.current = self.__previous
+        return False
+
+
+def current_accounting():
+    """Return the accounting context active in the
+    current thread or None"""
+    return getattr(_accounting, "current", None)
+
+
+def _proc_state(pid):
+    """Return the state of the process from /proc or None
+    if it is not available"""
+    try:
+        with open("/proc/%d/stat" % (pid)) as f:
+            return f.read().rsplit(")", 1)[1].split()[0]
+    except (IOError, IndexError):
+        return None
+
+
+def _proc_io(pid):
+    """Return the io counters of the process from /proc or None
+    if they are not available"""
+    try:
+        io = {}
+        with open("/proc/%d/io" % (pid)) as f:
+            for line in f:
+                (key, value) = line.split(":")
+                io[key.strip()] = int(value)
+        return io
+    except (IOError, ValueError):
+        return None
+
+
+def _libc_splice():
+    """Return the splice(2) function of the c library
+    or None if it is not available"""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        splice = libc.splice
+    except (OSError, AttributeError):
+        return None
+    splice.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p,
+                       ctypes.c_size_t, ctypes.c_uint]
+    splice.restype = ctypes.c_ssize_t
+    return splice
+
+
+_splice = _libc_splice()
+# SPLICE_F_MOVE
+_SPLICE_FLAGS = 1
+_STREAM_BLOCK_SIZE = 1 << 20
+
+
+class StreamCounter(object):
+    """Moves the content of a file descriptor to another one in
+    a thread and counts the bytes. Processes started by the
+    ProcessWrapper read and write pipes that are copied from their
+    actual input and to their actual output, so the bytes moved
+    through their stdin and stdout are known. Pipes are spliced
+    without copying the data through user space where possible.
+    Both file descriptors are owned by the counter and closed
+    when the source reaches EOF or the target stops reading.
+    """
+    def __init__(self, source, target):
+        """Start moving the content of source to target
+
+        source -- the source file descriptor
+        target -- the target file descriptor
+        """
+        self.source = source
+        self.target = target
+        self.bytes = 0
+        self.error = None
+        # forked writers must not keep the pipes open
+        multiprocessing.util.register_after_fork(self, StreamCounter._close_fds)
+        self.thread = threading.Thread(target=self.__run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def __move(self, spliced):
+        """Move the next block and return the number of bytes
+        moved and whether the descriptors can be spliced"""
+        if spliced:
+            n = _splice(self.source, None, self.target, None, _STREAM_BLOCK_SIZE, _SPLICE_FLAGS)
+            if n >= 0:
+                return (n, True)
+            e = ctypes.get_errno()
+            if e != errno.EINVAL or self.bytes > 0:
+                raise OSError(e, os.strerror(e))
+        data = os.read(self.source, _STREAM_BLOCK_SIZE)
+        written = 0
+        while written < len(data):
+            written += os.write(self.target, data[written:])
+        return (len(data), False)
+
+    def __run(self):
+        spliced = _splice is not None
+        try:
+            while True:
+                try:
+                    (n, spliced) = self.__move(spliced)
+                except OSError, e:
+                    if e.errno == errno.EINTR:
+                        continue
+                    raise
+                if n == 0:
+                    break
+                self.bytes += n
+        except OSError, e:
+            # the reader stopped reading
+            if e.errno != errno.EPIPE:
+                self.error = e
+        finally:
+            self._close_fds()
+
+    def _close_fds(self):
+        """Close the descriptors if they are still open"""
+        (source, target) = (self.source, self.target)
+        (self.source, self.target) = (None, None)
+        for fd in [source, target]:
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+
+    def join(self, timeout=None):
+        """Wait for the counter to finish and return the number
+        of bytes moved so far
+
+        timeout -- optional timeout in seconds
+        """
+        self.thread.join(timeout)
+        return self.bytes
+
+
 class CommandException(Exception):
     """Exception thrown by gemtools commands"""
     pass
@@ -238,11 +429,23 @@ class Process(object):
         self.logfile = logfile
         self.parent = parent
         self.input_writer = None
+        self.stdin = None  # the stream writers of a piped input write to
+        self.stdout = None  # the stream readers of a piped output read from
+        self.stdin_counter = None
+        self.stdout_counter = None
+        self.start_time = None
+        self.usage = None  # resource usage after the process finished
+        self.exit_value = None
+        self.killed = False  # terminated by the wrapper
+        self.__lock = threading.Lock()
 
     def run(self):
         """Start the process and return it. If the input is a ProcessInput,
         the input of this process is set to pipe and the ProcessInput is written
-        there.
+        there. The process reads and writes pipes, the input is copied
+        to its stdin and its stdout is copied to the output by StreamCounters
+        that count the bytes. Processes in a pipe share the counter between
+        them.
         """
         stdin = self.input
         stdout = self.output
@@ -258,32 +461,74 @@ class Process(object):
                 stderr = self.logfile
 
         #check outout
+        output_file = None
         if stdout is not None and isinstance(stdout, basestring):
             logging.debug("File output detected, opening output stream to %s", stdout)
-            stdout = open(stdout, "wb")
+            stdout = output_file = open(stdout, "wb")
         elif stdout is None:
             stdout = subprocess.PIPE
 
         # check input
         if self.parent is not None:
             logging.debug("Setting process input to parent output")
-            stdin = self.parent.process.stdout
+            stdin = self.parent.stdout
+            self.stdin_counter = self.parent.stdout_counter
         else:
             if isinstance(stdin, ProcessInput):
-                logging.debug("Process-Input detected, switching to PIPE input")
+                logging.debug("Process-Input detected")
                 process_input = stdin
-                stdin = subprocess.PIPE
+                stdin = process_input.stdin()
+
+        input_source = None
+        if self.parent is None and stdin is not None:
+            if stdin == subprocess.PIPE:
+                (input_source, writer) = os.pipe()
+                self.stdin = os.fdopen(writer, 'wb')
+            else:
+                input_source = os.dup(stdin.fileno())
 
         logging.debug("Starting subprocess")
-        self.process = subprocess.Popen(self.commands, stdin=stdin, stdout=stdout, stderr=stderr, env=self.env, close_fds=False)
+        self.start_time = time.time()
+        try:
+            # steps start their processes concurrently, so the pipes of other
+            # steps must not leak into this process and delay their EOF
+            self.process = subprocess.Popen(self.commands, stdin=subprocess.PIPE if input_source is not None else stdin,
+                                            stdout=subprocess.PIPE, stderr=stderr, env=self.env, close_fds=True)
+        finally:
+            # the process writes its own copy of the log file
+            if stderr is not None and stderr is not self.logfile:
+                stderr.close()
+
+        if input_source is not None:
+            self.stdin_counter = StreamCounter(input_source, self.__detach(self.process.stdin))
+            self.process.stdin = None
+        elif self.parent is not None and self.parent.stdout is not None:
+            # the pipe is read by this process only
+            self.parent.stdout.close()
+        if stdout == subprocess.PIPE:
+            (reader, output_target) = os.pipe()
+            self.stdout = os.fdopen(reader, 'rb')
+        else:
+            output_target = os.dup(stdout.fileno())
+            if output_file is not None:
+                output_file.close()
+        self.stdout_counter = StreamCounter(self.__detach(self.process.stdout), output_target)
+        self.process.stdout = None
 
         if process_input is not None:
             logging.debug("Starting process input writer")
-            process_input.write(self.process)
+            process_input.write(self)
             self.input_writer = process_input
 
         return self.process
 
+    def __detach(self, stream):
+        """Close the stream and return a duplicate of its
+        file descriptor"""
+        fd = os.dup(stream.fileno())
+        stream.close()
+        return fd
+
     def __str__(self):
         if self.commands is None:
             return "<process>"
@@ -292,28 +537,123 @@ class Process(object):
                 return str(self.commands[0])
             return str(self.commands)
 
-    def wait(self):
+    def poll(self):
+        """Check if the process exited without blocking and return
+        its exit value or None if it is still running. The resource
+        usage is recorded when the process is reaped. The io counters
+        are read from /proc after the process exited but before it is
+        reaped. read_bytes_total and write_bytes_total are rchar and
+        wchar, the bytes of all read and write calls of the process,
+        including pipes, regular files and the index. stdin_bytes and
+        stdout_bytes are the bytes moved through its stdin and stdout,
+        they are set by wait() once the stream counters finished.
+        """
+        with self.__lock:
+            if self.exit_value is not None:
+                return self.exit_value
+            pid = self.process.pid
+            state = _proc_state(pid)
+            if state is not None and state != "Z":
+                return None
+            io = _proc_io(pid) if state == "Z" else None
+            end_time = time.time()
+            try:
+                (reaped, status, rusage) = os.wait4(pid, os.WNOHANG)
+            except OSError, e:
+                if e.errno == errno.EINTR:
+                    return None
+                if e.errno != errno.ECHILD:
+                    raise
+                # already reaped
+                (reaped, status, rusage) = (pid, None, None)
+            if reaped == 0:
+                return None
+            if status is None:
+                exit_value = self.process.wait()
+            else:
+                if os.WIFSIGNALED(status):
+                    exit_value = -os.WTERMSIG(status)
+                else:
+                    exit_value = os.WEXITSTATUS(status)
+                self.process.returncode = exit_value
+
+            self.usage = {
+                "command": str(self),
+                "pipe": self.wrapper.name if self.wrapper is not None else None,
+                "pid": pid,
+                "start": self.start_time,
+                "end": end_time,
+                "wall": end_time - self.start_time,
+                "user": rusage.ru_utime if rusage is not None else None,
+                "system": rusage.ru_stime if rusage is not None else None,
+                "max_rss": rusage.ru_maxrss if rusage is not None else None,
+                "read_bytes_total": io.get("rchar") if io is not None else None,
+                "write_bytes_total": io.get("wchar") if io is not None else None,
+                "stdin_bytes": None,
+                "stdout_bytes": None,
+                "exit_value": exit_value
+            }
+            if self.wrapper is not None and self.wrapper.accounting is not None:
+                self.wrapper.accounting.add(self.usage)
+            self.exit_value = exit_value
+            return exit_value
+
+    def terminate(self, kill=False):
+        """Send SIGTERM, or SIGKILL if kill is True, to the process
+        and its input writer if they are still running"""
+        self.killed = True
+        if self.input_writer is not None:
+            self.input_writer.terminate()
+        if self.process is not None and self.poll() is None:
+            try:
+                os.kill(self.process.pid, signal.SIGKILL if kill else signal.SIGTERM)
+            except OSError:
+                pass
+
+    def log_failure(self):
+        """Print the exit value and the log file of a failed process to error"""
+        logging.error("Process '%s' finished with %d", str(self), self.exit_value)
+        if self.logfile is not None and isinstance(self.logfile, basestring) and os.path.exists(self.logfile):
+            with open(self.logfile) as f:
+                for line in f:
+                    logging.error("%s" % (line.strip()))
+
+    def wait(self, quiet=False):
         """Wait for the process and return its exit value. If it did not exit with
-        0, print the log file to error
+        0, print the log file to error and raise a ProcessError.
+
+        quiet -- return the exit value without logging and raising errors
         """
         if self.process is None:
             logging.error("Process was not started")
             raise ProcessError("Process was not started!", self)
 
+        writer_exit_value = None
         if self.input_writer is not None:
             logging.debug("Waiting for process input writer to finish")
-            self.input_writer.wait()
+            writer_exit_value = self.input_writer.wait()
 
         # wait for the process
-        exit_value = self.process.wait()
+        delay = 0.001
+        while self.poll() is None:
+            time.sleep(delay)
+            delay = min(0.1, delay * 2)
+        exit_value = self.exit_value
+        # the counters finish once the remaining output was read, the
+        # output of a terminated process might never be read
+        timeout = 0 if self.killed else None
+        if self.stdin_counter is not None:
+            self.usage["stdin_bytes"] = self.stdin_counter.join(timeout)
+        if self.stdout_counter is not None:
+            self.usage["stdout_bytes"] = self.stdout_counter.join(timeout)
         logging.debug("Process '%s' finished with %d", str(self), exit_value)
-        if exit_value is not 0:
-            logging.error("Process '%s' finished with %d", str(self), exit_value)
-            if self.logfile is not None and isinstance(self.logfile, basestring):
-                with open(self.logfile) as f:
-                    for line in f:
-                        logging.error("%s" % (line.strip()))
+        if exit_value is not 0 and not quiet:
+            self.log_failure()
             raise ProcessError("Process '%s' finished with %d" % (str(self), exit_value))
+        if writer_exit_value and not self.killed and not quiet:
+            # the process read an incomplete input, i.e. a truncated file
+            logging.error("Input writer of '%s' finished with %d", str(self), writer_exit_value)
+            raise ProcessError("Input writer of '%s' finished with %d" % (str(self), writer_exit_value))
         return exit_value
 
     def to_bash(self):
@@ -326,16 +666,24 @@ class Process(object):
 
 class ProcessInput(object):
     """Takes a gemtools InputFile or filter and uses the write_stream() method
-    to write the content to the given process stdin.
+    to write the content to the given process stdin. If passthrough is set,
+    input files whose raw content is exactly what write_stream() would write
+    (see InputFile.passthrough()) are passed through. The process reads the
+    file, or the output of its decompressor, directly and no writer is started.
+    The whole file is checked unless strict_passthrough is disabled, then only
+    its beginning is compared and the rest is assumed to have the same format.
     """
 
-    def __init__(self, input, write_map=False, clean_id=True, append_extra=True):
+    def __init__(self, input, write_map=False, clean_id=True, append_extra=True, passthrough=False, strict_passthrough=True):
         """Initialize a new ProcessInput from a gemtools.InputFile or filter
 
         input         -- the input
         write_map     -- write in map format, otherwise writes in fasta/q
         clean_id      -- clean ids and ensure /1 /2 pairing ids
         append_extra  -- include any additional infomration stored in the read ids
+        passthrough   -- pass input files through if they need no transformation
+        strict_passthrough -- check the whole input file before passing it through,
+                              otherwise only its first templates
         """
         self.write_map = write_map
         self.clean_id = clean_id
@@ -343,6 +691,10 @@ class ProcessInput(object):
         self.process = None
         self.input = input
         self.thread = None
+        self.passthrough = passthrough and isinstance(input, gt.InputFile) and \
+            input.passthrough(write_map=write_map, clean_id=clean_id, append_extra=append_extra, strict=strict_passthrough)
+        self.stream = None  # the raw stream of a passed through input
+        self.decompressor = None
 
     def __write_input(self):
         """Internal method that writes templates ot the
@@ -361,8 +713,27 @@ class ProcessInput(object):
         outfile.close()
         self.process.stdin.close()
 
+    def stdin(self):
+        """Return the stdin of the process, the pipe the writer
+        writes to or the raw stream of a passed through input"""
+        if not self.passthrough:
+            return subprocess.PIPE
+        import gem.files
+        codec = gem.files.codec_for(self.input.filename)
+        if codec is None:
+            self.stream = open(self.input.filename, 'rb')
+        else:
+            self.decompressor = codec.open(self.input.filename, threads=self.input.threads)
+            self.stream = self.decompressor.stdout
+        return self.stream
+
     def write(self, process):
         self.process = process
+        if self.passthrough:
+            logging.debug("Passing process input through from %s" % (self.input.filename))
+            # the process reads from its own copy of the stream
+            self.stream.close()
+            return
         logging.debug("Preparing process input stream -- clean_id: %s, append_extra: %s, write_map:%s" % (str(self.clean_id), str(self.append_extra), str(self.write_map)))
         self.thread = mp.Process(target=ProcessInput.__write_input, args=(self,))
         register_process(self.thread)
@@ -371,8 +742,32 @@ class ProcessInput(object):
         self.process.stdin.close()
 
     def wait(self):
+        """Wait for the writer, or the decompressor of a passed
+        through input, and return its exit value"""
+        if self.decompressor is not None:
+            self.decompressor.wait()
         if self.thread is not None:
             self.thread.join()
+        return self.poll()
+
+    def poll(self):
+        """Return the exit code of the writer or None if
+        it is still running"""
+        if self.passthrough and self.stream is not None:
+            return 0 if self.decompressor is None else self.decompressor.poll()
+        if self.thread is None:
+            return None
+        return self.thread.exitcode
+
+    def terminate(self):
+        """Stop the writer if it is still running"""
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.terminate()
+
+
+# seconds the supervisor waits for the successors of a failed process
+# before it blames the failed process for terminating the pipe
+_FAILURE_GRACE_PERIOD = 0.1
 
 
 class ProcessWrapper(object):
@@ -380,7 +775,9 @@ class ProcessWrapper(object):
     is able to wait. The wrapper is aware of the process log files and
     will do the cleanup around the process when after waiting.
 
-    If a process does not exit with 0, its log file is printed to logger error.
+    A supervisor thread watches all processes and input writers while
+    the pipe runs. If one of them fails, the whole pipe is terminated and
+    the first failure and its log file is printed to logger error.
 
     After the wait, all log files are deleted by default.
     """
@@ -398,6 +795,12 @@ class ProcessWrapper(object):
         self.force_debug = force_debug
         self.raw = raw
         self.exit_value = None
+        # report process usage to the accounting active at creation time
+        self.accounting = current_accounting()
+        self.failed = None  # the first process that failed
+        self.error = None  # ProcessError describing the first failure
+        self.__writer_failed = False
+        self.__supervisor = None
 
     def submit(self, command, input=subprocess.PIPE, output=None, env=None, logfile=None):
         """Run a command. The command must be list of command and its parameters.
@@ -442,17 +845,95 @@ class ProcessWrapper(object):
         return "%s.%d" % (name, len(self.processes))
 
     def start(self):
-        """Start the process pipe"""
+        """Start the process pipe and the supervisor that
+        watches all its processes"""
         logging.info("Starting:\n\t%s" % (self.to_bash_pipe()))
         for p in self.processes:
             p.run()
-        self.stdin = self.processes[0].process.stdin
-        self.stdout = self.processes[-1].process.stdout
+        self.stdin = self.processes[0].stdin
+        self.stdout = self.processes[-1].stdout
+        self.__supervisor = threading.Thread(target=self.__supervise)
+        self.__supervisor.daemon = True
+        self.__supervisor.start()
+
+    def __supervise(self):
+        """Watch all processes and input writers of the pipe until they
+        finished. If one of them fails, the whole pipe is terminated
+        to avoid that the others block on pipes nobody reads or writes
+        anymore. Processes that were killed by SIGPIPE do not stop
+        the pipe, their reader stopped reading on purpose or failed
+        itself. A process closes its pipes before it can be reaped, so
+        the successors of a failed process get a moment to finish and
+        show whether they broke the pipe.
+        """
+        delay = 0.001
+        killed = None
+        failed_since = None
+        while True:
+            running = False
+            failed = []
+            running_successor = False
+            for p in self.processes:
+                writer = p.input_writer
+                if writer is not None:
+                    exit_value = writer.poll()
+                    if exit_value is None:
+                        running = True
+                    elif exit_value != 0 and not p.killed:
+                        failed.append((p, exit_value, True))
+                exit_value = p.poll()
+                if exit_value is None:
+                    running = True
+                    running_successor = running_successor or len(failed) > 0
+                elif exit_value not in [0, -signal.SIGPIPE] and not p.killed:
+                    failed.append((p, exit_value, False))
+            if len(failed) > 0 and self.failed is None and running_successor:
+                if failed_since is None:
+                    failed_since = time.time()
+                if time.time() - failed_since < _FAILURE_GRACE_PERIOD:
+                    time.sleep(delay)
+                    continue
+            if len(failed) > 0 and self.failed is None:
+                # processes killed by a signal crashed, a failing
+                # process is more likely the cause the later it
+                # is in the pipe as it breaks the pipe for
+                # its predecessors
+                failed.reverse()
+                failed.sort(key=lambda x: x[1] >= 0)
+                (self.failed, exit_value, self.__writer_failed) = failed[0]
+                if self.__writer_failed:
+                    message = "Input writer of '%s' finished with %d" % (str(self.failed), exit_value)
+                else:
+                    message = "Process '%s' finished with %d" % (str(self.failed), exit_value)
+                self.error = ProcessError(message, self)
+                logging.debug("Terminating pipe after failure : %s", message)
+                self.terminate()
+                killed = time.time()
+            if not running:
+                break
+            if killed is not None and time.time() - killed > 5:
+                self.terminate(kill=True)
+            time.sleep(delay)
+            delay = min(0.05, delay * 2)
+
+    def terminate(self, kill=False):
+        """Terminate all running processes of the pipe and
+        their input processes
+
+        kill -- send SIGKILL instead of SIGTERM
+        """
+        for p in reversed(self.processes):
+            p.terminate(kill=kill)
+        if self.raw:
+            for r in self.raw:
+                if r is not None and hasattr(r, "terminate"):
+                    r.terminate()
 
     def wait(self):
         """Wait for all processes in the process list to
-        finish. If a process is exiting with non 0, the process
-        log file is printed to logger error.
+        finish. If a process fails, all other processes are
+        terminated and the first failure and its log file is
+        printed to logger error.
 
         All log files are delete if keep_logfiles is False
         """
@@ -464,12 +945,24 @@ class ProcessWrapper(object):
                     if r is not None:
                         r.wait()
             exit_value = 0
-            for i, process in enumerate(self.processes):
-                ev = process.wait()
-                if exit_value is not 0:
+            for process in self.processes:
+                ev = process.wait(quiet=True)
+                if exit_value == 0 and ev != 0 and not process.killed:
                     exit_value = ev
+            if self.__supervisor is not None:
+                self.__supervisor.join()
+            if self.failed is None and exit_value != 0:
+                self.failed = [p for p in self.processes if p.exit_value == exit_value][0]
+                self.error = ProcessError("Process '%s' finished with %d" % (str(self.failed), exit_value), self)
+            if self.failed is not None:
+                if self.__writer_failed:
+                    logging.error(str(self.error))
+                    exit_value = self.failed.input_writer.poll() or 1
+                else:
+                    self.failed.log_failure()
+                    exit_value = self.failed.exit_value
             self.exit_value = exit_value
-            return ev
+            return exit_value
         except Exception, e:
             if isinstance(e, OSError) and e.errno == 10:
                 pass
@@ -487,13 +980,151 @@ class ProcessWrapper(object):
         return " | ".join([p.to_bash() for p in self.processes])
 
 
-def _prepare_input(input, write_map=False, clean_id=True, append_extra=True):
+# cached number of cpus available to this process
+_available_cpus = None
+
+
+def _affinity_cpus():
+    """Return the number of cpus in the affinity mask of this
+    process or None if the mask can not be read"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("Cpus_allowed_list:"):
+                    count = 0
+                    for r in line.split(":", 1)[1].strip().split(","):
+                        if "-" in r:
+                            start, end = r.split("-")
+                            count += int(end) - int(start) + 1
+                        elif len(r) > 0:
+                            count += 1
+                    return count if count > 0 else None
+    except (IOError, ValueError):
+        pass
+    return None
+
+
+def _cgroup_cpus():
+    """Return the cpu limit set by the cgroup cpu quota or None
+    if no quota is set"""
+    quota = None
+    period = None
+    try:
+        # cgroups v2
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            values = f.read().split()
+            if values[0] != "max":
+                quota, period = int(values[0]), int(values[1])
+    except (IOError, ValueError, IndexError):
+        try:
+            # cgroups v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                quota = int(f.read().strip())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read().strip())
+        except (IOError, ValueError):
+            return None
+    if quota is None or quota <= 0 or not period:
+        return None
+    return max(1, -(-quota // period))
+
+
+def available_cpus():
+    """Return the number of cpus this process can use. This
+    respects the cpu affinity mask, cgroup cpu quotas and
+    the SLURM_CPUS_PER_TASK setting of a slurm allocation.
+    """
+    global _available_cpus
+    if _available_cpus is None:
+        limits = [mp.cpu_count(), _affinity_cpus(), _cgroup_cpus()]
+        try:
+            limits.append(int(os.environ["SLURM_CPUS_PER_TASK"]))
+        except (KeyError, ValueError):
+            pass
+        _available_cpus = max(1, min([l for l in limits if l is not None and l > 0]))
+    return _available_cpus
+
+
+def thread_budget(threads):
+    """Return the given number of threads limited to the
+    available cpus"""
+    return max(1, min(int(threads), available_cpus()))
+
+
+class Threads(object):
+    """Placeholder for a thread count in a tool command line.
+    run_tools() replaces the placeholder with the share of
+    the thread budget assigned to the tool. The cost is the
+    expected relative cpu load of the tool, i.e. a tool with
+    cost 4 gets about four times the threads of a tool with
+    cost 1. The format turns the thread count into the
+    parameter, i.e. "-T%d" for tools that expect the count
+    attached to the option.
+    """
+    def __init__(self, cost=1, format="%d"):
+        if cost <= 0:
+            raise ValueError("Thread cost must be > 0")
+        self.cost = cost
+        self.format = format
+
+    def __repr__(self):
+        return "Threads(%s)" % (str(self.cost))
+
+
+def allocate_threads(threads, costs):
+    """Split a thread budget between tools that run
+    concurrently according to their costs. Every tool
+    gets at least one thread and the assigned threads
+    sum up to the budget unless there are more tools
+    than threads.
+
+    threads -- the thread budget
+    costs   -- list of the relative costs of the tools
+    """
+    if len(costs) == 0:
+        return []
+    threads = max(1, int(threads))
+    extra = threads - len(costs)
+    if extra <= 0:
+        return [1] * len(costs)
+    total = float(sum(costs))
+    shares = [extra * c / total for c in costs]
+    allocation = [1 + int(s) for s in shares]
+    # hand out the remaining threads by largest remainder
+    remaining = threads - sum(allocation)
+    order = sorted(range(len(costs)), key=lambda i: int(shares[i]) - shares[i])
+    for i in order[:remaining]:
+        allocation[i] += 1
+    return allocation
+
+
+def _resolve_threads(tools, threads):
+    """Replace all Threads placeholders in the tools command
+    lines with their share of the thread budget"""
+    placeholders = []
+    for commands in tools:
+        for c in commands:
+            if isinstance(c, Threads) and not any(c is p for p in placeholders):
+                placeholders.append(c)
+    if len(placeholders) == 0:
+        return tools
+    if threads is None:
+        raise ValueError("Tools with thread placeholders need a thread budget")
+    allocation = allocate_threads(thread_budget(threads), [p.cost for p in placeholders])
+    assigned = dict(zip([id(p) for p in placeholders], allocation))
+    return [[c.format % (assigned[id(c)]) if isinstance(c, Threads) else c for c in commands]
+            for commands in tools]
+
+
+def _prepare_input(input, write_map=False, clean_id=True, append_extra=True, passthrough=False):
+    import gem.files
     if isinstance(input, basestring):
         return open(input, 'rb')
-    if isinstance(input, file):
+    if isinstance(input, (file, gem.files.DecompressedStream)):
         return input
     elif input is not None:
-        return ProcessInput(input, write_map=write_map, clean_id=clean_id, append_extra=append_extra)
+        return ProcessInput(input, write_map=write_map, clean_id=clean_id, append_extra=append_extra,
+                            passthrough=passthrough)
     return None
 
 
@@ -510,7 +1141,8 @@ def _prepare_output(output):
 
 def run_tools(tools, input=None, output=None, write_map=False, clean_id=False,
               append_extra=True, name=None, keep_logfiles=False,
-              force_debug=False, env=None, raw=False, logfile=None):
+              force_debug=False, env=None, raw=False, logfile=None,
+              threads=None, passthrough=False):
     """
     Run the tools defined in the tools list using a new process per tool.
     The input must be a gem.gemtools.TemplateIterator that is used to get
@@ -524,9 +1156,17 @@ def run_tools(tools, input=None, output=None, write_map=False, clean_id=False,
     any casava 1.8 information is dropped. If append_extra is set to False, no additional
     information will be printed to the read tag
 
+    With passthrough, input files that are already in the requested format
+    and id style are not rewritten, the first process reads the file (or the
+    output of its decompressor) directly, see ProcessInput.
+
     If output is a string or an open file handle, the
     stdout of the final process is piped to that file.
 
+    Thread counts in the tools can be given as Threads placeholders.
+    They are replaced by the share of the threads budget
+    assigned to the tool based on its cost.
+
     tools        -- the list of tools to run. This is a list of lists.
     input        -- the input TemplateIterator
     output       -- optional output file name or open, writable file handle
@@ -535,7 +1175,10 @@ def run_tools(tools, input=None, output=None, write_map=False, clean_id=False,
     append_extra -- if false, no additional information is printed in tag
     name         -- optional name for this process group
     logfile      -- specify a filename or a string that is used as stderr
+    threads      -- the thread budget split between the Threads placeholders
+    passthrough  -- pass input files through that need no changes
     """
+    tools = _resolve_threads(tools, threads)
     parent_process = None
     if raw:
         if isinstance(input, gt.InputFile):
@@ -550,7 +1193,8 @@ def run_tools(tools, input=None, output=None, write_map=False, clean_id=False,
             if raw:
                 process_in = _prepare_input(input.raw_stream(), write_map=write_map, clean_id=clean_id, append_extra=append_extra)
             else:
-                process_in = _prepare_input(input, write_map=write_map, clean_id=clean_id, append_extra=append_extra)
+                process_in = _prepare_input(input, write_map=write_map, clean_id=clean_id, append_extra=append_extra,
+                                            passthrough=passthrough)
 
         if i == len(tools) - 1:
             # prepare last process output
@@ -733,7 +1377,7 @@ def get_max_read_length(input, threads=1, paired=False):
     import re
     pattern = re.compile(r'.*Reads.Length \(min,avg,max\) \(\d+,\d+,(\d+)\)')
     max_len = -1
-    for line in process.processes[0].process.stdout:
+    for line in process.stdout:
         m = pattern.match(line)
         if m:
             max_len = int(m.groups()[0])
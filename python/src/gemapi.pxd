@@ -13,6 +13,7 @@ cdef extern from "stdint.h":
     ctypedef int uint64_t
     ctypedef int int64_t
     ctypedef int uint32_t
+    ctypedef int uint8_t
     cdef uint64_t UINT64_MAX
     cdef int64_t INT64_MAX
     cdef int64_t INT64_MIN
@@ -71,6 +72,8 @@ cdef extern from "gem_tools.h" nogil:
         FASTA
         MAP
         SAM
+        BAM
+        GTB
         FILE_FORMAT_UNKNOWN
 
     enum gt_file_type:
@@ -79,27 +82,56 @@ cdef extern from "gem_tools.h" nogil:
         MAPPED_FILE
         GZIPPED_FILE
         BZIPPED_FILE
+        BGZIPPED_FILE
 
     # input file
     ctypedef struct gt_input_file:
         gt_file_type file_type
         gt_file_format file_format
+        bool error
 
     gt_input_file* gt_input_stream_open(FILE* stream)
     gt_input_file* gt_input_file_open(char* file_name,bool mmap_file)
     gt_status gt_input_file_close(gt_input_file* input_file)
+    void gt_input_file_set_threads(gt_input_file* input_file,uint64_t num_threads)
     gt_file_format gt_input_file_detect_file_format(gt_input_file* input_file)
 
     enum gt_output_file_type:
         SORTED_FILE
         UNSORTED_FILE
 
+    enum gt_output_file_compression:
+        NONE
+        GZIP
+        BZIP2
+        BGZF
+
     ctypedef struct gt_output_file:
-        pass
+        gt_output_file_compression compression_type
 
     gt_output_file* gt_output_stream_new(FILE* file, gt_output_file_type output_file_type)
     gt_output_file* gt_output_file_new(char* file_name, gt_output_file_type output_file_type)
+    gt_output_file* gt_output_stream_new_compress(FILE* file, gt_output_file_type output_file_type, gt_output_file_compression compression_type)
+    gt_output_file* gt_output_file_new_compress(char* file_name, gt_output_file_type output_file_type, gt_output_file_compression compression_type)
     gt_status gt_output_file_close(gt_output_file*  output_file)
+    void gt_output_file_set_threads(gt_output_file* output_file, uint64_t num_threads)
+    bool gt_output_file_set_template_index(gt_output_file* output_file, char* index_file_name, uint64_t interval, uint64_t template_lines)
+
+    # template index
+    ctypedef struct gt_template_index:
+        uint64_t interval
+        uint64_t num_templates
+        uint64_t data_size
+        uint64_t data_mtime
+        uint64_t data_mtime_nsec
+        uint64_t data_inode
+    gt_template_index* gt_template_index_read(char* file_name)
+    bool gt_template_index_write(gt_template_index* template_index, char* file_name)
+    void gt_template_index_delete(gt_template_index* template_index)
+    bool gt_template_index_bind_data(gt_template_index* template_index, char* data_file_name)
+    bool gt_template_index_check_data(gt_template_index* template_index, char* data_file_name)
+    gt_template_index* gt_input_file_index_templates(gt_input_file* input_file, uint64_t interval, uint64_t template_lines)
+    bool gt_input_file_seek_templates(gt_input_file* input_file, gt_template_index* template_index, uint64_t template_lines, uint64_t begin, uint64_t end)
 
 
     # buffered input
@@ -109,6 +141,23 @@ cdef extern from "gem_tools.h" nogil:
     void gt_buffered_input_file_close(gt_buffered_input_file* input_file)
     void gt_buffered_input_file_attach_buffered_output(gt_buffered_input_file* buffered_input_file, gt_buffered_output_file* buffered_output_file)
 
+    # paired input
+    cdef int GT_PIF_OK
+    cdef int GT_PIF_EOF
+    ctypedef struct gt_paired_input_file:
+        pass
+    gt_paired_input_file* gt_paired_input_file_new(gt_input_file* end1_input_file, gt_input_file* end2_input_file, uint64_t num_blocks)
+    void gt_paired_input_file_close(gt_paired_input_file* paired_input_file)
+
+    # prefetch input
+    cdef int GT_PRF_OK
+    cdef int GT_PRF_EOF
+    ctypedef struct gt_prefetch_input_file:
+        pass
+    gt_prefetch_input_file* gt_prefetch_input_file_new(gt_input_file* input_file, uint64_t num_blocks, uint64_t block_size, bool paired_read)
+    void gt_prefetch_input_file_close(gt_prefetch_input_file* prefetch_input_file)
+    gt_status gt_prefetch_input_file_get_template(gt_prefetch_input_file* prefetch_input_file, gt_template** template)
+
 
     # buffered output
     ctypedef struct gt_buffered_output_file:
@@ -207,6 +256,12 @@ cdef extern from "gem_tools.h" nogil:
     void gt_map_delete(gt_map* map)
     char* gt_map_get_seq_name(gt_map* map)
     gt_strand gt_map_get_strand(gt_map* map)
+    uint64_t gt_map_get_position(gt_map* map)
+    uint64_t gt_map_get_num_blocks(gt_map* map)
+    uint64_t gt_map_get_global_length(gt_map* map)
+    uint64_t gt_map_get_global_distance(gt_map* map)
+    uint64_t gt_map_get_score(gt_map* map)
+    uint8_t gt_map_get_phred_score(gt_map* map)
 
     # template
     ctypedef struct gt_template:
@@ -214,6 +269,7 @@ cdef extern from "gem_tools.h" nogil:
     gt_template* gt_template_new()
     void gt_template_delete(gt_template* template)
     char* gt_template_get_tag(gt_template* template)
+    gt_string* gt_template_get_string_tag(gt_template* template)
     void gt_template_set_tag(gt_template* template, char* tag, uint64_t length)
     uint64_t gt_template_get_num_blocks(gt_template* template)
     uint64_t gt_template_get_num_mmaps(gt_template* template)
@@ -238,6 +294,7 @@ cdef extern from "gem_tools.h" nogil:
 
     # template merge
     cdef gt_template* gt_template_union_template_mmaps(gt_template* src_A, gt_template* src_B)
+    void gt_template_copy(gt_template* template_dst, gt_template* template_src, bool copy_maps, bool copy_mmaps)
 
 
     # output printer support
@@ -299,6 +356,59 @@ cdef extern from "gem_tools.h" nogil:
     gt_status gt_output_map_sprint_alignment(gt_string* string,gt_alignment* alignment,gt_output_map_attributes* attributes)
     gt_status gt_output_map_ofprint_template(gt_output_file* output_file,gt_template* template, gt_output_map_attributes* attributes)
 
+    ## print gtb
+    gt_status gt_output_gtb_ofprint_header(gt_output_file* output_file)
+    gt_status gt_output_gtb_ofprint_template(gt_output_file* output_file,gt_template* template, gt_output_map_attributes* attributes)
+    gt_status gt_output_gtb_sprint_template(gt_string* string,gt_template* template, gt_output_map_attributes* attributes)
+
 
 cdef extern from "gemtools_binding.h" nogil:
-    void gt_write_stream(gt_output_file* output, gt_input_file** inputs, uint64_t num_inputs, bool append_extra, bool clean_id, bool interleave, uint64_t threads, bool write_map, bool remove_scores)
\ No newline at end of file
+    cdef int GT_EXPRESSION_MAX_STACK
+    ctypedef enum gt_expression_op:
+        GT_EXPRESSION_CONST
+        GT_EXPRESSION_VARIABLE
+        GT_EXPRESSION_LT
+        GT_EXPRESSION_LE
+        GT_EXPRESSION_GT
+        GT_EXPRESSION_GE
+        GT_EXPRESSION_EQ
+        GT_EXPRESSION_NE
+        GT_EXPRESSION_AND
+        GT_EXPRESSION_OR
+        GT_EXPRESSION_NOT
+    ctypedef enum gt_expression_variable:
+        GT_EXPRESSION_MAPPED
+        GT_EXPRESSION_PAIRED
+        GT_EXPRESSION_BLOCKS
+        GT_EXPRESSION_NUM_MAPS
+        GT_EXPRESSION_LENGTH
+        GT_EXPRESSION_MISMATCHES
+        GT_EXPRESSION_MAX_MISMATCHES
+        GT_EXPRESSION_LEVEL
+        GT_EXPRESSION_MCS
+        GT_EXPRESSION_HAS_QUALITIES
+    ctypedef struct gt_expression_instruction:
+        gt_expression_op op
+        int64_t value
+    ctypedef struct gt_template_expression:
+        gt_expression_instruction* code
+        uint64_t length
+    bool gt_template_expression_eval(gt_template_expression* expression, gt_template* template)
+    ctypedef enum gt_stream_filter_type:
+        GT_STREAM_FILTER_UNMAPPED
+        GT_STREAM_FILTER_UNIQUE
+        GT_STREAM_FILTER_TRIM
+        GT_STREAM_FILTER_EXPRESSION
+    ctypedef struct gt_stream_filter:
+        gt_stream_filter_type type
+        uint64_t max_mismatches
+        uint64_t level
+        uint64_t left
+        uint64_t right
+        gt_template_expression* expression
+    bool gt_write_stream(gt_output_file* output, gt_input_file** inputs, uint64_t num_inputs, bool append_extra, bool clean_id, bool interleave, uint64_t threads, bool write_map, bool remove_scores, bool write_binary, gt_stream_filter* filters, uint64_t num_filters)
+    bool gt_write_stream_matches(gt_input_file* input, int raw_fd, uint64_t num_templates, bool append_extra, bool clean_id, bool write_map)
+    bool gt_input_files_pairable(gt_input_file* end1, gt_input_file* end2)
+    gt_status gt_paired_input_next(gt_paired_input_file* paired_input, gt_buffered_input_file** buffered_input, gt_template* end1, gt_template* end2, gt_generic_parser_attributes* parser_attributes)
+    bool gt_inflate_to_fd(char* file_name, int fd, uint64_t threads)
+    bool gt_sam_to_bam_fd(int in_fd, int out_fd, uint64_t threads, uint64_t min_mapq)
\ No newline at end of file
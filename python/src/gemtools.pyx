@@ -1,4 +1,5 @@
 from gemapi cimport *
+from cpython.buffer cimport PyBUF_WRITABLE, PyBUF_FORMAT
 
 import os
 import sys
@@ -21,6 +22,11 @@ cdef class TemplateFilter(object):
         """
         return True
 
+    cdef bool _native(self, gt_stream_filter* stream_filter):
+        """Set up the native version of this filter that is applied
+        by gt_write_stream. Returns false if there is none"""
+        return False
+
 
 cdef class filter_unmapped(TemplateFilter):
     """Filter for unmapped reads or reads with mismatches >= max_mismatches"""
@@ -39,6 +45,11 @@ cdef class filter_unmapped(TemplateFilter):
     cpdef bool filter(self, Template template):
         return template.is_unmapped(self.max_mismatches)
 
+    cdef bool _native(self, gt_stream_filter* stream_filter):
+        stream_filter.type = GT_STREAM_FILTER_UNMAPPED
+        stream_filter.max_mismatches = self.max_mismatches
+        return True
+
 cdef class filter_unique(TemplateFilter):
     """Filter for unique mappings up to given uniqueness level
     """
@@ -52,6 +63,11 @@ cdef class filter_unique(TemplateFilter):
         template_level = template.level(self.level)
         return template_level > 0 and template_level >= self.level
 
+    cdef bool _native(self, gt_stream_filter* stream_filter):
+        stream_filter.type = GT_STREAM_FILTER_UNIQUE
+        stream_filter.level = self.level
+        return True
+
 
 cdef class filter_trim(TemplateFilter):
     """Trimming filter that always returns true, but trims the
@@ -73,6 +89,101 @@ cdef class filter_trim(TemplateFilter):
         #gt_template_trim(template.template, self.left, self.right, self.min_length, self.set_extra)
         return True
 
+    cdef bool _native(self, gt_stream_filter* stream_filter):
+        stream_filter.type = GT_STREAM_FILTER_TRIM
+        stream_filter.left = self.left
+        stream_filter.right = self.right
+        return True
+
+# operations and variables of the filter expression code
+EXPRESSION_OPERATIONS = {
+    "const": GT_EXPRESSION_CONST,
+    "variable": GT_EXPRESSION_VARIABLE,
+    "<": GT_EXPRESSION_LT,
+    "<=": GT_EXPRESSION_LE,
+    ">": GT_EXPRESSION_GT,
+    ">=": GT_EXPRESSION_GE,
+    "==": GT_EXPRESSION_EQ,
+    "!=": GT_EXPRESSION_NE,
+    "and": GT_EXPRESSION_AND,
+    "or": GT_EXPRESSION_OR,
+    "not": GT_EXPRESSION_NOT,
+}
+EXPRESSION_VARIABLES = {
+    "mapped": GT_EXPRESSION_MAPPED,
+    "paired": GT_EXPRESSION_PAIRED,
+    "blocks": GT_EXPRESSION_BLOCKS,
+    "num_maps": GT_EXPRESSION_NUM_MAPS,
+    "length": GT_EXPRESSION_LENGTH,
+    "mismatches": GT_EXPRESSION_MISMATCHES,
+    "max_mismatches": GT_EXPRESSION_MAX_MISMATCHES,
+    "level": GT_EXPRESSION_LEVEL,
+    "mcs": GT_EXPRESSION_MCS,
+    "has_qualities": GT_EXPRESSION_HAS_QUALITIES,
+}
+EXPRESSION_MAX_STACK = GT_EXPRESSION_MAX_STACK
+
+
+cdef class filter_expression(TemplateFilter):
+    """Filter for the templates a compiled expression is true for.
+    The code is a list of (operation, value) tuples that is evaluated on a
+    stack, see gem.filter.expression for the expression language.
+    """
+    cdef gt_template_expression expression
+    # the expression the code was compiled from
+    cdef readonly object text
+
+    def __cinit__(self):
+        self.expression.code = NULL
+        self.expression.length = 0
+
+    def __init__(self, code, text=None):
+        """Initialize the filter with the compiled code. Raises a
+        ValueError if the code is not valid.
+
+        code -- list of (operation, value) tuples, the operations are
+                the values of EXPRESSION_OPERATIONS. The value is the
+                constant or the variable (see EXPRESSION_VARIABLES)
+        text -- the source of the expression
+        """
+        cdef uint64_t i
+        cdef int64_t depth = 0
+        code = list(code)
+        operations = EXPRESSION_OPERATIONS.values()
+        variables = EXPRESSION_VARIABLES.values()
+        for op, value in code:
+            if op not in operations:
+                raise ValueError("Unknown expression operation %s" % op)
+            if op == GT_EXPRESSION_VARIABLE and value not in variables:
+                raise ValueError("Unknown expression variable %s" % value)
+            if op == GT_EXPRESSION_CONST or op == GT_EXPRESSION_VARIABLE:
+                depth += 1
+            elif op != GT_EXPRESSION_NOT:
+                depth -= 1
+            if depth < 1 or depth > GT_EXPRESSION_MAX_STACK:
+                raise ValueError("Invalid expression code")
+        if depth != 1:
+            raise ValueError("Invalid expression code")
+        free(self.expression.code)
+        self.expression.code = <gt_expression_instruction*> malloc(len(code) * sizeof(gt_expression_instruction))
+        self.expression.length = len(code)
+        for i in range(len(code)):
+            self.expression.code[i].op = code[i][0]
+            self.expression.code[i].value = code[i][1]
+        self.text = text
+
+    def __dealloc__(self):
+        free(self.expression.code)
+
+    cpdef bool filter(self, Template template):
+        return gt_template_expression_eval(&self.expression, template.template)
+
+    cdef bool _native(self, gt_stream_filter* stream_filter):
+        stream_filter.type = GT_STREAM_FILTER_EXPRESSION
+        stream_filter.expression = &self.expression
+        return True
+
+
 cpdef unmapped(source, int64_t max_mismatches=GT_ALL):
     """Wrapper function that creates a filtered iterator"""
     return filter(source, filter_unmapped(max_mismatches))
@@ -115,21 +226,86 @@ cdef class filter(object):
             if not filtered:
                 return n
 
+    def batches(self, uint64_t size=1024):
+        """Iterate the filtered templates in batches of the given size,
+        see batched"""
+        return batched(self, size)
+
+    cdef _fill_batch(self, TemplateBatch batch):
+        """Fill the batch from the source and drop the templates
+        that do not pass the filters"""
+        cdef uint64_t start, keep, i
+        cdef bool full
+        while batch.length < batch.size:
+            start = batch.length
+            _fill_template_batch(self.source, batch)
+            full = batch.length == batch.size
+            keep = start
+            for i in range(start, batch.length):
+                template = batch.templates[i]
+                for f in self.template_filter:
+                    if not f.filter(template):
+                        break
+                else:
+                    batch._swap(keep, i)
+                    keep += 1
+            batch.length = keep
+            if not full:
+                # the source is exhausted
+                break
 
     cpdef write_stream(self, OutputFile output, bool write_map=False, uint64_t threads=1):
-        """Write the content of this filter to the output file.
+        """Write the content of this filter to the output file. If the
+        filters are built-in filters (see NATIVE_FILTERS) over input files,
+        the filters are applied by the native writer with the given number
+        of threads. Otherwise the templates are written one by one.
 
         output   -- the output file
         write_map     -- if true, write map, otherwise write fasta/q sequence
         threads       -- number of threads to use (if supported by the iterator)
         """
-        for t in self:
-            output.write(t, write_map=write_map)
+        native = _native_write_source(self)
+        if native is None:
+            for t in self:
+                output.write(t, write_map=write_map)
+            return
+        files, interleaved, source_threads, parent, remove_scores, filters = native
+        __run_write_stream(files, output, write_map, max(threads, source_threads), interleaved, parent, remove_scores=remove_scores, filters=filters)
+
+
+# the filters that have a native version applied by gt_write_stream.
+# Subclasses are excluded, they can override filter()
+NATIVE_FILTERS = (filter_unmapped, filter_unique, filter_trim, filter_expression)
+
+
+cdef _native_write_source(source):
+    """Return the arguments of __run_write_stream (files, interleave,
+    threads, parent, remove_scores, filters) if the source can be written
+    by gt_write_stream, otherwise None"""
+    if isinstance(source, InputFile):
+        return ([source], True, 0, source.process, source.remove_scores, [])
+    if isinstance(source, interleave):
+        if not all([isinstance(f, InputFile) for f in (<interleave> source).files]):
+            return None
+        return (list((<interleave> source).files), (<interleave> source).interleave, (<interleave> source).threads, None, False, [])
+    if isinstance(source, filter):
+        native = _native_write_source((<filter> source).source)
+        if native is None:
+            return None
+        for f in (<filter> source).template_filter:
+            if type(f) not in NATIVE_FILTERS:
+                return None
+            native[5].append(f)
+        return native
+    return None
 
 
 
 cdef class interleave(object):
-    """Interleaving iterator over templates from a list of input files
+    """Interleaving iterator over templates from a list of input files.
+    Two FASTA/FASTQ mate files are read by a native paired input, where
+    each mate file is parsed ahead by its own reader thread and the
+    read ids of both ends are checked.
     """
     # the input files
     cdef object files
@@ -141,6 +317,18 @@ cdef class interleave(object):
     cdef int64_t threads
     # interleave
     cdef bool interleave
+    # the paired input over two mate files
+    cdef gt_paired_input_file* paired_input
+    cdef gt_input_file* mate_files[2]
+    cdef gt_buffered_input_file* buffered_mates[2]
+    cdef gt_generic_parser_attributes* parser_attr
+    # the templates of both ends
+    cdef Template end1
+    cdef Template end2
+    # true if end/2 of the last pair was not returned yet
+    cdef bool end2_pending
+    # true if the mate files are read by the paired input
+    cdef bool paired
 
     def __init__(self, files, interleave=True, uint64_t threads=1):
         self.files = files
@@ -149,13 +337,124 @@ cdef class interleave(object):
         self.interleave = interleave
         self.threads = threads
 
+    def __dealloc__(self):
+        self._close_paired()
+
     def __iter__(self):
         # initialize iterators
-        self.files = [f.__iter__() for f in self.files]
+        self._close_paired()
+        self.paired = False
+        if self.interleave and self.length == 2 and all([isinstance(f, InputFile) for f in self.files]):
+            self._open_paired()
+        if self.paired_input is NULL:
+            self.files = [f.__iter__() for f in self.files]
         return self
 
+    cdef _open_paired(self):
+        """Open a paired input over both mate files if they are
+        FASTA/FASTQ files with the same record layout"""
+        cdef uint64_t i
+        for i in range(2):
+            self.mate_files[i] = (<InputFile> self.files[i])._open()
+        if not gt_input_files_pairable(self.mate_files[0], self.mate_files[1]):
+            for i in range(2):
+                gt_input_file_close(self.mate_files[i])
+                self.mate_files[i] = NULL
+            return
+        self.paired_input = gt_paired_input_file_new(self.mate_files[0], self.mate_files[1], 0)
+        for i in range(2):
+            self.buffered_mates[i] = gt_buffered_input_file_new(self.mate_files[i])
+        self.parser_attr = gt_input_generic_parser_attributes_new(False)
+        self.end1 = Template()
+        self.end2 = Template()
+        self.end2_pending = False
+        self.paired = True
+
+    cdef _close_paired(self):
+        cdef uint64_t i
+        if self.paired_input is NULL:
+            return
+        gt_paired_input_file_close(self.paired_input)
+        self.paired_input = NULL
+        for i in range(2):
+            gt_buffered_input_file_close(self.buffered_mates[i])
+            self.buffered_mates[i] = NULL
+            gt_input_file_close(self.mate_files[i])
+            self.mate_files[i] = NULL
+        free(self.parser_attr)
+        self.parser_attr = NULL
+
+    cdef _next_pair(self):
+        cdef gt_status s
+        cdef gt_paired_input_file* paired_input = self.paired_input
+        cdef gt_buffered_input_file** buffered_mates = self.buffered_mates
+        cdef gt_generic_parser_attributes* parser_attr = self.parser_attr
+        if self.end2_pending:
+            self.end2_pending = False
+            return self.end2
+        if paired_input is NULL:
+            raise StopIteration()
+        self.end1._detach(False)
+        self.end2._detach(False)
+        cdef gt_template* end1 = self.end1.template
+        cdef gt_template* end2 = self.end2.template
+        with nogil:
+            s = gt_paired_input_next(paired_input, buffered_mates, end1, end2, parser_attr)
+        if s == GT_PIF_OK:
+            self.end2_pending = True
+            return self.end1
+        self._end_pairs(s)
+        raise StopIteration()
+
+    cdef _end_pairs(self, gt_status s):
+        """Close the paired input once it returned a status other than
+        GT_PIF_OK. Raises a ValueError if the input was not read completely"""
+        self._close_paired()
+        for f in self.files:
+            # if this is a stream based process, make sure we clean up
+            if f.process is not None:
+                f.process.wait()
+        if s != GT_PIF_EOF:
+            raise ValueError("Unable to read the paired input %s" % (", ".join([str(f.source) for f in self.files])))
+
+    cdef _fill_batch(self, TemplateBatch batch):
+        """Fill the batch. Both ends of a pair are read into the
+        batch by the paired input without going through __next__"""
+        cdef gt_status s = GT_PIF_OK
+        cdef gt_paired_input_file* paired_input = self.paired_input
+        cdef gt_buffered_input_file** buffered_mates = self.buffered_mates
+        cdef gt_generic_parser_attributes* parser_attr = self.parser_attr
+        cdef gt_template** block
+        cdef uint64_t size = batch.size
+        cdef uint64_t length
+        if not self.paired:
+            _copy_template_batch(self, batch)
+            return
+        block = batch._block()
+        if self.end2_pending and batch.length < size:
+            self.end2_pending = False
+            gt_template_copy(block[batch.length], self.end2.template, True, True)
+            batch.length += 1
+        if paired_input is NULL:
+            return
+        length = batch.length
+        with nogil:
+            while length + 2 <= size:
+                s = gt_paired_input_next(paired_input, buffered_mates, block[length], block[length+1], parser_attr)
+                if s != GT_PIF_OK:
+                    break
+                length += 2
+        batch.length = length
+        if s != GT_PIF_OK:
+            self._end_pairs(s)
+        elif length < size:
+            # a single slot is left, end/2 goes into the next batch
+            _copy_template_batch(self, batch)
+
     def __next__(self):
         cdef int64_t mises = 0
+        if self.paired:
+            return self._next_pair()
         if self.interleave:
             while True:
                 try:
@@ -178,6 +477,11 @@ cdef class interleave(object):
                     if mises >= self.length or self.i >= self.length:
                         raise StopIteration()
 
+    def batches(self, uint64_t size=1024):
+        """Iterate the templates in batches of the given size,
+        see batched"""
+        return batched(self, size)
+
     cpdef write_stream(self, OutputFile output, bool write_map=False, uint64_t threads=1):
         """Write the content interleaved to the output file
 
@@ -188,6 +492,7 @@ cdef class interleave(object):
         __run_write_stream(self.files, output, write_map, max(threads, self.threads), self.interleave, None)
 
     cpdef close(self):
+        self._close_paired()
         try:
             for f in self.files:
                 f.close()
@@ -202,6 +507,353 @@ cdef class cat(interleave):
         interleave.__init__(self, files, interleave=False, threads=threads)
 
 
+cdef class TemplateBatch(object):
+    """Block of templates that is filled in one go by a batched
+    iterator. The templates are allocated once and reused, so the content
+    of the batch, and of the templates taken from it, is replaced when
+    the next batch is read. Iterate the batch for the templates or use the
+    per-block fields (tags, reads, ...) that return one list per batch.
+    """
+    # the preallocated templates
+    cdef list templates
+    # the native templates of the block
+    cdef gt_template** block
+    # number of templates the batch can hold
+    cdef readonly uint64_t size
+    # number of templates in the batch
+    cdef uint64_t length
+
+    def __cinit__(self, uint64_t size):
+        if size == 0:
+            raise ValueError("The batch size has to be greater than 0")
+        self.size = size
+        self.length = 0
+        self.templates = [Template() for i in range(size)]
+        self.block = <gt_template**> malloc(size * sizeof(gt_template*))
+
+    def __dealloc__(self):
+        free(self.block)
+
+    cdef gt_template** _block(self):
+        """Return the native templates of the block. The free slots are
+        updated, a template can replace its native template (merge or
+        detach)"""
+        cdef uint64_t i
+        for i in range(self.length, self.size):
+            (<Template> self.templates[i])._detach(False)
+            self.block[i] = (<Template> self.templates[i]).template
+        return self.block
+
+    cdef _swap(self, uint64_t i, uint64_t j):
+        if i != j:
+            self.templates[i], self.templates[j] = self.templates[j], self.templates[i]
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(self.templates[:self.length])
+
+    def __getitem__(self, int64_t i):
+        if i < 0:
+            i += self.length
+        if i < 0 or i >= <int64_t> self.length:
+            raise IndexError("Template index out of range")
+        return self.templates[i]
+
+    property tags:
+        def __get__(self):
+            cdef uint64_t i
+            return [gt_template_get_tag((<Template> self.templates[i]).template) for i in range(self.length)]
+
+    property pairs:
+        def __get__(self):
+            cdef uint64_t i
+            return [gt_template_get_pair((<Template> self.templates[i]).template) for i in range(self.length)]
+
+    property lengths:
+        def __get__(self):
+            cdef uint64_t i
+            return [(<Template> self.templates[i])._length() for i in range(self.length)]
+
+    property reads:
+        def __get__(self):
+            cdef uint64_t i
+            return [(<Template> self.templates[i])._read() for i in range(self.length)]
+
+    property qualities:
+        def __get__(self):
+            cdef uint64_t i
+            return [(<Template> self.templates[i])._qualities() for i in range(self.length)]
+
+    property num_maps:
+        def __get__(self):
+            cdef uint64_t i
+            return [gt_template_get_num_mmaps((<Template> self.templates[i]).template) for i in range(self.length)]
+
+
+cdef class batched(object):
+    """Iterator over batches of templates from a source (InputFile,
+    interleave, cat, filter or any other template iterator). Input files
+    and paired mate files are parsed natively into the batch, without a
+    __next__ call per template. The same TemplateBatch is returned for
+    every batch, the last one can be shorter than the batch size.
+    """
+    cdef object source
+    cdef TemplateBatch batch
+    # true if the source is exhausted
+    cdef bool done
+    # the IOError of the source, raised after the templates read before it
+    cdef object error
+
+    def __init__(self, source, uint64_t size=1024):
+        self.source = source
+        self.batch = TemplateBatch(size)
+        self.done = False
+        self.error = None
+
+    def __iter__(self):
+        self.source = iter(self.source)
+        self.done = False
+        self.error = None
+        return self
+
+    def __next__(self):
+        cdef TemplateBatch batch = self.batch
+        if self.error is not None:
+            error = self.error
+            self.error = None
+            raise error
+        if self.done:
+            raise StopIteration()
+        batch.length = 0
+        try:
+            _fill_template_batch(self.source, batch)
+        except IOError as e:
+            if batch.length == 0:
+                raise
+            self.error = e
+        if batch.length < batch.size:
+            self.done = True
+        if batch.length == 0:
+            raise StopIteration()
+        return batch
+
+
+cdef _fill_template_batch(source, TemplateBatch batch):
+    """Fill the free slots of the batch from the source. The batch
+    is only left with free slots if the source is exhausted"""
+    if isinstance(source, InputFile):
+        (<InputFile> source)._fill_batch(batch)
+    elif isinstance(source, interleave):
+        (<interleave> source)._fill_batch(batch)
+    elif isinstance(source, filter):
+        (<filter> source)._fill_batch(batch)
+    else:
+        _copy_template_batch(source, batch)
+
+
+cdef _copy_template_batch(source, TemplateBatch batch):
+    """Fill the batch with copies of the templates returned by
+    the source iterator"""
+    cdef Template template
+    cdef gt_template** block = batch._block()
+    while batch.length < batch.size:
+        try:
+            template = next(source)
+        except StopIteration:
+            return
+        gt_template_copy(block[batch.length], template.template, True, True)
+        batch.length += 1
+
+
+# the fields of map_arrays and their NumPy types
+MAP_ARRAY_FIELDS = [
+    ("read", "int64"),
+    ("block", "uint8"),
+    ("seq", "uint32"),
+    ("position", "int64"),
+    ("strand", "uint8"),
+    ("length", "int64"),
+    ("blocks", "uint32"),
+    ("distance", "int64"),
+    ("stratum_count", "int64"),
+    ("score", "uint64"),
+    ("mapq", "uint8"),
+]
+
+
+cdef class map_arrays(object):
+    """Iterator over the maps of an input file in chunks of NumPy
+    arrays (see InputFile.to_arrays). Every chunk is a dict from field name
+    to array with one row per map. The maps are read from the native
+    templates, no Template or Map objects are created. Sequence names
+    are stored as ids into the sequences list, which grows while the
+    chunks are read.
+    """
+    cdef InputFile source
+    cdef object numpy
+    # the requested fields
+    cdef readonly list fields
+    # the sequence names, indexed by id
+    cdef readonly list sequences
+    cdef dict sequence_ids
+    # the last sequence name and its id
+    cdef object last_sequence
+    cdef uint32_t last_sequence_id
+    # max number of maps per chunk
+    cdef readonly uint64_t chunk_size
+    # index of the current template, -1 before the first template
+    cdef int64_t read
+    # the next map of the current template
+    cdef uint64_t block
+    cdef uint64_t map_position
+    # true if the input is exhausted
+    cdef bool done
+
+    def __init__(self, InputFile source, fields=None, uint64_t chunk_size=65536):
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError("NumPy is required to read maps into arrays, please install numpy (pip install numpy)")
+        names = [name for name, dtype in MAP_ARRAY_FIELDS]
+        if fields is None:
+            fields = names
+        for name in fields:
+            if name not in names:
+                raise ValueError("Unknown map field %s, available fields : %s" % (name, ", ".join(names)))
+        if chunk_size == 0:
+            raise ValueError("The chunk size has to be greater than 0")
+        self.numpy = numpy
+        self.fields = list(fields)
+        self.chunk_size = chunk_size
+        self.sequences = []
+        self.sequence_ids = {}
+        self.last_sequence = None
+        self.read = -1
+        self.block = 0
+        self.map_position = 0
+        self.done = False
+        self.source = source
+        self.source.__iter__()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        cdef uint64_t n
+        if self.done:
+            raise StopIteration()
+        # the templates are read into the template of the source
+        self.source.template._detach(False)
+        arrays = {}
+        for name, dtype in MAP_ARRAY_FIELDS:
+            if name in self.fields:
+                arrays[name] = self.numpy.empty(self.chunk_size, dtype=dtype)
+        n = self._fill(arrays)
+        if n < self.chunk_size:
+            self.done = True
+            if n == 0:
+                raise StopIteration()
+            for name in arrays:
+                arrays[name] = arrays[name][:n]
+        return arrays
+
+    cdef _set_sequence(self, char* name):
+        seq = name
+        seq_id = self.sequence_ids.get(seq)
+        if seq_id is None:
+            seq_id = len(self.sequences)
+            self.sequences.append(seq)
+            self.sequence_ids[seq] = seq_id
+        self.last_sequence = seq
+        self.last_sequence_id = seq_id
+
+    cdef uint64_t _fill(self, dict arrays) except? 0:
+        """Write the next maps into the arrays and return the number
+        of maps written. Less than chunk_size maps are only written
+        if the input is exhausted"""
+        cdef bool has_read = "read" in arrays
+        cdef bool has_block = "block" in arrays
+        cdef bool has_seq = "seq" in arrays
+        cdef bool has_position = "position" in arrays
+        cdef bool has_strand = "strand" in arrays
+        cdef bool has_length = "length" in arrays
+        cdef bool has_blocks = "blocks" in arrays
+        cdef bool has_distance = "distance" in arrays
+        cdef bool has_stratum_count = "stratum_count" in arrays
+        cdef bool has_score = "score" in arrays
+        cdef bool has_mapq = "mapq" in arrays
+        cdef int64_t[:] read_view
+        cdef uint8_t[:] block_view
+        cdef uint32_t[:] seq_view
+        cdef int64_t[:] position_view
+        cdef uint8_t[:] strand_view
+        cdef int64_t[:] length_view
+        cdef uint32_t[:] blocks_view
+        cdef int64_t[:] distance_view
+        cdef int64_t[:] stratum_count_view
+        cdef uint64_t[:] score_view
+        cdef uint8_t[:] mapq_view
+        cdef gt_template* template = self.source.template.template
+        cdef gt_alignment* alignment
+        cdef gt_map* _map
+        cdef char* name
+        cdef uint64_t distance
+        cdef uint64_t n = 0
+        cdef uint64_t size = self.chunk_size
+        if has_read: read_view = arrays["read"]
+        if has_block: block_view = arrays["block"]
+        if has_seq: seq_view = arrays["seq"]
+        if has_position: position_view = arrays["position"]
+        if has_strand: strand_view = arrays["strand"]
+        if has_length: length_view = arrays["length"]
+        if has_blocks: blocks_view = arrays["blocks"]
+        if has_distance: distance_view = arrays["distance"]
+        if has_stratum_count: stratum_count_view = arrays["stratum_count"]
+        if has_score: score_view = arrays["score"]
+        if has_mapq: mapq_view = arrays["mapq"]
+        while n < size:
+            if self.read < 0 or self.block >= gt_template_get_num_blocks(template):
+                if self.source._next() != GT_STATUS_OK:
+                    self.source._check_error()
+                    break
+                template = self.source.template.template
+                self.read += 1
+                self.block = 0
+                self.map_position = 0
+                continue
+            alignment = gt_template_get_block(template, self.block)
+            if self.map_position >= gt_alignment_get_num_maps(alignment):
+                self.block += 1
+                self.map_position = 0
+                continue
+            _map = gt_alignment_get_map(alignment, self.map_position)
+            self.map_position += 1
+            distance = gt_map_get_global_distance(_map)
+            if has_read: read_view[n] = self.read
+            if has_block: block_view[n] = self.block
+            if has_seq:
+                name = gt_map_get_seq_name(_map)
+                if self.last_sequence is None or strcmp(name, <char*> self.last_sequence) != 0:
+                    self._set_sequence(name)
+                seq_view[n] = self.last_sequence_id
+            if has_position: position_view[n] = gt_map_get_position(_map)
+            if has_strand: strand_view[n] = 1 if gt_map_get_strand(_map) == REVERSE else 0
+            if has_length: length_view[n] = gt_map_get_global_length(_map)
+            if has_blocks: blocks_view[n] = gt_map_get_num_blocks(_map)
+            if has_distance: distance_view[n] = distance
+            if has_stratum_count:
+                if distance < gt_alignment_get_num_counters(alignment):
+                    stratum_count_view[n] = gt_alignment_get_counter(alignment, distance)
+                else:
+                    stratum_count_view[n] = 0
+            if has_score: score_view[n] = gt_map_get_score(_map)
+            if has_mapq: mapq_view[n] = gt_map_get_phred_score(_map)
+            n += 1
+        return n
+
+
 cdef class OutputFile:
     """The OutputFile can write content to a file or
     or a stream.
@@ -220,20 +872,43 @@ cdef class OutputFile:
     cdef bool append_extra
     # list of filters
     cdef object filters
-
-    def __init__(self, target, bool clean_id=False, bool append_extra=True):
+    # write binary GTB records
+    cdef readonly bool binary
+    # the template index written with the output
+    cdef readonly object index_file
+    # serialization buffer of format()
+    cdef _CharBuffer buffer
+    # write BGZF compressed output
+    cdef readonly bool compress
+
+    def __init__(self, target, bool clean_id=False, bool append_extra=True, bool binary=False, bool index=False, uint64_t index_interval=4096, bool compress=False, uint64_t threads=1):
         """Initialize the output file from the given target. The
         target can be either a string a stream. If init_buffer is
         true, the output buffer is initialized. The output can be configured
         to clean the ids and append extra information. Clean ids encode the
         pair information as /1 and /2. Extra information is everything after
         the first space in the id or the everything after the casava id in case
-        of tempalte tags encoded as casava >= 1.8+.
-
-        target       -- the target file or stream
-        clean_id     -- ensure /1 /2 read pair encoding
-        append_extra -- append additional infomration to the id
-        init_buffer  -- if true, the buffered output will be initialized, default True
+        of tempalte tags encoded as casava >= 1.8+. Binary outputs are written
+        as GTB records, a compact encoding of the templates that InputFile
+        detects and reads back without parsing text. Reads are packed into
+        two bits per base and positions are delta encoded, GTB files are
+        about a quarter smaller than the same map text. Map outputs written to a
+        file can be indexed. The offset of every index_interval-th template is
+        written to the <target>.idx sidecar file when the output is closed, and
+        InputFile uses it to read template ranges. Compressed outputs are
+        written as BGZF, a gzip compatible sequence of independent blocks that
+        are deflated by the given number of threads. They can be indexed too,
+        the index then stores the virtual offsets of the templates.
+
+        target         -- the target file or stream
+        clean_id       -- ensure /1 /2 read pair encoding
+        append_extra   -- append additional infomration to the id
+        init_buffer    -- if true, the buffered output will be initialized, default True
+        binary         -- write GTB records instead of map/fastq/fasta text
+        index          -- write a template index of the map output
+        index_interval -- number of templates between two index entries
+        compress       -- write BGZF compressed text
+        threads        -- number of threads that compress the output
         """
         self.target = target
         self.map_attributes = gt_output_map_attributes_new()
@@ -241,6 +916,8 @@ cdef class OutputFile:
         self.clean_id = clean_id
         self.append_extra = append_extra
         self.filters = None
+        self.binary = binary
+        self.compress = compress
         # init attributes
         gt_output_map_attributes_set_print_extra(self.map_attributes, append_extra)
         gt_output_map_attributes_set_print_casava(self.map_attributes, not clean_id)
@@ -248,10 +925,26 @@ cdef class OutputFile:
         gt_output_fasta_attributes_set_print_casava(self.fasta_attributes, not clean_id)
 
         # open the outout file or stream
+        if index and (binary or not isinstance(target, basestring)):
+            raise ValueError("Only map outputs written to a file can be indexed")
+        if compress and binary:
+            raise ValueError("Binary outputs can not be compressed")
         if isinstance(target, basestring):
             self._open_file(<char*> target)
         else:
             self._open_stream(<file> target)
+        if compress:
+            if self.output_file.compression_type != BGZF:
+                gt_output_file_close(self.output_file)
+                self.output_file = NULL
+                raise ValueError("BGZF compression is not available")
+            gt_output_file_set_threads(self.output_file, threads)
+        if binary:
+            gt_output_gtb_ofprint_header(self.output_file)
+        if index:
+            import gem.files
+            self.index_file = gem.files.template_index_file(target)
+            gt_output_file_set_template_index(self.output_file, <char*> self.index_file, index_interval, 1)
 
     cpdef bool is_stream(self):
         return isinstance(self.target, basestring)
@@ -272,7 +965,10 @@ cdef class OutputFile:
         stream      -- the output stream
         init_buffer -- if true, initialize the output buffer
         """
-        self.output_file = gt_output_stream_new(PyFile_AsFile(stream), SORTED_FILE)
+        if self.compress:
+            self.output_file = gt_output_stream_new_compress(PyFile_AsFile(stream), SORTED_FILE, BGZF)
+        else:
+            self.output_file = gt_output_stream_new(PyFile_AsFile(stream), SORTED_FILE)
 
     cpdef _open_file(self, char* file_name):
         """Initialize this instance from a file
@@ -280,7 +976,10 @@ cdef class OutputFile:
         file_name   -- the output file name
         init_buffer -- if true, initialize the output buffer
         """
-        self.output_file = gt_output_file_new(file_name, SORTED_FILE)
+        if self.compress:
+            self.output_file = gt_output_file_new_compress(file_name, SORTED_FILE, BGZF)
+        else:
+            self.output_file = gt_output_file_new(file_name, SORTED_FILE)
 
     cpdef close(self):
         """Close the output file"""
@@ -294,18 +993,50 @@ cdef class OutputFile:
         """Write a single template to this otuout file.
 
         template  -- the source tempalte
-        write_map -- writes map or fastq/a format
+        write_map -- writes map or fastq/a format, ignored for binary outputs
         """
+        if not write_map and self.index_file is not None:
+            raise ValueError("Indexed outputs contain map records only")
         if self.filters is not None:
             for f in self.filters:
                 if not f.filter(template):
                     return
         # write a single template
-        if write_map:
+        if self.binary:
+            gt_output_gtb_ofprint_template(self.output_file, template.template, self.map_attributes)
+        elif write_map:
             gt_output_map_ofprint_template(self.output_file, template.template, self.map_attributes)
         else:
             gt_output_fasta_ofprint_template(self.output_file, template.template, self.fasta_attributes)
 
+    def format(self, Template template, write_map=True):
+        """Serialize a template the way write() writes it and return a
+        read-only memoryview of the serialization buffer of this output.
+        The buffer is reused unless the view of the previous call is still
+        in use, a view stays valid until it is released.
+        Returns None if the template does not pass the filters.
+
+        template  -- the source tempalte
+        write_map -- format map or fastq/a, ignored for binary outputs
+        """
+        if self.filters is not None:
+            for f in self.filters:
+                if not f.filter(template):
+                    return None
+        if self.buffer is None or self.buffer.exports > 0:
+            # views of the previous serialization keep their buffer
+            self.buffer = _string_buffer(1024)
+        else:
+            gt_string_clear(self.buffer.string)
+        cdef gt_string* buffer = self.buffer.string
+        if self.binary:
+            gt_output_gtb_sprint_template(buffer, template.template, self.map_attributes)
+        elif write_map:
+            gt_output_map_sprint_template(buffer, template.template, self.map_attributes)
+        else:
+            gt_output_fasta_sprint_template(buffer, template.template, self.fasta_attributes)
+        return self.buffer._view()
+
 
 
 cdef class InputFile(object):
@@ -324,6 +1055,17 @@ cdef class InputFile(object):
     cdef readonly object process
     # the quality offset
     cdef readonly object quality
+    # number of threads used to inflate BGZF files, 0 for the default
+    cdef readonly uint64_t threads
+    # the compression codec of the file, see gem.files.codecs
+    cdef readonly object codec
+    # content stream of the decompressor of codecs that are not read natively
+    cdef object decompressor
+    # the range of templates read, see the template index
+    cdef readonly object start
+    cdef readonly object end
+    # number of template blocks parsed ahead by a reader thread, 0 to parse on demand
+    cdef readonly uint64_t prefetch
 
     # parsing attributes
     # the buffered input file
@@ -333,31 +1075,61 @@ cdef class InputFile(object):
     cdef gt_buffered_input_file* buffered_input
     # parser attributes
     cdef gt_generic_parser_attributes* parser_attr
+    # the prefetching reader, replaces the buffered input if prefetch > 0
+    cdef gt_prefetch_input_file* prefetch_input
     # the template instance that is used to iterate templates
     cdef readonly Template template
     # remove scores when printing
     cdef public bool remove_scores
 
-    def __init__(self, source, bool mmap_file=False, bool force_paired_reads=False, object quality=None, object process=None):
+    def __init__(self, source, bool mmap_file=True, bool force_paired_reads=False, object quality=None, object process=None, uint64_t threads=0, object start=None, object end=None, uint64_t prefetch=0):
         """Initialize a new input file on the source. The source can be either a file name
-        or a stream.
-
+        or a stream. Gzip compressed files are read natively and the blocks of
+        BGZF compressed files are inflated by the given number of threads.
+        BAM and GTB files and streams are decoded natively. Files compressed
+        with the other registered codecs (see gem.files.codecs) are read through
+        their codec tool. Uncompressed regular files are memory mapped unless
+        mmap_file is False. The pages are released once they are parsed.
+
+        Map files that come with a template index (<source>.idx, see
+        OutputFile and gem.files.index_templates) can be read partially. Only
+        the templates from start (inclusive) to end (exclusive) are read if
+        either is given. The file has to be an uncompressed or BGZF compressed
+        map file and the index has to match its current size and modification
+        time, otherwise a ValueError or IOError is raised.
+
+        If prefetch is greater than 0, a native reader thread reads and parses
+        up to prefetch blocks of templates ahead while the current ones are
+        processed, overlapping the I/O with the work of the consumer.
         """
         self.source = source
+        self.prefetch = prefetch
+        self.threads = threads
         self.force_paired_reads = force_paired_reads
         self.mmap_file = mmap_file
         self.process = process
         self.quality = quality
         self.template = Template()
         self.remove_scores = False
+        self.decompressor = None
+        self.start = start
+        self.end = end
         if isinstance(source, basestring):
+            import gem.files
             self.filename = source
+            self.codec = gem.files.codec_for(source)
+        if start is not None or end is not None:
+            self._check_range()
         # make sure memory mapping is disabled for compressed files and
         # # streams
-        if self.filename is None or self.filename.endswith(".gz") or self.filename.endswith(".bz2"):
+        if self.filename is None or self.codec is not None or self.filename.endswith(".bz2") or self.filename.endswith(".bam"):
                 self.mmap_file = False
 
     def __dealloc__(self):
+        if self.prefetch_input is not NULL:
+            with nogil:
+                gt_prefetch_input_file_close(self.prefetch_input)
+            self.prefetch_input = NULL
         if self.buffered_input is not NULL:
             gt_buffered_input_file_close(self.buffered_input)
             self.buffered_input = NULL
@@ -368,22 +1140,106 @@ cdef class InputFile(object):
             gt_input_file_close(self.input_file)
             self.input_file = NULL
 
-    cdef gt_input_file* _open(self):
+    cdef gt_input_file* _open(self) except NULL:
         """Open a new gt_input_file"""
-        if self.filename is not None:
-            return gt_input_file_open(<char*>self.filename, self.mmap_file)
+        cdef char* file_name
+        cdef bool mmap_file = self.mmap_file
+        cdef gt_input_file* input_file
+        cdef FILE* stream
+        if self.codec is not None and not self.codec.native:
+            # the codec tool decompresses the file into a pipe, the
+            # tool of an earlier iteration is stopped
+            import gem.files
+            self._close_decompressor(False)
+            self.decompressor = gem.files.DecompressedStream(self.codec.open(self.filename), self.filename)
+            stream = PyFile_AsFile(self.decompressor.stream)
+            with nogil:
+                input_file = gt_input_stream_open(stream)
+            return input_file
+        elif self.filename is not None:
+            file_name = <char*>self.filename
+            # opening a fifo blocks until the writer is connected
+            with nogil:
+                input_file = gt_input_file_open(file_name, mmap_file)
+            if self.threads > 0:
+                gt_input_file_set_threads(input_file, self.threads)
+            if self.start is not None or self.end is not None:
+                self._seek(input_file)
+            return input_file
         else:
-            return gt_input_stream_open(PyFile_AsFile(self.source))
+            # streams can be written by other threads of this process
+            # that need the GIL to finish
+            import gem.files
+            source = self.source
+            if isinstance(source, gem.files.DecompressedStream):
+                source = source.stream
+            stream = PyFile_AsFile(source)
+            with nogil:
+                input_file = gt_input_stream_open(stream)
+            return input_file
+
+    cdef _check_range(self):
+        """Check that the template range can be read from the file"""
+        if self.filename is None or (self.codec is not None and not self.codec.native):
+            raise ValueError("Template ranges can only be read from uncompressed or BGZF compressed files")
+        if (self.start is not None and self.start < 0) or (self.end is not None and self.end < 0) or \
+                (self.start is not None and self.end is not None and self.start > self.end):
+            raise ValueError("Invalid template range : %s-%s" % (self.start, self.end))
+        if not os.path.isfile(self.filename):
+            raise ValueError("Template ranges can only be read from regular files : %s" % (self.filename))
+        cdef char* file_name = self.filename
+        cdef gt_input_file* input_file
+        with nogil:
+            input_file = gt_input_file_open(file_name, False)
+        cdef bool supported = input_file.file_format == MAP and \
+            (input_file.file_type == REGULAR_FILE or input_file.file_type == MAPPED_FILE or input_file.file_type == BGZIPPED_FILE)
+        gt_input_file_close(input_file)
+        if not supported:
+            raise ValueError("Template ranges can only be read from uncompressed or BGZF compressed map files : %s" % (self.filename))
+        gt_template_index_delete(self._read_index())
+
+    cdef gt_template_index* _read_index(self) except NULL:
+        """Read the template index of the file and make sure
+        it was built from the current content of the file"""
+        import gem.files
+        index_file = gem.files.template_index_file(self.filename)
+        cdef gt_template_index* template_index = gt_template_index_read(<char*> index_file)
+        if template_index is NULL:
+            raise IOError("Template index not found : %s" % (index_file))
+        if not gt_template_index_check_data(template_index, <char*> self.filename):
+            gt_template_index_delete(template_index)
+            raise IOError("Template index %s does not match %s, the file was changed after it was indexed" % (index_file, self.filename))
+        return template_index
+
+    cdef _seek(self, gt_input_file* input_file):
+        """Restrict the input file to the template range"""
+        cdef gt_template_index* template_index
+        try:
+            template_index = self._read_index()
+        except:
+            gt_input_file_close(input_file)
+            raise
+        cdef uint64_t start = 0 if self.start is None else self.start
+        cdef uint64_t end = template_index.num_templates if self.end is None else self.end
+        cdef bool ok = False
+        if input_file.file_format == MAP:
+            with nogil:
+                ok = gt_input_file_seek_templates(input_file, template_index, 1, start, end)
+        gt_template_index_delete(template_index)
+        if not ok:
+            gt_input_file_close(input_file)
+            raise IOError("Can not read templates %d-%d of %s with the template index" % (start, end, self.filename))
 
     def raw_sequence_stream(self):
         """Return true if this is a file based
         input file, uncompressed and fastq/q format
+        and the whole file is read (no template range)
         """
-        if self.filename is None:
+        if self.filename is None or self.codec is not None or self.start is not None or self.end is not None:
             return False
         cdef gt_input_file* infile = self._open()
         valid = False
-        if infile.file_type == REGULAR_FILE and infile.file_format == FASTA:
+        if (infile.file_type == REGULAR_FILE or infile.file_type == MAPPED_FILE) and infile.file_format == FASTA:
             valid = True
         gt_input_file_close(infile)
         return valid
@@ -397,7 +1253,7 @@ cdef class InputFile(object):
         if self.filename is None:
             raise ValueError("Can not clone a stream based input file")
         else:
-            return InputFile(self.source, mmap_file=self.mmap_file, force_paired_reads=self.force_paired_reads, quality=self.quality, process=self.process)
+            return InputFile(self.source, mmap_file=self.mmap_file, force_paired_reads=self.force_paired_reads, quality=self.quality, process=self.process, threads=self.threads, start=self.start, end=self.end, prefetch=self.prefetch)
 
     def raw_stream(self):
         """Return the raw stream on this input file.
@@ -409,25 +1265,172 @@ cdef class InputFile(object):
             return self.source
         else:
             import gem.files
-            return gem.files.open_file(self.filename)
+            return gem.files.open_file(self.filename, threads=self.threads)
+
+    def passthrough(self, bool write_map=False, bool clean_id=False, bool append_extra=True, uint64_t sample=1000, bool strict=True):
+        """Return true if the raw content of this file is what write_stream()
+        writes with the given settings, i.e. the file is clean FASTQ or MAP
+        that would be parsed and printed without changes. Streams, ranges and
+        inputs with a process are never passed through.
+
+        By default the whole file is parsed and compared, which reads it
+        twice. Without strict, only the first sample templates are compared
+        and the format and id style of the file are assumed to be the same
+        for the rest of it. A file that changes its style after the sample,
+        i.e. concatenated files, is then passed through without the changes
+        write_stream() would make.
+
+        write_map    -- compare to map output, otherwise to fasta/q
+        clean_id     -- the /1 /2 pair encoding is enforced
+        append_extra -- additional information of the ids is kept
+        sample       -- number of templates compared
+        strict       -- compare all templates of the file
+        """
+        if self.filename is None or self.process is not None or self.remove_scores or self.start is not None or self.end is not None:
+            return False
+        cdef InputFile source = self.clone()
+        cdef gt_input_file* input_file = source._open()
+        cdef uint64_t num_templates = 0 if strict else sample
+        cdef bool match = False
+        cdef int raw_fd
+        try:
+            if (num_templates > 0 or strict) and \
+                    ((write_map and input_file.file_format == MAP) or (not write_map and input_file.file_format == FASTA)):
+                raw = self.raw_stream()
+                try:
+                    raw_fd = raw.fileno()
+                    with nogil:
+                        match = gt_write_stream_matches(input_file, raw_fd, num_templates, append_extra, clean_id, write_map)
+                finally:
+                    # a damaged compressed file is reported
+                    raw.close()
+        finally:
+            gt_input_file_close(input_file)
+            source.close()
+        return match
 
     def __iter__(self):
-        """Initialize buffers and prepare for iterating"""
-        ##
+        """Initialize buffers and prepare for iterating. The
+        input of an earlier iteration is closed and read again"""
+        self._close_input()
         self.input_file = self._open()
-        self.buffered_input = gt_buffered_input_file_new(self.input_file)
-        self.parser_attr = gt_input_generic_parser_attributes_new(self.force_paired_reads)
+        if self.prefetch > 0:
+            # the reader thread owns its buffered input and parser attributes
+            self.prefetch_input = gt_prefetch_input_file_new(self.input_file, self.prefetch, 0, self.force_paired_reads)
+        else:
+            self.buffered_input = gt_buffered_input_file_new(self.input_file)
+            self.parser_attr = gt_input_generic_parser_attributes_new(self.force_paired_reads)
         return self
 
     def __next__(self):
+        self.template._detach(False)
         if self._next() == GT_STATUS_OK:
             return self.template
         else:
+            self._check_error()
             raise StopIteration()
 
+    cdef _check_error(self):
+        """Raise an IOError if the input ended because its
+        compressed content is corrupt or truncated"""
+        import gem.files
+        if self.input_file is not NULL and self.input_file.error:
+            raise IOError("Corrupt or truncated input : %s" % (self.filename if self.filename is not None else "stream"))
+        # the decompressor tools report the damage with their exit value
+        source = self.decompressor if self.decompressor is not None else self.source
+        if isinstance(source, gem.files.DecompressedStream):
+            source.check()
+
+    cdef _close_decompressor(self, bool check):
+        """Stop the decompressor and raise its failure
+        if check is set"""
+        decompressor = self.decompressor
+        self.decompressor = None
+        if decompressor is None:
+            return
+        try:
+            decompressor.close()
+        except IOError:
+            if check:
+                raise
+
+    def batches(self, uint64_t size=1024):
+        """Iterate the templates in batches of the given size,
+        see batched"""
+        return batched(self, size)
+
+    def to_arrays(self, fields=None, uint64_t chunk_size=65536):
+        """Read the maps of this input into chunks of NumPy arrays with
+        one row per map. Returns a map_arrays iterator over dicts from field
+        name to array. The fields are
+
+        read          -- index of the template in the input
+        block         -- the block (end) of the template the map belongs to
+        seq           -- id of the sequence name in map_arrays.sequences
+        position      -- the position as printed in the map file
+        strand        -- 0 for forward, 1 for reverse
+        length        -- the mapped length, including all split blocks
+        blocks        -- number of split blocks of the map
+        distance      -- the distance (stratum) of the map
+        stratum_count -- number of matches of the block in the map's stratum
+        score         -- the GT score (2^64-1 if not set)
+        mapq          -- the phred score (255 if not set)
+
+        fields     -- list of fields to read, all if None
+        chunk_size -- max number of maps per chunk
+        """
+        return map_arrays(self, fields=fields, chunk_size=chunk_size)
+
+    cdef _fill_batch(self, TemplateBatch batch):
+        """Parse templates into the free slots of the batch"""
+        cdef gt_status s = GT_STATUS_OK
+        cdef gt_buffered_input_file* buffered_input = self.buffered_input
+        cdef gt_generic_parser_attributes* parser_attr = self.parser_attr
+        cdef gt_template** block = batch._block()
+        cdef uint64_t size = batch.size
+        cdef uint64_t length = batch.length
+        cdef uint64_t start = length
+        cdef gt_prefetch_input_file* prefetch_input = self.prefetch_input
+        cdef uint64_t i
+        if prefetch_input is not NULL:
+            # the parsed templates are swapped into the block
+            with nogil:
+                while length < size:
+                    s = gt_prefetch_input_file_get_template(prefetch_input, &block[length])
+                    if s != GT_PRF_OK:
+                        break
+                    length += 1
+            for i in range(start, length):
+                (<Template> batch.templates[i]).template = block[i]
+        else:
+            with nogil:
+                while length < size:
+                    s = gt_input_generic_parser_get_template(buffered_input, block[length], parser_attr)
+                    if s != GT_STATUS_OK:
+                        break
+                    length += 1
+        batch.length = length
+        if s != GT_STATUS_OK:
+            if self.process is not None:
+                # if this is a stream based process, make sure we clean up
+                self.process.wait()
+            self._check_error()
+
     cpdef gt_status _next(self):
         """Internal iterator method"""
-        cdef gt_status s = gt_input_generic_parser_get_template(self.buffered_input, self.template.template, self.parser_attr)
+        cdef gt_status s
+        cdef gt_buffered_input_file* buffered_input = self.buffered_input
+        cdef gt_template* template = self.template.template
+        cdef gt_generic_parser_attributes* parser_attr = self.parser_attr
+        cdef gt_prefetch_input_file* prefetch_input = self.prefetch_input
+        if prefetch_input is not NULL:
+            # the parsed template is swapped with the current one
+            with nogil:
+                s = gt_prefetch_input_file_get_template(prefetch_input, &template)
+            self.template.template = template
+        else:
+            with nogil:
+                s = gt_input_generic_parser_get_template(buffered_input, template, parser_attr)
         if s != GT_STATUS_OK:
             if self.process is not None:
                 # if this is a stream based process, make sure we clean up
@@ -445,7 +1448,13 @@ cdef class InputFile(object):
         """
         __run_write_stream([self], output, write_map, threads, True, self.process, remove_scores=self.remove_scores)
 
-    cpdef close(self):
+    cdef _close_input(self):
+        """Stop the reader thread and release the buffers
+        and the input file of the current iteration"""
+        if self.prefetch_input is not NULL:
+            with nogil:
+                gt_prefetch_input_file_close(self.prefetch_input)
+            self.prefetch_input = NULL
         if self.buffered_input is not NULL:
             gt_buffered_input_file_close(self.buffered_input)
             self.buffered_input = NULL
@@ -456,10 +1465,98 @@ cdef class InputFile(object):
             gt_input_file_close(self.input_file)
             self.input_file = NULL
 
+    cpdef close(self):
+        self._close_input()
+        # the tool stops once its pipe is closed
+        self._close_decompressor(True)
+
+
+def inflate(file_name, int fd, uint64_t threads=0):
+    """Write the uncompressed content of a gzip or BGZF compressed
+    file to the file descriptor. BGZF blocks are inflated in parallel.
+    Returns False if the content could not be written completely,
+    i.e. because the reader closed the other end of a pipe or the
+    compressed file is corrupt or truncated. The
+    file descriptor is not closed.
+
+    file_name -- the compressed file
+    fd        -- the target file descriptor
+    threads   -- number of threads that inflate BGZF blocks, 0 for the default
+    """
+    if not os.path.exists(file_name):
+        raise IOError("File not found : %s" % (file_name))
+    cdef char* name = file_name
+    cdef bool ok
+    with nogil:
+        ok = gt_inflate_to_fd(name, fd, threads)
+    return ok
+
+
+def index_templates(file_name, index_file, uint64_t interval=4096):
+    """Write the template index of a map file that is uncompressed or
+    BGZF compressed. The offset of every interval-th template is written
+    to the index file.
+
+    file_name  -- the map file
+    index_file -- the target index file
+    interval   -- number of templates between two index entries
+    """
+    if not os.path.exists(file_name):
+        raise IOError("File not found : %s" % (file_name))
+    cdef char* name = file_name
+    cdef gt_input_file* input_file
+    with nogil:
+        input_file = gt_input_file_open(name, True)
+    if input_file.file_format != MAP or not (input_file.file_type == REGULAR_FILE or input_file.file_type == MAPPED_FILE or input_file.file_type == BGZIPPED_FILE):
+        gt_input_file_close(input_file)
+        raise ValueError("Only uncompressed or BGZF compressed map files can be indexed : %s" % (file_name))
+    cdef gt_template_index* template_index
+    with nogil:
+        template_index = gt_input_file_index_templates(input_file, interval, 1)
+    gt_input_file_close(input_file)
+    # bind the index to the indexed content
+    ok = gt_template_index_bind_data(template_index, name) and gt_template_index_write(template_index, <char*> index_file)
+    gt_template_index_delete(template_index)
+    if not ok:
+        raise IOError("Could not write template index : %s" % (index_file))
+
+
+def template_index_matches(index_file, file_name):
+    """Return true if the template index was built from the current
+    content of the file, i.e. the size, modification time and inode
+    of the file did not change
+
+    index_file -- the template index
+    file_name  -- the indexed file
+    """
+    cdef gt_template_index* template_index = gt_template_index_read(<char*> index_file)
+    if template_index is NULL:
+        raise IOError("Template index not found : %s" % (index_file))
+    cdef bool matches = gt_template_index_check_data(template_index, <char*> file_name)
+    gt_template_index_delete(template_index)
+    return matches
+
+
+def sam_to_bam(int in_fd, int out_fd, uint64_t threads=0, uint64_t mapq=0):
+    """Encode the SAM content read from in_fd as BAM and write it
+    to out_fd. The BGZF blocks are compressed in parallel. Returns
+    False if the SAM content is malformed or the BAM could not be
+    written completely. The file descriptors are not closed.
+
+    in_fd   -- the file descriptor of the SAM content
+    out_fd  -- the target file descriptor
+    threads -- number of threads that compress BGZF blocks, 0 for the default
+    mapq    -- skip records with a lower mapping quality
+    """
+    cdef bool ok
+    with nogil:
+        ok = gt_sam_to_bam_fd(in_fd, out_fd, threads, mapq)
+    return ok
+
 
-cpdef __run_write_stream(source, OutputFile output, bool write_map=False, uint64_t threads=1, bool interleave=True, parent=None, function=__write_stream, bool async=False, bool remove_scores=False):
+cpdef __run_write_stream(source, OutputFile output, bool write_map=False, uint64_t threads=1, bool interleave=True, parent=None, function=__write_stream, bool async=False, bool remove_scores=False, filters=None):
     import gem.utils
-    process = multiprocessing.Process(target=function, args=(source, output, write_map, threads, interleave, remove_scores))
+    process = multiprocessing.Process(target=function, args=(source, output, write_map, threads, interleave, remove_scores, filters))
     gem.utils.register_process(process)
     process.start()
 
@@ -467,26 +1564,38 @@ cpdef __run_write_stream(source, OutputFile output, bool write_map=False, uint64
         process.join()
         if parent is not None:
             parent.wait()
+        if process.exitcode != 0:
+            raise IOError("Writing the input stream failed")
     return process
 
-cpdef __write_stream(source, OutputFile output, bool write_map=False, uint64_t threads=1, bool interleave=True, bool remove_scores=False):
+cpdef __write_stream(source, OutputFile output, bool write_map=False, uint64_t threads=1, bool interleave=True, bool remove_scores=False, filters=None):
     cdef gt_output_file* output_file = output.output_file
     cdef uint64_t num_inputs = len(source)
     cdef gt_input_file** inputs = <gt_input_file**>malloc( num_inputs *sizeof(gt_input_file*))
+    cdef uint64_t num_filters = 0 if filters is None else len(filters)
+    cdef gt_stream_filter* stream_filters = <gt_stream_filter*>malloc((num_filters + 1) * sizeof(gt_stream_filter))
     cdef bool clean_id = output.clean_id
     cdef bool append_extra = output.append_extra
+    cdef bool write_binary = output.binary
     cdef uint64_t use_threads = threads
+    cdef bool ok
 
     for i in range(num_inputs):
         inputs[i] = (<InputFile> source[i])._open()
+    for i in range(num_filters):
+        (<TemplateFilter> filters[i])._native(&stream_filters[i])
 
     with nogil:
-        gt_write_stream(output_file, inputs, num_inputs, append_extra, clean_id, interleave, use_threads, write_map, remove_scores)
+        ok = gt_write_stream(output_file, inputs, num_inputs, append_extra, clean_id, interleave, use_threads, write_map, remove_scores, write_binary, stream_filters, num_filters)
 
     output.close()
     for i in range(num_inputs):
         gt_input_file_close(inputs[i])
     free(inputs)
+    free(stream_filters)
+    if not ok:
+        # the error is reported by the parser, exit with an error code
+        sys.exit(1)
 
 
 cdef _create_alignment(gt_alignment* ali):
@@ -706,22 +1815,144 @@ cdef class Map:
 
 
 
+cdef class _CharBuffer:
+    """Read-only buffer over native characters that counts its exports,
+    the memoryviews in use, like a bytearray. The buffer either owns its
+    characters, a serialization buffer (see _string_buffer), or points to
+    the fields of an owner that it keeps alive. The owner counts the
+    exports of its fields as well, see Template._detach()"""
+    cdef object owner
+    cdef Py_ssize_t* owner_exports
+    cdef gt_string* string
+    cdef Py_ssize_t exports
+    cdef char* data
+    cdef Py_ssize_t length
+    cdef Py_ssize_t itemsize
+
+    def __dealloc__(self):
+        if self.string is not NULL:
+            gt_string_delete(self.string)
+
+    def __getbuffer__(self, Py_buffer* buffer, int flags):
+        if flags & PyBUF_WRITABLE:
+            raise BufferError("The buffer is read only")
+        buffer.buf = self.data
+        buffer.obj = self
+        buffer.len = self.length
+        buffer.readonly = 1
+        buffer.itemsize = 1
+        buffer.format = NULL
+        if flags & PyBUF_FORMAT:
+            buffer.format = "B"
+        buffer.ndim = 1
+        buffer.shape = &self.length
+        buffer.strides = &self.itemsize
+        buffer.suboffsets = NULL
+        buffer.internal = NULL
+        self.exports += 1
+        if self.owner_exports is not NULL:
+            self.owner_exports[0] += 1
+
+    def __releasebuffer__(self, Py_buffer* buffer):
+        self.exports -= 1
+        if self.owner_exports is not NULL:
+            self.owner_exports[0] -= 1
+
+    cdef _view(self):
+        """Return a read-only memoryview of the owned string"""
+        self.data = gt_string_get_string(self.string)
+        self.length = gt_string_get_length(self.string)
+        return memoryview(self)
+
+cdef _char_view(owner, Py_ssize_t* owner_exports, char* data, uint64_t length):
+    """Return a read-only memoryview of native characters of the owner.
+    The exports are counted in owner_exports"""
+    cdef _CharBuffer buffer = _CharBuffer()
+    buffer.owner = owner
+    buffer.owner_exports = owner_exports
+    buffer.data = data
+    buffer.length = length
+    buffer.itemsize = 1
+    return memoryview(buffer)
+
+cdef class _TemplateFields:
+    """Counts the memoryviews of the fields of a native template and
+    keeps the template alive for them once the Template moved on to a
+    new one, see Template._detach()"""
+    cdef gt_template* template
+    cdef Py_ssize_t exports
+
+    def __dealloc__(self):
+        if self.template is not NULL:
+            gt_template_delete(self.template)
+
+cdef _CharBuffer _string_buffer(uint64_t size):
+    """Return a new serialization buffer that owns its string"""
+    cdef _CharBuffer buffer = _CharBuffer()
+    buffer.string = gt_string_new(size)
+    buffer.itemsize = 1
+    return buffer
+
+# output attributes of Template.to_map(), to_fasta() and to_fastq()
+cdef gt_output_map_attributes* _map_attributes = gt_output_map_attributes_new()
+cdef gt_output_fasta_attributes* _fasta_attributes = gt_output_fasta_attributes_new()
+gt_output_fasta_attributes_set_format(_fasta_attributes, F_FASTA)
+cdef gt_output_fasta_attributes* _fastq_attributes = gt_output_fasta_attributes_new()
+
+
 cdef class Template:
-    """Wrapper class around gt_tempalte"""
+    """Wrapper class around gt_tempalte
+
+    The *_view accessors return read-only memoryviews of the native
+    fields without copying them. The views stay valid as long as they
+    are in use. If the template is changed while views of its fields
+    are in use, i.e. an iterator reads the next template into it, the
+    template moves on to a new native template and the views keep the
+    previous one. The views of the serializations (to_map_view(), ...)
+    own their buffer and stay valid as well.
+    """
     cdef gt_template* template
+    # serialization buffer of to_map(), to_fasta(), ...
+    cdef _CharBuffer buffer
+    # counts the memoryviews of the fields of the native template
+    cdef _TemplateFields fields
 
     def __cinit__(self):
         self.template = gt_template_new()
 
     def __dealloc__(self):
-        gt_template_delete(self.template)
+        self._release()
 
     property tag:
         def __get__(self):
             return gt_template_get_tag(self.template)
         def __set__(self, value):
+            self._detach(True)
             gt_template_set_tag(self.template, value, len(value))
 
+    property tag_view:
+        """Read-only memoryview of the tag"""
+        def __get__(self):
+            cdef gt_string* tag = gt_template_get_string_tag(self.template)
+            cdef _TemplateFields fields = self._fields()
+            return _char_view(fields, &fields.exports, gt_string_get_string(tag), gt_string_get_length(tag))
+
+    property read_view:
+        """Read-only memoryview of the read of the first block"""
+        def __get__(self):
+            cdef gt_alignment* alignment = self._get_alignment(0)
+            cdef _TemplateFields fields = self._fields()
+            return _char_view(fields, &fields.exports, gt_alignment_get_read(alignment), gt_alignment_get_read_length(alignment))
+
+    property qualities_view:
+        """Read-only memoryview of the qualities of the first block,
+        empty if the read has no qualities"""
+        def __get__(self):
+            cdef gt_alignment* alignment = self._get_alignment(0)
+            cdef uint64_t length = gt_alignment_get_read_length(alignment) if gt_alignment_has_qualities(alignment) else 0
+            cdef _TemplateFields fields = self._fields()
+            return _char_view(fields, &fields.exports, gt_alignment_get_qualities(alignment), length)
+
     property pair:
         def __get__(self):
             return gt_template_get_pair(self.template)
@@ -799,56 +2030,100 @@ cdef class Template:
 
     def to_map(self):
         cdef gt_string* gt = self._to_map()
-        s = ""+gt_string_get_string(gt)
-        gt_string_delete(gt)
-        return s
+        return gt_string_get_string(gt)[:gt_string_get_length(gt)]
 
     def to_fasta(self):
         cdef gt_string* gt = self._to_fasta()
-        s = ""+gt_string_get_string(gt)
-        gt_string_delete(gt)
-        return s
+        return gt_string_get_string(gt)[:gt_string_get_length(gt)]
 
     def to_fastq(self):
         cdef gt_string* gt = self._to_fastq()
-        s = ""+gt_string_get_string(gt)
-        gt_string_delete(gt)
-        return s
+        return gt_string_get_string(gt)[:gt_string_get_length(gt)]
 
     def to_sequence(self):
         cdef gt_string* gt = self._to_sequence()
-        s = ""+gt_string_get_string(gt)
-        gt_string_delete(gt)
-        return s
-
-
-    cdef gt_string* _to_map(self):
-        cdef gt_string* s = gt_string_new(512)
-        cdef gt_output_map_attributes* attr = gt_output_map_attributes_new()
-        gt_output_map_sprint_template(s,self.template, attr)
+        return gt_string_get_string(gt)[:gt_string_get_length(gt)]
+
+    def to_map_view(self):
+        """Like to_map(), but returns a read-only memoryview of the
+        serialization buffer of this template. The view keeps its buffer,
+        the next serialization uses a new one while the view is in use"""
+        self._to_map()
+        return self.buffer._view()
+
+    def to_fasta_view(self):
+        """Like to_fasta(), see to_map_view()"""
+        self._to_fasta()
+        return self.buffer._view()
+
+    def to_fastq_view(self):
+        """Like to_fastq(), see to_map_view()"""
+        self._to_fastq()
+        return self.buffer._view()
+
+    def to_sequence_view(self):
+        """Like to_sequence(), see to_map_view()"""
+        self._to_sequence()
+        return self.buffer._view()
+
+    cdef gt_string* _buffer(self):
+        """Return the cleared serialization buffer. The buffer is
+        replaced if views of the previous serialization are in use"""
+        if self.buffer is None or self.buffer.exports > 0:
+            self.buffer = _string_buffer(512)
+        else:
+            gt_string_clear(self.buffer.string)
+        return self.buffer.string
+
+    cdef _TemplateFields _fields(self):
+        """Return the export counter of the native template"""
+        if self.fields is None:
+            self.fields = _TemplateFields()
+        return self.fields
+
+    cdef _release(self):
+        """Delete the native template, unless views of its
+        fields are in use. The views keep it then"""
+        if self.fields is not None and self.fields.exports > 0:
+            self.fields.template = self.template
+            self.fields = None
+        else:
+            gt_template_delete(self.template)
+        self.template = NULL
+
+    cdef _detach(self, bool copy):
+        """Move on to a new native template if views of the fields are
+        in use, the views keep the previous one. The content is copied
+        to the new template if copy is true"""
+        cdef gt_template* template
+        if self.fields is None or self.fields.exports == 0:
+            return
+        template = gt_template_new()
+        if copy:
+            gt_template_copy(template, self.template, True, True)
+        self._release()
+        self.template = template
+
+    cdef gt_string* _strip(self, gt_string* s):
+        """Remove the line end of a serialized template"""
         gt_string_set_length(s, gt_string_get_length(s)-1)
         gt_string_append_eos(s)
-        gt_output_map_attributes_delete(attr)
         return s
 
+    cdef gt_string* _to_map(self):
+        cdef gt_string* s = self._buffer()
+        gt_output_map_sprint_template(s,self.template, _map_attributes)
+        return self._strip(s)
+
     cdef gt_string* _to_fasta(self):
-        cdef gt_string* s = gt_string_new(512)
-        cdef gt_output_fasta_attributes* attr = gt_output_fasta_attributes_new()
-        gt_output_fasta_attributes_set_format(attr, F_FASTA)
-        gt_output_fasta_sprint_template(s,self.template, attr)
-        gt_string_set_length(s, gt_string_get_length(s)-1)
-        gt_string_append_eos(s)
-        gt_output_fasta_attributes_delete(attr)
-        return s
+        cdef gt_string* s = self._buffer()
+        gt_output_fasta_sprint_template(s,self.template, _fasta_attributes)
+        return self._strip(s)
 
     cdef gt_string* _to_fastq(self):
-        cdef gt_string* s = gt_string_new(512)
-        cdef gt_output_fasta_attributes* attr = gt_output_fasta_attributes_new()
-        gt_output_fasta_sprint_template(s,self.template, attr)
-        gt_string_set_length(s, gt_string_get_length(s)-1)
-        gt_string_append_eos(s)
-        gt_output_fasta_attributes_delete(attr)
-        return s
+        cdef gt_string* s = self._buffer()
+        gt_output_fasta_sprint_template(s,self.template, _fastq_attributes)
+        return self._strip(s)
 
     cdef gt_string* _to_sequence(self):
         if gt_template_has_qualities(self.template):
@@ -872,7 +2147,7 @@ cdef class Template:
     cpdef merge(self, Template other):
         """Merge the other template into this one"""
         cdef gt_template* tmpl = gt_template_union_template_mmaps(self.template, other.template)
-        gt_template_delete(self.template)
+        self._release()
         self.template = tmpl
 
     cpdef get_pair(self):
@@ -905,6 +2180,7 @@ cdef class Template:
         return -1
 
     cpdef parse(self, char* string):
+        self._detach(False)
         gt_input_map_parse_template(string, self.template)
         return self
 
@@ -6,36 +6,272 @@
 
 
 bool gt_input_file_has_qualities(gt_input_file* file){
-  return (file->file_format == FASTA && file->fasta_type.fasta_format == F_FASTQ) || (file->file_format == MAP && file->map_type.contains_qualities);
+  return (file->file_format == FASTA && file->fasta_type.fasta_format == F_FASTQ) || (file->file_format == MAP && file->map_type.contains_qualities) || (file->file_format == GTB && file->gtb_type.contains_qualities) || file->file_format == BAM;
 }
 
+/*
+ * Write the uncompressed content of the file to the file descriptor.
+ * BGZF blocks are inflated with the given number of threads (0 for the default).
+ * Returns false if the content could not be written completely
+ */
+bool gt_inflate_to_fd(char* file_name, int fd, uint64_t threads){
+  gt_input_file* input_file = gt_input_file_open(file_name, false);
+  if(threads > 0){
+    gt_input_file_set_threads(input_file, threads);
+  }
+  bool ok = true;
+  // the format detection already filled the first buffer
+  uint64_t size = input_file->buffer_size;
+  while(ok && size > 0){
+    uint64_t pos = 0;
+    while(pos < size){
+      ssize_t written = write(fd, input_file->file_buffer+pos, size-pos);
+      if(written < 0 && errno == EINTR) continue;
+      if(written <= 0){
+        ok = false;
+        break;
+      }
+      pos += written;
+    }
+    if(ok){
+      size = gt_input_file_fill_buffer(input_file);
+    }
+  }
+  // corrupt or truncated content ends like EOF
+  if(input_file->error) ok = false;
+  gt_input_file_close(input_file);
+  return ok;
+}
 
-void gt_write_stream(gt_output_file* output, gt_input_file** inputs, uint64_t num_inputs, bool append_extra, bool clean_id, bool interleave, uint64_t threads, bool write_map, bool remove_scores){
-  // prepare attributes
+/*
+ * Encode the SAM content read from in_fd as BAM and write it to out_fd.
+ * BGZF blocks are compressed with the given number of threads (0 for the default).
+ * Records with a mapping quality below min_mapq are skipped.
+ * Returns false if the SAM content is malformed or the BAM could not be written
+ */
+bool gt_sam_to_bam_fd(int in_fd, int out_fd, uint64_t threads, uint64_t min_mapq){
+  FILE* sam_stream = fdopen(dup(in_fd), "r");
+  FILE* bam_stream = fdopen(dup(out_fd), "w");
+  if(sam_stream == NULL || bam_stream == NULL){
+    if(sam_stream != NULL) fclose(sam_stream);
+    if(bam_stream != NULL) fclose(bam_stream);
+    return false;
+  }
+  gt_bam_writer* bam_writer = gt_bam_writer_new(bam_stream, threads > 0 ? threads : GT_BGZF_DEFAULT_THREADS, 6);
+  gt_bam_writer_set_min_mapq(bam_writer, GT_MIN(min_mapq, UINT8_MAX));
+  bool ok = gt_bam_writer_write_sam_stream(bam_writer, sam_stream) == GT_OBW_OK;
+  ok = gt_bam_writer_close(bam_writer) && ok;
+  gt_bam_writer_delete(bam_writer);
+  fclose(sam_stream);
+  ok = (fclose(bam_stream) == 0) && ok;
+  return ok;
+}
 
-  gt_output_fasta_attributes* attributes = 0;
-  gt_output_map_attributes* map_attributes = 0;
-  if(!write_map){
-    attributes = gt_output_fasta_attributes_new();
-    gt_output_fasta_attributes_set_print_extra(attributes, append_extra);
-    gt_output_fasta_attributes_set_print_casava(attributes, !clean_id);
-    // check qualities
-    if(!gt_input_file_has_qualities(inputs[0])){
-      gt_output_fasta_attributes_set_format(attributes, F_FASTA);
+/*
+ * Return true if the two mate files can be read by a paired input, i.e.
+ * both are FASTA/FASTQ files with the same number of lines per record
+ */
+bool gt_input_files_pairable(gt_input_file* end1, gt_input_file* end2){
+  return end1->file_format == FASTA && end2->file_format == FASTA &&
+         end1->fasta_type.fasta_format != F_MULTI_FASTA &&
+         end1->fasta_type.fasta_format == end2->fasta_type.fasta_format;
+}
+
+/*
+ * Parse the next pair of templates from the paired input. Returns
+ * GT_PIF_OK, GT_PIF_EOF or the error code (the error is reported)
+ */
+gt_status gt_paired_input_next(gt_paired_input_file* paired_input, gt_buffered_input_file** buffered_input, gt_template* end1, gt_template* end2, gt_generic_parser_attributes* parser_attributes){
+  gt_status status = gt_paired_input_file_synch_blocks(paired_input, buffered_input[0], buffered_input[1]);
+  if(status == GT_PIF_OK){
+    status = gt_paired_input_file_get_templates(buffered_input[0], buffered_input[1], end1, end2, parser_attributes);
+  }
+  if(status != GT_PIF_OK && status != GT_PIF_EOF){
+    gt_paired_input_file_prompt_error(buffered_input[0], buffered_input[1], end1, end2, status);
+  }
+  return status;
+}
+
+/*
+ * Output attributes of the templates written by gt_write_stream
+ */
+gt_output_fasta_attributes* gt_write_stream_fasta_attributes(gt_input_file* input, bool append_extra, bool clean_id){
+  gt_output_fasta_attributes* attributes = gt_output_fasta_attributes_new();
+  gt_output_fasta_attributes_set_print_extra(attributes, append_extra);
+  gt_output_fasta_attributes_set_print_casava(attributes, !clean_id);
+  // check qualities
+  if(!gt_input_file_has_qualities(input)){
+    gt_output_fasta_attributes_set_format(attributes, F_FASTA);
+  }
+  return attributes;
+}
+gt_output_map_attributes* gt_write_stream_map_attributes(bool append_extra, bool clean_id, bool remove_scores){
+  gt_output_map_attributes* map_attributes = gt_output_map_attributes_new();
+  gt_output_map_attributes_set_print_extra(map_attributes, append_extra);
+  gt_output_map_attributes_set_print_casava(map_attributes, !clean_id);
+  gt_output_map_attributes_set_print_scores(map_attributes, !remove_scores);
+  return map_attributes;
+}
+
+/*
+ * Template filters
+ */
+int64_t gt_template_get_uniq_level(gt_template* template, uint64_t max_level){
+  // same as Template.level(): number of empty strata after the first unique
+  // stratum, -1 if the first mapped stratum is not unique
+  const uint64_t num_counters = gt_template_get_num_counters(template);
+  uint64_t i, j;
+  int64_t level = 0;
+  for(i=0; i<num_counters; i++){
+    const uint64_t counter = gt_template_get_counter(template, i);
+    if(counter == 1){
+      for(j=i+1; j<num_counters; j++){
+        if((uint64_t)level >= max_level) return level;
+        if(gt_template_get_counter(template, j) > 0) return (int64_t)(j-(i+1));
+        level++;
+      }
+      return (int64_t)(num_counters-(i+1));
+    }else if(counter > 1){
+      return -1;
     }
+  }
+  return -1;
+}
+/*
+ * Template filter expressions
+ */
+int64_t gt_template_expression_get_variable(gt_template* template, gt_expression_variable variable){
+  uint64_t num_counters, i;
+  int64_t stratum = -1;
+  switch(variable){
+    case GT_EXPRESSION_MAPPED: return gt_template_is_mapped(template);
+    case GT_EXPRESSION_PAIRED: return gt_template_get_num_blocks(template) > 1;
+    case GT_EXPRESSION_BLOCKS: return gt_template_get_num_blocks(template);
+    case GT_EXPRESSION_NUM_MAPS: return gt_template_get_num_mmaps(template);
+    case GT_EXPRESSION_LENGTH: return gt_template_get_total_length(template);
+    case GT_EXPRESSION_MISMATCHES:
+    case GT_EXPRESSION_MAX_MISMATCHES:
+      // first/last stratum with matches, -1 if unmapped
+      num_counters = gt_template_get_num_counters(template);
+      for(i=0; i<num_counters; i++){
+        if(gt_template_get_counter(template, i) > 0){
+          stratum = i;
+          if(variable == GT_EXPRESSION_MISMATCHES) break;
+        }
+      }
+      return stratum;
+    case GT_EXPRESSION_LEVEL: return gt_template_get_uniq_level(template, UINT64_MAX);
+    case GT_EXPRESSION_MCS: return (int64_t)gt_template_get_mcs(template); // -1 if not set
+    case GT_EXPRESSION_HAS_QUALITIES: return gt_template_has_qualities(template);
+  }
+  return 0;
+}
+bool gt_template_expression_eval(gt_template_expression* expression, gt_template* template){
+  // the code is checked when it is compiled, the stack can not overflow
+  int64_t stack[GT_EXPRESSION_MAX_STACK];
+  int64_t top = -1;
+  uint64_t i;
+  for(i=0; i<expression->length; i++){
+    const gt_expression_instruction* const instruction = expression->code+i;
+    switch(instruction->op){
+      case GT_EXPRESSION_CONST: stack[++top] = instruction->value; break;
+      case GT_EXPRESSION_VARIABLE: stack[++top] = gt_template_expression_get_variable(template, instruction->value); break;
+      case GT_EXPRESSION_LT: --top; stack[top] = stack[top] < stack[top+1]; break;
+      case GT_EXPRESSION_LE: --top; stack[top] = stack[top] <= stack[top+1]; break;
+      case GT_EXPRESSION_GT: --top; stack[top] = stack[top] > stack[top+1]; break;
+      case GT_EXPRESSION_GE: --top; stack[top] = stack[top] >= stack[top+1]; break;
+      case GT_EXPRESSION_EQ: --top; stack[top] = stack[top] == stack[top+1]; break;
+      case GT_EXPRESSION_NE: --top; stack[top] = stack[top] != stack[top+1]; break;
+      case GT_EXPRESSION_AND: --top; stack[top] = stack[top] && stack[top+1]; break;
+      case GT_EXPRESSION_OR: --top; stack[top] = stack[top] || stack[top+1]; break;
+      case GT_EXPRESSION_NOT: stack[top] = !stack[top]; break;
+    }
+  }
+  return top >= 0 && stack[top] != 0;
+}
+
+bool gt_stream_filters_apply(gt_stream_filter* filters, uint64_t num_filters, gt_template* template){
+  uint64_t i;
+  int64_t level;
+  for(i=0; i<num_filters; i++){
+    switch(filters[i].type){
+      case GT_STREAM_FILTER_UNMAPPED:
+        if(gt_template_is_thresholded_mapped(template, filters[i].max_mismatches)) return false;
+        break;
+      case GT_STREAM_FILTER_UNIQUE:
+        level = gt_template_get_uniq_level(template, filters[i].level);
+        if(level <= 0 || level < (int64_t)filters[i].level) return false;
+        break;
+      case GT_STREAM_FILTER_TRIM:
+        gt_template_hard_trim(template, filters[i].left, filters[i].right);
+        break;
+      case GT_STREAM_FILTER_EXPRESSION:
+        if(!gt_template_expression_eval(filters[i].expression, template)) return false;
+        break;
+    }
+  }
+  return true;
+}
+
+static void gt_write_stream_template(gt_buffered_output_file* buffered_output, gt_template* template, bool write_map, bool write_binary,
+    gt_output_map_attributes* map_attributes, gt_output_fasta_attributes* attributes, gt_stream_filter* filters, uint64_t num_filters){
+  if(num_filters > 0 && !gt_stream_filters_apply(filters, num_filters, template)) return;
+  if(write_binary){
+    gt_output_gtb_bofprint_template(buffered_output, template, map_attributes);
+  }else if(write_map){
+    gt_output_map_bofprint_template(buffered_output, template, map_attributes);
   }else{
+    gt_output_fasta_bofprint_template(buffered_output, template, attributes);
+  }
+}
 
-    map_attributes = gt_output_map_attributes_new();
-    gt_output_map_attributes_set_print_extra(map_attributes, append_extra);
-    gt_output_map_attributes_set_print_casava(map_attributes, !clean_id);
-    gt_output_map_attributes_set_print_scores(map_attributes, !remove_scores);
+bool gt_write_stream(gt_output_file* output, gt_input_file** inputs, uint64_t num_inputs, bool append_extra, bool clean_id, bool interleave, uint64_t threads, bool write_map, bool remove_scores, bool write_binary, gt_stream_filter* filters, uint64_t num_filters){
+  // prepare attributes
+  gt_output_fasta_attributes* attributes = 0;
+  gt_output_map_attributes* map_attributes = 0;
+  if(!write_map && !write_binary){
+    attributes = gt_write_stream_fasta_attributes(inputs[0], append_extra, clean_id);
+  }else{
+    map_attributes = gt_write_stream_map_attributes(append_extra, clean_id, remove_scores);
   }
 
   // generic parser attributes
   gt_generic_parser_attributes* parser_attributes = gt_input_generic_parser_attributes_new(false); // do not force pairs
   pthread_mutex_t input_mutex = PTHREAD_MUTEX_INITIALIZER;
+  bool ok = true;
 
-  if(interleave){
+  if(interleave && num_inputs == 2 && gt_input_files_pairable(inputs[0], inputs[1])){
+    // main loop, mate files. Each mate is read by its own reader thread
+    gt_paired_input_file* paired_input = gt_paired_input_file_new(inputs[0], inputs[1], GT_MAX(threads, GT_PIF_DEFAULT_NUM_BLOCKS));
+    #pragma omp parallel num_threads(threads)
+    {
+      gt_buffered_output_file* buffered_output = gt_buffered_output_file_new(output);
+      gt_buffered_input_file* buffered_input[2];
+      buffered_input[0] = gt_buffered_input_file_new(inputs[0]);
+      buffered_input[1] = gt_buffered_input_file_new(inputs[1]);
+      // attache first input to output
+      gt_buffered_input_file_attach_buffered_output(buffered_input[0], buffered_output);
+
+      gt_template* end1 = gt_template_new();
+      gt_template* end2 = gt_template_new();
+      gt_status status;
+      while( (status = gt_paired_input_next(paired_input, buffered_input, end1, end2, parser_attributes)) == GT_PIF_OK ){
+        gt_write_stream_template(buffered_output, end1, write_map, write_binary, map_attributes, attributes, filters, num_filters);
+        gt_write_stream_template(buffered_output, end2, write_map, write_binary, map_attributes, attributes, filters, num_filters);
+      }
+      if(status != GT_PIF_EOF){
+        // stop the readers and the other threads
+        ok = false;
+        gt_paired_input_file_abort(paired_input);
+      }
+      gt_buffered_output_file_close(buffered_output);
+      gt_buffered_input_file_close(buffered_input[0]);
+      gt_buffered_input_file_close(buffered_input[1]);
+      gt_template_delete(end1);
+      gt_template_delete(end2);
+    }
+    gt_paired_input_file_close(paired_input);
+  }else if(interleave){
     // main loop, interleave
     #pragma omp parallel num_threads(threads)
     {
@@ -56,11 +292,7 @@ void gt_write_stream(gt_output_file* output, gt_input_file** inputs, uint64_t nu
       while( gt_input_generic_parser_synch_blocks_a(&input_mutex, buffered_input, num_inputs, parser_attributes) == GT_STATUS_OK ){
         for(i=0; i<num_inputs; i++){
           if( (status = gt_input_generic_parser_get_template(buffered_input[i], template, parser_attributes)) == GT_STATUS_OK){
-            if(write_map){
-              gt_output_map_bofprint_template(buffered_output, template, map_attributes);
-            }else{
-              gt_output_fasta_bofprint_template(buffered_output, template, attributes);
-            }
+            gt_write_stream_template(buffered_output, template, write_map, write_binary, map_attributes, attributes, filters, num_filters);
             c++;
           }
         }
@@ -98,11 +330,7 @@ void gt_write_stream(gt_output_file* output, gt_input_file** inputs, uint64_t nu
         // read
         while( gt_input_generic_parser_synch_blocks_a(&input_mutex, buffered_input, 1, parser_attributes) == GT_STATUS_OK ){
           if( (status = gt_input_generic_parser_get_template(current_input, template, parser_attributes)) == GT_STATUS_OK){
-            if(write_map){
-              gt_output_map_bofprint_template(buffered_output, template, map_attributes);
-            }else{
-              gt_output_fasta_bofprint_template(buffered_output, template, attributes);
-            }
+            gt_write_stream_template(buffered_output, template, write_map, write_binary, map_attributes, attributes, filters, num_filters);
             c++;
           }
         }
@@ -115,13 +343,93 @@ void gt_write_stream(gt_output_file* output, gt_input_file** inputs, uint64_t nu
     }
 
   }
+  register uint64_t k = 0;
+  for(k=0; k<num_inputs; k++){
+    // corrupt or truncated inputs end like EOF
+    if(inputs[k]->error) ok = false;
+  }
   if(attributes != NULL) gt_output_fasta_attributes_delete(attributes);
   if(map_attributes != NULL)gt_output_map_attributes_delete(map_attributes);
   gt_input_generic_parser_attributes_delete(parser_attributes);
+  return ok;
 
   // register uint64_t i = 0;
   // for(i=0; i<num_inputs; i++){
   //     gt_input_file_close(inputs[i]);
   // }
   // gt_output_file_close(output);
-}
\ No newline at end of file
+}
+
+/*
+ * Read up to length bytes of the raw content. Returns the number of bytes read,
+ * less than length only at the end of the content or on errors
+ */
+uint64_t gt_write_stream_read_raw(int fd, char* buffer, uint64_t length){
+  uint64_t pos = 0;
+  while(pos < length){
+    ssize_t num_read = read(fd, buffer+pos, length-pos);
+    if(num_read < 0 && errno == EINTR) continue;
+    if(num_read <= 0) break;
+    pos += num_read;
+  }
+  return pos;
+}
+
+/*
+ * Compare the printed content to the next bytes of the raw content
+ * and clear it
+ */
+bool gt_write_stream_compare_raw(int fd, gt_string* raw, gt_string* printed){
+  const uint64_t length = gt_string_get_length(printed);
+  gt_string_resize(raw, length+1);
+  const bool match = gt_write_stream_read_raw(fd, gt_string_get_string(raw), length) == length &&
+      memcmp(gt_string_get_string(raw), gt_string_get_string(printed), length) == 0;
+  gt_string_clear(printed);
+  return match;
+}
+
+bool gt_write_stream_matches(gt_input_file* input, int raw_fd, uint64_t num_templates, bool append_extra, bool clean_id, bool write_map){
+  gt_output_fasta_attributes* attributes = 0;
+  gt_output_map_attributes* map_attributes = 0;
+  if(!write_map){
+    attributes = gt_write_stream_fasta_attributes(input, append_extra, clean_id);
+  }else{
+    map_attributes = gt_write_stream_map_attributes(append_extra, clean_id, false);
+  }
+  gt_generic_parser_attributes* parser_attributes = gt_input_generic_parser_attributes_new(false); // do not force pairs
+  gt_buffered_input_file* buffered_input = gt_buffered_input_file_new(input);
+  gt_template* template = gt_template_new();
+  gt_string* printed = gt_string_new(GT_WRITE_STREAM_COMPARE_SIZE);
+  gt_string* raw = gt_string_new(GT_WRITE_STREAM_COMPARE_SIZE);
+  uint64_t c = 0;
+  gt_status status = GT_IGP_OK;
+  bool match = true;
+  while(match && (num_templates == 0 || c < num_templates) &&
+        (status = gt_input_generic_parser_get_template(buffered_input, template, parser_attributes)) == GT_IGP_OK){
+    if(write_map){
+      gt_output_map_sprint_template(printed, template, map_attributes);
+    }else{
+      gt_output_fasta_sprint_template(printed, template, attributes);
+    }
+    c++;
+    // compare in chunks, the printed templates are not kept
+    if(gt_string_get_length(printed) >= GT_WRITE_STREAM_COMPARE_SIZE){
+      match = gt_write_stream_compare_raw(raw_fd, raw, printed);
+    }
+  }
+  if(match){
+    match = c > 0 && (status == GT_IGP_OK || status == GT_IGP_EOF) && !input->error && gt_write_stream_compare_raw(raw_fd, raw, printed);
+    // the whole input was parsed, nothing else can follow in the raw content
+    if(match && status == GT_IGP_EOF){
+      match = gt_write_stream_read_raw(raw_fd, gt_string_get_string(raw), 1) == 0;
+    }
+  }
+  gt_string_delete(raw);
+  gt_string_delete(printed);
+  gt_template_delete(template);
+  gt_buffered_input_file_close(buffered_input);
+  if(attributes != NULL) gt_output_fasta_attributes_delete(attributes);
+  if(map_attributes != NULL) gt_output_map_attributes_delete(map_attributes);
+  gt_input_generic_parser_attributes_delete(parser_attributes);
+  return match;
+}
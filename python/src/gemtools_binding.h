@@ -6,6 +6,56 @@
 
 #define get_mapq(score) ((int)floor((sqrt(score)/256.0)*255))
 
-void gt_write_stream(gt_output_file* output, gt_input_file** inputs, uint64_t num_inputs, bool append_extra, bool clean_id, bool interleave, uint64_t threads, bool write_map, bool remove_scores);
+// Chunk size of the comparison of printed templates and raw content (passthrough)
+#define GT_WRITE_STREAM_COMPARE_SIZE (1<<20)
+
+/*
+ * Template filter expressions. The expressions are compiled to stack
+ * code in python (see gem.filter.expression) and evaluated per template
+ */
+#define GT_EXPRESSION_MAX_STACK 64
+typedef enum {
+  GT_EXPRESSION_CONST, GT_EXPRESSION_VARIABLE,
+  GT_EXPRESSION_LT, GT_EXPRESSION_LE, GT_EXPRESSION_GT, GT_EXPRESSION_GE, GT_EXPRESSION_EQ, GT_EXPRESSION_NE,
+  GT_EXPRESSION_AND, GT_EXPRESSION_OR, GT_EXPRESSION_NOT
+} gt_expression_op;
+typedef enum {
+  GT_EXPRESSION_MAPPED, GT_EXPRESSION_PAIRED, GT_EXPRESSION_BLOCKS, GT_EXPRESSION_NUM_MAPS, GT_EXPRESSION_LENGTH,
+  GT_EXPRESSION_MISMATCHES, GT_EXPRESSION_MAX_MISMATCHES, GT_EXPRESSION_LEVEL, GT_EXPRESSION_MCS, GT_EXPRESSION_HAS_QUALITIES
+} gt_expression_variable;
+typedef struct {
+  gt_expression_op op;
+  int64_t value; // the constant or the variable
+} gt_expression_instruction;
+typedef struct {
+  gt_expression_instruction* code;
+  uint64_t length;
+} gt_template_expression;
+
+int64_t gt_template_expression_get_variable(gt_template* template, gt_expression_variable variable);
+bool gt_template_expression_eval(gt_template_expression* expression, gt_template* template);
+
+/*
+ * Template filters gt_write_stream applies to every template (see the
+ * TemplateFilter classes). A template is written if it passes all filters
+ */
+typedef enum { GT_STREAM_FILTER_UNMAPPED, GT_STREAM_FILTER_UNIQUE, GT_STREAM_FILTER_TRIM, GT_STREAM_FILTER_EXPRESSION } gt_stream_filter_type;
+typedef struct {
+  gt_stream_filter_type type;
+  uint64_t max_mismatches; // GT_STREAM_FILTER_UNMAPPED
+  uint64_t level;          // GT_STREAM_FILTER_UNIQUE
+  uint64_t left;           // GT_STREAM_FILTER_TRIM
+  uint64_t right;
+  gt_template_expression* expression; // GT_STREAM_FILTER_EXPRESSION
+} gt_stream_filter;
+
+int64_t gt_template_get_uniq_level(gt_template* template, uint64_t max_level);
+bool gt_stream_filters_apply(gt_stream_filter* filters, uint64_t num_filters, gt_template* template);
+bool gt_write_stream(gt_output_file* output, gt_input_file** inputs, uint64_t num_inputs, bool append_extra, bool clean_id, bool interleave, uint64_t threads, bool write_map, bool remove_scores, bool write_binary, gt_stream_filter* filters, uint64_t num_filters);
+bool gt_write_stream_matches(gt_input_file* input, int raw_fd, uint64_t num_templates, bool append_extra, bool clean_id, bool write_map);
 bool gt_input_file_has_qualities(gt_input_file* file);
+bool gt_input_files_pairable(gt_input_file* end1, gt_input_file* end2);
+gt_status gt_paired_input_next(gt_paired_input_file* paired_input, gt_buffered_input_file** buffered_input, gt_template* end1, gt_template* end2, gt_generic_parser_attributes* parser_attributes);
+bool gt_inflate_to_fd(char* file_name, int fd, uint64_t threads);
+bool gt_sam_to_bam_fd(int in_fd, int out_fd, uint64_t threads, uint64_t min_mapq);
 #endif /* GEMTOOLS_BINDING_H */
@@ -0,0 +1,232 @@
+#!/usr/bin/env python
+import os
+import shutil
+import subprocess
+import threading
+import time
+from nose.tools import with_setup
+
+import gem.utils
+import gem.executors as executors
+from gem.pipeline import MappingPipeline, PipelineStep, PipelineError, StepScheduler, pipeline_from_dict
+from testfiles import testfiles
+
+results_dir = None
+
+
+def setup_func():
+    global results_dir
+    results_dir = "test_results"
+    if not os.path.exists(results_dir):
+        os.mkdir(results_dir)
+    results_dir = os.path.abspath(results_dir)
+
+
+def cleanup():
+    shutil.rmtree(results_dir, ignore_errors=True)
+
+
+class WriteStep(PipelineStep):
+    """Step that writes its pid and copies the test mapping
+    with an external process"""
+    def run(self):
+        if self.configuration["fail"]:
+            raise PipelineError("Step failed")
+        with open(self._final_output() + ".pid", "w") as f:
+            f.write(str(os.getpid()))
+        p = gem.utils.run_tools([["cat", "-"]], input=testfiles["test.map"], output=self._final_output())
+        p.wait()
+
+
+def _pipeline(fail=False):
+    pipeline = MappingPipeline()
+    pipeline.name = "test"
+    pipeline.output_dir = results_dir
+    step = WriteStep("write")
+    step.prepare(0, pipeline, {"fail": fail})
+    pipeline.steps.append(step)
+    return pipeline
+
+
+def _pid(step):
+    with open(step.files()[0] + ".pid") as f:
+        return int(f.read())
+
+
+@with_setup(setup_func, cleanup)
+def test_pipeline_serialization_round_trip():
+    pipeline = _pipeline()
+    pipeline.threads = 3
+    restored = pipeline_from_dict(pipeline.to_dict())
+    assert restored.threads == 3
+    assert restored.output_dir == results_dir
+    step = restored.steps[0]
+    assert isinstance(step, WriteStep)
+    assert step.pipeline is restored
+    assert step.configuration.fail is False
+    assert step.files() == pipeline.steps[0].files()
+
+
+@with_setup(setup_func, cleanup)
+def test_process_executor_runs_step_in_worker():
+    pipeline = _pipeline()
+    executor = executors.ProcessExecutor(os.path.join(results_dir, "jobs"))
+    scheduler = StepScheduler(pipeline, [0], executor=executor)
+    assert scheduler.run()
+    executor.close()
+    step = pipeline.steps[0]
+    assert _pid(step) != os.getpid()
+    assert step.is_done()
+    assert os.path.getsize(step.files()[0]) == os.path.getsize(testfiles["test.map"])
+    assert [p["command"] for p in scheduler.timeline[0]["processes"]] == ["cat"]
+    assert os.listdir(os.path.join(results_dir, "jobs")) == []
+
+
+@with_setup(setup_func, cleanup)
+def test_queue_executor_runs_step_in_worker():
+    pipeline = _pipeline()
+    queue = os.path.join(results_dir, "queue")
+    executor = executors.QueueExecutor(queue, workers=1)
+    try:
+        assert StepScheduler(pipeline, [0], executor=executor).run()
+    finally:
+        executor.close()
+    assert _pid(pipeline.steps[0]) != os.getpid()
+    for d in ["pending", "running", "done"]:
+        assert os.listdir(os.path.join(queue, d)) == []
+
+
+@with_setup(setup_func, cleanup)
+def test_executor_reports_failed_step():
+    pipeline = _pipeline(fail=True)
+    executor = executors.ProcessExecutor()
+    scheduler = StepScheduler(pipeline, [0], executor=executor)
+    assert not scheduler.run()
+    executor.close()
+    assert not os.path.exists(executor.directory)
+    assert not os.path.exists(pipeline.steps[0].files()[0])
+
+
+class SleepStep(PipelineStep):
+    """Step that writes the pid of a long running tool and waits for it"""
+    def run(self):
+        p = subprocess.Popen(["sleep", "60"])
+        with open(self._final_output() + ".pid", "w") as f:
+            f.write(str(p.pid))
+        p.wait()
+
+
+def _running(pid):
+    try:
+        with open("/proc/%d/stat" % (pid)) as f:
+            return f.read().split(")")[-1].split()[0] != "Z"
+    except IOError:
+        return False
+
+
+@with_setup(setup_func, cleanup)
+def test_closing_process_executor_stops_the_tools_of_the_worker():
+    pipeline = MappingPipeline()
+    pipeline.name = "test"
+    pipeline.output_dir = results_dir
+    step = SleepStep("sleep")
+    step.prepare(0, pipeline, {})
+    pipeline.steps.append(step)
+    executor = executors.ProcessExecutor()
+    errors = []
+
+    def run():
+        try:
+            executor.run(step)
+        except PipelineError, e:
+            errors.append(e)
+    runner = threading.Thread(target=run)
+    runner.start()
+    pid_file = step.files()[0] + ".pid"
+    for i in range(100):
+        if os.path.exists(pid_file) and os.path.getsize(pid_file) > 0:
+            break
+        time.sleep(0.1)
+    pid = _pid(step)
+    assert _running(pid)
+    executor.close()
+    runner.join(10)
+    assert len(errors) == 1
+    for i in range(50):
+        if not _running(pid):
+            break
+        time.sleep(0.1)
+    assert not _running(pid)
+
+
+@with_setup(setup_func, cleanup)
+def test_executor_rejects_attributes_that_can_not_be_serialized():
+    pipeline = _pipeline()
+    pipeline.unknown = object()
+    executor = executors.ProcessExecutor()
+    try:
+        executor.run(pipeline.steps[0])
+        assert False
+    except PipelineError, e:
+        assert "serialize" in e.message
+    finally:
+        executor.close()
+
+
+def _parent(pid):
+    with open("/proc/%d/stat" % (pid)) as f:
+        return int(f.read().split(")")[-1].split()[1])
+
+
+@with_setup(setup_func, cleanup)
+def test_job_fails_when_its_queue_worker_dies():
+    pipeline = MappingPipeline()
+    pipeline.name = "test"
+    pipeline.output_dir = results_dir
+    step = SleepStep("sleep")
+    step.prepare(0, pipeline, {})
+    pipeline.steps.append(step)
+    queue = os.path.join(results_dir, "queue")
+    # the second worker keeps the queue alive
+    executor = executors.QueueExecutor(queue, workers=2)
+    executor.heartbeat_interval = 0.2
+    executor.heartbeat_timeout = 2
+    errors = []
+
+    def run():
+        try:
+            executor.run(step)
+        except PipelineError, e:
+            errors.append(e)
+    runner = threading.Thread(target=run)
+    runner.start()
+    pid_file = step.files()[0] + ".pid"
+    for i in range(100):
+        if os.path.exists(pid_file) and os.path.getsize(pid_file) > 0:
+            break
+        time.sleep(0.1)
+    pid = _pid(step)
+    try:
+        os.kill(_parent(pid), 9)
+        runner.join(20)
+        assert not runner.is_alive()
+        assert len(errors) == 1
+        assert "heartbeat" in errors[0].message
+        for d in ["pending", "running"]:
+            assert os.listdir(os.path.join(queue, d)) == []
+    finally:
+        os.kill(pid, 9)
+        executor.close()
+
+
+@with_setup(setup_func, cleanup)
+def test_job_that_is_never_started_times_out():
+    pipeline = _pipeline()
+    queue = os.path.join(results_dir, "queue")
+    executor = executors.QueueExecutor(queue, workers=0, timeout=1)
+    try:
+        assert not StepScheduler(pipeline, [0], executor=executor).run()
+    finally:
+        executor.close()
+    for d in ["pending", "running", "done"]:
+        assert os.listdir(os.path.join(queue, d)) == []
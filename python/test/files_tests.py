@@ -1,6 +1,8 @@
 from gem import files
 from gem import filter
+import gem.gemtools as gt
 from testfiles import testfiles
+from nose.tools import assert_raises
 
 __author__ = 'Thasso Griebel <thasso.griebel@gmail.com>'
 
@@ -86,3 +88,309 @@ def test_open_gzip_file():
     assert lines is not None
     assert len(lines) == 40000, len(lines)
 
+
+
+def test_open_bgzf_file():
+    with open(testfiles["reads_1.fastq"]) as f:
+        content = f.read()
+    reader = files.open_gzip(testfiles["reads_1_bgzf.fastq.gz"], threads=4)
+    assert reader.read() == content
+    reader = files.open_gzip(testfiles["reads_1.fastq.gz"])
+    assert reader.read() == content
+
+
+def test_iterating_bgzf_input_file():
+    plain = [t.to_sequence() for t in gt.InputFile(testfiles["reads_1.fastq"])]
+    bgzf = [t.to_sequence() for t in gt.InputFile(testfiles["reads_1_bgzf.fastq.gz"], threads=3)]
+    assert len(bgzf) == 10000, len(bgzf)
+    assert bgzf == plain
+
+
+def test_inflate_stops_on_closed_reader():
+    inflater = files.Inflater(testfiles["reads_1_bgzf.fastq.gz"], threads=2)
+    inflater.stdout.readline()
+    inflater.stdout.close()
+    assert inflater.wait() == 1
+
+
+def test_corrupt_compressed_input_is_reported():
+    import os
+    import shutil
+    import tempfile
+    tmpdir = tempfile.mkdtemp()
+    try:
+        with open(testfiles["reads_1_bgzf.fastq.gz"], "rb") as f:
+            bgzf = f.read()
+        with open(testfiles["reads_1.fastq.gz"], "rb") as f:
+            gzip = f.read()
+        middle = len(bgzf) / 2
+        damaged = {
+            "truncated_bgzf.fastq.gz": bgzf[:middle],
+            "corrupt_bgzf.fastq.gz": bgzf[:middle] + "".join(chr(ord(c) ^ 0xff) for c in bgzf[middle:middle + 64]) + bgzf[middle + 64:],
+            "truncated.fastq.gz": gzip[:len(gzip) / 2],
+        }
+        for name, content in damaged.items():
+            path = os.path.join(tmpdir, name)
+            with open(path, "wb") as f:
+                f.write(content)
+            # the templates before the damage are read, then the error is raised
+            templates = []
+            input = gt.InputFile(path)
+            with assert_raises(IOError):
+                for t in input:
+                    templates.append(t.to_sequence())
+            assert 0 < len(templates) < 10000, (name, len(templates))
+            batches = []
+            with assert_raises(IOError):
+                for batch in gt.InputFile(path).batches(100):
+                    batches.append(len(batch))
+            assert 0 < sum(batches) < 10000, (name, sum(batches))
+            inflater = files.Inflater(path)
+            assert len(inflater.stdout.read()) > 0
+            assert inflater.wait() == 1, name
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_truncated_codec_input_is_reported():
+    import os
+    import shutil
+    import tempfile
+    import subprocess
+    import gem
+    tmpdir = tempfile.mkdtemp()
+    try:
+        for name in ["zstd", "lz4"]:
+            codec = files.get_codec(name)
+            if not codec.available():
+                continue
+            target = files.compressed_file_name(os.path.join(tmpdir, "reads.fastq"), name)
+            with open(testfiles["reads_1.fastq"]) as input:
+                with open(target, 'wb') as output:
+                    assert subprocess.call(gem._compressor(threads=1, codec=name), stdin=input, stdout=output) == 0
+            # a reader that stops early does not fail
+            stream = files.open_file(target)
+            stream.readline()
+            stream.close()
+            with open(target, "rb") as f:
+                content = f.read()
+            with open(target, "wb") as f:
+                f.write(content[:len(content) / 2])
+            # the templates before the damage are read, then the error is raised
+            templates = []
+            input = gt.InputFile(target)
+            with assert_raises(IOError):
+                for t in input:
+                    templates.append(t.to_sequence())
+            assert len(templates) < 10000, (name, len(templates))
+            # the error is reported once
+            input.close()
+            with assert_raises(IOError):
+                list(gt.InputFile(target).batches(100))
+            with assert_raises(IOError):
+                files.open_file(target).read()
+            with assert_raises(IOError):
+                list(files.open_file(target))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_native_pipes_are_not_kept_open_by_forked_processes():
+    import time
+    import multiprocessing as mp
+    inflater = files.Inflater(testfiles["reads_1_bgzf.fastq.gz"])
+    encoder = files.BamEncoder(files.open_file(testfiles["reads_1.sam"]))
+    # forked while the content is written
+    sleeper = mp.Process(target=time.sleep, args=(10,))
+    sleeper.start()
+    try:
+        for stream in (inflater.stdout, encoder.stdout):
+            start = time.time()
+            assert len(stream.read()) > 0
+            assert time.time() - start < 5
+        assert inflater.wait() == 0
+        assert encoder.wait() == 0
+    finally:
+        sleeper.terminate()
+        sleeper.join()
+
+
+def test_bgzf_compressor_writes_template_index():
+    import os
+    import zlib
+    import shutil
+    import tempfile
+    import subprocess
+    import gem
+    tmpdir = tempfile.mkdtemp()
+    try:
+        source = testfiles["chr21_mapping_initial.map"]
+        target = os.path.join(tmpdir, "out.map.gz")
+        index_file = files.template_index_file(target)
+        compressor = gem._compressor(threads=2, index=index_file)
+        assert os.path.basename(compressor[0]) == "gt.bgzip", compressor
+        with open(source) as input:
+            with open(target, 'wb') as output:
+                assert subprocess.call(compressor + ["-k", "100"], stdin=input, stdout=output) == 0
+        with open(source) as f:
+            lines = f.readlines()
+        # readable with gzip and as BGZF input
+        assert files.open_gzip(target).read() == "".join(lines)
+        assert sum(1 for t in gt.InputFile(target)) == 2000
+        index = files.read_template_index(index_file)
+        assert index.virtual
+        assert index.interval == 100
+        assert index.num_templates == 2000
+        assert index.matches(target)
+        assert len(index.offsets) == 20
+        # every offset points to the start of its template
+        with open(target, 'rb') as f:
+            for i, offset in enumerate(index.offsets):
+                f.seek(offset >> 16)
+                block = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(f.read(1 << 16))
+                assert block[offset & 0xffff:].startswith(lines[i * 100][:64]), i
+        assert index.ranges(3) == [(0, 600, index.offsets[0]),
+                                   (600, 1300, index.offsets[6]),
+                                   (1300, 2000, index.offsets[13])]
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_iterating_bam_input_file():
+    sam = [t.to_map() for t in gt.InputFile(testfiles["reads_1.sam"])]
+    bam = [t.to_map() for t in files.open(testfiles["reads_1.bam"])]
+    assert len(bam) == 10000, len(bam)
+    assert bam == sam
+
+
+def test_truncated_bam_input_is_reported():
+    import os
+    import struct
+    import shutil
+    import tempfile
+    tmpdir = tempfile.mkdtemp()
+    try:
+        with open(testfiles["reads_1.bam"], "rb") as f:
+            bam = f.read()
+        # the BGZF block boundaries, the last block is the EOF marker
+        boundaries = [0]
+        while boundaries[-1] < len(bam):
+            boundaries.append(boundaries[-1] + struct.unpack("<H", bam[boundaries[-1] + 16:boundaries[-1] + 18])[0] + 1)
+        assert bam[boundaries[-2]:] == "1f8b08040000000000ff0600424302001b0003000000000000000000".decode("hex")
+        middle = boundaries[len(boundaries) / 2]
+        truncated = {
+            "no_eof_marker.bam": (bam[:boundaries[-2]], 10000),
+            "block_boundary.bam": (bam[:middle], None),
+            "middle_of_block.bam": (bam[:middle + 1000], None),
+        }
+        for name, (content, num_templates) in truncated.items():
+            path = os.path.join(tmpdir, name)
+            with open(path, "wb") as f:
+                f.write(content)
+            templates = []
+            with assert_raises(IOError):
+                for t in gt.InputFile(path):
+                    templates.append(t)
+            if num_templates is not None:
+                assert len(templates) == num_templates, (name, len(templates))
+            else:
+                assert 0 < len(templates) < 10000, (name, len(templates))
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_sam2bam_native_encoding():
+    import os
+    import shutil
+    import tempfile
+    import gem
+    tmpdir = tempfile.mkdtemp()
+    try:
+        sam = [t.to_map() for t in gt.InputFile(testfiles["reads_1.sam"])]
+        target = os.path.join(tmpdir, "reads_1.bam")
+        bam = gem.sam2bam(files.open(testfiles["reads_1.sam"]), target)
+        with open(target, 'rb') as f:
+            assert f.read(4) == "\x1f\x8b\x08\x04"
+        assert [t.to_map() for t in bam] == sam
+        # streamed BAM content
+        bam = gem.sam2bam(files.open(testfiles["reads_1.sam"]))
+        assert bam.filename is None
+        assert [t.to_map() for t in bam] == sam
+        # mapping quality filter
+        bam = gem.sam2bam(files.open(testfiles["reads_1.sam"]), target, mapq=255)
+        assert 0 < sum(1 for t in bam) < 10000
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+def test_bam_encoder_fails_on_undeclared_references():
+    encoder = files.BamEncoder(files.open_file(testfiles["subsetBWA.sam"]))
+    encoder.stdout.read()
+    assert encoder.wait() == 1
+
+
+def test_codec_registry():
+    assert files.get_codec(False) is None
+    assert files.get_codec(True).name == "gzip"
+    assert files.codec_for("file.map.zst").name == "zstd"
+    assert files.codec_for("file.map.lz4").name == "lz4"
+    assert files.codec_for("file.map") is None
+    assert files.compressed_file_name("file.map", "zstd") == "file.map.zst"
+    assert files.compressed_file_name("file.map.gz", True) == "file.map.gz"
+    assert files.compressed_file_name("file.map", False) == "file.map"
+    assert files._guess_type("file.fastq.lz4") == "fastq"
+    assert_raises(ValueError, files.get_codec, "unknown")
+
+
+def test_gzip_fallback_removes_stale_template_index():
+    import os
+    import shutil
+    import tempfile
+    tmpdir = tempfile.mkdtemp()
+    which = files.which
+    try:
+        index = os.path.join(tmpdir, "out.map.gz.idx")
+        with open(index, "w") as f:
+            f.write("stale")
+        gzip = files.get_codec(True)
+        assert "-x" in gzip.compressor(index=index)
+        assert os.path.exists(index)
+        # without gt.bgzip the output can not be indexed
+        files.which = lambda name: None
+        assert gzip.compressor(index=index) == ["gzip", "-"]
+        assert not os.path.exists(index)
+    finally:
+        files.which = which
+        shutil.rmtree(tmpdir)
+
+
+def test_fast_codecs_round_trip():
+    import os
+    import shutil
+    import tempfile
+    import subprocess
+    import gem
+    tmpdir = tempfile.mkdtemp()
+    try:
+        source = testfiles["chr21_mapping_initial.map"]
+        with open(source) as f:
+            content = f.read()
+        plain = [t.to_map() for t in gt.InputFile(source)]
+        for name in ["zstd", "lz4"]:
+            codec = files.get_codec(name)
+            if not codec.available():
+                continue
+            target = files.compressed_file_name(os.path.join(tmpdir, "out.map"), name)
+            with open(source) as input:
+                with open(target, 'wb') as output:
+                    assert subprocess.call(gem._compressor(threads=2, codec=name), stdin=input, stdout=output) == 0
+            assert files.open_file(target).read() == content
+            input = gt.InputFile(target)
+            assert not input.mmap_file
+            assert [t.to_map() for t in input] == plain
+            input.close()
+            # placeholders are resolved with the codec thread format
+            tools = gem.utils._resolve_threads([gem._compressor(threads=gem.utils.Threads(1), codec=name)], 4)
+            assert tools[0][-1] == "-"
+    finally:
+        shutil.rmtree(tmpdir)
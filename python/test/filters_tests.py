@@ -80,3 +80,55 @@ def test_only_split_maps_filter_paired_compress_file():
         lines = f.readlines()
         print lines
         assert len(lines) == 3
+
+
+def test_filter_expressions():
+    source = testfiles["chr21_mapping_initial.map"]
+    templates = list(t.to_map() for t in gt.InputFile(source))
+
+    def selected(text):
+        return [t.to_map() for t in filter.select(gt.InputFile(source), text)]
+
+    def reference(predicate):
+        return [m for m in templates if predicate(gt.Template().parse(m))]
+
+    expected = reference(lambda t: t.get_min_mismatches() >= 0 and t.get_min_mismatches() <= 1 and t.num_maps < 3 and t.length >= 50)
+    assert 0 < len(expected) < len(templates)
+    assert selected("mapped and mismatches<=1 and num_maps < 3 and length >= 50") == expected
+    expected = reference(lambda t: not (t.get_min_mismatches() == 0 or t.get_min_mismatches() == -1))
+    assert 0 < len(expected) < len(templates)
+    assert selected("not (mismatches == 0 or mismatches == -1)") == expected
+    assert selected("level >= 2") == [t.to_map() for t in gt.unique(gt.InputFile(source), 2)]
+    assert selected("not mapped or mapped") == templates
+    assert selected("0") == []
+
+
+@with_setup(setup_func, cleanup)
+def test_filter_expressions_in_stream_writer():
+    source = testfiles["chr21_mapping_initial.map"]
+    text = "mapped and (mismatches == 1 or num_maps >= 2) and not paired"
+    target = results_dir + "/selected.map"
+    filter.select(gt.InputFile(source), text).write_stream(gt.OutputFile(target), write_map=True, threads=2)
+    expected = [t.to_map() for t in filter.select(gt.InputFile(source), text)]
+    assert expected
+    with open(target) as f:
+        assert [l.rstrip("\n") for l in f] == expected
+
+
+def test_invalid_filter_expressions():
+    for text in ["", "mapped and", "length >", "(mapped", "mapped )", "unknown > 1",
+                 "length >= - 1x", "mapped && length", "and mapped", "length > 1 > 2"]:
+        try:
+            filter.expression(text)
+        except ValueError:
+            pass
+        else:
+            assert False, text
+    assert filter.expression("length>-1").text == "length>-1"
+    for code in [[], [(gt.EXPRESSION_OPERATIONS["and"], 0)], [(gt.EXPRESSION_OPERATIONS["variable"], 1000)]]:
+        try:
+            gt.filter_expression(code)
+        except ValueError:
+            pass
+        else:
+            assert False, code
@@ -2,6 +2,7 @@
 import gem.utils as gu
 import gem.gemtools as gt
 from testfiles import testfiles
+from nose.tools import assert_raises
 import tempfile
 import os
 import sys
@@ -75,3 +76,158 @@ def test_pipeline_map_input():
     assert p.wait() == 0
     assert lines == 10
 
+
+
+def test_process_input_passes_clean_input_through():
+    reads = testfiles["reads_1.fastq"]
+    # the reads are printed unchanged unless the ids are cleaned
+    assert gt.InputFile(reads).passthrough()
+    assert gt.InputFile(testfiles["reads_1.fastq.gz"]).passthrough()
+    assert not gt.InputFile(reads).passthrough(write_map=True)
+    assert not gt.InputFile(open(reads)).passthrough()
+    for input in [gt.InputFile(reads), gt.InputFile(testfiles["reads_1.fastq.gz"])]:
+        # passing through is opt-in
+        assert not gu.ProcessInput(input, clean_id=False).passthrough
+        process_input = gu.ProcessInput(input, clean_id=False, passthrough=True)
+        assert process_input.passthrough
+        p = gu.run_tools([["cat", "-"]], input=input, passthrough=True)
+        content = p.stdout.read()
+        assert p.wait() == 0
+        assert p.processes[0].input_writer.thread is None
+        assert content == open(reads).read()
+
+
+def test_strict_passthrough_checks_the_whole_file():
+    with open(testfiles["reads_1.fastq"]) as f:
+        lines = f.readlines()
+    # the first reads already use the /1 /2 pair encoding
+    for i in range(0, 20000, 4):
+        lines[i] = lines[i].split(" ")[0].rstrip() + "/1\n"
+    (fd, reads) = tempfile.mkstemp(suffix=".fastq")
+    os.close(fd)
+    try:
+        with open(reads, 'w') as f:
+            f.write("".join(lines))
+        input = gt.InputFile(reads)
+        assert not input.passthrough(clean_id=True)
+        # only the sample is compared
+        assert input.passthrough(clean_id=True, strict=False)
+        assert not input.passthrough(clean_id=True, strict=False, sample=6000)
+        assert not gu.ProcessInput(input, passthrough=True).passthrough
+        assert gu.ProcessInput(input, passthrough=True, strict_passthrough=False).passthrough
+        assert input.passthrough()
+    finally:
+        os.remove(reads)
+    assert gt.InputFile(testfiles["reads_1.fastq.gz"]).passthrough()
+
+
+def test_process_input_reports_truncated_input_that_is_passed_through():
+    import subprocess
+    import gem
+    import gem.files
+    if not gem.files.get_codec("zstd").available():
+        return
+    (fd, reads) = tempfile.mkstemp(suffix=".fastq.zst")
+    os.close(fd)
+    try:
+        with open(reads, 'wb') as output:
+            with open(testfiles["reads_1.fastq"]) as input:
+                assert subprocess.call(gem._compressor(threads=1, codec="zstd"), stdin=input, stdout=output) == 0
+        process_input = gu.ProcessInput(gt.InputFile(reads), clean_id=False, passthrough=True)
+        assert process_input.passthrough
+        # the file is damaged after it was checked
+        with open(reads, 'rb') as f:
+            content = f.read()
+        with open(reads, 'wb') as f:
+            f.write(content[:len(content) / 2])
+        p = gu.ProcessWrapper()
+        p.submit(["cat", "-"], input=process_input)
+        p.start()
+        assert len(p.stdout.read()) > 0
+        assert_raises(gu.ProcessError, p.processes[0].wait)
+        assert process_input.wait() != 0
+    finally:
+        os.remove(reads)
+
+
+def test_process_input_rewrites_input_that_needs_changes():
+    input = gt.InputFile(testfiles["reads_1.fastq"])
+    expected = [t.to_sequence() for t in gt.InputFile(testfiles["reads_1.fastq"])]
+    # a fasta consumer needs the qualities dropped
+    assert not input.passthrough(write_map=True)
+    p = gu.run_tools([["cat", "-"]], input=input, write_map=True)
+    lines = p.stdout.readlines()
+    assert p.wait() == 0
+    assert p.processes[0].input_writer.thread is not None
+    assert len(lines) == len(expected)
+
+
+def test_allocate_threads_by_cost():
+    assert gu.allocate_threads(8, [8, 2]) == [6, 2]
+    assert gu.allocate_threads(10, [8, 1, 1]) == [6, 2, 2]
+    assert gu.allocate_threads(7, [1, 1, 1]) == [3, 2, 2]
+    assert gu.allocate_threads(2, [8, 2, 1]) == [1, 1, 1]
+    assert gu.allocate_threads(4, []) == []
+    for threads in range(1, 33):
+        assert sum(gu.allocate_threads(threads, [8, 1, 2])) == max(threads, 3)
+
+
+def test_available_cpus_honours_limits():
+    assert 1 <= gu.available_cpus() <= gu.mp.cpu_count()
+    assert gu.thread_budget(gu.available_cpus() + 10) == gu.available_cpus()
+    assert gu.thread_budget(0) == 1
+
+
+def test_run_tools_resolves_thread_placeholders():
+    budget = gu.thread_budget(2)
+    p = gu.run_tools([["echo", gu.Threads(1)], ["cat", "-"]], input=None, threads=2)
+    assert int(p.stdout.readline().strip()) == budget
+    assert p.wait() == 0
+
+
+def test_process_accounting_records_usage():
+    with gu.ProcessAccounting("test") as accounting:
+        assert gu.current_accounting() is accounting
+        p = gu.run_tools([["cat", "-"], ["wc", "-l"]], input=test_mapping)
+        assert int(p.stdout.readline().strip()) == 10
+        assert p.wait() == 0
+    assert gu.current_accounting() is None
+    assert [u["command"] for u in accounting.processes] == ["cat", "wc"]
+    size = os.path.getsize(test_mapping)
+    cat = accounting.processes[0]
+    assert cat["exit_value"] == 0
+    assert cat["read_bytes_total"] >= size
+    assert cat["write_bytes_total"] >= size
+    assert cat["max_rss"] > 0
+    assert cat["wall"] >= 0
+    assert accounting.totals()["write_bytes_total"] >= size
+    # the bytes moved through stdin and stdout are counted on the pipes
+    wc = accounting.processes[1]
+    assert cat["stdin_bytes"] == size
+    assert cat["stdout_bytes"] == size
+    assert wc["stdin_bytes"] == size
+    assert wc["stdout_bytes"] == len("10\n")
+    assert accounting.totals()["stdin_bytes"] == 2 * size
+
+
+def test_process_accounting_counts_piped_input_and_file_output():
+    target = tempfile.NamedTemporaryFile(suffix=".map", delete=False).name
+    try:
+        with gu.ProcessAccounting("test") as accounting:
+            p = gu.run_tools([["cat", "-"]], input=gt.InputFile(test_mapping), output=target, write_map=True)
+            assert p.wait() == 0
+        cat = accounting.processes[0]
+        assert cat["stdin_bytes"] == os.path.getsize(target)
+        assert cat["stdout_bytes"] == os.path.getsize(target)
+        assert os.path.getsize(target) > 0
+    finally:
+        os.remove(target)
+
+
+def test_failing_process_terminates_pipe():
+    p = gu.run_tools([["yes"], ["cat", "-"], ["sh", "-c", "echo failed >&2; exit 3"]], input=None)
+    assert p.wait() == 3
+    assert p.failed.commands[0] == "sh"
+    assert isinstance(p.error, gu.ProcessError)
+    assert p.processes[0].killed
+    assert p.processes[0].exit_value != 0
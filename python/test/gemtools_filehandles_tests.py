@@ -1,11 +1,12 @@
 #!/usr/bin/env python
 
 import subprocess
+import sys
 import gem.gemtools as gt
 from testfiles import testfiles
 import os
 import shutil
-from nose.tools import with_setup
+from nose.tools import with_setup, assert_raises
 from gem import files
 
 results_dir = None
@@ -81,6 +82,15 @@ def test_iterating_interleaved():
     assert count == 20000, count
 
 
+def test_iterating_interleaved_pairs():
+    infile_1 = gt.InputFile(testfiles["reads_1.fastq"])
+    infile_2 = gt.InputFile(testfiles["reads_2.fastq"])
+    tags = [t.tag for t in gt.interleave([infile_1, infile_2])]
+    assert len(tags) == 20000, len(tags)
+    assert tags[0::2] == tags[1::2]
+    assert tags[0::2] == [t.tag for t in gt.InputFile(testfiles["reads_1.fastq"])]
+
+
 def test_one_level_filter_chain():
     infile = gt.InputFile(testfiles["bedconvert.map"])
     filtered = gt.filter(infile, gt.filter_unique(2))
@@ -131,3 +141,447 @@ def test_writing_interleaved_file():
         lines = f.readlines()
         assert len(lines) == 80000
 
+
+
+@with_setup(setup_func, cleanup)
+def test_writing_interleaved_file_with_threads():
+    source1 = files.open(testfiles["reads_1.fastq"])
+    source2 = files.open(testfiles["reads_2.fastq"])
+    target = results_dir + "/write_interleaved.fastq"
+    out = gt.OutputFile(target)
+    gt.interleave([source1, source2]).write_stream(out, write_map=False, threads=4)
+    expected = [t.tag for t in gt.interleave([files.open(testfiles["reads_1.fastq"]), files.open(testfiles["reads_2.fastq"])])]
+    assert [t.tag for t in gt.InputFile(target)] == expected
+
+
+def _write_mate(target, lines):
+    with open(target, "w") as f:
+        f.writelines(lines)
+    return target
+
+
+@with_setup(setup_func, cleanup)
+def test_interleaving_mismatching_ids_fails():
+    with open(testfiles["reads_2.fastq"]) as f:
+        lines = f.readlines()
+    # same number of reads, but the first read is moved to the end
+    shifted = _write_mate(results_dir + "/shifted_2.fastq", lines[4:] + lines[:4])
+    assert_raises(ValueError, list, gt.interleave([files.open(testfiles["reads_1.fastq"]), files.open(shifted)]))
+    out = gt.OutputFile(results_dir + "/write_interleaved.fastq")
+    assert_raises(IOError, gt.interleave([files.open(testfiles["reads_1.fastq"]), files.open(shifted)]).write_stream, out, write_map=False)
+
+
+@with_setup(setup_func, cleanup)
+def test_interleaving_different_number_of_reads_fails():
+    with open(testfiles["reads_2.fastq"]) as f:
+        lines = f.readlines()
+    truncated = _write_mate(results_dir + "/truncated_2.fastq", lines[:-4])
+    assert_raises(ValueError, list, gt.interleave([files.open(testfiles["reads_1.fastq"]), files.open(truncated)]))
+
+
+def test_memory_mapped_input_matches_read_input():
+    for name in ["reads_1.fastq", "test.map", "reads_1.sam"]:
+        mapped = [t.to_map() for t in gt.InputFile(testfiles[name])]
+        read = [t.to_map() for t in gt.InputFile(testfiles[name], mmap_file=False)]
+        assert len(mapped) > 0
+        assert mapped == read, name
+
+
+@with_setup(setup_func, cleanup)
+def test_memory_mapped_input_with_dos_line_ends():
+    with open(testfiles["reads_1.fastq"]) as f:
+        content = f.read()
+    target = results_dir + "/dos.fastq"
+    with open(target, "w") as f:
+        f.write(content.replace("\n", "\r\n").rstrip("\r\n"))
+    expected = [t.to_sequence() for t in gt.InputFile(testfiles["reads_1.fastq"])]
+    assert [t.to_sequence() for t in gt.InputFile(target)] == expected
+
+
+def _mapped_kb(file_name):
+    """Return the resident kB of the mappings of the
+    file in this process"""
+    rss = 0
+    mapped = False
+    with open("/proc/self/smaps") as f:
+        for line in f:
+            fields = line.split()
+            if "-" in fields[0] and ":" not in fields[0]:
+                mapped = fields[-1] == file_name
+            elif mapped and fields[0] == "Rss:":
+                rss += int(fields[1])
+    return rss
+
+
+@with_setup(setup_func, cleanup)
+def test_memory_mapped_input_releases_parsed_pages():
+    with open(testfiles["reads_1.fastq"]) as f:
+        content = f.read()
+    target = results_dir + "/large.fastq"
+    copies = (64 * 1024 * 1024) / len(content) + 1
+    with open(target, "w") as f:
+        for i in range(copies):
+            f.write(content)
+    input = gt.InputFile(target)
+    assert sum(1 for t in input) == copies * 10000
+    # the whole file was read through the mapping
+    rss = _mapped_kb(os.path.realpath(target))
+    input.close()
+    assert rss < 32 * 1024, rss
+
+
+@with_setup(setup_func, cleanup)
+def test_binary_output_round_trip():
+    for name in ["test.map", "paired_w_splitmap.map", "paired_sm_mm.map", "chr21_mapping_initial_split.map"]:
+        expected = [t.to_map() for t in gt.InputFile(testfiles[name])]
+        target = results_dir + "/round_trip.gtb"
+        gt.InputFile(testfiles[name]).write_stream(gt.OutputFile(target, binary=True), write_map=True, threads=2)
+        assert open(target).read(3) == "GTB"
+        assert [t.to_map() for t in gt.InputFile(target)] == expected, name
+        assert [t.to_map() for t in gt.InputFile(target, mmap_file=False)] == expected, name
+        # reads are packed and positions delta encoded, the binary file is smaller
+        text = results_dir + "/round_trip.map"
+        gt.InputFile(testfiles[name]).write_stream(gt.OutputFile(text), write_map=True)
+        assert os.path.getsize(target) < os.path.getsize(text), name
+
+
+@with_setup(setup_func, cleanup)
+def test_binary_output_keeps_reads_with_other_bases():
+    source = results_dir + "/bases.map"
+    reads = ["ACGTNACGTACGTACGTACGTACGTACGTACGTNNACGTACGTAC", "NNNNNNNNNN", "acgtACGTnACGT", "ACGTTGCA", "A", ""]
+    with open(source, "w") as f:
+        for i, read in enumerate(reads):
+            f.write("r%d\t%s\t%s\t0\t-\n" % (i, read, "I" * len(read)))
+    target = results_dir + "/bases.gtb"
+    gt.InputFile(source).write_stream(gt.OutputFile(target, binary=True), write_map=True)
+    assert [t.to_map() for t in gt.InputFile(target)] == [t.to_map() for t in gt.InputFile(source)]
+    assert [t.read for t in gt.InputFile(target)] == reads
+
+
+@with_setup(setup_func, cleanup)
+def test_binary_output_of_single_templates():
+    target = results_dir + "/templates.gtb"
+    out = gt.OutputFile(target, binary=True)
+    expected = []
+    for tmpl in gt.InputFile(testfiles["paired_w_splitmap.map"]):
+        out.write(tmpl)
+        expected.append(tmpl.to_map())
+    out.close()
+    assert [t.to_map() for t in gt.InputFile(target)] == expected
+
+
+@with_setup(setup_func, cleanup)
+def test_indexed_output_template_ranges():
+    expected = [t.to_map() for t in gt.InputFile(testfiles["chr21_mapping_initial.map"])]
+    target = results_dir + "/indexed.map"
+    gt.InputFile(testfiles["chr21_mapping_initial.map"]).write_stream(gt.OutputFile(target, index=True, index_interval=100), write_map=True, threads=2)
+    index = files.read_template_index(files.template_index_file(target))
+    assert not index.virtual
+    assert index.num_templates == 2000
+    assert len(index.offsets) == 20
+    for mmap_file in [True, False]:
+        for start, end in [(0, 150), (150, 1000), (1999, None), (None, 50), (2000, None), (2100, None), (700, 700)]:
+            templates = [t.to_map() for t in gt.InputFile(target, mmap_file=mmap_file, start=start, end=end)]
+            assert templates == expected[start:end], (mmap_file, start, end)
+
+
+@with_setup(setup_func, cleanup)
+def test_index_templates_of_bgzf_file():
+    import gem
+    source = testfiles["chr21_mapping_initial.map"]
+    expected = [t.to_map() for t in gt.InputFile(source)]
+    target = results_dir + "/indexed.map.gz"
+    with open(source) as input:
+        with open(target, 'wb') as output:
+            assert subprocess.call(gem._compressor(threads=2), stdin=input, stdout=output) == 0
+    with assert_raises(IOError):
+        sum(1 for t in gt.InputFile(target, start=10))
+    index_file = files.index_templates(target, interval=64)
+    index = files.read_template_index(index_file)
+    assert index.virtual
+    assert index.num_templates == 2000
+    for start, end in [(0, 64), (100, 1500), (1990, None), (640, 640)]:
+        templates = [t.to_map() for t in gt.InputFile(target, start=start, end=end)]
+        assert templates == expected[start:end], (start, end)
+
+
+@with_setup(setup_func, cleanup)
+def test_compressed_indexed_output():
+    import gzip
+    source = testfiles["chr21_mapping_initial.map"]
+    expected = [t.to_map() for t in gt.InputFile(source)]
+    target = results_dir + "/indexed.map.gz"
+    gt.InputFile(source).write_stream(gt.OutputFile(target, index=True, index_interval=100, compress=True, threads=2), write_map=True, threads=2)
+    gt.InputFile(source).write_stream(gt.OutputFile(results_dir + "/plain.map"), write_map=True)
+    with open(results_dir + "/plain.map") as f:
+        assert gzip.open(target).read() == f.read()
+    index = files.read_template_index(files.template_index_file(target))
+    assert index.virtual
+    assert index.num_templates == 2000
+    assert len(index.offsets) == 20
+    assert [t.to_map() for t in gt.InputFile(target)] == expected
+    for start, end in [(0, 150), (150, 1000), (1999, None), (None, 50), (2000, None)]:
+        templates = [t.to_map() for t in gt.InputFile(target, start=start, end=end)]
+        assert templates == expected[start:end], (start, end)
+    with assert_raises(ValueError):
+        gt.OutputFile(results_dir + "/binary.gtb", binary=True, compress=True)
+
+
+@with_setup(setup_func, cleanup)
+def test_stale_template_index_is_rejected():
+    target = results_dir + "/indexed.map"
+    gt.InputFile(testfiles["chr21_mapping_initial.map"]).write_stream(gt.OutputFile(target, index=True, index_interval=100), write_map=True)
+    index_file = files.template_index_file(target)
+    assert files.read_template_index(index_file).matches(target)
+    assert sum(1 for t in gt.InputFile(target, start=100, end=200)) == 100
+    # rewrite the file without updating its index
+    with open(testfiles["paired_w_splitmap.map"]) as source:
+        content = source.read()
+    with open(target, 'w') as f:
+        f.write(content)
+    assert not files.read_template_index(index_file).matches(target)
+    with assert_raises(IOError):
+        gt.InputFile(target, start=1)
+    # the file can change after the input file was created
+    input = gt.InputFile(testfiles["chr21_mapping_initial.map"])
+    input.write_stream(gt.OutputFile(target, index=True, index_interval=100), write_map=True)
+    ranged = gt.InputFile(target, end=10)
+    with open(target, 'a') as f:
+        f.write(content)
+    with assert_raises(IOError):
+        sum(1 for t in ranged)
+
+
+@with_setup(setup_func, cleanup)
+def test_template_index_rejects_same_size_rewrite_within_a_second():
+    import string
+    target = results_dir + "/indexed.map"
+    index_file = files.template_index_file(target)
+    while True:
+        gt.InputFile(testfiles["chr21_mapping_initial.map"]).write_stream(gt.OutputFile(target, index=True, index_interval=100), write_map=True)
+        indexed = os.stat(target)
+        # same size, different content, written within the same second
+        with open(target) as f:
+            content = f.read().translate(string.maketrans("ACGT", "TGCA"))
+        with open(target, 'w') as f:
+            f.write(content)
+        rewritten = os.stat(target)
+        if int(rewritten.st_mtime) == int(indexed.st_mtime):
+            break
+    assert rewritten.st_size == indexed.st_size
+    assert not files.read_template_index(index_file).matches(target)
+    with assert_raises(IOError):
+        gt.InputFile(target, start=1)
+
+
+def test_indexed_output_restrictions():
+    with assert_raises(ValueError):
+        gt.OutputFile(sys.stdout, index=True)
+    with assert_raises(ValueError):
+        gt.InputFile(sys.stdin, start=10)
+    # ranges are checked when the input file is created
+    with assert_raises(ValueError):
+        gt.InputFile(testfiles["reads_1.fastq"], start=10)
+    with assert_raises(ValueError):
+        gt.InputFile(testfiles["reads_1.fastq.gz"], end=10)
+    with assert_raises(ValueError):
+        gt.InputFile(testfiles["chr21_mapping_initial.map"], start=-1)
+    with assert_raises(ValueError):
+        gt.InputFile(testfiles["chr21_mapping_initial.map"], start=10, end=5)
+
+
+def test_batched_input_file():
+    expected = [t.to_sequence() for t in gt.InputFile(testfiles["reads_1.fastq"])]
+    templates = []
+    sizes = []
+    for batch in gt.InputFile(testfiles["reads_1.fastq"]).batches(333):
+        sizes.append(len(batch))
+        assert batch.tags == [t.tag for t in batch]
+        assert batch.reads == [t.read for t in batch]
+        assert batch.qualities == [t.qualities for t in batch]
+        assert batch.lengths == [len(t.read) for t in batch]
+        assert batch[-1].tag == batch.tags[-1]
+        templates.extend(t.to_sequence() for t in batch)
+    assert templates == expected
+    assert sizes == [333] * 30 + [10], sizes
+    with assert_raises(ValueError):
+        gt.InputFile(testfiles["reads_1.fastq"]).batches(0)
+
+
+def test_batched_interleaved_and_cat():
+    def sources():
+        return [gt.InputFile(testfiles["reads_1.fastq"]), gt.InputFile(testfiles["reads_2.fastq"])]
+    for size in [1, 7, 1000]:
+        expected = [t.to_sequence() for t in gt.interleave(sources())]
+        batched = [t.to_sequence() for batch in gt.interleave(sources()).batches(size) for t in batch]
+        assert batched == expected, size
+    expected = [t.to_sequence() for t in gt.cat(sources())]
+    assert [t.to_sequence() for batch in gt.cat(sources()).batches(999) for t in batch] == expected
+
+
+def test_batched_filter():
+    source = testfiles["chr21_mapping_initial.map"]
+    expected = [t.to_map() for t in gt.trim(gt.unique(gt.InputFile(source), 2), left=5, right=5)]
+    assert 0 < len(expected) < 2000
+    for size in [1, 64, 5000]:
+        filtered = gt.trim(gt.unique(gt.InputFile(source), 2), left=5, right=5)
+        assert [t.to_map() for batch in filtered.batches(size) for t in batch] == expected, size
+
+
+def test_batched_template_iterator():
+    expected = [t.to_map() for t in gt.InputFile(testfiles["paired_w_splitmap.map"])]
+    templates = (t for t in gt.InputFile(testfiles["paired_w_splitmap.map"]))
+    assert [t.to_map() for batch in gt.batched(templates, 3) for t in batch] == expected
+
+
+def test_prefetched_input_matches_parsed_input():
+    for name in ["reads_1.fastq", "reads_1.fastq.gz", "chr21_mapping_initial.map", "paired_w_splitmap.map", "20t.map.gz"]:
+        expected = [t.to_map() for t in gt.InputFile(testfiles[name])]
+        for prefetch in [1, 4]:
+            prefetched = [t.to_map() for t in gt.InputFile(testfiles[name], prefetch=prefetch)]
+            assert prefetched == expected, (name, prefetch)
+    p = subprocess.Popen(["cat", testfiles["reads_1.fastq"]], stdout=subprocess.PIPE)
+    expected = [t.to_sequence() for t in gt.InputFile(testfiles["reads_1.fastq"])]
+    assert [t.to_sequence() for t in files.open(p.stdout, prefetch=2)] == expected
+    p.wait()
+
+
+def test_prefetched_input_closed_early():
+    infile = gt.InputFile(testfiles["chr21_mapping_initial.map"], prefetch=2)
+    tags = []
+    for tmpl in infile:
+        tags.append(tmpl.tag)
+        if len(tags) == 10:
+            break
+    infile.close()
+    assert tags == [t.tag for t in gt.InputFile(testfiles["chr21_mapping_initial.map"])][:10]
+    assert infile.clone().prefetch == 2
+
+
+def test_reiterating_input_file_releases_the_previous_iteration():
+    def open_files():
+        return len(os.listdir("/proc/self/fd"))
+
+    def threads():
+        return len(os.listdir("/proc/self/task"))
+    for name in ["chr21_mapping_initial.map", "reads_1.fastq.gz", "reads_1.fastq"]:
+        expected = [t.to_map() for t in gt.InputFile(testfiles[name])]
+        for prefetch in [0, 2]:
+            (fds, tasks) = (open_files(), threads())
+            infile = gt.InputFile(testfiles[name], prefetch=prefetch)
+            assert [t.to_map() for t in infile] == expected
+            for i in range(5):
+                # partial reads start over
+                iterator = iter(infile)
+                assert next(iterator).to_map() == expected[0]
+                assert [t.to_map() for t in infile] == expected
+            # close only releases the last iteration
+            infile.close()
+            assert open_files() == fds, (name, prefetch)
+            assert threads() == tasks, (name, prefetch)
+
+
+def test_prefetched_batches_and_arrays():
+    source = testfiles["chr21_mapping_initial.map"]
+    expected = [t.to_map() for t in gt.InputFile(source)]
+    for size in [1, 333, 5000]:
+        batched = [t.to_map() for batch in gt.InputFile(source, prefetch=3).batches(size) for t in batch]
+        assert batched == expected, size
+    import numpy
+    plain = list(gt.InputFile(source).to_arrays(fields=["read", "position"], chunk_size=100))
+    prefetched = list(gt.InputFile(source, prefetch=2).to_arrays(fields=["read", "position"], chunk_size=100))
+    assert len(plain) == len(prefetched)
+    for a, b in zip(plain, prefetched):
+        assert numpy.array_equal(a["read"], b["read"])
+        assert numpy.array_equal(a["position"], b["position"])
+
+
+def test_map_arrays():
+    import numpy
+    source = testfiles["chr21_mapping_initial.map"]
+    expected = []
+    with open(source) as f:
+        for i, line in enumerate(f):
+            maps = line.rstrip("\n").split("\t")[4]
+            if maps != "-":
+                expected.extend((i, m.split(":")[0], m.split(":")[1], int(m.split(":")[2])) for m in maps.split(","))
+    assert len(expected) > 2000
+    arrays = gt.InputFile(source).to_arrays()
+    chunks = list(arrays)
+    assert len(chunks) == 1
+    chunk = chunks[0]
+    assert set(chunk.keys()) == set(name for name, dtype in gt.MAP_ARRAY_FIELDS)
+    assert len(chunk["read"]) == len(expected)
+    assert chunk["position"].dtype == numpy.int64
+    names = [arrays.sequences[i] for i in chunk["seq"]]
+    strands = ["-" if s else "+" for s in chunk["strand"]]
+    assert zip(chunk["read"].tolist(), names, strands, chunk["position"].tolist()) == expected
+    assert (chunk["block"] == 0).all()
+    assert (chunk["blocks"] == 1).all()
+    assert (chunk["length"] > 0).all()
+    # the first template maps once with one mismatch
+    assert chunk["distance"][0] == 1
+    assert chunk["stratum_count"][0] == 1
+    assert (chunk["stratum_count"] >= 1).all()
+
+    small = list(gt.InputFile(source).to_arrays(fields=["read", "position"], chunk_size=7))
+    assert all(len(c["read"]) == 7 for c in small[:-1])
+    assert set(small[0].keys()) == set(["read", "position"])
+    assert numpy.concatenate([c["position"] for c in small]).tolist() == chunk["position"].tolist()
+    assert numpy.concatenate([c["read"] for c in small]).tolist() == chunk["read"].tolist()
+    with assert_raises(ValueError):
+        gt.InputFile(source).to_arrays(fields=["unknown"])
+
+
+def test_map_arrays_of_paired_and_split_maps():
+    chunk = list(gt.InputFile(testfiles["paired_w_splitmap.map"]).to_arrays())[0]
+    expected = [(b, m.num_maps) for t in gt.InputFile(testfiles["paired_w_splitmap.map"]) for b, m in enumerate(t.alignments())]
+    assert [(b, list(chunk["block"]).count(b)) for b, num_maps in expected] == expected
+    assert (chunk["read"] == 0).all()
+    assert chunk["blocks"].max() > 1
+
+
+class PythonUnique(gt.filter_unique):
+    """Subclasses of the built-in filters are applied in Python"""
+    pass
+
+
+@with_setup(setup_func, cleanup)
+def test_native_filter_write_stream():
+    def written(source, write_map, threads=1):
+        target = results_dir + "/filtered.out"
+        source.write_stream(gt.OutputFile(target), write_map=write_map, threads=threads)
+        with open(target) as f:
+            return f.read()
+
+    def expected(source, write_map):
+        target = results_dir + "/expected.out"
+        out = gt.OutputFile(target)
+        for t in source:
+            out.write(t, write_map=write_map)
+        out.close()
+        with open(target) as f:
+            return f.read()
+
+    mapped = testfiles["chr21_mapping_initial.map"]
+    chains = [
+        lambda: gt.unmapped(gt.InputFile(mapped)),
+        lambda: gt.unique(gt.InputFile(mapped), 2),
+        lambda: gt.trim(gt.unique(gt.InputFile(mapped), 2), left=5, right=10),
+        lambda: gt.filter(gt.InputFile(mapped), [gt.filter_trim(left=3), gt.filter_unique(1)]),
+    ]
+    for chain in chains:
+        for write_map in [True, False]:
+            content = expected(chain(), write_map)
+            assert content
+            assert written(chain(), write_map, threads=4) == content
+    # the reference of the python chain, same as the native unique(2)
+    assert written(gt.unique(gt.InputFile(mapped), 2), True) == written(gt.filter(gt.InputFile(mapped), PythonUnique(2)), True)
+
+    def mates():
+        return gt.interleave([gt.InputFile(testfiles["reads_1.fastq"]), gt.InputFile(testfiles["reads_2.fastq"])])
+    content = expected(gt.trim(mates(), left=10, right=5), False)
+    assert written(gt.trim(mates(), left=10, right=5), False, threads=4) == content
+    with open(testfiles["reads_1.fastq"]) as f:
+        read = f.readlines()[1].strip()
+    assert content.split("\n")[1] == read[10:-5]
@@ -206,3 +206,86 @@ def test_template_merge():
 ##             print mis
 ##     assert c == 4
 ###
+
+
+def test_template_views():
+    template = gt.Template()
+    template.parse("A/1\tACGT\t#$%&\t0\t-\n")
+    assert template.read_view.tobytes() == "ACGT"
+    assert template.qualities_view.tobytes() == "#$%&"
+    assert template.tag_view.tobytes() == "A"
+    assert template.read_view.readonly
+    assert len(template.read_view) == 4
+    template.parse("B/1\tAAA\t\t0\t-\n")
+    assert template.qualities_view.tobytes() == ""
+    assert template.to_map_view().tobytes() == template.to_map()
+    assert template.to_fasta_view().tobytes() == ">B/1\nAAA"
+    template.parse("B/1\tAAA\t###\t0\t-\n")
+    assert template.to_fastq_view().tobytes() == template.to_fastq() == "@B/1\nAAA\n+\n###"
+    assert template.to_sequence_view().tobytes() == template.to_sequence()
+
+
+def test_serialization_views_keep_their_buffer():
+    template = gt.Template()
+    template.parse("A/1\tACGT\t#$%&\t0\t-\n")
+    view = template.to_map_view()
+    expected = template.to_map()
+    # reserializing, also into a larger buffer, does not touch the view
+    assert template.to_fastq() == "@A/1\nACGT\n+\n#$%&"
+    template.parse("A/1\t" + "ACGT" * 1000 + "\t\t0\t-\n")
+    template.to_map_view()
+    assert view.tobytes() == expected
+    del template
+    assert view.tobytes() == expected
+
+
+def test_field_views_keep_their_template():
+    template = gt.Template()
+    template.parse("A/1\tACGT\t#$%&\t0\t-\n")
+    view = template.read_view
+    part = view[1:3]
+    tag = template.tag_view
+    template.tag = "B" * 1000
+    assert tag.tobytes() == "A"
+    assert template.read == "ACGT"
+    template.parse("B/1\tAAA\t###\t0\t-\n")
+    assert template.read_view.tobytes() == "AAA"
+    template.merge(template)
+    del template
+    assert view.tobytes() == "ACGT"
+    assert part.tobytes() == "CG"
+
+
+def test_field_views_taken_while_iterating():
+    expected = [(t.tag, t.read, t.qualities) for t in gt.InputFile(testfiles["test.map"])]
+    for prefetch in [0, 2]:
+        views = []
+        for t in gt.InputFile(testfiles["test.map"], prefetch=prefetch):
+            v = t.read_view
+            views.append((t.tag_view, v, t.qualities_view))
+        assert [(a.tobytes(), b.tobytes(), c.tobytes()) for (a, b, c) in views] == expected, prefetch
+    views = []
+    for batch in gt.batched(gt.InputFile(testfiles["test.map"]), 3):
+        views.extend([t.read_view for t in batch])
+    assert [v.tobytes() for v in views] == [e[1] for e in expected]
+
+
+def test_template_views_of_input_file():
+    expected = [(t.tag, t.read, t.qualities, t.to_map()) for t in gt.InputFile(testfiles["test.map"])]
+    views = [(t.tag_view.tobytes(), t.read_view.tobytes(), t.qualities_view.tobytes(), t.to_map_view().tobytes()) for t in gt.InputFile(testfiles["test.map"])]
+    assert views == expected
+
+
+def test_output_file_format():
+    import os
+    out = gt.OutputFile(open(os.devnull, "w"), clean_id=True)
+    template = gt.Template()
+    template.parse("A/1\tAAA\t###\t0\t-\n")
+    assert out.format(template).tobytes() == "A/1\tAAA\t###\t0\t-\n"
+    assert out.format(template, write_map=False).tobytes() == "@A/1\nAAA\n+\n###\n"
+    view = out.format(template)
+    out.format(template, write_map=False)
+    assert view.tobytes() == "A/1\tAAA\t###\t0\t-\n"
+    out.add_filter(gt.filter_unmapped(0))
+    template.parse("A/1\tAAA\t###\t1\tchr1:+:10:3\n")
+    assert out.format(template) is None
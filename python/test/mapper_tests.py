@@ -124,6 +124,15 @@ def test_sync_mapper_execution():
     assert sum(1 for x in mappings) == 10000
 
 
+@with_setup(setup_func, cleanup)
+def test_chunked_mapper_execution():
+    input = files.open(testfiles["reads_1.fastq"])
+    mappings = gem.mapper(input, index, results_dir + "/result.mapping", chunks=3)
+    assert mappings.filename == results_dir + "/result.mapping"
+    assert [x.tag for x in mappings] == [x.tag for x in files.open(testfiles["reads_1.fastq"])]
+    assert [f for f in os.listdir(results_dir) if f.startswith(".chunks")] == []
+
+
 @with_setup(setup_func, cleanup)
 def test_async_mapper_execution():
     input = files.open(testfiles["reads_1.fastq"])
@@ -0,0 +1,344 @@
+import json
+import os
+import shutil
+import threading
+from nose.tools import with_setup
+
+import gem.utils
+
+from gem.pipeline import MappingPipeline, PipelineStep, PipelineError, StepScheduler
+from testfiles import testfiles
+
+results_dir = None
+
+
+def setup_func():
+    global results_dir
+    results_dir = "test_results"
+    if not os.path.exists(results_dir):
+        os.mkdir(results_dir)
+    results_dir = os.path.abspath(results_dir)
+
+
+def cleanup():
+    shutil.rmtree(results_dir, ignore_errors=True)
+
+
+class RecordingStep(PipelineStep):
+    """Step that records its execution and writes an empty output"""
+    def __init__(self, name, log, wait_for=None, fail=False, **kwargs):
+        PipelineStep.__init__(self, name, **kwargs)
+        self.log = log
+        self.started = threading.Event()
+        self.wait_for = wait_for
+        self.fail = fail
+        self.concurrent = None
+
+    def run(self):
+        self.log.append((self.name, self.threads))
+        self.started.set()
+        if self.wait_for is not None:
+            self.wait_for.started.wait(5)
+            self.concurrent = self.wait_for.started.is_set()
+        if self.fail:
+            raise PipelineError("Step failed")
+        open(self._final_output(), "w").close()
+
+
+def _pipeline(threads=4, parallel_steps=1):
+    pipeline = MappingPipeline()
+    pipeline.name = "test"
+    pipeline.output_dir = results_dir
+    pipeline.threads = threads
+    pipeline.parallel_steps = parallel_steps
+    return pipeline
+
+
+def _add(pipeline, step):
+    step.prepare(len(pipeline.steps), pipeline, {})
+    pipeline.steps.append(step)
+    return step
+
+
+@with_setup(setup_func, cleanup)
+def test_scheduler_runs_independent_steps_concurrently():
+    log = []
+    pipeline = _pipeline(threads=4, parallel_steps=2)
+    a = _add(pipeline, RecordingStep("a", log))
+    b = _add(pipeline, RecordingStep("b", log))
+    c = _add(pipeline, RecordingStep("c", log, dependencies=[a.id, b.id]))
+    a.wait_for = b
+    b.wait_for = a
+    scheduler = StepScheduler(pipeline, [0, 1, 2], threads=4, max_parallel=2)
+    assert scheduler.run()
+    assert a.concurrent and b.concurrent
+    assert log[2] == ("c", 4)
+    assert sorted(log[:2]) == [("a", 2), ("b", 2)]
+    assert scheduler.completed == set([0, 1, 2])
+
+
+@with_setup(setup_func, cleanup)
+def test_scheduler_sequential_keeps_order_and_threads():
+    log = []
+    pipeline = _pipeline(threads=4)
+    a = _add(pipeline, RecordingStep("a", log))
+    _add(pipeline, RecordingStep("b", log))
+    _add(pipeline, RecordingStep("c", log, dependencies=[a.id, -1]))
+    scheduler = StepScheduler(pipeline, [0, 1, 2], threads=4, max_parallel=1)
+    assert scheduler.run()
+    assert log == [("a", 4), ("b", 4), ("c", 4)]
+
+
+@with_setup(setup_func, cleanup)
+def test_scheduler_skips_done_steps():
+    log = []
+    pipeline = _pipeline()
+    a = _add(pipeline, RecordingStep("a", log))
+    _add(pipeline, RecordingStep("b", log, dependencies=[a.id]))
+    open(a.files()[0], "w").close()
+    a.write_manifest()
+    assert StepScheduler(pipeline, [0, 1]).run()
+    assert log == [("b", 1)]
+
+
+@with_setup(setup_func, cleanup)
+def test_scheduler_reruns_dependents_of_executed_steps():
+    log = []
+    pipeline = _pipeline()
+    a = _add(pipeline, RecordingStep("a", log))
+    b = _add(pipeline, RecordingStep("b", log, dependencies=[a.id]))
+    assert StepScheduler(pipeline, [0, 1]).run()
+    assert a.is_done() and b.is_done()
+    a.remove_manifest()
+    assert StepScheduler(pipeline, [0, 1]).run()
+    assert log == [("a", 1), ("b", 1), ("a", 1), ("b", 1)]
+
+
+@with_setup(setup_func, cleanup)
+def test_scheduler_keeps_removed_intermediates_that_are_not_needed():
+    log = []
+    pipeline = _pipeline()
+    a = _add(pipeline, RecordingStep("a", log))
+    b = _add(pipeline, RecordingStep("b", log, dependencies=[a.id], final=True))
+    c = _add(pipeline, RecordingStep("c", log, dependencies=[b.id], final=True))
+    assert StepScheduler(pipeline, range(3)).run()
+    for step in pipeline.steps:
+        step.cleanup()
+    assert not os.path.exists(a.files()[0])
+    assert a.is_removed() and not a.is_done()
+    # only the changed step is executed again
+    c.configuration["param"] = 1
+    assert StepScheduler(pipeline, range(3)).run()
+    assert [name for (name, threads) in log] == ["a", "b", "c", "c"]
+    # the removed output is created again if a dependent needs it
+    b.configuration["param"] = 1
+    assert StepScheduler(pipeline, range(3)).run()
+    assert [name for (name, threads) in log] == ["a", "b", "c", "c", "a", "b", "c"]
+    a.cleanup(force=True)
+    assert not os.path.exists(a.manifest())
+
+
+@with_setup(setup_func, cleanup)
+def test_step_manifest_detects_changes():
+    pipeline = _pipeline()
+    pipeline.input = [testfiles["test.map"]]
+    step = _add(pipeline, CopyStep("copy"))
+    assert not step.is_done()
+    # existing output without manifest is not done
+    step.run()
+    assert not step.is_done()
+    step.write_manifest()
+    assert step.is_done()
+
+    step.configuration["param"] = 1
+    assert not step.is_done()
+    step.write_manifest()
+    assert step.is_done()
+
+    with open(step.files()[0], "a") as f:
+        f.write("truncated")
+    assert not step.is_done()
+    step.run()
+    assert step.is_done()
+
+    pipeline.input = [testfiles["test.fastq"]]
+    assert not step.is_done()
+    pipeline.input = [testfiles["test.map"]]
+    step.cleanup(force=True)
+    assert not os.path.exists(step.manifest())
+
+
+@with_setup(setup_func, cleanup)
+def test_scheduler_stops_dependents_of_failed_step():
+    log = []
+    pipeline = _pipeline(threads=2, parallel_steps=2)
+    a = _add(pipeline, RecordingStep("a", log, fail=True))
+    _add(pipeline, RecordingStep("b", log, dependencies=[a.id]))
+    scheduler = StepScheduler(pipeline, [0, 1], threads=2, max_parallel=2)
+    assert not scheduler.run()
+    assert log == [("a", 2)]
+    assert not os.path.exists(a.files()[0])
+
+
+class CopyStep(PipelineStep):
+    """Step that writes the test mapping as output"""
+    def run(self):
+        with open(testfiles["test.map"]) as source:
+            with open(self._final_output(), "w") as target:
+                target.write(source.read())
+
+
+class CountStep(PipelineStep):
+    """Step that counts the templates of its input"""
+    fan_out = True
+
+    def run(self):
+        self.shared = self.shared_input is not None
+        self.count = sum(1 for t in self._input())
+        open(self._final_output(), "w").close()
+
+
+@with_setup(setup_func, cleanup)
+def test_scheduler_fan_out_shares_dependency_output():
+    pipeline = _pipeline(threads=3)
+    pipeline.fan_out = True
+    source = _add(pipeline, CopyStep("source"))
+    consumers = [_add(pipeline, CountStep("count%d" % i, dependencies=[source.id])) for i in range(3)]
+    scheduler = StepScheduler(pipeline, range(4), threads=3)
+    assert scheduler.run()
+    for c in consumers:
+        assert c.shared
+        assert c.count == 10, c.count
+        assert c.threads == 1
+        assert c.shared_input is None
+
+
+class ProducerStep(CopyStep):
+    """Step whose output can be streamed"""
+    stream_output = True
+
+    def run(self):
+        self.streamed = self.stream is not None
+        CopyStep.run(self)
+
+
+class ConsumerStep(PipelineStep):
+    """Step that counts the templates of all its inputs"""
+    stream_input = True
+
+    def __init__(self, name, fail=False, **kwargs):
+        PipelineStep.__init__(self, name, **kwargs)
+        self.fail = fail
+
+    def run(self):
+        if self.fail:
+            raise PipelineError("Step failed")
+        self.count = 0
+        for i in self.dependencies:
+            with open(self.pipeline.open_step(i, raw=True)) as f:
+                self.count += sum(1 for l in f)
+        open(self._final_output(), "w").close()
+
+
+@with_setup(setup_func, cleanup)
+def test_scheduler_streams_intermediates_through_fifos():
+    pipeline = _pipeline(threads=3)
+    pipeline.stream_intermediates = True
+    producers = [_add(pipeline, ProducerStep("producer%d" % i)) for i in range(2)]
+    consumer = _add(pipeline, ConsumerStep("consumer", dependencies=[p.id for p in producers]))
+    scheduler = StepScheduler(pipeline, range(3), threads=3)
+    assert scheduler.run()
+    assert consumer.count == 20
+    for p in producers:
+        assert p.streamed
+        assert p.stream is None
+        assert not os.path.exists(p.files()[0])
+    assert os.path.exists(consumer.files()[0])
+
+
+@with_setup(setup_func, cleanup)
+def test_scheduler_resumes_streamed_pipeline():
+    pipeline = _pipeline(threads=3)
+    pipeline.stream_intermediates = True
+    producers = [_add(pipeline, ProducerStep("producer%d" % i)) for i in range(2)]
+    consumer = _add(pipeline, ConsumerStep("consumer", dependencies=[p.id for p in producers]))
+    assert StepScheduler(pipeline, range(3), threads=3).run()
+    for p in producers:
+        assert p.is_removed() and not p.is_done()
+    # nothing is executed again
+    scheduler = StepScheduler(pipeline, range(3), threads=3)
+    assert scheduler.run()
+    assert scheduler.executed == set([])
+    assert scheduler.completed == set([0, 1, 2])
+    for p in producers:
+        assert not os.path.exists(p.files()[0])
+    # the producers are streamed again if the consumer changes
+    consumer.configuration["param"] = 1
+    scheduler = StepScheduler(pipeline, range(3), threads=3)
+    assert scheduler.run()
+    assert scheduler.executed == set([0, 1, 2])
+    assert consumer.count == 20
+
+
+@with_setup(setup_func, cleanup)
+def test_scheduler_defers_ready_producers_until_all_are_ready():
+    pipeline = _pipeline(threads=3)
+    pipeline.stream_intermediates = True
+    first = _add(pipeline, CopyStep("first"))
+    early = _add(pipeline, ProducerStep("early"))
+    late = _add(pipeline, ProducerStep("late", dependencies=[first.id]))
+    consumer = _add(pipeline, ConsumerStep("consumer", dependencies=[early.id, late.id]))
+    assert StepScheduler(pipeline, range(4), threads=4, max_parallel=2).run()
+    assert early.streamed
+    assert late.streamed
+    assert consumer.count == 20
+
+
+@with_setup(setup_func, cleanup)
+def test_scheduler_uses_files_for_completed_producers():
+    pipeline = _pipeline()
+    pipeline.stream_intermediates = True
+    done = _add(pipeline, ProducerStep("done"))
+    producer = _add(pipeline, ProducerStep("producer"))
+    consumer = _add(pipeline, ConsumerStep("consumer", dependencies=[done.id, producer.id]))
+    shutil.copy(testfiles["test.map"], done.files()[0])
+    assert StepScheduler(pipeline, range(3)).run()
+    assert producer.streamed
+    assert consumer.count == 20
+
+
+@with_setup(setup_func, cleanup)
+def test_scheduler_fails_streaming_unit_with_its_consumer():
+    pipeline = _pipeline(threads=2)
+    pipeline.stream_intermediates = True
+    producer = _add(pipeline, ProducerStep("producer"))
+    _add(pipeline, ConsumerStep("consumer", fail=True, dependencies=[producer.id]))
+    scheduler = StepScheduler(pipeline, range(2), threads=2)
+    assert not scheduler.run()
+    assert scheduler.completed == set([])
+
+
+class ToolStep(PipelineStep):
+    """Step that copies the test mapping with an external process"""
+    def run(self):
+        p = gem.utils.run_tools([["cat", "-"]], input=testfiles["test.map"], output=self._final_output())
+        p.wait()
+
+
+@with_setup(setup_func, cleanup)
+def test_scheduler_records_process_timeline():
+    pipeline = _pipeline()
+    step = _add(pipeline, ToolStep("tool"))
+    scheduler = StepScheduler(pipeline, [0])
+    assert scheduler.run()
+    assert len(scheduler.timeline) == 1
+    record = scheduler.timeline[0]
+    assert record["step"] == "tool"
+    assert [p["command"] for p in record["processes"]] == ["cat"]
+    assert record["totals"]["read_bytes_total"] >= os.path.getsize(step.files()[0])
+    assert record["totals"]["stdin_bytes"] == os.path.getsize(testfiles["test.map"])
+    assert record["totals"]["stdout_bytes"] == os.path.getsize(step.files()[0])
+    pipeline.write_timeline(scheduler.timeline)
+    with open(pipeline.timeline_file()) as f:
+        timeline = json.load(f)
+    assert timeline["steps"][0]["processes"][0]["exit_value"] == 0
@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+import os
+import shutil
+import string
+import tempfile
+import time
+from nose.tools import with_setup
+import gem.scatter as scatter
+import gem.gemtools as gt
+from testfiles import testfiles
+
+results_dir = None
+
+
+def setup_func():
+    global results_dir
+    results_dir = "test_results"
+    if not os.path.exists(results_dir):
+        os.mkdir(results_dir)
+    results_dir = os.path.abspath(results_dir)
+
+
+def cleanup():
+    shutil.rmtree(results_dir, ignore_errors=True)
+
+
+def _chunk_content(file_name, chunks):
+    with open(file_name, "rb") as f:
+        for (start, end) in chunks:
+            f.seek(start)
+            yield f.read(end - start)
+
+
+def test_split_fastq_into_read_aligned_chunks():
+    source = testfiles["reads_1.fastq"]
+    chunks = scatter.split(source, 4)
+    assert len(chunks) == 4
+    assert chunks[0][0] == 0
+    assert chunks[-1][1] == os.path.getsize(source)
+    content = list(_chunk_content(source, chunks))
+    for c in content:
+        assert c.startswith("@HWI")
+        assert len(c.split("\n")) % 4 == 1
+    assert sum(len(c.split("\n")) - 1 for c in content) == 40000
+    with open(source, "rb") as f:
+        assert "".join(content) == f.read()
+
+
+@with_setup(setup_func, cleanup)
+def test_split_keeps_pairs_together():
+    interleaved = results_dir + "/interleaved.fastq"
+    with open(testfiles["reads_1.fastq"]) as r1:
+        with open(testfiles["reads_2.fastq"]) as r2:
+            with open(interleaved, "w") as out:
+                while True:
+                    first = [r1.readline() for i in range(4)]
+                    second = [r2.readline() for i in range(4)]
+                    if len(first[0]) == 0:
+                        break
+                    first[0] = first[0].split()[0] + "/1\n"
+                    second[0] = second[0].split()[0] + "/2\n"
+                    out.write("".join(first + second))
+    for n in [2, 3, 7]:
+        chunks = scatter.split(interleaved, n)
+        assert len(chunks) == n
+        for c in _chunk_content(interleaved, chunks):
+            lines = c.split("\n")
+            assert len(lines) % 8 == 1
+            assert lines[0].endswith("/1")
+            assert lines[4].endswith("/2")
+            assert lines[0][:-2] == lines[4][:-2]
+
+
+def test_split_map_and_small_files():
+    source = testfiles["test.map"]
+    chunks = scatter.split(source, 20)
+    assert 1 < len(chunks) <= 10
+    content = list(_chunk_content(source, chunks))
+    for c in content:
+        assert c.endswith("\n")
+    assert sum(c.count("\n") for c in content) == 10
+
+
+def test_open_chunk_reads_byte_range():
+    source = testfiles["reads_1.fastq"]
+    (start, end) = scatter.split(source, 3)[1]
+    input = scatter._open_chunk({"file": source, "start": start, "end": end, "quality": 33})
+    count = sum(1 for t in input)
+    assert input.process.wait() == 0
+    with open(source, "rb") as f:
+        f.seek(start)
+        assert count == f.read(end - start).count("\n") / 4
+
+
+def test_local_executor_keeps_order_and_raises_errors():
+    executor = scatter.LocalExecutor(3)
+    assert executor.map(lambda x: x * 2, range(10)) == [x * 2 for x in range(10)]
+
+    def fail(x):
+        if x == 5:
+            raise ValueError("failed")
+        return x
+    try:
+        executor.map(fail, range(10))
+        assert False
+    except ValueError:
+        pass
+
+
+# read tag that makes copy_chunk fail and the tags of the copied chunks
+fail_on = None
+copied = []
+
+
+def copy_chunk(input, output=None, threads=1):
+    """Chunk function that copies the chunk content"""
+    content = input.raw_stream().read()
+    if fail_on is not None and fail_on in content:
+        raise ValueError("Failing on %s" % (fail_on))
+    copied.append(content.split("\n", 1)[0])
+    with open(output, "w") as f:
+        f.write(content)
+
+
+def failing_chunk(input, output=None, threads=1):
+    """Chunk function that fails before reading its chunk"""
+    raise ValueError("Failing chunk")
+
+
+@with_setup(setup_func, cleanup)
+def test_failed_chunk_releases_its_reader():
+    source = testfiles["reads_1.fastq"]
+    job = {"function": __name__ + ".failing_chunk",
+           "input": {"file": source, "start": 0, "end": os.path.getsize(source), "quality": None},
+           "output": results_dir + "/chunk.map", "arguments": {}}
+    fds = len(os.listdir("/proc/self/fd"))
+    logs = set(os.listdir(tempfile.gettempdir()))
+    try:
+        scatter.run_job(job)
+        assert False
+    except ValueError:
+        pass
+    assert len(os.listdir("/proc/self/fd")) == fds
+    assert set(os.listdir(tempfile.gettempdir())) == logs
+
+
+@with_setup(setup_func, cleanup)
+def test_scatter_resumes_from_checkpoint():
+    global fail_on
+    source = testfiles["reads_1.fastq"]
+    checkpoint = results_dir + "/chunks"
+    ranges = scatter.split(source, 3)
+    with open(source) as f:
+        f.seek(ranges[2][0])
+        fail_on = f.readline().strip()
+    arguments = {"input": gt.InputFile(source), "output": results_dir + "/out.fastq",
+                 "chunks": 3, "executor": None, "threads": 3, "checkpoint": checkpoint}
+    try:
+        scatter.scatter(__name__ + ".copy_chunk", arguments)
+        assert False
+    except ValueError:
+        pass
+    assert len(copied) == 2
+    assert sorted(f for f in os.listdir(checkpoint) if f.endswith(".json")) == \
+        ["chunk.0000.map.json", "chunk.0001.map.json"]
+
+    missing = fail_on
+    fail_on = None
+    del copied[:]
+    result = scatter.scatter(__name__ + ".copy_chunk", arguments)
+    assert copied == [missing]
+    assert not os.path.exists(checkpoint)
+    with open(source) as a:
+        with open(result.filename) as b:
+            assert a.read() == b.read()
+
+
+@with_setup(setup_func, cleanup)
+def test_scatter_does_not_resume_other_input_of_the_same_size():
+    global fail_on
+    del copied[:]
+    source = testfiles["reads_1.fastq"]
+    with open(source) as f:
+        lines = f.readlines()
+    # same size and chunk boundaries, but other reads
+    other = results_dir + "/other.fastq"
+    with open(other, "w") as f:
+        for i, line in enumerate(lines):
+            f.write(line.translate(string.maketrans("ACGT", "TGCA")) if i % 4 == 1 else line)
+    assert os.path.getsize(other) == os.path.getsize(source)
+    assert scatter.split(other, 3) == scatter.split(source, 3)
+    checkpoint = results_dir + "/chunks"
+    fail_on = lines[-4].strip()
+    arguments = {"output": results_dir + "/out.fastq", "chunks": 3,
+                 "executor": None, "threads": 3, "checkpoint": checkpoint}
+    try:
+        # streams are materialized before they are split
+        scatter.scatter(__name__ + ".copy_chunk", dict(arguments, input=gt.InputFile(open(source))))
+        assert False
+    except ValueError:
+        pass
+    assert len(copied) == 2
+
+    fail_on = None
+    del copied[:]
+    result = scatter.scatter(__name__ + ".copy_chunk", dict(arguments, input=gt.InputFile(open(other))))
+    assert len(copied) == 3
+    with open(other) as a:
+        with open(result.filename) as b:
+            assert a.read() == b.read()
+
+
+
+# number of running chunk jobs, the maximum and the threads of the jobs
+running = [0, 0]
+chunk_threads = []
+
+
+def count_chunk(input, output=None, threads=1):
+    """Chunk function that records its threads and the concurrency"""
+    running[0] += 1
+    running[1] = max(running[1], running[0])
+    chunk_threads.append(threads)
+    content = input.raw_stream().read()
+    time.sleep(0.05)
+    with open(output, "w") as f:
+        f.write(content)
+    running[0] -= 1
+
+
+@with_setup(setup_func, cleanup)
+def test_scatter_maps_chunks_one_at_a_time_by_default():
+    source = testfiles["reads_1.fastq"]
+    arguments = {"input": gt.InputFile(source), "output": results_dir + "/out.fastq",
+                 "chunks": 4, "executor": None, "threads": 4}
+    result = scatter.scatter(__name__ + ".count_chunk", arguments)
+    assert running[1] == 1
+    assert chunk_threads == [4] * 4
+    with open(source) as a:
+        with open(result.filename) as b:
+            assert a.read() == b.read()